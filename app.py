@@ -548,10 +548,11 @@ def execute_step4(model_name: str) -> tuple[bool, str]:
             return False, f"Step4 入力検証失敗（3つのデータソース統合に必要）: {message}"
         
         # 【重要修正】データソース1: AIスキニング（Step3出力）- source引数として使用
-        # Step3で生成されたskinned_fbxには正しいスキンウェイト情報が含まれている
+        # スキンNPZがあれば配列のまま使用し、無ければskinned_fbx（スキンウェイト付き）を使用
+        skinning_npz = available_files.get("skinning_npz")
         skinned_fbx = available_files.get("skinned_fbx")
-        if not skinned_fbx or not Path(skinned_fbx).exists():
-            return False, "Step4 エラー: スキニング済みFBX（Step3出力）が見つかりません（スキンウェイト転写に必要）"
+        if not skinning_npz and (not skinned_fbx or not Path(skinned_fbx).exists()):
+            return False, "Step4 エラー: スキンNPZ・スキニング済みFBX（Step3出力）が見つかりません（スキンウェイト転写に必要）"
         
         # データソース2: オリジナルメッシュ（ユーザーアップロード）- target引数として使用
         # 重要: model_dirに保存されているオリジナルファイルを取得
@@ -565,7 +566,7 @@ def execute_step4(model_name: str) -> tuple[bool, str]:
         if not original_file:
             return False, "Step4 エラー: オリジナルメッシュファイルが見つかりません（3つのデータソース統合に必要）"
         
-        app_logger.info(f"Step4: スキンウェイト転写処理 - source: {skinned_fbx}, target: {original_file}")
+        app_logger.info(f"Step4: スキンウェイト転写処理 - source: {skinning_npz or skinned_fbx}, target: {original_file}")
         
         # unified_merge使用（3つのデータソース統合処理）
         merge_orchestrator = UnifiedMergeOrchestrator(app_logger)
@@ -575,9 +576,10 @@ def execute_step4(model_name: str) -> tuple[bool, str]:
         # 【修正】重要な技術的発見: skinned_fbx（Step3出力）をsourceに使用
         success, logs = merge_orchestrator.merge_skeleton_skinning_unified(
             model_name=model_name,
-            skinned_fbx=str(skinned_fbx),   # source: AIスキニング（Step3出力・スキンウェイト付き）
+            skinned_fbx=str(skinned_fbx) if skinned_fbx else None,  # source: AIスキニング（Step3出力・スキンウェイト付き）
             original_file=original_file,    # target: オリジナルメッシュ（ユーザーアップロード）
-            output_dir=str(output_dir)
+            output_dir=str(output_dir),
+            skinning_npz=str(skinning_npz) if skinning_npz else None  # 優先: スキンNPZ（中間FBX不要）
         )
         
         # 期待出力確認
@@ -616,7 +618,8 @@ def execute_step5(model_name: str) -> tuple[bool, str]:
         success, logs, output_files = step5.integrate_final_output(
             model_name=model_name,
             original_file=Path(original_file),    # アセット情報源（テクスチャ・UV・マテリアル）
-            rigged_file=Path(merged_fbx)          # リギング情報源（ボーン・スキン）
+            rigged_file=Path(merged_fbx),         # リギング情報源（ボーン・スキン）
+            skinning_npz=fdm.find_file_with_fallback("step3", "skinning_npz")  # .glb出力はBlenderを使わずここから書き出す
         )
         
         # 出力ファイル確認
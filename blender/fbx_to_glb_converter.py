@@ -3,18 +3,63 @@
 FBX to GLB converter using Blender
 Based on https://qiita.com/y-okamon/items/179f74cf86da40b7cba1
 and https://github.com/KhronosGroup/glTF-Tutorials/blob/main/BlenderGltfConverter/blender_gltf_converter.py
+
+Batch mode converts many files in one Blender session (scene reset and memory check per file):
+    blender --background --python fbx_to_glb_converter.py -- --batch <dir|manifest> [--output_dir <dir>] [--report report.json]
+With plain python the same options run a pool of Blender processes:
+    python fbx_to_glb_converter.py --batch <dir|manifest> --workers 4 [--blender blender]
+A manifest is a .json list of {"input": ..., "output": ...} or a text file with "input[<TAB>output]" per line.
 """
 
-import bpy
 import sys
 import os
+import json
+import time
 import argparse
+import subprocess
+import tempfile
+
+try:
+    import bpy
+except ImportError:
+    # not inside Blender: only the process pool driver is available
+    bpy = None
+
+# exit code of a batch that stopped early because memory exceeded --max_memory_mb
+EXIT_MEMORY = 3
 
 def clear_scene():
     """Clear all objects from the scene"""
     bpy.ops.object.select_all(action='SELECT')
     bpy.ops.object.delete(use_global=False, confirm=False)
 
+def reset_scene():
+    """Clear the scene and remove data blocks left by the previous file"""
+    clear_scene()
+    for collection in [
+        bpy.data.meshes, bpy.data.armatures, bpy.data.materials, bpy.data.images,
+        bpy.data.textures, bpy.data.actions, bpy.data.node_groups, bpy.data.cameras, bpy.data.lights,
+    ]:
+        for item in list(collection):
+            try:
+                collection.remove(item)
+            except Exception as e:
+                print(f"Warning: Could not remove {item.name}: {e}")
+    try:
+        bpy.ops.outliner.orphans_purge(do_local_ids=True, do_linked_ids=True, do_recursive=True)
+    except Exception as e:
+        print(f"Warning: Could not purge orphans: {e}")
+
+def current_rss_mb():
+    """Resident memory of this process in MB (peak memory where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
 def convert_fbx_to_glb(input_path, output_path=None):
     """
     Convert FBX file to GLB format
@@ -102,12 +147,133 @@ def convert_fbx_to_glb(input_path, output_path=None):
         print(f"Error during conversion: {str(e)}")
         return False
 
+def collect_jobs(batch, output_dir=None):
+    """
+    List (input_fbx, output_glb) pairs from a directory (searched recursively) or a manifest
+    """
+    jobs = []
+    if os.path.isdir(batch):
+        for root, dirs, files in os.walk(batch):
+            for file in sorted(files):
+                if file.lower().endswith('.fbx'):
+                    input_path = os.path.join(root, file)
+                    jobs.append((input_path, None if output_dir is None else
+                        os.path.join(output_dir, os.path.relpath(os.path.splitext(input_path)[0] + '.glb', batch))))
+        return sorted(jobs)
+    with open(batch, 'r', encoding='utf-8') as f:
+        if batch.endswith('.json'):
+            for item in json.load(f):
+                jobs.append((item['input'], item.get('output')))
+        else:
+            for line in f:
+                line = line.strip()
+                if line == '' or line.startswith('#'):
+                    continue
+                parts = line.split('\t')
+                jobs.append((parts[0], parts[1] if len(parts) > 1 else None))
+    if output_dir is not None:
+        jobs = [(i, o if o is not None else os.path.join(output_dir, os.path.splitext(os.path.basename(i))[0] + '.glb')) for i, o in jobs]
+    return jobs
+
+def convert_batch(jobs, max_memory_mb=None, report_path=None):
+    """
+    Convert jobs in this Blender session
+
+    Stops early (pending files are listed in the report) when memory stays above max_memory_mb after a
+    scene reset, so that the caller can continue in a fresh process.
+
+    Returns:
+        (results, pending)
+    """
+    results = []
+    pending = []
+    start = time.time()
+    for i, (input_path, output_path) in enumerate(jobs):
+        reset_scene()
+        rss = current_rss_mb()
+        if max_memory_mb is not None and rss > max_memory_mb and len(results) > 0:
+            print(f"Memory {rss:.0f}MB exceeds {max_memory_mb}MB after reset, stopping with {len(jobs) - i} files left")
+            pending = [{'input': j[0], 'output': j[1]} for j in jobs[i:]]
+            break
+        file_start = time.time()
+        success = convert_fbx_to_glb(input_path, output_path)
+        results.append({
+            'input': input_path,
+            'output': output_path if output_path is not None else input_path.replace(".fbx", ".glb"),
+            'success': success,
+            'seconds': round(time.time() - file_start, 3),
+            'rss_mb': round(current_rss_mb(), 1),
+        })
+        print(f"[{i + 1}/{len(jobs)}] {'OK' if success else 'FAIL'} {input_path} ({results[-1]['seconds']:.2f}s, {results[-1]['rss_mb']:.0f}MB)")
+    elapsed = time.time() - start
+    print(f"Converted {sum(r['success'] for r in results)}/{len(results)} files in {elapsed:.1f}s")
+    if report_path is not None:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump({'results': results, 'pending': pending, 'seconds': round(elapsed, 3)}, f, indent=2, ensure_ascii=False)
+    return results, pending
+
+def run_pool(jobs, workers=1, blender='blender', max_memory_mb=None, report_path=None, timeout=None):
+    """
+    Convert jobs with a pool of background Blender processes, each converting a shard of the files in
+    one session. Shards stopped for memory are resumed in a new process.
+    """
+    start = time.time()
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        shards = [jobs[i::workers] for i in range(workers) if len(jobs[i::workers]) > 0]
+        running = []
+        def launch(shard, index):
+            manifest = os.path.join(tmp, f"shard_{index}.json")
+            report = os.path.join(tmp, f"report_{index}.json")
+            with open(manifest, 'w', encoding='utf-8') as f:
+                json.dump([{'input': i, 'output': o} for i, o in shard], f)
+            cmd = [blender, '--background', '--python', os.path.abspath(__file__), '--', '--batch', manifest, '--report', report]
+            if max_memory_mb is not None:
+                cmd += ['--max_memory_mb', str(max_memory_mb)]
+            return subprocess.Popen(cmd, stdout=subprocess.DEVNULL), shard, report
+        count = 0
+        for shard in shards:
+            running.append(launch(shard, count))
+            count += 1
+        while len(running) > 0:
+            process, shard, report = running.pop(0)
+            try:
+                process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+            done = []
+            pending = []
+            if os.path.exists(report):
+                with open(report, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                done = data['results']
+                pending = [(p['input'], p['output']) for p in data['pending']]
+            results.extend(done)
+            if process.returncode == EXIT_MEMORY and len(pending) > 0:
+                running.append(launch(pending, count))
+                count += 1
+            elif len(done) < len(shard):
+                # crashed or timed out: files without a result are reported as failed
+                finished = {r['input'] for r in done}
+                results.extend({'input': i, 'output': o, 'success': False, 'seconds': None, 'rss_mb': None,
+                                'error': f"blender exited with {process.returncode}"} for i, o in shard if i not in finished)
+    elapsed = time.time() - start
+    ok = sum(1 for r in results if r['success'])
+    print(f"Converted {ok}/{len(jobs)} files in {elapsed:.1f}s with {workers} Blender process(es)")
+    if report_path is not None:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump({'results': results, 'seconds': round(elapsed, 3)}, f, indent=2, ensure_ascii=False)
+    return results
+
 def main():
     """Main function for command line usage"""
     # Parse arguments (skip Blender's arguments)
     argv = sys.argv
     if "--" in argv:
         argv = argv[argv.index("--") + 1:]
+    elif bpy is None:
+        argv = argv[1:]
     else:
         argv = []
     
@@ -115,31 +281,50 @@ def main():
     parser = argparse.ArgumentParser(description='Convert FBX to GLB using Blender')
     parser.add_argument('--input', help='Input FBX file path')
     parser.add_argument('--output', help='Output GLB file path (optional)')
+    parser.add_argument('--batch', help='Directory or manifest of FBX files to convert in one session')
+    parser.add_argument('--output_dir', help='Output directory of batch conversion (optional)')
+    parser.add_argument('--report', help='JSON report of batch conversion with per-file timings (optional)')
+    parser.add_argument('--max_memory_mb', type=float, help='Restart Blender when memory stays above this after a scene reset')
+    parser.add_argument('--workers', type=int, default=1, help='Number of Blender processes (plain python only)')
+    parser.add_argument('--blender', default='blender', help='Blender executable (plain python only)')
     # Also support positional arguments for backward compatibility
     parser.add_argument('positional', nargs='*', help='Positional arguments: input_fbx [output_glb]')
     
     try:
         args = parser.parse_args(argv)
-        
-        # Determine input and output paths
-        if args.input:
-            input_path = args.input
-            output_path = args.output
-        elif args.positional and len(args.positional) >= 1:
-            input_path = args.positional[0]
-            output_path = args.positional[1] if len(args.positional) > 1 else None
-        else:
-            print("Error: No input file specified")
-            print("Usage: blender --background --python fbx_to_glb_converter.py -- --input <input_fbx> --output <output_glb>")
-            print("   or: blender --background --python fbx_to_glb_converter.py -- <input_fbx> [output_glb]")
-            return
-            
     except SystemExit:
         print("Error: Invalid arguments")
         print("Usage: blender --background --python fbx_to_glb_converter.py -- --input <input_fbx> --output <output_glb>")
         print("   or: blender --background --python fbx_to_glb_converter.py -- <input_fbx> [output_glb]")
         return
     
+    if args.batch:
+        jobs = collect_jobs(args.batch, args.output_dir)
+        if bpy is None:
+            results = run_pool(jobs, workers=args.workers, blender=args.blender, max_memory_mb=args.max_memory_mb, report_path=args.report)
+            sys.exit(0 if all(r['success'] for r in results) else 1)
+        results, pending = convert_batch(jobs, max_memory_mb=args.max_memory_mb, report_path=args.report)
+        if len(pending) > 0:
+            sys.exit(EXIT_MEMORY)
+        sys.exit(0 if all(r['success'] for r in results) else 1)
+
+    if bpy is None:
+        print("Error: single file conversion must run inside Blender (or use --batch)")
+        return
+
+    # Determine input and output paths
+    if args.input:
+        input_path = args.input
+        output_path = args.output
+    elif args.positional and len(args.positional) >= 1:
+        input_path = args.positional[0]
+        output_path = args.positional[1] if len(args.positional) > 1 else None
+    else:
+        print("Error: No input file specified")
+        print("Usage: blender --background --python fbx_to_glb_converter.py -- --input <input_fbx> --output <output_glb>")
+        print("   or: blender --background --python fbx_to_glb_converter.py -- <input_fbx> [output_glb]")
+        return
+    
     success = convert_fbx_to_glb(input_path, output_path)
     sys.exit(0 if success else 1)
 
@@ -204,9 +204,10 @@ class FixedDirectoryManager:
         validation_results["step2_fbx"] = step2_fbx is not None
         validation_results["step2_npz"] = step2_npz is not None
         
-        # Step3検証: スキニング済みFBX確認
+        # Step3検証: スキニング済みFBX（またはスキンNPZ）確認
         step3_fbx = self.find_file_with_fallback("step3", "skinned_fbx")
-        validation_results["step3_fbx"] = step3_fbx is not None
+        step3_npz = self.find_file_with_fallback("step3", "skinning_npz")
+        validation_results["step3_fbx"] = step3_fbx is not None or step3_npz is not None
         
         # Step4検証: マージ済みFBX確認
         step4_fbx = self.find_file_with_fallback("step4", "merged_fbx")
@@ -350,7 +351,11 @@ class FixedDirectoryManager:
             step2_files = self.get_expected_files("step2")
             step3_files = self.get_expected_files("step3")
             input_files["skeleton_fbx"] = step2_files["skeleton_fbx"]
-            input_files["skinned_fbx"] = step3_files["skinned_fbx"]
+            # スキンNPZがあれば中間のスキニング済みFBXは不要
+            if step3_files["skinning_npz"].exists() or not step3_files["skinned_fbx"].exists():
+                input_files["skinning_npz"] = step3_files["skinning_npz"]
+            else:
+                input_files["skinned_fbx"] = step3_files["skinned_fbx"]
         
         elif step == "step5":
             # Step5: Step4の出力と元ファイルが入力
@@ -384,7 +389,7 @@ class FixedDirectoryManager:
         elif step == "step3":
             return {
                 "skinned_fbx": step_dir / f"{self.model_name}_skinned.fbx",
-                "skinning_npz": step_dir / "skinning_data.npz"
+                "skinning_npz": step_dir / f"{self.model_name}_skinning.npz"
             }
         elif step == "step4":
             return {
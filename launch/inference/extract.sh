@@ -9,6 +9,7 @@ require_suffix="obj,fbx,FBX,dae,glb,gltf,vrm"
 num_runs=1
 force_override="false"
 faces_target_count=50000
+lod_face_counts="20000,5000" # coarser levels written to lod.npz in the same pass (empty to disable)
 output_dir="results/" # Default output directory changed to results/
 
 PYTHON_EXEC="/opt/conda/envs/UniRig/bin/python3"
@@ -22,6 +23,7 @@ while [[ "$#" -gt 0 ]]; do
         --num_runs) num_runs="$2"; shift; shift ;;
         --force_override) force_override="$2"; shift; shift ;;
         --faces_target_count) faces_target_count="$2"; shift; shift ;;
+        --lod_face_counts) lod_face_counts="$2"; shift; shift ;;
         --time) time="$2"; shift; shift ;;
         --input|-i) input="$2"; shift; shift ;;
         --input_dir) input_dir="$2"; shift; shift ;;
@@ -85,6 +87,9 @@ do
     command_args+=("--id=$i")
     command_args+=("--time=$time")
     command_args+=("--faces_target_count=$faces_target_count")
+    if [ -n "$lod_face_counts" ]; then
+        command_args+=("--lod_face_counts=$lod_face_counts")
+    fi
 
     if [ -n "$input" ]; then
         command_args+=("--input=$input")
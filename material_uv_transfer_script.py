@@ -1,4 +1,55 @@
 import bpy
+import numpy as np
+
+def _loop_points(obj):
+    """
+    ループごとのワールド座標（頂点を面の中心へ少し寄せ、UVシームの両側を区別する）
+    """
+    mesh = obj.data
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    vertex_index = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", vertex_index)
+    center = np.empty(len(mesh.polygons) * 3, dtype=np.float32)
+    mesh.polygons.foreach_get("center", center)
+    loop_total = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_total", loop_total)
+    # polygonsのループは連続しているので、面の中心をループ数だけ繰り返せばよい
+    points = co.reshape(-1, 3)[vertex_index] * 0.9 + np.repeat(center.reshape(-1, 3), loop_total, axis=0) * 0.1
+    m = np.array(obj.matrix_world, dtype=np.float32)
+    return points @ m[:3, :3].T + m[:3, 3]
+
+def _nearest(source_points, target_points):
+    try:
+        from scipy.spatial import cKDTree
+        return cKDTree(source_points).query(target_points)[1]
+    except ImportError:
+        # Blender同梱のPythonにscipyが無い場合はmathutilsのKDTreeを使う
+        from mathutils.kdtree import KDTree
+        tree = KDTree(len(source_points))
+        for i, p in enumerate(source_points):
+            tree.insert(p, i)
+        tree.balance()
+        return np.array([tree.find(p)[1] for p in target_points], dtype=np.int64)
+
+def copy_uv_layer(source_obj, source_layer, target_obj, target_layer):
+    """
+    UVレイヤーをforeach_get/foreach_setで一括コピーする
+    ループ数が異なる場合は、最も近いソースループのUVを割り当てる（KD-tree）
+
+    Returns:
+        bool: ループ数が一致し直接コピーできた場合True
+    """
+    n_source = len(source_obj.data.loops)
+    n_target = len(target_obj.data.loops)
+    uv = np.empty(n_source * 2, dtype=np.float32)
+    source_layer.data.foreach_get("uv", uv)
+    if n_source == n_target:
+        target_layer.data.foreach_set("uv", uv)
+        return True
+    index = _nearest(_loop_points(source_obj), _loop_points(target_obj))
+    target_layer.data.foreach_set("uv", uv.reshape(-1, 2)[index].reshape(-1))
+    return False
 
 def transfer_materials_and_uvmaps(source_name, target_name):
     """
@@ -64,12 +115,10 @@ def transfer_materials_and_uvmaps(source_name, target_name):
                 # 新しいUVマップを作成
                 new_uv_layer = target_obj.data.uv_layers.new(name=uv_layer.name)
                 
-                # UVデータをコピー
-                for loop_idx in range(len(target_obj.data.loops)):
-                    if loop_idx < len(source_obj.data.loops):
-                        new_uv_layer.data[loop_idx].uv = uv_layer.data[loop_idx].uv
+                # UVデータを一括コピー（ループ数が異なる場合は最近傍で再サンプリング）
+                direct = copy_uv_layer(source_obj, uv_layer, target_obj, new_uv_layer)
                     
-                print(f"UVマップ '{uv_layer.name}' を {target_obj.name} に追加しました")
+                print(f"UVマップ '{uv_layer.name}' を {target_obj.name} に追加しました（{'直接コピー' if direct else '最近傍再サンプリング'}）")
             
             # アクティブUVマップを設定
             if active_uv_name and target_obj.data.uv_layers.get(active_uv_name):
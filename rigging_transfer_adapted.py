@@ -7,11 +7,17 @@ Step5用リギング移植スクリプト（simple_rigging_transfer_v2.py基盤
 - 出力: ターゲットファイル形式でリギング統合済みファイル
 
 実行方法:
-    blender --background --python rigging_transfer_adapted.py -- source_fbx target_file output_file
+    blender --background --python rigging_transfer_adapted.py -- source_fbx target_file output_file [texture_map_json]
+
+texture_map_json（任意）: テクスチャストアのハッシュ → 配置済みファイルパス
+    指定すると画像をストアの元ファイルに付け替え、再エンコードせずに元のバイト列を埋め込む
+    （テクスチャは指定の有無にかかわらず常にFBXへ埋め込む: embed_textures=True, path_mode='COPY'）
 """
 
 import bpy
 import sys
+import json
+import hashlib
 import bmesh
 from pathlib import Path
 from mathutils import Vector
@@ -34,13 +40,17 @@ def main():
         source_fbx = Path(argv[0])      # リギング済みFBX
         target_file = Path(argv[1])     # UV・マテリアル・テクスチャ保持ファイル
         output_file = Path(argv[2])     # 出力ファイル
+        texture_map = None
+        if len(argv) >= 4:
+            with open(argv[3], 'r', encoding='utf-8') as f:
+                texture_map = json.load(f)
         
         print(f"ソースFBX: {source_fbx}")
         print(f"ターゲットファイル: {target_file}")
         print(f"出力ファイル: {output_file}")
         
         # リギング移植実行
-        success = transfer_rigging_dynamic(source_fbx, target_file, output_file)
+        success = transfer_rigging_dynamic(source_fbx, target_file, output_file, texture_map)
         
         if success:
             print("\n🎉 Step5 リギング移植完了！")
@@ -56,7 +66,38 @@ def main():
         sys.exit(1)
 
 
-def transfer_rigging_dynamic(source_fbx: Path, target_file: Path, output_file: Path) -> bool:
+def relink_stored_textures(texture_map: dict) -> int:
+    """
+    テクスチャストアに登録済みの画像を配置済みファイルへ付け替え、パックを解除する
+    
+    Returns:
+        付け替えた画像数
+    """
+    relinked = 0
+    for image in bpy.data.images:
+        try:
+            if image.packed_file is not None:
+                data = bytes(image.packed_file.data)
+            else:
+                path = Path(bpy.path.abspath(image.filepath))
+                if not path.is_file():
+                    continue
+                data = path.read_bytes()
+        except Exception as e:
+            print(f"⚠️ 画像読み取りスキップ: {image.name}: {e}")
+            continue
+        stored = texture_map.get(hashlib.sha256(data).hexdigest())
+        if stored is None:
+            continue
+        image.filepath = stored
+        if image.packed_file is not None:
+            # 同一内容のファイルが既にあるので書き出さずに参照だけ切り替える
+            image.unpack(method='USE_ORIGINAL')
+        relinked += 1
+    return relinked
+
+
+def transfer_rigging_dynamic(source_fbx: Path, target_file: Path, output_file: Path, texture_map: dict = None) -> bool:
     """
     動的リギング移植処理（simple_rigging_transfer_v2.py基盤）
     
@@ -241,12 +282,19 @@ def transfer_rigging_dynamic(source_fbx: Path, target_file: Path, output_file: P
         output_ext = output_file.suffix.lower()
         output_file.parent.mkdir(parents=True, exist_ok=True)
         
+        if texture_map:
+            # 画像をストアの元ファイルに付け替え、エクスポーターが元のバイト列をそのまま
+            # 埋め込む（パック画像の再エンコードを省く）。埋め込みはやめない
+            relinked = relink_stored_textures(texture_map)
+            print(f"テクスチャストア参照: {relinked}/{len(bpy.data.images)}枚（再エンコード省略）")
+        
         if output_ext == '.fbx':
             bpy.ops.export_scene.fbx(
                 filepath=str(output_file),
                 use_selection=True,
                 add_leaf_bones=True,
                 bake_anim=False,
+                # ダウンロードされるのはFBX単体なので、テクスチャは常に埋め込む
                 embed_textures=True,
                 path_mode='COPY'
             )
@@ -34,6 +34,8 @@ from src.data.transform import TransformConfig
 from src.tokenizer.spec import TokenizerConfig
 from src.tokenizer.parse import get_tokenizer
 from src.model.parse import get_model
+from src.model.registry import build_model, load_weights, COLD_START_TARGET_SEC
+from src.inference.predict import Predictor
 from src.system.parse import get_system, get_writer
 
 from tqdm import tqdm
@@ -122,8 +124,10 @@ def resolve_input_files(args) -> tuple[List[str], Optional[Datapath]]:
     elif args.input_dir:
         input_dir_path = Path(args.input_dir).resolve()
         if input_dir_path.exists():
-            datapath = Datapath(files=[str(input_dir_path)], cls=args.cls)
-            run_logger.info(f"input_dirを使用: {input_dir_path}")
+            # サブディレクトリごとにNPZがある場合（複数アセット）は全てを対象にする
+            asset_dirs = sorted(str(p) for p in input_dir_path.iterdir() if p.is_dir() and any(p.glob('*.npz')))
+            datapath = Datapath(files=asset_dirs or [str(input_dir_path)], cls=args.cls)
+            run_logger.info(f"input_dirを使用: {input_dir_path} ({max(len(asset_dirs), 1)}アセット)")
         else:
             run_logger.warning(f"指定されたinput_dirが存在しません: {input_dir_path}")
     
@@ -187,6 +191,8 @@ if __name__ == "__main__":
     parser.add_argument("--npz_dir", type=nullable_string, default='tmp', help="中間NPZディレクトリ")
     parser.add_argument("--cls", type=nullable_string, default=None, help="クラス名")
     parser.add_argument("--data_name", type=nullable_string, default=None, help="NPZファイル名")
+    parser.add_argument("--lean", action="store_true", help="Lightning Trainerを使わずに直接推論（単一アセットの対話的リクエスト向け）")
+    parser.add_argument("--batch_size", type=int, default=1, help="推論バッチサイズ（ボーン数・頂点数の近いアセット同士でまとめる）")
     
     args = parser.parse_args()
     
@@ -224,14 +230,30 @@ if __name__ == "__main__":
         if transform_config.get('predict_transform_config'):
             predict_transform_config = TransformConfig.parse(config=transform_config.predict_transform_config)
         
+        # チェックポイント設定（ローカルのsafetensors > ckpt > HFキャッシュ > ダウンロード）
+        resume_from_checkpoint = task_config.get('resume_from_checkpoint')
+        if resume_from_checkpoint:
+            resume_from_checkpoint = download(resume_from_checkpoint)
+            run_logger.info(f"チェックポイント: {resume_from_checkpoint}")
+        
         # モデル初期化
         model = None
+        predict_ckpt_path = resume_from_checkpoint
         model_cfg_path = task_config.components.get('model')
         if model_cfg_path:
             model_loaded_cfg = load_config_safely('model', model_cfg_path)
             tokenizer_for_model = get_tokenizer(config=tokenizer_config_obj) if tokenizer_config_obj else None
-            model = get_model(tokenizer=tokenizer_for_model, **model_loaded_cfg)
-            run_logger.info(f"モデル読み込み完了: {type(model)}")
+            model_start = time.time()
+            if resume_from_checkpoint and resume_from_checkpoint.endswith('.safetensors'):
+                # meta deviceで構築し、mmapした重みをそのまま割り当てる（乱数初期化を省略）
+                model = build_model(lambda: get_model(tokenizer=tokenizer_for_model, **model_loaded_cfg), resume_from_checkpoint)
+                predict_ckpt_path = None
+            else:
+                model = get_model(tokenizer=tokenizer_for_model, **model_loaded_cfg)
+            model_elapsed = time.time() - model_start
+            run_logger.info(f"モデル読み込み完了: {type(model)} ({model_elapsed:.2f}s, 目標 {COLD_START_TARGET_SEC:.1f}s)")
+            if predict_ckpt_path is None and model_elapsed > COLD_START_TARGET_SEC:
+                run_logger.warning(f"モデル構築が目標時間を超えました: {model_elapsed:.2f}s")
         
         # データモジュール初期化
         data_module = UniRigDatasetModule(
@@ -243,6 +265,7 @@ if __name__ == "__main__":
             data_name=data_name,
             datapath=datapath,
             cls=args.cls,
+            batch_size=args.batch_size,
         )
         run_logger.info("データモジュール初期化完了")
         
@@ -292,28 +315,40 @@ if __name__ == "__main__":
             )
             run_logger.info(f"システムモジュール初期化: {type(system)}")
         
-        # チェックポイント設定
-        resume_from_checkpoint = task_config.get('resume_from_checkpoint')
-        if resume_from_checkpoint:
-            resume_from_checkpoint = download(resume_from_checkpoint)
-            run_logger.info(f"チェックポイント: {resume_from_checkpoint}")
-        
         # 予測実行要件の検証
         if not validate_prediction_requirements(task_config, resume_from_checkpoint):
             exit(1)
         
-        # トレーナー初期化
-        trainer_config_dict = task_config.get('trainer', {})
-        trainer = L.Trainer(
-            callbacks=callbacks_list,
-            **trainer_config_dict,
-        )
-        run_logger.info("トレーナー初期化完了")
-        
-        # 予測実行
-        run_logger.info("予測実行開始...")
-        predictions_output = trainer.predict(system, datamodule=data_module, ckpt_path=resume_from_checkpoint)
-        run_logger.info("予測実行完了")
+        if args.lean:
+            # Trainerを使わず、同じAsset/transform/model/writerを直接呼び出す（対話的な単一アセット向け）
+            if datapath is None:
+                run_logger.error("--leanには --npz_dir / --input_dir / NPZファイルの指定が必要です")
+                exit(1)
+            if predict_ckpt_path is not None:
+                model.load_state_dict(load_weights(predict_ckpt_path))
+            predictor = Predictor(
+                system=system,
+                writer=active_writer,
+                transform_config=predict_transform_config,
+                tokenizer=get_tokenizer(config=tokenizer_config_obj) if tokenizer_config_obj else None,
+                data_name=data_name,
+            )
+            run_logger.info("予測実行開始 (lean)...")
+            predictions_output = predictor.predict(datapath.get_data())
+            run_logger.info("予測実行完了")
+        else:
+            # トレーナー初期化
+            trainer_config_dict = task_config.get('trainer', {})
+            trainer = L.Trainer(
+                callbacks=callbacks_list,
+                **trainer_config_dict,
+            )
+            run_logger.info("トレーナー初期化完了")
+            
+            # 予測実行
+            run_logger.info("予測実行開始...")
+            predictions_output = trainer.predict(system, datamodule=data_module, ckpt_path=predict_ckpt_path)
+            run_logger.info("予測実行完了")
         
         if predictions_output:
             run_logger.info(f"予測結果: {len(predictions_output)}バッチ")
@@ -2,6 +2,7 @@ from collections import defaultdict
 from dataclasses import dataclass
 import numpy as np
 from numpy import ndarray
+from scipy.sparse import identity, issparse
 
 from typing import Dict, Union, List, Tuple
 
@@ -10,9 +11,8 @@ from .raw_data import RawData
 from .exporter import Exporter
 
 from ..tokenizer.spec import TokenizeInput
-from .utils import linear_blend_skinning
-
-import trimesh
+from .geometry import face_normals, vertex_normals
+from .skinning import forward_kinematics, identity_matrix_local, sparse_linear_blend_skinning
 
 
 @dataclass
@@ -121,29 +121,8 @@ class Asset(Exporter):
             assert self.joints is not None
             matrix_local = self.matrix_local
             if matrix_local is None:
-                matrix_local = np.zeros((self.J, 4, 4))
-                matrix_local[:, 0, 0] = 1.
-                matrix_local[:, 1, 1] = 1.
-                matrix_local[:, 2, 2] = 1.
-                matrix_local[:, 3, 3] = 1.
-                for i in range(self.J):
-                    matrix_local[i, :3, 3] = self.joints[i]
-        
-        matrix = np.zeros((self.J, 4, 4))
-        for i in range(self.J):
-            if i==0:
-                matrix[i] = matrix_local[i] @ matrix_basis[i]
-            else:
-                pid = self.parents[i]
-                matrix_parent = matrix[pid]
-                matrix_local_parent = matrix_local[pid]
-                
-                matrix[i] = (
-                    matrix_parent @
-                    (np.linalg.inv(matrix_local_parent) @ matrix_local[i]) @
-                    matrix_basis[i]
-                )
-        return matrix
+                matrix_local = identity_matrix_local(self.joints)
+        return forward_kinematics(matrix_local=matrix_local, matrix_basis=matrix_basis, parents=self.parents)
     
     def apply_matrix_basis(self, matrix_basis: ndarray):
         '''
@@ -153,29 +132,22 @@ class Asset(Exporter):
         '''
         matrix_local = self.matrix_local
         if matrix_local is None:
-            matrix_local = np.zeros((self.J, 4, 4))
-            matrix_local[:, 0, 0] = 1.
-            matrix_local[:, 1, 1] = 1.
-            matrix_local[:, 2, 2] = 1.
-            matrix_local[:, 3, 3] = 1.
-            for i in range(self.J):
-                matrix_local[i, :3, 3] = self.joints[i].copy()
+            matrix_local = identity_matrix_local(self.joints)
         
         matrix = self.get_matrix(matrix_basis=matrix_basis, matrix_local=matrix_local)
         self.joints = matrix[:, :3, 3].copy()
-        vertices = linear_blend_skinning(self.vertices, matrix_local, matrix, self.skin, pad=1, value=1.)
+        vertices = sparse_linear_blend_skinning(self.vertices, matrix_local, matrix, self.skin, pad=1, value=1.)
         # update matrix_local
         self.matrix_local = matrix.copy()
 
         # change tails
         if self.tails is not None:
-            t_skin = np.eye(self.J)
-            self.tails = linear_blend_skinning(self.tails, matrix_local, matrix, t_skin, pad=1, value=1.)
+            t_skin = identity(self.J, dtype=np.float32, format='csr')
+            self.tails = sparse_linear_blend_skinning(self.tails, matrix_local, matrix, t_skin, pad=1, value=1.)
         # in accordance with trimesh's normals
-        mesh = trimesh.Trimesh(vertices=vertices, faces=self.faces, process=False)
         self.vertices = vertices
-        self.vertex_normals = mesh.vertex_normals.copy()
-        self.face_normals = mesh.face_normals.copy()
+        self.face_normals = face_normals(vertices=vertices, faces=self.faces)
+        self.vertex_normals = vertex_normals(vertices=vertices, faces=self.faces, weighting='angle', normals_of_faces=self.face_normals)
     
     def set_order_by_names(self, new_names: List[str]):
         assert len(new_names) == len(self.names)
@@ -311,7 +283,8 @@ class Asset(Exporter):
             face_normals=raw_data.face_normals,
             joints=raw_data.joints,
             tails=raw_data.tails,
-            skin=raw_data.skin,
+            # predict_skin.npz keeps the skin as CSR, vertex groups and transforms work on dense arrays
+            skin=raw_data.skin.toarray() if issparse(raw_data.skin) else raw_data.skin,
             no_skin=raw_data.no_skin,
             parents=raw_data.parents,
             names=raw_data.names,
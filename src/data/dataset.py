@@ -5,9 +5,10 @@ import lightning.pytorch as pl
 import torch
 from torch import LongTensor
 from torch.utils import data
-from torch.utils.data import DataLoader, Dataset
-from typing import Dict, List, Tuple, Union, Callable
+from torch.utils.data import DataLoader, Dataset, Sampler
+from typing import Dict, Iterator, List, Tuple, Union, Callable
 import os
+import zipfile
 import numpy as np
 
 from .raw_data import RawData
@@ -74,6 +75,8 @@ class UniRigDatasetModule(pl.LightningDataModule):
         data_name: str='raw_data.npz',
         datapath: Union[Datapath, None]=None,
         cls: Union[str, None]=None,
+        batch_size: int=1,
+        bucket_by_size: bool=True,
     ):
         super().__init__()
         self.process_fn                 = process_fn
@@ -82,6 +85,8 @@ class UniRigDatasetModule(pl.LightningDataModule):
         self.tokenizer_config           = tokenizer_config
         self.debug                      = debug
         self.data_name                  = data_name
+        # group assets of similar bone and vertex counts into the same batch to reduce padding
+        self.bucket_by_size             = bucket_by_size
         
         if debug:
             print("\033[31mWARNING: debug mode, dataloader will be extremely slow !!!\033[0m")
@@ -95,7 +100,7 @@ class UniRigDatasetModule(pl.LightningDataModule):
             self.predict_dataset_config = {
                 cls: DatasetConfig(
                     shuffle=False,
-                    batch_size=1,
+                    batch_size=batch_size,
                     num_workers=0,
                     datapath_config=deepcopy(datapath),
                     pin_memory=False,
@@ -153,6 +158,15 @@ class UniRigDatasetModule(pl.LightningDataModule):
         **kwargs,
     ) -> Union[DataLoader, Dict[str, DataLoader]]:
         def create_single_dataloader(dataset, config: Union[DatasetConfig, Dict[str, DatasetConfig]], **kwargs):
+            if not is_train and not config.shuffle and config.batch_size > 1 and self.bucket_by_size:
+                return DataLoader(
+                    dataset,
+                    batch_sampler=SizeBucketBatchSampler(sizes=dataset.get_sizes(), batch_size=config.batch_size),
+                    num_workers=config.num_workers,
+                    pin_memory=config.pin_memory,
+                    persistent_workers=config.persistent_workers and config.num_workers > 0,
+                    collate_fn=dataset.collate_fn,
+                )
             return DataLoader(
                 dataset,
                 batch_size=config.batch_size,
@@ -198,26 +212,29 @@ class UniRigDataset(Dataset):
     def __getitem__(self, idx) -> ModelInput:
         cls, dir_path = self.data[idx]
         raw_data = RawData.load(path=os.path.join(dir_path, self.data_name))
-        asset = Asset.from_raw_data(raw_data=raw_data, cls=cls, path=dir_path, data_name=self.data_name)
-        
-        first_augments, second_augments = transform_asset(
-            asset=asset,
+        return make_model_input(
+            raw_data=raw_data,
+            cls=cls,
+            path=dir_path,
+            data_name=self.data_name,
             transform_config=self.transform_config,
+            tokenizer=self.tokenizer,
         )
-        if self.tokenizer is not None and asset.parents is not None:
-            tokens = self.tokenizer.tokenize(input=asset.get_tokenize_input())
-        else:
-            tokens = None
-        return ModelInput(
-            tokens=tokens,
-            pad=None if self.tokenizer is None else self.tokenizer.pad,
-            vertices=asset.sampled_vertices.astype(np.float32),
-            normals=asset.sampled_normals.astype(np.float32),
-            joints=None if asset.joints is None else asset.joints.astype(np.float32),
-            tails=None if asset.tails is None else asset.tails.astype(np.float32),
-            asset=asset,
-            augments=None,
-        )
+
+    def get_sizes(self) -> List[Tuple[int, int]]:
+        '''
+        Return (number of bones, number of vertices) of every item, read from npz headers only.
+        '''
+        sizes = []
+        for _, dir_path in self.data:
+            path = os.path.join(dir_path, self.data_name)
+            vertices = _npz_shape(path, 'vertices')
+            joints = _npz_shape(path, 'joints')
+            sizes.append((
+                0 if joints is None or len(joints) == 0 else joints[0],
+                0 if vertices is None or len(vertices) == 0 else vertices[0],
+            ))
+        return sizes
 
     def _collate_fn_debug(self, batch):
         return batch
@@ -228,4 +245,70 @@ class UniRigDataset(Dataset):
     def collate_fn(self, batch):
         if self.debug:
             return self._collate_fn_debug(batch)
-        return self._collate_fn(batch)
\ No newline at end of file
+        return self._collate_fn(batch)
+def make_model_input(
+    raw_data: RawData,
+    cls: Union[str, None],
+    path: str,
+    data_name: str='raw_data.npz',
+    transform_config: Union[TransformConfig, None]=None,
+    tokenizer: Union[TokenizerSpec, None]=None,
+) -> ModelInput:
+    '''
+    Transform raw_data into the input of a model, shared by UniRigDataset and the lean predictor.
+    '''
+    asset = Asset.from_raw_data(raw_data=raw_data, cls=cls, path=path, data_name=data_name)
+    
+    first_augments, second_augments = transform_asset(
+        asset=asset,
+        transform_config=transform_config,
+    )
+    if tokenizer is not None and asset.parents is not None:
+        tokens = tokenizer.tokenize(input=asset.get_tokenize_input())
+    else:
+        tokens = None
+    return ModelInput(
+        tokens=tokens,
+        pad=None if tokenizer is None else tokenizer.pad,
+        vertices=asset.sampled_vertices.astype(np.float32),
+        normals=asset.sampled_normals.astype(np.float32),
+        joints=None if asset.joints is None else asset.joints.astype(np.float32),
+        tails=None if asset.tails is None else asset.tails.astype(np.float32),
+        asset=asset,
+        augments=None,
+    )
+
+def _npz_shape(path: str, key: str) -> Union[Tuple[int, ...], None]:
+    '''
+    Shape of an array in a npz file without loading it, None if missing or not an array.
+    '''
+    try:
+        with zipfile.ZipFile(path) as z, z.open(f"{key}.npy") as f:
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, _, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, _, dtype = np.lib.format.read_array_header_2_0(f)
+    except (KeyError, OSError, ValueError, zipfile.BadZipFile):
+        return None
+    if dtype == object:
+        return None
+    return shape
+
+class SizeBucketBatchSampler(Sampler):
+    '''
+    Yield batches of indices with similar sizes.
+
+    Items are sorted by (number of bones, number of vertices) and cut into consecutive batches,
+    so padding to the largest item of a batch stays small.
+    '''
+    def __init__(self, sizes: List[Tuple[int, int]], batch_size: int):
+        self.batch_size = batch_size
+        order = sorted(range(len(sizes)), key=lambda i: sizes[i])
+        self.batches = [order[i:i+batch_size] for i in range(0, len(order), batch_size)]
+
+    def __iter__(self) -> Iterator[List[int]]:
+        return iter(self.batches)
+
+    def __len__(self) -> int:
+        return len(self.batches)
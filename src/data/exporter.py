@@ -4,12 +4,7 @@ from typing import List, Union, Tuple
 from collections import defaultdict
 import os
 
-try:
-    import open3d as o3d
-    OPEN3D_EQUIPPED = True
-except:
-    print("do not have open3d")
-    OPEN3D_EQUIPPED = False
+from .skinning import prune_skin
 
 class Exporter():
     
@@ -24,25 +19,8 @@ class Exporter():
         name = path.removesuffix('.obj')
         path = name + ".obj"
         self._safe_make_dir(path)
-        J = joints.shape[0]
-        with open(path, 'w') as file:
-            file.write("o spring_joint\n")
-            _joints = []
-            for id in range(J):
-                pid = parents[id]
-                if pid is None or pid == -1:
-                    continue
-                bx, by, bz = joints[id]
-                ex, ey, ez = joints[pid]
-                _joints.extend([
-                    f"v {bx} {bz} {-by}\n",
-                    f"v {ex} {ez} {-ey}\n",
-                    f"v {ex} {ez} {-ey + 0.00001}\n"
-                ])
-            file.writelines(_joints)
-            
-            _faces = [f"f {id*3+1} {id*3+2} {id*3+3}\n" for id in range(J)]
-            file.writelines(_faces)
+        ids = [id for id in range(joints.shape[0]) if parents[id] is not None and parents[id] != -1]
+        _write_obj(path, 'spring_joint', vertices=_bone_triangles(joints[ids], joints[[parents[id] for id in ids]]), triangles=True)
     
     def _export_bones(self, bones: ndarray, path: str):
         format = path.split('.')[-1]
@@ -50,22 +28,7 @@ class Exporter():
         name = path.removesuffix('.obj')
         path = name + ".obj"
         self._safe_make_dir(path)
-        J = bones.shape[0]
-        with open(path, 'w') as file:
-            file.write("o bones\n")
-            _joints = []
-            for bone in bones:
-                bx, by, bz = bone[:3]
-                ex, ey, ez = bone[3:]
-                _joints.extend([
-                    f"v {bx} {bz} {-by}\n",
-                    f"v {ex} {ez} {-ey}\n",
-                    f"v {ex} {ez} {-ey + 0.00001}\n"
-                ])
-            file.writelines(_joints)
-            
-            _faces = [f"f {id*3+1} {id*3+2} {id*3+3}\n" for id in range(J)]
-            file.writelines(_faces)
+        _write_obj(path, 'bones', vertices=_bone_triangles(bones[:, :3], bones[:, 3:]), triangles=True)
     
     def _export_skeleton_sequence(self, joints: ndarray, parents: List[Union[int, None]], path: str):
         format = path.split('.')[-1]
@@ -74,91 +37,44 @@ class Exporter():
         path = name + ".obj"
         self._safe_make_dir(path)
         J = joints.shape[0]
+        ids = [id for id in range(J) if parents[id] is not None]
+        vertices = _bone_triangles(joints[ids], joints[[parents[id] for id in ids]])
         for i in range(J):
-            file = open(name + f"_{i}.obj", 'w')
-            file.write("o spring_joint\n")
-            _joints = []
-            for id in range(i + 1):
-                pid = parents[id]
-                if pid is None:
-                    continue
-                bx, by, bz = joints[id]
-                ex, ey, ez = joints[pid]
-                _joints.extend([
-                    f"v {bx} {bz} {-by}\n",
-                    f"v {ex} {ez} {-ey}\n",
-                    f"v {ex} {ez} {-ey + 0.00001}\n"
-                ])
-            file.writelines(_joints)
-            
-            _faces = [f"f {id*3+1} {id*3+2} {id*3+3}\n" for id in range(J)]
-            file.writelines(_faces)
-            file.close()
+            # bones up to joint i
+            n = sum(1 for id in ids if id <= i)
+            _write_obj(name + f"_{i}.obj", 'spring_joint', vertices=vertices[:n * 3], triangles=True)
     
     def _export_mesh(self, vertices: ndarray, faces: ndarray, path: str):
         format = path.split('.')[-1]
         assert format in ['obj', 'ply']
         if path.endswith('ply'):
-            if not OPEN3D_EQUIPPED:
-                raise RuntimeError("open3d is not available")
-            mesh = o3d.geometry.TriangleMesh()
-            mesh.vertices = o3d.utility.Vector3dVector(vertices)
-            mesh.triangles = o3d.utility.Vector3iVector(faces)
             self._safe_make_dir(path)
-            o3d.io.write_triangle_mesh(path, mesh)
+            _write_ply(path, vertices=vertices, faces=faces)
             return
         name = path.removesuffix('.obj')
         path = name + ".obj"
         self._safe_make_dir(path)
-        with open(path, 'w') as file:
-            file.write("o mesh\n")
-            _vertices = []
-            for co in vertices:
-                _vertices.append(f"v {co[0]} {co[2]} {-co[1]}\n")
-            file.writelines(_vertices)
-            _faces = []
-            for face in faces:
-                _faces.append(f"f {face[0]+1} {face[1]+1} {face[2]+1}\n")
-            file.writelines(_faces)
+        _write_obj(path, 'mesh', vertices=_to_obj_axis(vertices), faces=faces)
             
     def _export_pc(self, vertices: ndarray, path: str, vertex_normals: Union[ndarray, None]=None, normal_size: float=0.01):
         if path.endswith('.ply'):
-            if vertex_normals is not None:
-                print("normal result will not be displayed in .ply format")
             name = path.removesuffix('.ply')
             path = name + ".ply"
-            pc = o3d.geometry.PointCloud()
-            pc.points = o3d.utility.Vector3dVector(vertices)
-            # segment fault when numpy >= 2.0 !! use torch environment
             self._safe_make_dir(path)
-            o3d.io.write_point_cloud(path, pc)
+            _write_ply(path, vertices=vertices, vertex_normals=vertex_normals)
             return
         name = path.removesuffix('.obj')
         path = name + ".obj"
         self._safe_make_dir(path)
-        with open(path, 'w') as file:
-            file.write("o pc\n")
-            _vertex = []
-            for co in vertices:
-                _vertex.append(f"v {co[0]} {co[2]} {-co[1]}\n")
-            file.writelines(_vertex)
-            if vertex_normals is not None:
-                new_path = path.replace('.obj', '_normal.obj')
-                nfile = open(new_path, 'w')
-                nfile.write("o normal\n")
-                _normal = []
-                for i in range(vertices.shape[0]):
-                    co = vertices[i]
-                    x = vertex_normals[i, 0]
-                    y = vertex_normals[i, 1]
-                    z = vertex_normals[i, 2]
-                    _normal.extend([
-                        f"v {co[0]} {co[2]} {-co[1]}\n",
-                        f"v {co[0]+0.0001} {co[2]} {-co[1]}\n",
-                        f"v {co[0]+x*normal_size} {co[2]+z*normal_size} {-(co[1]+y*normal_size)}\n",
-                        f"f {i*3+1} {i*3+2} {i*3+3}\n",
-                    ])
-                nfile.writelines(_normal)
+        _write_obj(path, 'pc', vertices=_to_obj_axis(vertices))
+        if vertex_normals is not None:
+            # a thin triangle along the normal of every point
+            start = np.asarray(vertices, dtype=np.float64)
+            side = start.copy()
+            side[:, 0] += 0.0001
+            end = start + np.asarray(vertex_normals, dtype=np.float64) * normal_size
+            normals = np.stack([start, side, end], axis=1).reshape(-1, 3)
+            _write_obj(path.replace('.obj', '_normal.obj'), 'normal', vertices=_to_obj_axis(normals), triangles=True)
     
     def _make_armature(
         self,
@@ -286,23 +202,58 @@ class Exporter():
         for x in ob.vertex_groups:
             vis.append(x.name)
         #sparsify
-        argsorted = np.argsort(-skin, axis=1)
-        vertex_group_reweight = skin[np.arange(skin.shape[0])[..., None], argsorted]
-        if group_per_vertex == -1:
-            group_per_vertex = vertex_group_reweight.shape[-1]
-        if not do_not_normalize:
-            vertex_group_reweight = vertex_group_reweight / vertex_group_reweight[..., :group_per_vertex].sum(axis=1)[...,None]
+        indices, vertex_group_reweight = self._vertex_group_weights(
+            skin=skin,
+            names=names,
+            groups=vis,
+            parents=parents,
+            vertices=vertices,
+            joints=joints,
+            group_per_vertex=group_per_vertex,
+            do_not_normalize=do_not_normalize,
+        )
 
-        for v, w in enumerate(skin):
-            for ii in range(group_per_vertex):
-                i = argsorted[v, ii]
-                if i >= J:
-                    continue
-                n = names[i]
-                if n not in vis:
+        for v in range(indices.shape[0]):
+            for ii in range(indices.shape[1]):
+                if vertex_group_reweight[v, ii] <= 0:
                     continue
+                n = names[indices[v, ii]]
                 ob.vertex_groups[n].add([v], vertex_group_reweight[v, ii], 'REPLACE')
 
+    def _vertex_group_weights(
+        self,
+        skin: ndarray,
+        names: List[str],
+        groups: List[str],
+        parents: List[Union[int, None]],
+        vertices: Union[ndarray, None]=None,
+        joints: Union[ndarray, None]=None,
+        group_per_vertex: int=-1,
+        do_not_normalize: bool=False,
+    ) -> Tuple[ndarray, ndarray]:
+        '''
+        Weights written to the vertex groups by `_make_armature`.
+
+        Columns without a vertex group (pseudo bones past names, names missing in groups) are folded
+        into their nearest ancestor with one before the top group_per_vertex are kept, so their weight
+        stays on the mesh instead of being dropped.
+
+        Returns:
+            indices: (N, group_per_vertex), into names
+            weights: (N, group_per_vertex)
+        '''
+        J = len(names)
+        valid = np.array([i < J and names[i] in groups for i in range(skin.shape[1])], dtype=bool)
+        return prune_skin(
+            skin,
+            k=group_per_vertex,
+            normalize=not do_not_normalize,
+            parents=parents,
+            valid=valid,
+            vertices=vertices,
+            joints=joints,
+        )
+
     def _clean_bpy(self):
         import bpy # type: ignore
         for c in bpy.data.actions:
@@ -368,6 +319,54 @@ class Exporter():
         # always enable add_leaf_bones to keep leaf bones
         bpy.ops.export_scene.fbx(filepath=path, check_existing=False, add_leaf_bones=False)
     
+    def _export_glb(
+        self,
+        path: str,
+        vertices: ndarray,
+        faces: ndarray,
+        joints: Union[ndarray, None]=None,
+        skin: Union[ndarray, None]=None,
+        parents: Union[List[Union[int, None]], None]=None,
+        names: Union[List[str], None]=None,
+        vertex_normals: Union[ndarray, None]=None,
+        uv_coords: Union[ndarray, None]=None,
+        materials: Union[List, None]=None,
+        inverse_bind_matrices: Union[ndarray, None]=None,
+        do_not_normalize: bool=False,
+    ):
+        '''
+        Does not require bpy, only the 4 largest weights of every vertex are kept
+        '''
+        from .gltf_writer import write_glb
+        skin_indices = None
+        skin_weights = None
+        if joints is not None and skin is not None:
+            J = joints.shape[0]
+            valid = np.arange(skin.shape[1]) < J
+            skin_indices, skin_weights = prune_skin(
+                skin,
+                k=min(4, skin.shape[1]),
+                normalize=not do_not_normalize,
+                parents=parents,
+                valid=valid,
+                vertices=vertices,
+                joints=joints,
+            )
+        write_glb(
+            path=path,
+            vertices=vertices,
+            faces=faces,
+            vertex_normals=vertex_normals,
+            uv_coords=uv_coords,
+            materials=materials,
+            joints=joints,
+            parents=parents,
+            names=names,
+            inverse_bind_matrices=inverse_bind_matrices,
+            skin_indices=skin_indices,
+            skin_weights=skin_weights,
+        )
+    
     def _export_render(
         self,
         path: str,
@@ -472,6 +471,74 @@ class Exporter():
                 draw.line([head_pix, tail_pix], fill=(255, 0, 0, 255), width=1)
             img_pil.save(path)
 
+# rows formatted per write, keeps the temporary string of large clouds small
+_CHUNK_ROWS = 1 << 16
+
+def _float_format(a: ndarray) -> str:
+    # shortest format that round-trips float32, float64 keeps python's repr precision
+    return '%.9g' if a.dtype == np.float32 else '%.17g'
+
+def _write_rows(file, prefix: str, a: ndarray, fmt: str):
+    n = a.shape[1]
+    line = prefix + ' ' + ' '.join([fmt] * n) + '\n'
+    for i in range(0, a.shape[0], _CHUNK_ROWS):
+        chunk = a[i:i + _CHUNK_ROWS]
+        file.write((line * chunk.shape[0]) % tuple(chunk.reshape(-1).tolist()))
+
+def _to_obj_axis(vertices: ndarray) -> ndarray:
+    # (x, y, z) -> (x, z, -y)
+    vertices = np.asarray(vertices)
+    return np.stack([vertices[:, 0], vertices[:, 2], -vertices[:, 1]], axis=1)
+
+def _bone_triangles(heads: ndarray, tails: ndarray) -> ndarray:
+    '''
+    A degenerate triangle (head, tail, tail slightly moved) per bone, in obj axis.
+    '''
+    heads = _to_obj_axis(heads)
+    tails = _to_obj_axis(tails)
+    moved = tails.copy()
+    moved[:, 2] = moved[:, 2] + 0.00001
+    return np.stack([heads, tails, moved], axis=1).reshape(-1, 3)
+
+def _write_obj(path: str, object_name: str, vertices: ndarray, faces: Union[ndarray, None]=None, triangles: bool=False):
+    '''
+    Write vertices (already in obj axis) and faces (starting from 0), or one face for every 3 vertices with triangles.
+    '''
+    vertices = np.asarray(vertices)
+    with open(path, 'w') as file:
+        file.write(f"o {object_name}\n")
+        _write_rows(file, 'v', vertices, _float_format(vertices))
+        if triangles:
+            faces = np.arange(vertices.shape[0] // 3 * 3, dtype=np.int64).reshape(-1, 3)
+        if faces is not None:
+            _write_rows(file, 'f', np.asarray(faces, dtype=np.int64) + 1, '%d')
+
+def _write_ply(path: str, vertices: ndarray, faces: Union[ndarray, None]=None, vertex_normals: Union[ndarray, None]=None):
+    '''
+    Write a binary little endian ply with float32 vertices (and normals) and int32 triangles.
+    '''
+    N = vertices.shape[0]
+    fields = [('x', '<f4'), ('y', '<f4'), ('z', '<f4')]
+    if vertex_normals is not None:
+        fields += [('nx', '<f4'), ('ny', '<f4'), ('nz', '<f4')]
+    data = np.empty(N, dtype=fields)
+    data['x'], data['y'], data['z'] = vertices[:, 0], vertices[:, 1], vertices[:, 2]
+    if vertex_normals is not None:
+        data['nx'], data['ny'], data['nz'] = vertex_normals[:, 0], vertex_normals[:, 1], vertex_normals[:, 2]
+    header = ['ply', 'format binary_little_endian 1.0', f'element vertex {N}']
+    header += [f'property float {name}' for name, _ in fields]
+    if faces is not None:
+        header += [f'element face {faces.shape[0]}', 'property list uchar int vertex_indices']
+    header.append('end_header')
+    with open(path, 'wb') as file:
+        file.write(('\n'.join(header) + '\n').encode('ascii'))
+        data.tofile(file)
+        if faces is not None:
+            face_data = np.empty(faces.shape[0], dtype=[('n', 'u1'), ('v', '<i4', (3,))])
+            face_data['n'] = 3
+            face_data['v'] = faces
+            face_data.tofile(file)
+
 def _trans_to_m(v: ndarray):
     m = np.eye(4)
     m[0:3, 3] = v
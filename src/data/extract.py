@@ -1,11 +1,8 @@
-import bpy, os
+import os
 from collections import defaultdict
 from tqdm import tqdm
 import numpy as np
-from numpy import ndarray
 from typing import Dict, Tuple, List, Optional, Union
-import trimesh
-import fast_simplification
 from scipy.spatial import KDTree
 
 import argparse
@@ -14,9 +11,19 @@ from box import Box
 import os
 
 from .log import new_entry, add_error, add_warning, new_log, end_log
-from .raw_data import RawData
+from .extract_native import is_native, extract_native, save_raw_data
+
+# bpy is only imported when a file needs Blender, glTF/GLB/OBJ files are extracted natively
+bpy = None
+
+def _import_bpy():
+    global bpy
+    if bpy is None:
+        import bpy as _bpy
+        bpy = _bpy
 
 def load(filepath: str):
+    _import_bpy()
     old_objs = set(bpy.context.scene.objects)
     
     if not os.path.exists(filepath):
@@ -80,6 +87,7 @@ def load(filepath: str):
 
 # remove all data in bpy
 def clean_bpy():
+    _import_bpy()
     # First try to purge orphan data
     try:
         bpy.ops.outliner.orphans_purge(do_local_ids=True, do_linked_ids=True, do_recursive=True)
@@ -118,6 +126,7 @@ def clean_bpy():
     gc.collect()
 
 def get_arranged_bones(armature):
+    _import_bpy()
     matrix_world = armature.matrix_world
     arranged_bones = []
     root = armature.pose.bones[0]
@@ -140,6 +149,7 @@ def get_arranged_bones(armature):
     return arranged_bones
 
 def process_mesh():
+    _import_bpy()
     meshes = []
     for v in bpy.data.objects:
         if v.type == 'MESH':
@@ -237,6 +247,7 @@ def process_armature(
     armature,
     arranged_bones,
 ) -> Tuple[np.ndarray, np.ndarray]:
+    _import_bpy()
     matrix_world = armature.matrix_world
     index = {}
 
@@ -286,48 +297,6 @@ def process_armature(
     
     return joints, tails, parents, names, matrix_local_stack
 
-def save_raw_data(
-    path: str,
-    vertices: ndarray,
-    faces: ndarray,
-    joints: Union[ndarray, None],
-    tails: Union[ndarray, None],
-    parents: Union[List[Union[int, None]], None],
-    names: Union[List[str], None],
-    matrix_local: Union[ndarray, None],
-    target_count: int,
-):
-    mesh = trimesh.Trimesh(vertices=vertices, faces=faces)
-    vertices = np.array(mesh.vertices, dtype=np.float32)
-    faces = np.array(mesh.faces, dtype=np.int64)
-    if faces.shape[0] > target_count:
-        vertices, faces = fast_simplification.simplify(vertices, faces, target_count=target_count)
-    mesh = trimesh.Trimesh(vertices=vertices, faces=faces)
-    
-    new_vertices = np.array(mesh.vertices, dtype=np.float32)
-    new_vertex_normals = np.array(mesh.vertex_normals, dtype=np.float32)
-    new_faces = np.array(mesh.faces, dtype=np.int64)
-    new_face_normals = np.array(mesh.face_normals, dtype=np.float32)
-    if joints is not None:
-        new_joints = np.array(joints, dtype=np.float32)
-    else:
-        new_joints = None
-    raw_data = RawData(
-        vertices=new_vertices,
-        vertex_normals=new_vertex_normals,
-        faces=new_faces,
-        face_normals=new_face_normals,
-        joints=new_joints,
-        tails=tails,
-        skin=None,
-        no_skin=None,
-        parents=parents,
-        names=names,
-        matrix_local=matrix_local,
-    )
-    raw_data.check()
-    raw_data.save(path=path)
-
 def extract_builtin(
     output_folder: str,
     target_count: int,
@@ -335,6 +304,7 @@ def extract_builtin(
     id: int,
     time: str,
     files: List[Union[str, str]],
+    lod_face_counts: Union[List[int], None]=None,
 ):
     log_path = "./logs"
     log_path = os.path.join(log_path, time)
@@ -354,11 +324,20 @@ def extract_builtin(
     for file in tqdm(files[start:]):
         input_file = file[0]
         output_dir = file[1]
-        clean_bpy()
         new_entry(input_file)
         try:
             print(f"Now processing {input_file}...")
             
+            if is_native(input_file):
+                try:
+                    extract_native(input_file=input_file, output_dir=output_dir, target_count=target_count, lod_face_counts=lod_face_counts)
+                    print('save to:', output_dir)
+                    tot += 1
+                    continue
+                except NotImplementedError as e:
+                    print(f"native extraction is not available ({str(e)}), using blender instead")
+            
+            clean_bpy()
             armature = load(input_file)
             
             print('save to:', output_dir)
@@ -387,6 +366,7 @@ def extract_builtin(
                 names=names,
                 matrix_local=matrix_local,
                 target_count=target_count,
+                lod_face_counts=lod_face_counts,
             )
             
             tot += 1
@@ -482,6 +462,7 @@ def parse():
     parser.add_argument('--input', type=nullable_string, required=False, default=None)
     parser.add_argument('--input_dir', type=nullable_string, required=False, default=None)
     parser.add_argument('--output_dir', type=nullable_string, required=False, default=None)
+    parser.add_argument('--lod_face_counts', type=nullable_string, required=False, default=None)
     return parser.parse_args()
 
 if __name__ == "__main__":
@@ -495,6 +476,7 @@ if __name__ == "__main__":
     require_suffix  = args.require_suffix.split(',')
     force_override  = args.force_override
     target_count    = args.faces_target_count
+    lod_face_counts = None if args.lod_face_counts is None else [int(x) for x in args.lod_face_counts.split(',')]
     
     if args.input_dir:
         config.input_dataset_dir = args.input_dir
@@ -520,4 +502,5 @@ if __name__ == "__main__":
         id=id,
         time=timestamp,
         files=files,
+        lod_face_counts=lod_face_counts,
     )
\ No newline at end of file
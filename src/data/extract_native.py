@@ -0,0 +1,431 @@
+'''
+Extraction of glTF/GLB and OBJ files without Blender.
+
+Buffers are parsed with numpy (trimesh for OBJ) and converted into the same RawData that
+extract.py produces through Blender: coordinates are turned into Blender's Z-up frame, node
+transforms and skins are applied, and an existing joint hierarchy becomes the armature.
+Unsupported files (e.g. Draco compressed) raise NotImplementedError so callers can fall back to
+Blender.
+'''
+import base64
+import json
+import os
+import struct
+from typing import Dict, List, Tuple, Union
+
+import fast_simplification
+import numpy as np
+from numpy import ndarray
+
+from .raw_data import RawData
+from .geometry import face_normals, merge_vertices, vertex_normals
+from .lod import LOD_NAME, build_lod_pyramid, save_lod
+
+NATIVE_SUFFIX = ['glb', 'gltf', 'obj']
+
+# glTF and OBJ are Y-up, Blender's importers turn (x, y, z) into (x, -z, y)
+Y_UP_TO_Z_UP = np.array([
+    [1, 0, 0, 0],
+    [0, 0,-1, 0],
+    [0, 1, 0, 0],
+    [0, 0, 0, 1],
+], dtype=np.float64)
+
+_COMPONENT_DTYPE = {
+    5120: np.int8,
+    5121: np.uint8,
+    5122: np.int16,
+    5123: np.uint16,
+    5125: np.uint32,
+    5126: np.float32,
+}
+
+_TYPE_SIZE = {
+    'SCALAR': 1,
+    'VEC2': 2,
+    'VEC3': 3,
+    'VEC4': 4,
+    'MAT2': 4,
+    'MAT3': 9,
+    'MAT4': 16,
+}
+
+def is_native(path: str) -> bool:
+    return path.split('.')[-1].lower() in NATIVE_SUFFIX
+
+class GLTF():
+    '''
+    Minimal reader of glTF 2.0 (.gltf with embedded or external buffers, and .glb).
+    '''
+    def __init__(self, path: str):
+        self.dir = os.path.dirname(path)
+        with open(path, 'rb') as f:
+            data = f.read()
+        binary = None
+        if data[:4] == b'glTF':
+            _, _, length = struct.unpack_from('<4sII', data, 0)
+            offset = 12
+            gltf = None
+            while offset < length:
+                chunk_length, chunk_type = struct.unpack_from('<II', data, offset)
+                chunk = data[offset + 8:offset + 8 + chunk_length]
+                if chunk_type == 0x4E4F534A: # JSON
+                    gltf = json.loads(chunk.decode('utf-8'))
+                elif chunk_type == 0x004E4942: # BIN
+                    binary = chunk
+                offset += 8 + chunk_length
+            if gltf is None:
+                raise ValueError(f"no JSON chunk in {path}")
+        else:
+            gltf = json.loads(data.decode('utf-8'))
+        self.gltf = gltf
+        required = set(gltf.get('extensionsRequired', []))
+        if len(required) > 0:
+            raise NotImplementedError(f"unsupported glTF extensions: {sorted(required)}")
+        self.buffers = []
+        for buffer in gltf.get('buffers', []):
+            uri = buffer.get('uri')
+            if uri is None:
+                self.buffers.append(binary)
+            elif uri.startswith('data:'):
+                self.buffers.append(base64.b64decode(uri.split(',', 1)[1]))
+            else:
+                with open(os.path.join(self.dir, uri), 'rb') as f:
+                    self.buffers.append(f.read())
+
+    def accessor(self, index: int) -> ndarray:
+        '''
+        Return data of an accessor as (count, n) float64 (or int64 for integer non-normalized data).
+        '''
+        accessor = self.gltf['accessors'][index]
+        if 'sparse' in accessor:
+            raise NotImplementedError("sparse accessors are not supported")
+        dtype = np.dtype(_COMPONENT_DTYPE[accessor['componentType']])
+        n = _TYPE_SIZE[accessor['type']]
+        count = accessor['count']
+        if 'bufferView' not in accessor:
+            res = np.zeros((count, n), dtype=dtype)
+        else:
+            view = self.gltf['bufferViews'][accessor['bufferView']]
+            buffer = self.buffers[view['buffer']]
+            offset = view.get('byteOffset', 0) + accessor.get('byteOffset', 0)
+            stride = view.get('byteStride', 0) or dtype.itemsize * n
+            if stride == dtype.itemsize * n:
+                res = np.frombuffer(buffer, dtype=dtype, count=count * n, offset=offset).reshape(count, n)
+            else:
+                # interleaved: view rows of `stride` bytes and take the first n components
+                rows = np.frombuffer(buffer, dtype=np.uint8, count=(count - 1) * stride + dtype.itemsize * n, offset=offset)
+                res = np.lib.stride_tricks.as_strided(rows, shape=(count, dtype.itemsize * n), strides=(stride, 1))
+                res = np.ascontiguousarray(res).view(dtype).reshape(count, n)
+        if dtype.kind == 'f':
+            return res.astype(np.float64)
+        if accessor.get('normalized', False):
+            info = np.iinfo(dtype)
+            return np.maximum(res.astype(np.float64) / info.max, -1.)
+        return res.astype(np.int64)
+
+    def local_matrix(self, node: Dict) -> ndarray:
+        if 'matrix' in node:
+            return np.array(node['matrix'], dtype=np.float64).reshape(4, 4).T # column-major
+        t = np.array(node.get('translation', [0., 0., 0.]), dtype=np.float64)
+        x, y, z, w = node.get('rotation', [0., 0., 0., 1.])
+        s = np.array(node.get('scale', [1., 1., 1.]), dtype=np.float64)
+        r = np.array([
+            [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+            [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+            [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)],
+        ])
+        m = np.eye(4)
+        m[:3, :3] = r * s[None, :]
+        m[:3, 3] = t
+        return m
+
+    def world_matrices(self) -> Tuple[Dict[int, ndarray], Dict[int, int], List[int]]:
+        '''
+        Returns:
+            world matrix of every node of the scene, parent of every node, nodes in depth-first order
+        '''
+        nodes = self.gltf.get('nodes', [])
+        scenes = self.gltf.get('scenes', [])
+        if len(scenes) > 0:
+            roots = scenes[self.gltf.get('scene', 0)].get('nodes', [])
+        else:
+            children = {c for node in nodes for c in node.get('children', [])}
+            roots = [i for i in range(len(nodes)) if i not in children]
+        world = {}
+        parent = {}
+        order = []
+        stack = [(i, None) for i in reversed(roots)]
+        while len(stack) > 0:
+            i, p = stack.pop()
+            world[i] = self.local_matrix(nodes[i]) if p is None else world[p] @ self.local_matrix(nodes[i])
+            parent[i] = p
+            order.append(i)
+            stack.extend((c, i) for c in reversed(nodes[i].get('children', [])))
+        return world, parent, order
+
+def _triangles(mode: int, indices: ndarray) -> ndarray:
+    if mode == 4: # TRIANGLES
+        return indices[:indices.shape[0] // 3 * 3].reshape(-1, 3)
+    if mode == 5: # TRIANGLE_STRIP
+        i = np.arange(indices.shape[0] - 2)
+        tri = np.stack([indices[i], indices[i + 1], indices[i + 2]], axis=1)
+        odd = i % 2 == 1
+        tri[odd] = tri[odd][:, [1, 0, 2]]
+        return tri
+    if mode == 6: # TRIANGLE_FAN
+        i = np.arange(1, indices.shape[0] - 1)
+        return np.stack([np.full_like(i, indices[0]), indices[i], indices[i + 1]], axis=1)
+    return np.zeros((0, 3), dtype=np.int64)
+
+def _bone_matrix(head: ndarray, tail: ndarray) -> ndarray:
+    '''
+    Rest matrix of a bone pointing from head to tail with roll 0, same as Blender's vec_roll_to_mat3.
+    '''
+    m = np.eye(4, dtype=np.float32)
+    m[:3, 3] = head
+    vec = tail - head
+    norm = np.linalg.norm(vec)
+    if norm < 1e-12:
+        return m
+    x, y, z = vec / norm
+    theta = 1 + y
+    theta_alt = x * x + z * z
+    if theta > 6.1e-3 or theta_alt > 2.5e-4:
+        if theta <= 6.1e-3:
+            theta = theta_alt * 0.5 + theta_alt * theta_alt * 0.125
+        m[:3, :3] = np.array([
+            [1 - x * x / theta, x, -x * z / theta],
+            [-x, y, -z],
+            [-x * z / theta, z, 1 - z * z / theta],
+        ])
+    else:
+        m[:3, :3] = np.diag([-1., -1., 1.])
+    return m
+
+def load_gltf(path: str) -> Tuple[ndarray, ndarray, Union[Dict, None]]:
+    '''
+    Returns:
+        vertices (N, 3), faces (F, 3) and the armature (joints, tails, parents, names, matrix_local) or None,
+        all in Blender's coordinate frame
+    '''
+    reader = GLTF(path)
+    gltf = reader.gltf
+    nodes = gltf.get('nodes', [])
+    world, parent, order = reader.world_matrices()
+
+    skins = gltf.get('skins', [])
+    joint_sets = {tuple(skin['joints']) for skin in skins}
+    if len(joint_sets) > 1:
+        raise ValueError("multiple armatures found")
+
+    armature_world = None
+    bind = None
+    if len(skins) > 0:
+        skin = skins[0]
+        joint_nodes = skin['joints']
+        # the armature sits at the parent of the root joint, like Blender's importer places it
+        joint_set = set(joint_nodes)
+        root = next((j for j in order if j in joint_set), None)
+        armature_world = np.eye(4) if parent.get(root) is None else world[parent[root]]
+        if 'inverseBindMatrices' in skin:
+            # bind pose of the joints in armature space
+            bind = armature_world @ np.linalg.inv(reader.accessor(skin['inverseBindMatrices']).reshape(-1, 4, 4).transpose(0, 2, 1))
+        else:
+            # without inverse bind matrices the current pose is the bind pose
+            bind = np.stack([world[j] for j in joint_nodes])
+
+    vertices = []
+    faces = []
+    num_vertices = 0
+    for i in order:
+        node = nodes[i]
+        if 'mesh' not in node:
+            continue
+        skinned = 'skin' in node and len(skins) > 0
+        # skinned meshes ignore their node transform; POSITION is the undeformed bind-pose mesh
+        # in the space of the armature (Blender's process_mesh reads the same undeformed data)
+        matrix = armature_world if skinned else world[i]
+        for primitive in gltf['meshes'][node['mesh']]['primitives']:
+            attributes = primitive['attributes']
+            if 'POSITION' not in attributes:
+                continue
+            positions = reader.accessor(attributes['POSITION'])[:, :3]
+            if 'indices' in primitive:
+                indices = reader.accessor(primitive['indices'])[:, 0]
+            else:
+                indices = np.arange(positions.shape[0], dtype=np.int64)
+            tri = _triangles(primitive.get('mode', 4), indices)
+            if tri.shape[0] == 0:
+                continue
+            p = np.concatenate([positions, np.ones((positions.shape[0], 1))], axis=1)
+            if skinned and 'inverseBindMatrices' not in skins[0] and 'JOINTS_0' in attributes and 'WEIGHTS_0' in attributes:
+                # identity inverse bind matrices: POSITION is given in the space of every joint
+                joints_id = reader.accessor(attributes['JOINTS_0']).astype(np.int64)
+                weights = reader.accessor(attributes['WEIGHTS_0'])
+                weights = weights / np.maximum(weights.sum(axis=1, keepdims=True), 1e-12)
+                blended = np.einsum('nk,nkij->nij', weights, bind[joints_id])
+                p = np.einsum('nij,nj->ni', blended, p)
+            else:
+                p = p @ matrix.T
+            vertices.append(p)
+            faces.append(tri + num_vertices)
+            num_vertices += p.shape[0]
+    if len(vertices) == 0:
+        raise ValueError(f"no mesh found in {path}")
+    vertices = (np.concatenate(vertices, axis=0) @ Y_UP_TO_Z_UP.T)[:, :3]
+    faces = np.concatenate(faces, axis=0)
+
+    armature = None
+    if bind is not None:
+        joint_nodes = skins[0]['joints']
+        heads = {j: (Y_UP_TO_Z_UP @ bind[k])[:3, 3] for k, j in enumerate(joint_nodes)}
+        armature = make_armature(nodes=nodes, joint_nodes=joint_nodes, heads=heads, parent=parent, order=order)
+    return vertices, faces, armature
+
+def make_armature(
+    nodes: List[Dict],
+    joint_nodes: List[int],
+    heads: Dict[int, ndarray],
+    parent: Dict[int, int],
+    order: List[int],
+) -> Dict:
+    '''
+    Arrange joints depth-first like get_arranged_bones and build tails and matrix_local of every bone.
+    '''
+    joint_set = set(joint_nodes)
+    def joint_parent(j: int) -> Union[int, None]:
+        p = parent.get(j)
+        while p is not None and p not in joint_set:
+            p = parent.get(p)
+        return p
+    # order of the scene traversal is already depth-first with children in file order
+    arranged = [j for j in order if j in joint_set]
+    index = {j: k for k, j in enumerate(arranged)}
+    parents = [None if joint_parent(j) is None else index[joint_parent(j)] for j in arranged]
+    joints = np.stack([heads[j] for j in arranged]).astype(np.float32)
+    names = [nodes[j].get('name', f"bone_{k}") for k, j in enumerate(arranged)]
+
+    children: Dict[int, List[int]] = {k: [] for k in range(len(arranged))}
+    for k, p in enumerate(parents):
+        if p is not None:
+            children[p].append(k)
+    # tails point to the children (their mean for branches), leaves continue their parent bone
+    tails = np.zeros_like(joints)
+    scale = float(np.linalg.norm(joints.max(axis=0) - joints.min(axis=0))) if len(arranged) > 1 else 1.
+    for k in range(len(arranged)):
+        if len(children[k]) > 0:
+            tails[k] = joints[children[k]].mean(axis=0)
+        elif parents[k] is not None and np.linalg.norm(joints[k] - joints[parents[k]]) > 1e-6:
+            tails[k] = joints[k] + (joints[k] - joints[parents[k]]) * 0.5
+        else:
+            tails[k] = joints[k] + np.array([0., 0., 0.05 * scale], dtype=np.float32)
+        if np.linalg.norm(tails[k] - joints[k]) < 1e-6:
+            tails[k] = joints[k] + np.array([0., 0., 0.05 * scale], dtype=np.float32)
+    matrix_local = np.stack([_bone_matrix(joints[k], tails[k]) for k in range(len(arranged))])
+    return {
+        'joints': joints,
+        'tails': tails,
+        'parents': parents,
+        'names': names,
+        'matrix_local': matrix_local,
+    }
+
+def load_obj(path: str) -> Tuple[ndarray, ndarray, None]:
+    import trimesh
+    scene = trimesh.load(path, force='scene', process=False)
+    vertices = []
+    faces = []
+    num_vertices = 0
+    for name, geometry in scene.geometry.items():
+        if not isinstance(geometry, trimesh.Trimesh) or len(geometry.faces) == 0:
+            continue
+        vertices.append(np.asarray(geometry.vertices, dtype=np.float64))
+        faces.append(np.asarray(geometry.faces, dtype=np.int64) + num_vertices)
+        num_vertices += vertices[-1].shape[0]
+    if len(vertices) == 0:
+        raise ValueError(f"no mesh found in {path}")
+    vertices = np.concatenate(vertices, axis=0) @ Y_UP_TO_Z_UP[:3, :3].T
+    return vertices, np.concatenate(faces, axis=0), None
+
+def load_native(path: str) -> Tuple[ndarray, ndarray, Union[Dict, None]]:
+    if not os.path.exists(path):
+        raise ValueError(f'File {path} does not exist !')
+    suffix = path.split('.')[-1].lower()
+    if suffix in ['glb', 'gltf']:
+        return load_gltf(path)
+    if suffix == 'obj':
+        return load_obj(path)
+    raise NotImplementedError(f"not suported type {path}")
+
+def save_raw_data(
+    path: str,
+    vertices: ndarray,
+    faces: ndarray,
+    joints: Union[ndarray, None],
+    tails: Union[ndarray, None],
+    parents: Union[List[Union[int, None]], None],
+    names: Union[List[str], None],
+    matrix_local: Union[ndarray, None],
+    target_count: int,
+    lod_face_counts: Union[List[int], None]=None,
+):
+    '''
+    Simplify to target_count faces and save. With lod_face_counts, coarser levels are decimated
+    from the saved mesh in the same pass and written to lod.npz next to path.
+    '''
+    vertices, faces, _ = merge_vertices(vertices=vertices, faces=faces)
+    vertices = np.array(vertices, dtype=np.float32)
+    faces = np.array(faces, dtype=np.int64)
+    if faces.shape[0] > target_count:
+        vertices, faces = fast_simplification.simplify(vertices, faces, target_count=target_count)
+        vertices, faces, _ = merge_vertices(vertices=vertices, faces=faces)
+
+    new_vertices = np.array(vertices, dtype=np.float32)
+    new_faces = np.array(faces, dtype=np.int64)
+    # angle weighted, in accordance with trimesh's normals
+    _face_normals = face_normals(vertices=new_vertices, faces=new_faces)
+    new_vertex_normals = vertex_normals(vertices=new_vertices, faces=new_faces, weighting='angle', normals_of_faces=_face_normals).astype(np.float32)
+    new_face_normals = _face_normals.astype(np.float32)
+    if joints is not None:
+        new_joints = np.array(joints, dtype=np.float32)
+    else:
+        new_joints = None
+    raw_data = RawData(
+        vertices=new_vertices,
+        vertex_normals=new_vertex_normals,
+        faces=new_faces,
+        face_normals=new_face_normals,
+        joints=new_joints,
+        tails=tails,
+        skin=None,
+        no_skin=None,
+        parents=parents,
+        names=names,
+        matrix_local=matrix_local,
+    )
+    raw_data.check()
+    raw_data.save(path=path)
+    lod_path = os.path.join(os.path.dirname(path), LOD_NAME)
+    if lod_face_counts:
+        save_lod(path=lod_path, levels=build_lod_pyramid(vertices=new_vertices, faces=new_faces, face_counts=lod_face_counts))
+    elif os.path.exists(lod_path):
+        # do not leave a pyramid of a previous extraction next to the new mesh
+        os.remove(lod_path)
+
+def extract_native(input_file: str, output_dir: str, target_count: int, data_name: str='raw_data.npz', lod_face_counts: Union[List[int], None]=None):
+    '''
+    Extract a glTF/GLB/OBJ file into output_dir/data_name without Blender.
+    '''
+    vertices, faces, armature = load_native(input_file)
+    os.makedirs(output_dir, exist_ok=True)
+    if armature is None:
+        armature = {'joints': None, 'tails': None, 'parents': None, 'names': None, 'matrix_local': None}
+    save_raw_data(
+        path=os.path.join(output_dir, data_name),
+        vertices=vertices,
+        faces=faces,
+        target_count=target_count,
+        lod_face_counts=lod_face_counts,
+        **armature,
+    )
@@ -0,0 +1,113 @@
+import numpy as np
+from numpy import ndarray
+from typing import Literal, Tuple, Union
+
+def _scatter_add(index: ndarray, values: ndarray, n: int) -> ndarray:
+    '''
+    Sum rows of values into n bins, same as np.add.at but with bincount per column.
+
+    Args:
+        index: (M,)
+        values: (M, C)
+    Returns:
+        (n, C)
+    '''
+    res = np.empty((n, values.shape[1]), dtype=values.dtype)
+    for c in range(values.shape[1]):
+        res[:, c] = np.bincount(index, weights=values[:, c], minlength=n)
+    return res
+
+def _normalize(x: ndarray) -> ndarray:
+    norm = np.linalg.norm(x, axis=-1, keepdims=True)
+    valid = norm[:, 0] > 1e-12
+    res = np.zeros_like(x)
+    res[valid] = x[valid] / norm[valid]
+    return res
+
+def face_normals(vertices: ndarray, faces: ndarray, normalize: bool=True) -> ndarray:
+    '''
+    Return normals of faces, shape (F, 3), degenerate faces get zero normals.
+
+    If normalize is False, length of each normal is twice the face area.
+    '''
+    v = vertices.astype(np.float64, copy=False)
+    n = np.cross(v[faces[:, 1]] - v[faces[:, 0]], v[faces[:, 2]] - v[faces[:, 0]])
+    if normalize:
+        n = _normalize(n)
+    return n
+
+def face_angles(vertices: ndarray, faces: ndarray) -> ndarray:
+    '''
+    Return angles of the three corners of every face, shape (F, 3).
+    '''
+    v = vertices.astype(np.float64, copy=False)
+    tri = v[faces]
+    # u[:, k] is the edge leaving corner k, w[:, k] the edge arriving at it
+    u = _normalize((np.roll(tri, -1, axis=1) - tri).reshape(-1, 3)).reshape(-1, 3, 3)
+    w = _normalize((np.roll(tri, 1, axis=1) - tri).reshape(-1, 3)).reshape(-1, 3, 3)
+    cos = np.clip((u * w).sum(axis=-1), -1., 1.)
+    return np.arccos(cos)
+
+def vertex_normals(
+    vertices: ndarray,
+    faces: ndarray,
+    weighting: Literal['area', 'angle']='area',
+    normals_of_faces: Union[ndarray, None]=None,
+) -> ndarray:
+    '''
+    Return normals of vertices, shape (N, 3), accumulated from adjacent faces.
+
+    weighting:
+        area: weight by face area (sum of unnormalized face normals)
+        angle: weight by corner angle, same as trimesh's vertex_normals
+    '''
+    N = vertices.shape[0]
+    if weighting == 'area':
+        n = face_normals(vertices, faces, normalize=False)
+        contrib = np.repeat(n, 3, axis=0)
+    elif weighting == 'angle':
+        if normals_of_faces is None:
+            normals_of_faces = face_normals(vertices, faces)
+        angles = face_angles(vertices, faces)
+        contrib = (normals_of_faces[:, None, :] * angles[:, :, None]).reshape(-1, 3)
+    else:
+        raise ValueError(f"unsupported weighting: {weighting}")
+    summed = _scatter_add(faces.reshape(-1), contrib, N)
+    return _normalize(summed)
+
+def merge_vertices(vertices: ndarray, faces: ndarray, digits: int=8, drop_unreferenced: bool=True) -> Tuple[ndarray, ndarray, ndarray]:
+    '''
+    Merge vertices that fall into the same cell of a grid with spacing 10^-digits, and drop vertices
+    no face references (with drop_unreferenced).
+
+    Order of remaining vertices follows their first occurrence.
+
+    Returns:
+        vertices: (N', 3)
+        faces: (F, 3), remapped to new vertices
+        inverse: (N,), new index of every original vertex, -1 for dropped ones
+    '''
+    if vertices.shape[0] == 0:
+        return vertices, faces, np.zeros(0, dtype=np.int64)
+    grid = np.round(vertices.astype(np.float64) * 10.**digits).astype(np.int64)
+    # view each row as one opaque key so that np.unique hashes whole cells
+    keys = np.ascontiguousarray(grid).view(np.dtype((np.void, grid.dtype.itemsize * 3))).reshape(-1)
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    # renumber unique cells by first occurrence
+    order = np.argsort(first, kind='stable')
+    rank = np.empty_like(order)
+    rank[order] = np.arange(order.shape[0])
+    inverse = rank[inverse]
+    vertices = vertices[first[order]]
+    faces = inverse[faces]
+    if drop_unreferenced:
+        used = np.zeros(vertices.shape[0], dtype=bool)
+        used[faces.reshape(-1)] = True
+        if not used.all():
+            remap = np.full(vertices.shape[0], -1, dtype=np.int64)
+            remap[used] = np.arange(int(used.sum()))
+            vertices = vertices[used]
+            faces = remap[faces]
+            inverse = remap[inverse]
+    return vertices, faces, inverse
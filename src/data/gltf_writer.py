@@ -0,0 +1,432 @@
+'''
+glTF 2.0 (.glb) writer of rigged meshes without Blender.
+
+Inputs are in Blender's Z-up frame like the rest of RawData and are converted to glTF's Y-up frame.
+Arrays are written into the binary chunk directly from their buffers (no intermediate copy of the
+whole buffer), textures are embedded as they are on disk.
+
+`rig_gltf` rigs an existing glTF instead: its meshes, uvs, materials and images are kept and the
+predicted weights are transferred onto its own vertices.
+'''
+import json
+import os
+import struct
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+from numpy import ndarray
+from scipy.sparse import spmatrix
+
+from .extract_native import GLTF
+from .skinning import prune_skin
+from .transfer import SkinTransfer
+
+# Blender (x, y, z) -> glTF (x, z, -y)
+Z_UP_TO_Y_UP = np.array([
+    [1, 0, 0, 0],
+    [0, 0, 1, 0],
+    [0,-1, 0, 0],
+    [0, 0, 0, 1],
+], dtype=np.float64)
+
+_MIME_TYPES = {
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.webp': 'image/webp',
+}
+
+class _BinaryChunk():
+    '''
+    Collects arrays as buffer views, only offsets are computed until write().
+    '''
+    def __init__(self):
+        self.blobs: List[Union[ndarray, bytes]] = []
+        self.views: List[Dict] = []
+        self.accessors: List[Dict] = []
+        self.length = 0
+
+    def add_view(self, blob: Union[ndarray, bytes], target: Union[int, None]=None) -> int:
+        nbytes = blob.nbytes if isinstance(blob, ndarray) else len(blob)
+        view = {'buffer': 0, 'byteOffset': self.length, 'byteLength': nbytes}
+        if target is not None:
+            view['target'] = target
+        self.blobs.append(blob)
+        self.views.append(view)
+        self.length += nbytes + (-nbytes) % 4
+        return len(self.views) - 1
+
+    def add_accessor(self, array: ndarray, type: str, target: Union[int, None]=None, minmax: bool=False) -> int:
+        array = np.ascontiguousarray(array)
+        component = {
+            np.dtype(np.uint8): 5121,
+            np.dtype(np.uint16): 5123,
+            np.dtype(np.uint32): 5125,
+            np.dtype(np.float32): 5126,
+        }[array.dtype]
+        accessor = {
+            'bufferView': self.add_view(array, target=target),
+            'componentType': component,
+            'count': array.shape[0],
+            'type': type,
+        }
+        if minmax:
+            flat = array.reshape(array.shape[0], -1)
+            accessor['min'] = flat.min(axis=0).tolist()
+            accessor['max'] = flat.max(axis=0).tolist()
+        self.accessors.append(accessor)
+        return len(self.accessors) - 1
+
+    def write(self, f):
+        for blob in self.blobs:
+            data = memoryview(blob).cast('B') if isinstance(blob, ndarray) else blob
+            f.write(data)
+            f.write(b'\0' * ((-len(data)) % 4))
+
+def _to_y_up(points: ndarray) -> ndarray:
+    return (points @ Z_UP_TO_Y_UP[:3, :3].T).astype(np.float32)
+
+def _unweld(
+    vertices: ndarray,
+    faces: ndarray,
+    uv_coords: ndarray,
+) -> Tuple[ndarray, ndarray, ndarray]:
+    '''
+    Split vertices with different uv coordinates on their corners (uv_coords of shape (F*3, 2)).
+
+    Returns:
+        index of the original vertex of every new vertex, uv of every new vertex, new faces
+    '''
+    corners = faces.reshape(-1)
+    keys = np.concatenate([corners[:, None].astype(np.float64), uv_coords.astype(np.float64)], axis=1)
+    unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+    return unique[:, 0].astype(np.int64), unique[:, 1:].astype(np.float32), inverse.reshape(-1, 3)
+
+def _material(material: Union[Dict, str], index: int, binary: _BinaryChunk, gltf: Dict) -> Dict:
+    if not isinstance(material, dict):
+        return {'name': str(material)}
+    pbr = {}
+    if material.get('base_color') is not None:
+        pbr['baseColorFactor'] = [float(x) for x in material['base_color']]
+    if material.get('metallic') is not None:
+        pbr['metallicFactor'] = float(material['metallic'])
+    if material.get('roughness') is not None:
+        pbr['roughnessFactor'] = float(material['roughness'])
+    texture = material.get('texture')
+    if texture is not None and os.path.isfile(texture):
+        mime = _MIME_TYPES.get(os.path.splitext(texture)[1].lower())
+        if mime is not None:
+            with open(texture, 'rb') as f:
+                view = binary.add_view(f.read())
+            gltf.setdefault('images', []).append({'bufferView': view, 'mimeType': mime, 'name': os.path.basename(texture)})
+            gltf.setdefault('samplers', [{}])
+            gltf.setdefault('textures', []).append({'source': len(gltf['images']) - 1, 'sampler': 0})
+            pbr['baseColorTexture'] = {'index': len(gltf['textures']) - 1}
+    res = {'name': material.get('name', f"material_{index}"), 'pbrMetallicRoughness': pbr}
+    if material.get('double_sided', False):
+        res['doubleSided'] = True
+    return res
+
+def _add_armature(
+    gltf: Dict,
+    binary: _BinaryChunk,
+    joints: ndarray,
+    parents: Union[List[Union[int, None]], None],
+    names: Union[List[str], None],
+    inverse_bind_matrices: Union[ndarray, None]=None,
+) -> int:
+    '''
+    Append joint nodes as roots of the default scene and their skin.
+
+    Returns:
+        index of the skin
+    '''
+    J = joints.shape[0]
+    if names is None:
+        names = [f"bone_{i}" for i in range(J)]
+    if parents is None:
+        parents = [None] + [0] * (J - 1)
+    if inverse_bind_matrices is None:
+        world = np.tile(np.eye(4), (J, 1, 1))
+        world[:, :3, 3] = joints
+    else:
+        world = np.linalg.inv(np.asarray(inverse_bind_matrices, dtype=np.float64))
+    world = Z_UP_TO_Y_UP @ world @ Z_UP_TO_Y_UP.T
+    offset = len(gltf['nodes'])
+    children = [[] for _ in range(J)]
+    for i, p in enumerate(parents):
+        if p is not None:
+            children[p].append(i)
+    for i in range(J):
+        local = world[i] if parents[i] is None else np.linalg.inv(world[parents[i]]) @ world[i]
+        node = {'name': str(names[i])}
+        if np.allclose(local[:3, :3], np.eye(3), atol=1e-6):
+            node['translation'] = local[:3, 3].tolist()
+        else:
+            node['matrix'] = local.T.reshape(-1).tolist() # column-major
+        if len(children[i]) > 0:
+            node['children'] = [offset + c for c in children[i]]
+        gltf['nodes'].append(node)
+    roots = [offset + i for i in range(J) if parents[i] is None]
+    gltf['scenes'][gltf.get('scene', 0)]['nodes'].extend(roots)
+    ibm = np.linalg.inv(world).transpose(0, 2, 1).astype(np.float32) # column-major
+    gltf.setdefault('skins', []).append({
+        'joints': list(range(offset, offset + J)),
+        'skeleton': roots[0],
+        'inverseBindMatrices': binary.add_accessor(ibm, 'MAT4'),
+    })
+    return len(gltf['skins']) - 1
+
+def _write(path: str, gltf: Dict, binary: _BinaryChunk):
+    gltf['accessors'] = binary.accessors
+    gltf['bufferViews'] = binary.views
+    gltf['buffers'] = [{'byteLength': binary.length}]
+
+    content = json.dumps(gltf, separators=(',', ':')).encode('utf-8')
+    content += b' ' * ((-len(content)) % 4)
+    total = 12 + 8 + len(content) + 8 + binary.length
+    if os.path.dirname(path) != '':
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<4sII', b'glTF', 2, total))
+        f.write(struct.pack('<II', len(content), 0x4E4F534A))
+        f.write(content)
+        f.write(struct.pack('<II', binary.length, 0x004E4942))
+        binary.write(f)
+
+def write_glb(
+    path: str,
+    vertices: ndarray,
+    faces: ndarray,
+    vertex_normals: Union[ndarray, None]=None,
+    uv_coords: Union[ndarray, None]=None,
+    materials: Union[List, None]=None,
+    face_materials: Union[ndarray, None]=None,
+    joints: Union[ndarray, None]=None,
+    parents: Union[List[Union[int, None]], None]=None,
+    names: Union[List[str], None]=None,
+    inverse_bind_matrices: Union[ndarray, None]=None,
+    skin_indices: Union[ndarray, None]=None,
+    skin_weights: Union[ndarray, None]=None,
+    mesh_name: str='character',
+):
+    '''
+    Write a (rigged) mesh into a .glb file.
+
+    Args:
+        vertices: (N, 3)
+        faces: (F, 3), starting from 0
+        vertex_normals: (N, 3)
+        uv_coords: (N, 2) per vertex or (F*3, 2) per face corner, v pointing up as in Blender
+        materials: dicts with optional name, base_color (rgba), metallic, roughness, texture (image path)
+        face_materials: (F,), index of the material of every face, defaults to the first material
+        joints: (J, 3), heads of bones
+        parents: parent of every joint, None for roots
+        names: names of joints
+        inverse_bind_matrices: (J, 4, 4), defaults to translations of -joints (bones aligned with the world)
+        skin_indices: (N, 4), joints influencing every vertex (e.g. from prune_skin)
+        skin_weights: (N, 4), weights of skin_indices, rows summing to 1
+    '''
+    vertices = np.asarray(vertices)
+    faces = np.asarray(faces, dtype=np.int64)
+    source = np.arange(vertices.shape[0])
+    if uv_coords is not None:
+        uv_coords = np.asarray(uv_coords, dtype=np.float32).reshape(-1, 2)
+        if uv_coords.shape[0] == faces.shape[0] * 3 and uv_coords.shape[0] != vertices.shape[0]:
+            source, uv_coords, faces = _unweld(vertices=vertices, faces=faces, uv_coords=uv_coords)
+        elif uv_coords.shape[0] != vertices.shape[0]:
+            print(f"uv_coords of shape {uv_coords.shape} match neither vertices nor face corners, ignored")
+            uv_coords = None
+
+    binary = _BinaryChunk()
+    gltf = {
+        'asset': {'version': '2.0', 'generator': 'UniRig'},
+        'scene': 0,
+        'scenes': [{'nodes': []}],
+        'nodes': [],
+        'meshes': [],
+    }
+
+    attributes = {'POSITION': binary.add_accessor(_to_y_up(vertices[source]), 'VEC3', target=34962, minmax=True)}
+    if vertex_normals is not None:
+        normals = _to_y_up(np.asarray(vertex_normals)[source])
+        normals /= np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), 1e-12)
+        attributes['NORMAL'] = binary.add_accessor(normals, 'VEC3', target=34962)
+    if uv_coords is not None:
+        # glTF's origin of uv is the top left corner
+        uv = uv_coords.copy()
+        uv[:, 1] = 1. - uv[:, 1]
+        attributes['TEXCOORD_0'] = binary.add_accessor(uv, 'VEC2', target=34962)
+
+    J = 0 if joints is None else joints.shape[0]
+    if J > 0 and skin_indices is not None and skin_weights is not None:
+        skin_indices = np.asarray(skin_indices)[source]
+        skin_weights = np.asarray(skin_weights, dtype=np.float32)[source]
+        k = skin_indices.shape[1]
+        if k < 4:
+            skin_indices = np.pad(skin_indices, ((0, 0), (0, 4 - k)))
+            skin_weights = np.pad(skin_weights, ((0, 0), (0, 4 - k)))
+        elif k > 4:
+            print(f"only 4 of {k} weights per vertex are written")
+            skin_indices, skin_weights = skin_indices[:, :4], skin_weights[:, :4]
+            skin_weights = skin_weights / np.maximum(skin_weights.sum(axis=1, keepdims=True), 1e-12)
+        skin_weights = np.where(skin_weights > 0, skin_weights, 0.).astype(np.float32)
+        skin_indices = np.where(skin_weights > 0, skin_indices, 0).astype(np.uint8 if J <= 256 else np.uint16)
+        attributes['JOINTS_0'] = binary.add_accessor(skin_indices, 'VEC4', target=34962)
+        attributes['WEIGHTS_0'] = binary.add_accessor(skin_weights, 'VEC4', target=34962)
+
+    if materials is not None and len(materials) > 0:
+        gltf['materials'] = [_material(m, i, binary, gltf) for i, m in enumerate(materials)]
+    primitives = []
+    if face_materials is None or materials is None or len(materials) == 0:
+        groups = [(0 if materials is not None and len(materials) > 0 else None, faces)]
+    else:
+        face_materials = np.asarray(face_materials, dtype=np.int64)
+        groups = [(int(m), faces[face_materials == m]) for m in np.unique(face_materials)]
+    index_dtype = np.uint16 if source.shape[0] < 65536 else np.uint32
+    for material, group in groups:
+        primitive = {
+            'attributes': attributes,
+            'indices': binary.add_accessor(group.reshape(-1).astype(index_dtype), 'SCALAR', target=34963),
+            'mode': 4,
+        }
+        if material is not None:
+            primitive['material'] = material
+        primitives.append(primitive)
+    gltf['meshes'].append({'name': mesh_name, 'primitives': primitives})
+    gltf['nodes'].append({'name': mesh_name, 'mesh': 0})
+    gltf['scenes'][0]['nodes'].append(0)
+
+    if J > 0:
+        skin = _add_armature(gltf=gltf, binary=binary, joints=joints, parents=parents, names=names, inverse_bind_matrices=inverse_bind_matrices)
+        if 'JOINTS_0' in attributes:
+            gltf['nodes'][0]['skin'] = skin
+
+    _write(path=path, gltf=gltf, binary=binary)
+
+def _bake(reader: GLTF, binary: _BinaryChunk, index: int, matrix: ndarray, kind: str='POSITION', delta: bool=False) -> int:
+    '''
+    Copy the accessor index of an attribute (POSITION, NORMAL or TANGENT) transformed by matrix (4, 4),
+    morph target deltas (delta) are neither translated nor normalized.
+    '''
+    data = reader.accessor(index)
+    linear = np.linalg.inv(matrix[:3, :3]).T if kind == 'NORMAL' else matrix[:3, :3]
+    res = data.copy()
+    res[:, :3] = data[:, :3] @ linear.T
+    if kind == 'POSITION' and not delta:
+        res[:, :3] += matrix[:3, 3]
+    elif kind != 'POSITION' and not delta:
+        res[:, :3] /= np.maximum(np.linalg.norm(res[:, :3], axis=1, keepdims=True), 1e-12)
+    accessor = reader.gltf['accessors'][index]
+    return binary.add_accessor(res.astype(np.float32), accessor['type'], target=34962, minmax=kind == 'POSITION')
+
+def rig_gltf(
+    path: str,
+    original: str,
+    vertices: ndarray,
+    skin: Union[ndarray, spmatrix],
+    joints: ndarray,
+    parents: Union[List[Union[int, None]], None]=None,
+    names: Union[List[str], None]=None,
+    k: int=1,
+):
+    '''
+    Write the glTF/GLB file original into a .glb with an armature, keeping its meshes, uvs, materials,
+    images and animations.
+
+    Weights are transferred from the predicted mesh onto every vertex of the original with a KD-tree
+    and the 4 largest are kept. Skinned meshes ignore their node transform, so positions, normals and
+    tangents of transformed nodes are baked into the scene frame (meshes used by several nodes are copied).
+    Originals that already have skins raise NotImplementedError, callers fall back to Blender.
+
+    Args:
+        vertices: (M, 3), vertices of the predicted mesh in Blender's frame (as extracted)
+        skin: (M, J), dense or scipy sparse
+        joints: (J, 3), heads of bones
+        k: number of nearest predicted vertices blended for every vertex of the original
+    '''
+    reader = GLTF(original)
+    gltf = json.loads(json.dumps(reader.gltf))
+    if len(gltf.get('skins', [])) > 0:
+        raise NotImplementedError("the original already has skins")
+    if len(gltf.get('scenes', [])) == 0:
+        _, parent, _ = reader.world_matrices()
+        gltf['scenes'] = [{'nodes': [i for i, p in parent.items() if p is None]}]
+        gltf['scene'] = 0
+    world, _, order = reader.world_matrices()
+    transfer = SkinTransfer(vertices=vertices, skin=skin, k=k, joints=joints)
+    J = joints.shape[0]
+
+    # all buffers (and external images) go into the binary chunk, views keep their indices
+    binary = _BinaryChunk()
+    bases = []
+    for buffer in reader.buffers:
+        bases.append(binary.length)
+        binary.add_view(b'' if buffer is None else buffer)
+    binary.views = [dict(view, buffer=0, byteOffset=bases[view['buffer']] + view.get('byteOffset', 0)) for view in gltf.get('bufferViews', [])]
+    binary.accessors = gltf.get('accessors', [])
+    for image in gltf.get('images', []):
+        uri = image.get('uri')
+        if uri is None or uri.startswith('data:'):
+            continue
+        mime = image.get('mimeType', _MIME_TYPES.get(os.path.splitext(uri)[1].lower()))
+        if mime is None:
+            continue
+        with open(os.path.join(reader.dir, uri), 'rb') as f:
+            image['bufferView'] = binary.add_view(f.read())
+        image['mimeType'] = mime
+        del image['uri']
+
+    used = set()
+    skinned = []
+    for i in order:
+        node = gltf['nodes'][i]
+        if 'mesh' not in node:
+            continue
+        if node['mesh'] in used:
+            mesh = json.loads(json.dumps(gltf['meshes'][node['mesh']]))
+            gltf['meshes'].append(mesh)
+            node['mesh'] = len(gltf['meshes']) - 1
+        used.add(node['mesh'])
+        matrix = world[i]
+        bake = not np.allclose(matrix, np.eye(4), atol=1e-9)
+        copies = {}
+        def baked(index: int, kind: str, delta: bool=False) -> int:
+            if not bake:
+                return index
+            if (index, kind, delta) not in copies:
+                copies[(index, kind, delta)] = _bake(reader=reader, binary=binary, index=index, matrix=matrix, kind=kind, delta=delta)
+            return copies[(index, kind, delta)]
+        weights = {}
+        for primitive in gltf['meshes'][node['mesh']]['primitives']:
+            attributes = primitive['attributes']
+            if 'POSITION' not in attributes:
+                continue
+            position = attributes['POSITION']
+            if position not in weights:
+                points = np.concatenate([reader.accessor(position)[:, :3], np.ones((reader.gltf['accessors'][position]['count'], 1))], axis=1)
+                points = (points @ matrix.T @ Z_UP_TO_Y_UP)[:, :3]
+                indices, skin_weights = prune_skin(transfer.transfer(points), k=4, vertices=points, joints=joints)
+                skin_weights = np.where(skin_weights > 0, skin_weights, 0.).astype(np.float32)
+                skin_indices = np.where(skin_weights > 0, indices, 0).astype(np.uint8 if J <= 256 else np.uint16)
+                weights[position] = (
+                    binary.add_accessor(skin_indices, 'VEC4', target=34962),
+                    binary.add_accessor(skin_weights, 'VEC4', target=34962),
+                )
+            for name in ['POSITION', 'NORMAL', 'TANGENT']:
+                if name in attributes:
+                    attributes[name] = baked(attributes[name], kind=name)
+            for target in primitive.get('targets', []):
+                for name in ['POSITION', 'NORMAL', 'TANGENT']:
+                    if name in target:
+                        target[name] = baked(target[name], kind=name, delta=True)
+            attributes['JOINTS_0'], attributes['WEIGHTS_0'] = weights[position]
+        skinned.append(i)
+
+    if len(skinned) == 0:
+        raise ValueError(f"no mesh found in {original}")
+    skin_index = _add_armature(gltf=gltf, binary=binary, joints=joints, parents=parents, names=names)
+    for i in skinned:
+        gltf['nodes'][i]['skin'] = skin_index
+    gltf['asset']['generator'] = 'UniRig'
+    _write(path=path, gltf=gltf, binary=binary)
@@ -0,0 +1,150 @@
+'''
+Multi-resolution (LOD) pyramid of an extracted mesh, built once at extraction time.
+
+Every level is decimated from the previous (finer) one and keeps, for every vertex of the base
+mesh (raw_data.npz), the index of the level vertex it collapsed into. Consumers pick the cheapest
+level that satisfies them (Step 2 reads its 5k-face mesh from here instead of extracting again).
+
+Carrying values back with the mapping is piecewise constant over every collapsed patch, so it is
+not used for skin weights: they are transferred to the full mesh directly.
+'''
+import os
+from dataclasses import dataclass
+from typing import List, Tuple, Union
+
+import fast_simplification
+import numpy as np
+from numpy import ndarray
+
+from .raw_data import RawData
+from .geometry import face_normals, merge_vertices, vertex_normals
+
+# file written next to raw_data.npz
+LOD_NAME = 'lod.npz'
+
+# face counts of the levels below the base mesh
+LOD_FACE_COUNTS = [20000, 5000]
+
+@dataclass
+class LODLevel():
+    # (N, 3)
+    vertices: ndarray
+
+    # (F, 3)
+    faces: ndarray
+
+    # (N_base,), index into vertices of every vertex of the base mesh
+    mapping: ndarray
+
+    @property
+    def N(self):
+        return self.vertices.shape[0]
+
+    @property
+    def F(self):
+        return self.faces.shape[0]
+
+    def lift(self, values: ndarray) -> ndarray:
+        '''
+        Carry per-vertex values of this level back to the base mesh (every base vertex takes the
+        value of the level vertex it collapsed into, no interpolation).
+        '''
+        return values[self.mapping]
+
+def decimate(vertices: ndarray, faces: ndarray, target_count: int) -> Tuple[ndarray, ndarray, ndarray]:
+    '''
+    Simplify to target_count faces.
+
+    Returns:
+        vertices, faces and the new index of every input vertex
+    '''
+    _, _, collapses = fast_simplification.simplify(vertices, faces, target_count=target_count, return_collapses=True)
+    # replaying the collapses gives the same mesh plus where every input vertex went
+    new_vertices, new_faces, mapping = fast_simplification.replay_simplification(vertices, faces, collapses)
+    # every input vertex needs a level vertex to map to, so unreferenced ones are kept
+    new_vertices, new_faces, inverse = merge_vertices(vertices=np.asarray(new_vertices, dtype=np.float32), faces=new_faces, drop_unreferenced=False)
+    return new_vertices, np.asarray(new_faces, dtype=np.int64), inverse[mapping]
+
+def build_lod_pyramid(vertices: ndarray, faces: ndarray, face_counts: List[int]=LOD_FACE_COUNTS) -> List[LODLevel]:
+    '''
+    Decimate the base mesh incrementally to every face count, finest level first.
+
+    Counts not below the face count of the previous level are skipped.
+    '''
+    vertices = np.asarray(vertices, dtype=np.float32)
+    faces = np.asarray(faces, dtype=np.int64)
+    mapping = np.arange(vertices.shape[0], dtype=np.int64)
+    levels = []
+    for count in sorted(set(face_counts), reverse=True):
+        if faces.shape[0] <= count:
+            continue
+        vertices, faces, step = decimate(vertices=vertices, faces=faces, target_count=count)
+        mapping = step[mapping]
+        levels.append(LODLevel(vertices=vertices, faces=faces, mapping=mapping))
+    return levels
+
+def save_lod(path: str, levels: List[LODLevel]):
+    d = {'face_counts': np.array([level.F for level in levels], dtype=np.int64)}
+    for (i, level) in enumerate(levels):
+        d[f'vertices_{i}'] = level.vertices
+        d[f'faces_{i}'] = level.faces
+        d[f'mapping_{i}'] = level.mapping
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    np.savez(file=path, **d)
+
+def load_lod(path: str) -> List[LODLevel]:
+    data = np.load(path)
+    return [
+        LODLevel(vertices=data[f'vertices_{i}'], faces=data[f'faces_{i}'], mapping=data[f'mapping_{i}'])
+        for i in range(data['face_counts'].shape[0])
+    ]
+
+def find_lod(raw_data_path: Union[str, None]) -> Union[str, None]:
+    '''
+    Path of the pyramid stored with raw_data_path (a raw_data.npz or its directory), if any.
+    '''
+    if raw_data_path is None:
+        return None
+    directory = raw_data_path if os.path.isdir(raw_data_path) else os.path.dirname(raw_data_path)
+    path = os.path.join(directory, LOD_NAME)
+    return path if os.path.exists(path) else None
+
+def pick_level(levels: List[LODLevel], min_vertices: int=0, max_faces: Union[int, None]=None) -> Union[LODLevel, None]:
+    '''
+    Cheapest level with at least min_vertices vertices and at most max_faces faces, None if no
+    level qualifies (use the base mesh then).
+    '''
+    candidates = [
+        level for level in levels
+        if level.N >= min_vertices and (max_faces is None or level.F <= max_faces)
+    ]
+    if len(candidates) == 0:
+        return None
+    return min(candidates, key=lambda level: level.F)
+
+def level_raw_data(raw_data: RawData, level: LODLevel) -> RawData:
+    '''
+    RawData with the geometry of level and everything else (skeleton) from the base raw_data.
+    '''
+    _face_normals = face_normals(vertices=level.vertices, faces=level.faces)
+    _vertex_normals = vertex_normals(vertices=level.vertices, faces=level.faces, weighting='angle', normals_of_faces=_face_normals)
+    return RawData(
+        vertices=level.vertices,
+        vertex_normals=_vertex_normals.astype(np.float32),
+        faces=level.faces,
+        face_normals=_face_normals.astype(np.float32),
+        joints=raw_data.joints,
+        tails=raw_data.tails,
+        skin=None if raw_data.skin is None else _restrict(raw_data.skin, level),
+        no_skin=raw_data.no_skin,
+        parents=raw_data.parents,
+        names=raw_data.names,
+        matrix_local=raw_data.matrix_local,
+        cls=raw_data.cls,
+    )
+
+def _restrict(values: ndarray, level: LODLevel) -> ndarray:
+    # every level vertex takes the value of one base vertex that collapsed into it
+    first = np.full(level.N, -1, dtype=np.int64)
+    first[level.mapping[::-1]] = np.arange(level.mapping.shape[0] - 1, -1, -1)
+    return values[np.maximum(first, 0)]
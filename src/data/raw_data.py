@@ -178,6 +178,27 @@ class RawData(Exporter):
             tails=self.tails if use_tail else None,
         )
     
+    def export_glb(self, path: str, custom_vertex_group: Union[ndarray, None]=None, do_not_normalize: bool=False):
+        '''
+        export the whole model with skinning, uv and materials without blender
+        '''
+        uv_coords = self.uv_coords
+        if uv_coords is not None and len(uv_coords) == 0:
+            uv_coords = None
+        self._export_glb(
+            path=path,
+            vertices=self.vertices,
+            faces=self.faces,
+            joints=self.joints,
+            skin=self.skin if custom_vertex_group is None else custom_vertex_group,
+            parents=self.parents,
+            names=self.names,
+            vertex_normals=self.vertex_normals,
+            uv_coords=uv_coords,
+            materials=self.materials,
+            do_not_normalize=do_not_normalize,
+        )
+    
     def export_render(self, path: str, resolution: Tuple[int, int]=[256, 256]):
         self._export_render(
             path=path,
@@ -0,0 +1,127 @@
+import numpy as np
+from numpy import ndarray
+from dataclasses import dataclass
+from typing import List, Tuple, Union
+
+from scipy import ndimage
+from scipy.spatial import cKDTree
+
+@dataclass
+class SkeletonScore():
+    # ratio of points sampled along bones that fall inside the mesh
+    inside: float
+
+    # 1 when the skeleton is mirror symmetric along x, decreasing with the mean mirror distance
+    symmetry: float
+
+    # ratio of occupied voxels that have a bone nearby
+    coverage: float
+
+    # weighted sum used for ranking
+    total: float
+
+class OccupancyGrid():
+    '''
+    Solid voxel grid of a shape built from its surface samples, cheap enough to score many skeletons.
+
+    Surface voxels are dilated by one cell to close small gaps and the interior is filled. Open or
+    very thin shapes only get a shell, which still works for relative ranking.
+
+    Args:
+        points: (N, 3), surface samples (e.g. sampled vertices of the asset)
+        grid: number of cells along the longest side
+    '''
+    def __init__(self, points: ndarray, grid: int=64):
+        points = np.asarray(points, dtype=np.float32)[:, :3]
+        lo = points.min(axis=0)
+        hi = points.max(axis=0)
+        self.extent = float(max((hi - lo).max(), 1e-6))
+        self.cell = self.extent / (grid - 2)
+        # one empty cell around the shape so that the outside is connected
+        self.origin = lo - self.cell
+        shape = np.ceil((hi - lo) / self.cell).astype(np.int64) + 3
+        occupied = np.zeros(shape, dtype=bool)
+        idx = np.floor((points - self.origin) / self.cell).astype(np.int64)
+        occupied[tuple(np.clip(idx, 0, shape - 1).T)] = True
+        occupied = ndimage.binary_dilation(occupied)
+        self.occupied = ndimage.binary_fill_holes(occupied)
+        self.centers = (np.argwhere(self.occupied) + 0.5) * self.cell + self.origin
+
+    def contains(self, x: ndarray) -> ndarray:
+        idx = np.floor((x - self.origin) / self.cell).astype(np.int64)
+        valid = ((idx >= 0) & (idx < np.array(self.occupied.shape))).all(axis=1)
+        res = np.zeros(x.shape[0], dtype=bool)
+        res[valid] = self.occupied[tuple(idx[valid].T)]
+        return res
+
+def sample_bones(joints: ndarray, parents: List[Union[int, None]], samples_per_bone: int=8) -> ndarray:
+    '''
+    Return joints and points evenly spaced on every bone (parent joint -> joint), shape (M, 3).
+    '''
+    joints = np.asarray(joints, dtype=np.float32)
+    child = np.array([i for i, p in enumerate(parents) if p is not None and p != -1], dtype=np.int64)
+    if child.shape[0] == 0:
+        return joints
+    parent = np.array([parents[i] for i in child], dtype=np.int64)
+    t = (np.arange(1, samples_per_bone + 1, dtype=np.float32) / (samples_per_bone + 1))[None, :, None]
+    on_bones = joints[parent][:, None] * (1 - t) + joints[child][:, None] * t
+    return np.concatenate([joints, on_bones.reshape(-1, 3)], axis=0)
+
+def score_skeleton(
+    joints: ndarray,
+    parents: List[Union[int, None]],
+    occupancy: OccupancyGrid,
+    weights: Tuple[float, float, float]=(0.5, 0.2, 0.3),
+    symmetry_tolerance: float=0.1,
+    coverage_radius: float=0.15,
+) -> SkeletonScore:
+    '''
+    Score a skeleton against the shape with geometric heuristics only.
+
+    Args:
+        joints: (J, 3), in the same space as the points of occupancy
+        weights: weights of (inside, symmetry, coverage) in total
+        symmetry_tolerance: mean mirror distance (relative to the shape extent) at which symmetry reaches 0
+        coverage_radius: distance (relative to the shape extent) under which a voxel counts as covered
+    '''
+    joints = np.asarray(joints, dtype=np.float32)
+    if joints.shape[0] < 2:
+        return SkeletonScore(inside=0., symmetry=0., coverage=0., total=0.)
+    points = sample_bones(joints=joints, parents=parents)
+    tree = cKDTree(points)
+
+    inside = float(occupancy.contains(points).mean())
+
+    # the model looks at -y, so left and right are mirrored along x
+    mirrored = joints * np.array([-1., 1., 1.], dtype=np.float32)
+    dis, _ = cKDTree(joints).query(mirrored)
+    symmetry = float(max(0., 1. - dis.mean() / (symmetry_tolerance * occupancy.extent)))
+
+    dis, _ = tree.query(occupancy.centers, distance_upper_bound=coverage_radius * occupancy.extent)
+    coverage = float(np.isfinite(dis).mean()) if dis.shape[0] > 0 else 0.
+
+    total = weights[0] * inside + weights[1] * symmetry + weights[2] * coverage
+    return SkeletonScore(inside=inside, symmetry=symmetry, coverage=coverage, total=float(total))
+
+def rank_skeletons(
+    skeletons: List[Tuple[ndarray, List[Union[int, None]]]],
+    points: ndarray,
+    grid: int=64,
+    **kwargs,
+) -> Tuple[List[int], List[SkeletonScore]]:
+    '''
+    Rank skeletons of the same shape, best first.
+
+    Args:
+        skeletons: list of (joints, parents)
+        points: (N, 3), surface samples of the shape
+        kwargs: passed to score_skeleton
+    Returns:
+        order: indices of skeletons sorted by total score, descending
+        scores: score of every skeleton, in input order
+    '''
+    occupancy = OccupancyGrid(points=points, grid=grid)
+    scores = [score_skeleton(joints=joints, parents=parents, occupancy=occupancy, **kwargs) for joints, parents in skeletons]
+    # stable sort keeps generation order between ties
+    order = sorted(range(len(scores)), key=lambda i: -scores[i].total)
+    return order, scores
@@ -0,0 +1,246 @@
+import numpy as np
+from numpy import ndarray
+from typing import List, Tuple, Union
+
+from scipy.sparse import csr_matrix, issparse, spmatrix
+from scipy.spatial import cKDTree
+
+def identity_matrix_local(joints: ndarray) -> ndarray:
+    '''
+    Build matrix_local of an armature without rotations.
+
+    Args:
+        joints: (J, 3)
+    Returns:
+        (J, 4, 4), float32
+    '''
+    J = joints.shape[0]
+    matrix_local = np.tile(np.eye(4, dtype=np.float32), (J, 1, 1))
+    matrix_local[:, :3, 3] = joints
+    return matrix_local
+
+def get_levels(parents: List[Union[int, None]]) -> List[ndarray]:
+    '''
+    Group joints by their depth in the parent tree.
+
+    Requires parents[k] < k, roots are None (or -1).
+
+    Returns:
+        list of index arrays, levels[d] contains all joints of depth d
+    '''
+    J = len(parents)
+    depth = np.zeros(J, dtype=np.int64)
+    for i, p in enumerate(parents):
+        if p is None or p < 0:
+            continue
+        assert p < i, 'parents must satisfy parents[k] < k'
+        depth[i] = depth[p] + 1
+    order = np.argsort(depth, kind='stable')
+    counts = np.bincount(depth)
+    return np.split(order, np.cumsum(counts)[:-1])
+
+def forward_kinematics(
+    matrix_local: ndarray,
+    matrix_basis: ndarray,
+    parents: List[Union[int, None]],
+) -> ndarray:
+    '''
+    Compute posed local-to-world matrices of all joints.
+
+    Equivalent to applying, from root to leaves,
+    matrix[i] = matrix[p] @ inv(matrix_local[p]) @ matrix_local[i] @ matrix_basis[i],
+    but the inverses are done in one batch and every level of the tree is one matmul.
+
+    Args:
+        matrix_local: (J, 4, 4), rest pose
+        matrix_basis: (J, 4, 4), pose relative to rest pose
+        parents: parents of joints, None represents a root
+    Returns:
+        (J, 4, 4), float32
+    '''
+    matrix_local = np.asarray(matrix_local, dtype=np.float32)
+    matrix_basis = np.asarray(matrix_basis, dtype=np.float32)
+    J = matrix_local.shape[0]
+    pid = np.array([-1 if p is None else p for p in parents], dtype=np.int64)
+    is_root = pid < 0
+
+    # (J, 4, 4), transform of each joint relative to its parent, with the pose applied
+    relative = matrix_local @ matrix_basis
+    if not is_root.all():
+        inv_local = np.linalg.inv(matrix_local)
+        child = np.where(~is_root)[0]
+        relative[child] = inv_local[pid[child]] @ relative[child]
+
+    matrix = np.zeros((J, 4, 4), dtype=np.float32)
+    for level in get_levels(parents):
+        roots = level[is_root[level]]
+        matrix[roots] = relative[roots]
+        level = level[~is_root[level]]
+        if level.shape[0] > 0:
+            matrix[level] = matrix[pid[level]] @ relative[level]
+    return matrix
+
+def _to_csr(skin: Union[ndarray, spmatrix]) -> csr_matrix:
+    if issparse(skin):
+        skin = csr_matrix(skin).astype(np.float32)
+        # pseudo bones and negative weights do not contribute
+        skin.data[skin.data < 0] = 0.
+        skin.eliminate_zeros()
+        return skin
+    skin = np.asarray(skin, dtype=np.float32)
+    rows, cols = np.nonzero(skin > 0)
+    return csr_matrix((skin[rows, cols], (rows, cols)), shape=skin.shape, dtype=np.float32)
+
+def sparse_linear_blend_skinning(
+    vertex: ndarray,
+    matrix_local: ndarray,
+    matrix: ndarray,
+    skin: Union[ndarray, spmatrix],
+    pad: int=0,
+    value: float=0.,
+) -> ndarray:
+    '''
+    Linear blend skinning as a sparse (N, J) @ (J, 12) product.
+
+    Only positive weights contribute, result is divided by the sum of weights
+    of each vertex (same as `linear_blend_skinning`).
+
+    Args:
+        vertex: (N, 4-pad)
+        matrix_local: (J, 4, 4)
+        matrix: (J, 4, 4)
+        skin: (N, J), dense or scipy sparse
+    Returns:
+        (N, 3), float32
+    '''
+    assert vertex.shape[-1] + pad == 4
+    N = vertex.shape[0]
+    J = matrix_local.shape[0]
+    padded = np.empty((N, 4), dtype=np.float32)
+    padded[:, :4-pad] = vertex
+    padded[:, 4-pad:] = value
+
+    # (J, 3, 4) -> (J, 12)
+    trans = (np.asarray(matrix, dtype=np.float32) @ np.linalg.inv(np.asarray(matrix_local, dtype=np.float32)))[:, :3, :]
+    trans = trans.reshape(J, 12)
+
+    csr = _to_csr(skin)
+    # (N, 3, 4)
+    blended = np.asarray(csr @ trans, dtype=np.float32).reshape(N, 3, 4)
+    g = np.einsum('nij,nj->ni', blended, padded)
+
+    if issparse(skin):
+        weight_sum = np.asarray(skin.sum(axis=1), dtype=np.float32).reshape(-1)
+    else:
+        weight_sum = np.asarray(skin, dtype=np.float32).sum(axis=1)
+    return g / (weight_sum[:, None] + 1e-8)
+
+def _fold_matrix(parents: List[Union[int, None]], valid: ndarray) -> csr_matrix:
+    '''
+    (J, J) matrix moving the weight of every invalid bone to its nearest valid ancestor,
+    bones without a valid ancestor are dropped.
+    '''
+    J = valid.shape[0]
+    target = np.full(J, -1, dtype=np.int64)
+    for i in range(J):
+        if valid[i]:
+            target[i] = i
+            continue
+        p = parents[i] if i < len(parents) else None
+        if p is not None and 0 <= p < i:
+            target[i] = target[p]
+    rows = np.where(target >= 0)[0]
+    return csr_matrix((np.ones(rows.shape[0], dtype=np.float32), (rows, target[rows])), shape=(J, J))
+
+def prune_skin(
+    skin: ndarray,
+    k: int,
+    threshold: float=0.,
+    normalize: bool=True,
+    parents: Union[List[Union[int, None]], None]=None,
+    valid: Union[ndarray, None]=None,
+    vertices: Union[ndarray, None]=None,
+    joints: Union[ndarray, None]=None,
+    chunk_elements: int=1 << 24,
+) -> Tuple[ndarray, ndarray]:
+    '''
+    Keep the k largest weights of every vertex.
+
+    Rows are processed in chunks of about chunk_elements values, so only the (N, k) result
+    is kept in memory after the first pass. Sparse input is densified one chunk at a time.
+
+    Args:
+        skin: (N, J), dense or scipy sparse
+        k: number of bones kept per vertex, -1 keeps all
+        threshold: weights below it are zeroed out, unless no weight of the vertex reaches it
+        normalize: make kept weights sum to 1, vertices without any weight are bound to the
+            nearest bone if vertices and joints are given, otherwise to the first valid bone
+        parents: used with valid, weights of invalid bones go to their nearest valid ancestor
+        valid: (J,), bool, bones that can receive weights
+        vertices: (N, 3)
+        joints: (J, 3)
+    Returns:
+        indices: (N, k), int64, sorted by descending weight
+        weights: (N, k), float32
+    '''
+    N, J = skin.shape
+    if k == -1 or k > J:
+        k = J
+    if valid is None:
+        valid = np.ones(J, dtype=bool)
+    valid = np.asarray(valid, dtype=bool)
+    fold = None
+    if not valid.all():
+        fold = _fold_matrix([] if parents is None else parents, valid)
+
+    indices = np.zeros((N, k), dtype=np.int64)
+    weights = np.zeros((N, k), dtype=np.float32)
+    chunk = max(1, chunk_elements // max(J, 1))
+    for start in range(0, N, chunk):
+        end = min(N, start + chunk)
+        s = skin[start:end]
+        s = s.toarray().astype(np.float32) if issparse(s) else np.asarray(s, dtype=np.float32)
+        if fold is not None:
+            s = np.asarray(s @ fold, dtype=np.float32)
+        s = np.maximum(s, 0.)
+        if k < J:
+            idx = np.argpartition(-s, k - 1, axis=1)[:, :k]
+        else:
+            idx = np.broadcast_to(np.arange(J), s.shape)
+        w = np.take_along_axis(s, idx, axis=1)
+        order = np.argsort(-w, axis=1, kind='stable')
+        idx = np.take_along_axis(idx, order, axis=1)
+        w = np.take_along_axis(w, order, axis=1)
+        if threshold > 0:
+            keep = w[:, :1] >= threshold
+            w[(w < threshold) & keep] = 0.
+        indices[start:end] = idx
+        weights[start:end] = w
+
+    if normalize:
+        total = weights.sum(axis=1)
+        ok = total > 1e-9
+        weights[ok] /= total[ok, None]
+        empty = np.where(~ok)[0]
+        if empty.shape[0] > 0 and k > 0 and valid.any():
+            candidates = np.where(valid)[0]
+            if vertices is not None and joints is not None:
+                _, nearest = cKDTree(joints[candidates, :3]).query(vertices[empty, :3])
+                nearest = candidates[nearest]
+            else:
+                nearest = candidates[0]
+            indices[empty, 0] = nearest
+            weights[empty] = 0.
+            weights[empty, 0] = 1.
+    return indices, weights
+
+def sparsify_skin(indices: ndarray, weights: ndarray, J: int) -> csr_matrix:
+    '''
+    Scatter the result of `prune_skin` to an (N, J) CSR matrix holding only the nonzero weights
+    (a fallback bone may also appear with zero weight in the same row, duplicates are summed).
+    '''
+    rows = np.repeat(np.arange(indices.shape[0]), indices.shape[1])
+    skin = csr_matrix((np.asarray(weights, dtype=np.float32).reshape(-1), (rows, indices.reshape(-1))), shape=(indices.shape[0], J))
+    skin.sum_duplicates()
+    skin.eliminate_zeros()
+    return skin
@@ -0,0 +1,103 @@
+import numpy as np
+from numpy import ndarray
+from typing import Iterator, Tuple, Union
+
+from scipy.sparse import csr_matrix, spmatrix, vstack
+from scipy.spatial import cKDTree
+
+from .skinning import _to_csr, prune_skin, sparsify_skin
+
+class SkinTransfer():
+    '''
+    Transfer skin weights from sampled vertices to a (possibly much denser) set of vertices.
+
+    The KD-tree is built once on the samples, targets are queried in chunks with all cores and
+    results are written into a CSR matrix, so memory stays O(N * k) for millions of vertices.
+
+    Args:
+        vertices: (M, 3), sampled vertices
+        skin: (M, J), weights of sampled vertices, dense or scipy sparse
+        k: number of nearest samples blended for every target vertex
+        power: exponent of the inverse-distance weights used when k > 1
+        group_per_vertex: keep at most this many bones per target vertex, -1 keeps all; kept weights are
+            renormalized and vertices left without weight are bound to the nearest joint (the first bone
+            without joints), see `prune_skin`
+        joints: (J, 3), used for the nearest-joint fallback
+        chunk_size: number of target vertices per query
+        workers: passed to cKDTree.query, -1 uses all cores
+    '''
+    def __init__(
+        self,
+        vertices: ndarray,
+        skin: Union[ndarray, spmatrix],
+        k: int=1,
+        power: float=2.,
+        group_per_vertex: int=-1,
+        chunk_size: int=1 << 16,
+        workers: int=-1,
+        joints: Union[ndarray, None]=None,
+    ):
+        assert k >= 1
+        self.tree = cKDTree(np.asarray(vertices)[:, :3])
+        self.skin = _to_csr(skin)
+        self.J = self.skin.shape[1]
+        self.k = min(k, self.skin.shape[0])
+        self.power = power
+        self.group_per_vertex = group_per_vertex
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.joints = None if joints is None else np.asarray(joints)[:, :3]
+
+    def query(self, vertices: ndarray) -> Iterator[Tuple[int, ndarray, ndarray]]:
+        '''
+        Yield (start, indices, weights) for every chunk of vertices, indices and weights
+        are (n, k) nearest samples and their normalized blend weights.
+        '''
+        for start in range(0, vertices.shape[0], self.chunk_size):
+            chunk = vertices[start:start + self.chunk_size, :3]
+            dis, idx = self.tree.query(chunk, k=self.k, workers=self.workers)
+            if self.k == 1:
+                idx = idx[:, None]
+                w = np.ones(idx.shape, dtype=np.float32)
+            else:
+                w = 1. / (dis ** self.power + 1e-12)
+                w = (w / w.sum(axis=1, keepdims=True)).astype(np.float32)
+            yield start, idx, w
+
+    def transfer(self, vertices: ndarray) -> csr_matrix:
+        '''
+        Returns:
+            (N, J) CSR matrix of weights of vertices
+        '''
+        vertices = np.asarray(vertices)
+        blocks = []
+        for start, idx, w in self.query(vertices):
+            n = idx.shape[0]
+            if self.k == 1:
+                block = self.skin[idx[:, 0]]
+            else:
+                blend = csr_matrix((w.reshape(-1), (np.repeat(np.arange(n), self.k), idx.reshape(-1))), shape=(n, self.skin.shape[0]))
+                block = blend @ self.skin
+            if self.group_per_vertex != -1 and self.group_per_vertex < self.J:
+                indices, weights = prune_skin(
+                    block,
+                    k=self.group_per_vertex,
+                    vertices=vertices[start:start + n, :3],
+                    joints=self.joints,
+                )
+                block = sparsify_skin(indices, weights, self.J)
+            blocks.append(csr_matrix(block, dtype=np.float32))
+        if len(blocks) == 0:
+            return csr_matrix((0, self.J), dtype=np.float32)
+        return vstack(blocks, format='csr')
+
+def transfer_skin(
+    sampled_vertices: ndarray,
+    sampled_skin: Union[ndarray, spmatrix],
+    vertices: ndarray,
+    **kwargs,
+) -> csr_matrix:
+    '''
+    Shortcut for SkinTransfer(sampled_vertices, sampled_skin, **kwargs).transfer(vertices).
+    '''
+    return SkinTransfer(vertices=sampled_vertices, skin=sampled_skin, **kwargs).transfer(vertices)
@@ -6,7 +6,8 @@ from typing import Tuple, Union
 
 from scipy.spatial.transform import Rotation as R
 from scipy.sparse import csc_matrix
-import numpy as np
+
+from .skinning import sparse_linear_blend_skinning
 
 def quaternion_to_matrix(x, use_4x4=True) -> FloatTensor:
     """
@@ -237,22 +238,6 @@ def linear_blend_skinning(
             final = g[0:3, :] / (skin.transpose(0, 1).sum(dim=0) + 1e-8).unsqueeze(0)
             return final.permute(1, 0)  # Output shape (N, 3)
         else:
-            J = matrix_local.shape[0]
-            N = vertex.shape[0]
-            # (4, N)
-            padded = np.pad(vertex, ((0, 0), (0, pad)), 'constant', constant_values=(0, value)).T
-            # (J, 4, 4)
-            trans = matrix @ np.linalg.inv(matrix_local)
-            weighted_per_bone_matrix = []
-            # (J, N)
-            mask = (skin > 0).T
-            for i in range(J):
-                offset = np.zeros((4, N), dtype=np.float32)
-                offset[:, mask[i]] = (trans[i] @ padded[:, mask[i]]) * skin.T[i, mask[i]]
-                weighted_per_bone_matrix.append(offset)
-            weighted_per_bone_matrix = np.stack(weighted_per_bone_matrix)
-            g = np.sum(weighted_per_bone_matrix, axis=0)
-            final = g[:3, :] / (np.sum(skin, axis=1) + 1e-8)
-            return final.T
+            return sparse_linear_blend_skinning(vertex, matrix_local, matrix, skin, pad=pad, value=value)
     else:
         assert 0, f'unsupported shape: {vertex.shape}'
@@ -1,19 +1,33 @@
 from huggingface_hub import hf_hub_download
 
+from ..model.registry import resolve_checkpoint
+
 def download(ckpt_name: str) -> str:
     MAP = {
         'experiments/skeleton/articulation-xl_quantization_256/model.ckpt': 'skeleton/articulation-xl_quantization_256/model.ckpt',
         'experiments/skin/articulation-xl/model.ckpt': 'skin/articulation-xl/model.ckpt',
     }
     
+    # local files (converted .safetensors first) never touch the network
+    local = resolve_checkpoint(ckpt_name)
+    if local is not None:
+        return local
     try:
         if ckpt_name not in MAP:
             print(f"not found: {ckpt_name}")
             return ckpt_name
+        try:
+            return hf_hub_download(
+                repo_id='VAST-AI/UniRig',
+                filename=MAP[ckpt_name],
+                local_files_only=True,
+            )
+        except Exception:
+            pass
         return hf_hub_download(
             repo_id='VAST-AI/UniRig',
             filename=MAP[ckpt_name],
         )
     except Exception as e:
         print(f"Failed to download {ckpt_name}: {e}")
-        return ckpt_name
\ No newline at end of file
+        return ckpt_name
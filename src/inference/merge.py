@@ -40,6 +40,8 @@ from mathutils import Vector
 
 from ..data.raw_data import RawData, RawSkin
 from ..data.extract import process_mesh, process_armature, get_arranged_bones
+from ..data.skinning import prune_skin, sparsify_skin
+from ..data.transfer import SkinTransfer
 
 def parser():
     parser = argparse.ArgumentParser()
@@ -316,6 +318,7 @@ def make_armature(
     group_per_vertex: int=4,
     add_root: bool=False,
     is_vrm: bool=False,
+    nearest_samples: int=1,
 ):
     """
     🦴 アーマチュア（骨格）の作成とスキニング適用
@@ -341,6 +344,7 @@ def make_armature(
     - group_per_vertex: 頂点あたりの最大ボーン影響数
     - add_root: ルートボーンを追加するか
     - is_vrm: VRMモデルかどうか
+    - nearest_samples: ウェイト転写で混合するAI頂点数（1なら最近傍のみ）
     
     重要な技術的処理:
     - KDTreeによる頂点とボーンの最適マッチング
@@ -439,21 +443,26 @@ def make_armature(
     
     # 🎯 Step 8: ウェイト正規化
     # 各頂点に対するボーン影響度を正規化（合計が1になるよう調整）
-    argsorted = np.argsort(-skin, axis=1)
-    vertex_group_reweight = skin[np.arange(skin.shape[0])[..., None], argsorted]
-    
-    # ゼロ除算防止: 分母が0の場合の安全な処理
-    weight_sums = vertex_group_reweight[..., :group_per_vertex].sum(axis=1)
-    # 分母が0の場合は1に置き換えて正規化をスキップ
-    weight_sums_safe = np.where(weight_sums == 0, 1.0, weight_sums)
-    vertex_group_reweight = vertex_group_reweight / weight_sums_safe[..., None]
-    vertex_group_reweight = np.nan_to_num(vertex_group_reweight)
+    # 上位group_per_vertex個のボーンだけを残し、合計が1になるよう正規化
+    # ウェイトが全て0の頂点は最も近いボーンに割り当てる
+    # names外の擬似ボーンのウェイトは最も近い有効な祖先ボーンへ移す
+    valid = np.arange(skin.shape[1]) < len(names)
+    argsorted, vertex_group_reweight = prune_skin(
+        skin,
+        k=group_per_vertex,
+        parents=parents,
+        valid=valid,
+        vertices=vertices,
+        joints=bones[:, :3],
+    )
     
     # 🎯 Step 9: KDTreeによる頂点マッチング
     # 【核心技術】AI生成頂点と実際のメッシュ頂点の対応関係を構築
     # これが頂点数差異吸収の仕組みの中核部分
-    # AI頂点（2048個）で構築したKDTreeに対して実メッシュ頂点（5742個）を検索
-    tree = cKDTree(vertices)  # vertices = AI生成頂点（denormalized済み）
+    # AI頂点（2048個）で構築したKDTreeに対して実メッシュ頂点（5742個例、数百万頂点も可）をチャンク単位・全コアで検索
+    # vertices = AI生成頂点（denormalized済み）
+    sparse_skin = sparsify_skin(argsorted, vertex_group_reweight, skin.shape[1])
+    transfer = SkinTransfer(vertices=vertices, skin=sparse_skin, k=nearest_samples, group_per_vertex=group_per_vertex, joints=bones[:, :3])
     # 🎯 Step 10: 各メッシュオブジェクトへのスキニング適用
     for ob in objects:
         if ob.type != 'MESH':
@@ -478,10 +487,10 @@ def make_armature(
             n_vertices.append(matrix_world_rot @ np.array(v.co) + matrix_world_bias)
         n_vertices = np.stack(n_vertices)
 
-        # KDTreeで最近傍頂点を検索
-        # 【重要】各実メッシュ頂点に対して最も近いAI頂点のインデックスを取得
+        # KDTreeで最近傍頂点を検索し、ウェイトをCSR形式で転写
+        # 【重要】各実メッシュ頂点に対して最も近いAI頂点（nearest_samples > 1なら逆距離重み付き平均）のウェイトを取得
         # これにより頂点数が異なってもウェイト情報を確実に転写できる
-        _, index = tree.query(n_vertices)  # index[i] = 実頂点iに最も近いAI頂点のインデックス
+        n_skin = transfer.transfer(n_vertices)  # (実頂点数, J)
 
         # 🔧 バーテックスグループ事前作成: names内の全ボーンに対してバーテックスグループを作成
         for bone_name in names:
@@ -490,19 +499,14 @@ def make_armature(
 
         # 🎯 Step 11: 頂点ウェイトの設定
         # 【核心処理】各実メッシュ頂点に対してAI生成ウェイトを転写
-        # KDTreeマッチングで見つけた最近傍AI頂点のウェイト情報を実頂点に適用
-        for v, co in enumerate(tqdm(n_vertices)):  # 実際のメッシュ頂点をループ（5742個例）
-            for ii in range(group_per_vertex):     # 各頂点に最大4ボーンまで影響設定
-                i = argsorted[index[v], ii]        # 最近傍AI頂点のウェイト順序取得
-                if i >= len(names):
-                    continue
-                n = names[i]                       # ボーン名取得
+        # CSRの非ゼロ要素（各頂点最大group_per_vertex個）だけを走査する
+        for v in tqdm(range(n_skin.shape[0])):  # 実際のメッシュ頂点をループ（5742個例）
+            for ptr in range(n_skin.indptr[v], n_skin.indptr[v + 1]):
+                n = names[n_skin.indices[ptr]]      # ボーン名取得
                 if n not in ob.vertex_groups:
                     continue
-                        
-                # 【ウェイト転写】実頂点vにAI頂点のウェイトを適用
-                # vertex_group_reweight[index[v], ii] = 最近傍AI頂点の正規化済みウェイト
-                ob.vertex_groups[n].add([v], vertex_group_reweight[index[v], ii], 'REPLACE')
+                # 【ウェイト転写】実頂点vに転写済みウェイトを適用
+                ob.vertex_groups[n].add([v], float(n_skin.data[ptr]), 'REPLACE')
         armature.select_set(False)
         ob.select_set(False)
     
@@ -680,6 +684,8 @@ def parse():
     parser.add_argument('--source', type=nullable_string, required=False, default=None)
     parser.add_argument('--target', type=nullable_string, required=False, default=None)
     parser.add_argument('--output', type=nullable_string, required=False, default=None)
+    parser.add_argument('--skin_npz', type=nullable_string, required=False, default=None)
+    parser.add_argument('--skeleton_npz', type=nullable_string, required=False, default=None)
     return parser.parse_args()
 
 def transfer(source: str, target: str, output: str, add_root: bool=False):
@@ -763,6 +769,41 @@ def transfer(source: str, target: str, output: str, add_root: bool=False):
         print(f"❌ マージ処理中にエラーが発生: {merge_e}")
         raise
 
+def transfer_npz(skin_npz: str, target: str, output: str, skeleton_npz: Union[str, None]=None, add_root: bool=False):
+    """
+    🔄 Step4 NPZ直接転送 - 中間FBXを使わないマージ
+    ============================================
+    
+    Step3のスキンNPZ（predict_skin.npz）を配列のまま読み込み、オリジナルメッシュに転写する。
+    transfer()と異なり、スキニング済みFBXのエクスポート・再インポート・ウェイト読み戻しが不要。
+    
+    引数:
+    - skin_npz: Step3出力のスキンNPZ（vertices/joints/tails/skin/parents/names）
+    - target: ユーザーがアップロードしたオリジナルモデル
+    - output: Step4の最終出力ファイル
+    - skeleton_npz: Step2のpredict_skeleton.npz（指定時はparents/names/tails/clsをこちらから取得）
+    """
+    raw_skin = RawData.load(path=skin_npz)
+    if raw_skin.skin is None or raw_skin.joints is None:
+        raise ValueError(f"{skin_npz} does not contain skin weights")
+    skeleton = raw_skin if skeleton_npz is None else RawData.load(path=skeleton_npz)
+    if skeleton.J != raw_skin.skin.shape[1]:
+        raise ValueError(f"number of bones mismatch: skeleton has {skeleton.J}, skin has {raw_skin.skin.shape[1]}")
+    
+    merge(
+        path=target,
+        output_path=output,
+        vertices=raw_skin.vertices,
+        joints=raw_skin.joints,
+        skin=raw_skin.skin,
+        parents=list(skeleton.parents),
+        names=list(skeleton.names),
+        tails=skeleton.tails,
+        add_root=add_root,
+        is_vrm=(skeleton.cls=='vroid'),
+    )
+    print(f"✅ Transfer (NPZ)完了: {output}")
+
 if __name__ == "__main__":
     """
     🚀 メインエントリーポイント
@@ -782,6 +823,12 @@ if __name__ == "__main__":
         --target mesh.fbx \
         --output merged.fbx
     
+    # ダイレクトモード（NPZ直接、中間FBX不要）
+    python -m src.inference.merge \
+        --skin_npz predict_skin.npz \
+        --target mesh.fbx \
+        --output merged.fbx
+    
     # バッチモード  
     python -m src.inference.merge \
         --data_config configs/data.yaml \
@@ -790,6 +837,12 @@ if __name__ == "__main__":
     """
     args = parse()
     
+    # 🎯 ダイレクトモード: スキンNPZから直接転送
+    if args.skin_npz is not None:
+        assert args.target is not None and args.output is not None
+        transfer_npz(args.skin_npz, args.target, args.output, skeleton_npz=args.skeleton_npz, add_root=args.add_root)
+        exit()
+    
     # 🎯 ダイレクトモード: 2ファイル間の直接転送
     if args.source is not None or args.target is not None:
         assert args.source is not None and args.target is not None
@@ -0,0 +1,113 @@
+'''
+Prediction of single assets without lightning's Trainer.
+
+run.py builds a Trainer, a datamodule and callbacks for every request and lightning runs its whole
+predict loop. Predictor reuses the same asset/transform/model/writer code but calls them directly,
+so a loaded model can serve many interactive requests with almost no fixed overhead.
+'''
+import os
+import time
+from typing import Dict, List, Union
+
+import torch
+from torch import nn
+from torch.utils.data import default_collate
+from lightning.pytorch.callbacks import BasePredictionWriter
+
+from ..data.dataset import make_model_input
+from ..data.raw_data import RawData
+from ..data.transform import TransformConfig
+from ..tokenizer.spec import TokenizerSpec
+
+class Predictor():
+    '''
+    Args:
+        system: ARSystem or SkinSystem wrapping a loaded model
+        writer: ARWriter or SkinWriter, called as a plain function; None only returns predictions
+        transform_config: predict transform config of the task
+        tokenizer: tokenizer of the task, if any
+        data_name: name of the npz file in asset directories
+        device: device to predict on, defaults to cuda if available
+    '''
+    def __init__(
+        self,
+        system: nn.Module,
+        writer: Union[BasePredictionWriter, None],
+        transform_config: Union[TransformConfig, None],
+        tokenizer: Union[TokenizerSpec, None]=None,
+        data_name: str='raw_data.npz',
+        device: Union[str, torch.device, None]=None,
+    ):
+        if device is None:
+            device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self.device = torch.device(device)
+        self.system = system.to(self.device).eval()
+        self.writer = writer
+        self.transform_config = transform_config
+        self.tokenizer = tokenizer
+        self.data_name = data_name
+
+    def make_batch(self, raw_data: RawData, path: str, cls: Union[str, None]=None) -> Dict:
+        model_input = make_model_input(
+            raw_data=raw_data,
+            cls=cls,
+            path=path,
+            data_name=self.data_name,
+            transform_config=self.transform_config,
+            tokenizer=self.tokenizer,
+        )
+        batch = default_collate(self.system.model._process_fn([model_input]))
+        return {k: v.to(self.device) if isinstance(v, torch.Tensor) else v for k, v in batch.items()}
+
+    def predict_one(self, raw_data: Union[RawData, str], path: Union[str, None]=None, cls: Union[str, None]=None):
+        '''
+        Predict one asset and write results with the writer.
+
+        Args:
+            raw_data: RawData, or a directory containing data_name, or a path to the npz file
+            path: asset directory used by writers for output paths, defaults to the directory of raw_data
+            cls: class of the asset
+        Returns:
+            prediction of the system (list for ARSystem, dict for SkinSystem)
+        '''
+        if isinstance(raw_data, str):
+            npz_path = os.path.join(raw_data, self.data_name) if os.path.isdir(raw_data) else raw_data
+            if path is None:
+                path = os.path.dirname(npz_path)
+            raw_data = RawData.load(path=npz_path)
+        assert path is not None, "path is required when raw_data is given as RawData"
+        batch = self.make_batch(raw_data=raw_data, path=path, cls=cls)
+        with torch.inference_mode():
+            prediction = self.system.predict_step(batch, batch_idx=0)
+        if self.writer is not None:
+            self.writer.write_on_batch_end(
+                trainer=None,
+                pl_module=self.system,
+                prediction=prediction,
+                batch_indices=[0],
+                batch=batch,
+                batch_idx=0,
+                dataloader_idx=0,
+            )
+        return prediction
+
+    def predict(self, items: List[tuple]) -> List:
+        '''
+        Predict (cls, path) items one by one, e.g. Datapath.get_data().
+
+        Like run.py, all items are predicted writer.repeat times (ARWriter), with writer._epoch set to
+        the index of the run so outputs of different runs do not overwrite each other (add_num).
+        '''
+        items = list(items)
+        repeat = getattr(self.writer, 'repeat', 1)
+        res = []
+        for epoch in range(repeat):
+            if self.writer is not None:
+                self.writer._epoch = epoch
+            for cls, path in items:
+                start = time.time()
+                res.append(self.predict_one(raw_data=path, path=path, cls=cls))
+                print(f"predicted {path} in {time.time() - start:.2f}s")
+            if epoch < repeat - 1:
+                print(f"Finished prediction run {epoch + 1}/{repeat}, starting next run...")
+        return res
@@ -0,0 +1,122 @@
+'''
+Attention kernels that only need PyTorch, used when flash_attn is unavailable (e.g. CPU nodes).
+
+Modules keep the parameter layout of their flash_attn counterparts, so the same checkpoints load
+into either backend.
+'''
+import torch
+from torch import nn, Tensor
+import torch.nn.functional as F
+from typing import Literal, Union
+
+try:
+    import flash_attn
+    from flash_attn.modules.mha import MHA
+except ImportError:
+    flash_attn = None
+    MHA = None
+
+AttnBackend = Literal['auto', 'flash', 'sdpa']
+
+def use_flash(backend: AttnBackend, device: Union[torch.device, str, None]=None) -> bool:
+    '''
+    Resolve the backend: 'auto' picks flash_attn if it is installed and the device is CUDA.
+    '''
+    assert backend in ['auto', 'flash', 'sdpa'], f"unknown attention backend: {backend}"
+    if backend == 'flash':
+        assert flash_attn is not None, "Make sure flash_attn is installed."
+        return True
+    if backend == 'sdpa' or flash_attn is None:
+        return False
+    if device is None:
+        return torch.cuda.is_available()
+    return torch.device(device).type == 'cuda'
+
+def varlen_qkvpacked_attention(
+    qkv: Tensor,
+    cu_seqlens: Tensor,
+    max_seqlen: int,
+    softmax_scale: Union[float, None]=None,
+    dropout_p: float=0.,
+    max_elements: int=1 << 26,
+) -> Tensor:
+    '''
+    SDPA equivalent of flash_attn_varlen_qkvpacked_func.
+
+    Sequences are gathered into a padded batch and a key mask keeps the attention block-diagonal.
+    When all sequences have length max_seqlen (the usual case for serialized patches) no padding
+    or mask is needed. Sequences are processed in groups so that the attention matrix holds at most
+    max_elements values.
+
+    Args:
+        qkv: (T, 3, H, D)
+        cu_seqlens: (S + 1,), int, cumulative sequence lengths
+    Returns:
+        (T, H, D)
+    '''
+    T, _, H, D = qkv.shape
+    cu_seqlens = cu_seqlens.to(device=qkv.device, dtype=torch.long)
+    lengths = cu_seqlens[1:] - cu_seqlens[:-1]
+    S = lengths.shape[0]
+    L = int(max_seqlen)
+    group = max(1, max_elements // max(1, H * L * L))
+
+    if bool((lengths == L).all()):
+        # (S, L, 3, H, D) -> 3 x (S, H, L, D)
+        q, k, v = qkv.reshape(S, L, 3, H, D).permute(2, 0, 3, 1, 4).unbind(dim=0)
+        out = torch.cat([
+            F.scaled_dot_product_attention(
+                q[s:s + group], k[s:s + group], v[s:s + group], dropout_p=dropout_p, scale=softmax_scale,
+            ) for s in range(0, S, group)
+        ], dim=0)
+        return out.transpose(1, 2).reshape(T, H, D)
+
+    seq_id = torch.repeat_interleave(torch.arange(S, device=qkv.device), lengths)
+    pos = torch.arange(T, device=qkv.device) - cu_seqlens[seq_id]
+    padded = qkv.new_zeros(S, L, 3, H, D)
+    padded[seq_id, pos] = qkv
+    q, k, v = padded.permute(2, 0, 3, 1, 4).unbind(dim=0)
+    # (S, 1, 1, L), True where the key belongs to the sequence
+    mask = (torch.arange(L, device=qkv.device)[None] < lengths[:, None])[:, None, None, :]
+    out = torch.cat([
+        F.scaled_dot_product_attention(
+            q[s:s + group], k[s:s + group], v[s:s + group], attn_mask=mask[s:s + group], dropout_p=dropout_p, scale=softmax_scale,
+        ) for s in range(0, S, group)
+    ], dim=0)
+    return out.transpose(1, 2)[seq_id, pos]
+
+class CrossAttention(nn.Module):
+    '''
+    Drop-in replacement of flash_attn's MHA(cross_attn=True) based on F.scaled_dot_product_attention.
+
+    Parameter names (Wq, Wkv, out_proj) match MHA so state dicts are interchangeable.
+    '''
+    def __init__(self, embed_dim: int, num_heads: int, bias: bool=True):
+        super().__init__()
+        assert embed_dim % num_heads == 0, "embed_dim must be divisible by num_heads"
+        self.embed_dim = embed_dim
+        self.num_heads = num_heads
+        self.head_dim = embed_dim // num_heads
+        self.Wq = nn.Linear(embed_dim, embed_dim, bias=bias)
+        self.Wkv = nn.Linear(embed_dim, 2 * embed_dim, bias=bias)
+        self.out_proj = nn.Linear(embed_dim, embed_dim, bias=bias)
+
+    def forward(self, x: Tensor, x_kv: Tensor, key_padding_mask: Union[Tensor, None]=None) -> Tensor:
+        '''
+        Args:
+            key_padding_mask: (B, Lk), bool, True for keys to attend to (same convention as MHA)
+        '''
+        B, Lq, _ = x.shape
+        Lk = x_kv.shape[1]
+        H, D = self.num_heads, self.head_dim
+        q = self.Wq(x).view(B, Lq, H, D).transpose(1, 2)
+        # same packing as MHA: (..., (two h d)) -> (..., two, h, d)
+        k, v = self.Wkv(x_kv).view(B, Lk, 2, H, D).permute(2, 0, 3, 1, 4).unbind(dim=0)
+        attn_mask = None if key_padding_mask is None else key_padding_mask[:, None, None, :]
+        out = F.scaled_dot_product_attention(q, k, v, attn_mask=attn_mask)
+        return self.out_proj(out.transpose(1, 2).reshape(B, Lq, self.embed_dim))
+
+def get_cross_attention(embed_dim: int, num_heads: int, backend: AttnBackend='auto') -> nn.Module:
+    if use_flash(backend):
+        return MHA(embed_dim=embed_dim, num_heads=num_heads, cross_attn=True)
+    return CrossAttention(embed_dim=embed_dim, num_heads=num_heads)
@@ -0,0 +1,251 @@
+'''
+Beam search with early stopping and adaptive beam width for the skeleton decoder, and an estimate of
+the token budget of an asset.
+
+transformers' generate keeps num_beams beams until max_new_tokens or until num_beams finished
+hypotheses exist. Here beams far behind the best one are pruned as the search converges and
+generation stops as soon as finished hypotheses dominate the running beams.
+'''
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Tuple, Union
+
+import numpy as np
+import torch
+from torch import nn, FloatTensor, LongTensor
+from numpy import ndarray
+
+from ..data.order import Order
+
+@dataclass
+class GenerationTrace():
+    # number of decoding steps
+    steps: int=0
+
+    # tokens run through the decoder, summed over beams
+    tokens_generated: int=0
+
+    # beams removed because they fell behind
+    beams_pruned: int=0
+
+    # token budget of the asset
+    max_new_tokens: int=0
+
+    # 'eos' when finished hypotheses dominated, 'beams' when enough beams finished, 'length' at max_new_tokens
+    stop_reason: str=''
+
+    # wall-clock time of generation
+    seconds: float=0.
+
+    # generations run again with a doubled budget because no eos came within max_new_tokens
+    retries: int=0
+
+    @property
+    def ms_per_token(self) -> float:
+        return 1000 * self.seconds / max(1, self.steps)
+
+    def __str__(self) -> str:
+        return (
+            f"steps {self.steps}/{self.max_new_tokens}, tokens {self.tokens_generated}, "
+            f"beams pruned {self.beams_pruned}, {self.ms_per_token:.1f} ms/token, stop: {self.stop_reason}"
+            + (f", retries {self.retries}" if self.retries > 0 else "")
+        )
+
+def estimate_token_budget(
+    vertices: Union[ndarray, FloatTensor],
+    cls: Union[str, None],
+    order: Union[Order, None]=None,
+    min_new_tokens: int=384,
+    max_new_tokens: int=2048,
+    tokens_per_cell: float=1.5,
+    grid: int=16,
+) -> int:
+    '''
+    Estimate max_new_tokens of an asset from the extent of its surface and its class.
+
+    The surface is measured by the number of cells of a coarse grid (over the normalized cube)
+    containing sampled points. Classes with a template skeleton need at least 7 tokens
+    (branch + 6 coordinates) for every template bone.
+    '''
+    if isinstance(vertices, torch.Tensor):
+        vertices = vertices.detach().float().cpu().numpy()
+    vertices = vertices.reshape(-1, vertices.shape[-1])[:, :3]
+    cells = np.clip(((vertices + 1) / 2 * grid).astype(np.int64), 0, grid - 1)
+    occupied = np.unique(cells[:, 0] * grid * grid + cells[:, 1] * grid + cells[:, 2]).shape[0]
+    budget = tokens_per_cell * occupied
+    if order is not None and cls in order.parts:
+        budget += 7 * sum(len(bones) for bones in order.parts[cls].values()) + len(order.parts[cls])
+    return int(min(max_new_tokens, max(min_new_tokens, budget)))
+
+def _reorder_cache(past, beam_idx: LongTensor):
+    if hasattr(past, 'reorder_cache'):
+        past.reorder_cache(beam_idx)
+        return past
+    return tuple(tuple(t.index_select(0, beam_idx.to(t.device)) for t in layer) for layer in past)
+
+def _warp(scores: FloatTensor, temperature: float, top_k: int, top_p: float) -> FloatTensor:
+    if temperature != 1.:
+        scores = scores / temperature
+    if 0 < top_k < scores.shape[-1]:
+        kth = torch.topk(scores, top_k, dim=-1).values[:, -1:]
+        scores = scores.masked_fill(scores < kth, float('-inf'))
+    if top_p < 1.:
+        sorted_scores, sorted_idx = torch.sort(scores, dim=-1, descending=True)
+        cum = sorted_scores.softmax(dim=-1).cumsum(dim=-1)
+        # remove tokens once the mass before them exceeds top_p, the first one is always kept
+        remove = (cum - sorted_scores.softmax(dim=-1)) > top_p
+        scores = scores.masked_fill(remove.scatter(1, sorted_idx, remove), float('-inf'))
+    return scores
+
+@torch.no_grad()
+def beam_search(
+    model: nn.Module,
+    inputs_embeds: FloatTensor,
+    eos_token_id: int,
+    pad_token_id: int,
+    max_new_tokens: int,
+    num_beams: int,
+    num_return_sequences: int=1,
+    logits_processor: Union[Callable[[LongTensor, FloatTensor], FloatTensor], None]=None,
+    repetition_penalty: float=1.,
+    length_penalty: float=1.,
+    do_sample: bool=False,
+    temperature: float=1.,
+    top_k: int=0,
+    top_p: float=1.,
+    min_beams: int=2,
+    prune_margin: float=8.,
+    eos_dominance: float=0.5,
+    **kwargs,
+) -> Tuple[LongTensor, GenerationTrace]:
+    '''
+    Beam search (or beam sampling with do_sample) for a single prompt given as embeddings.
+
+    Scores follow transformers' beam search: log-softmax, repetition penalty and logits_processor on
+    the step scores, accumulated per beam, then (with do_sample) temperature/top-k/top-p warpers on
+    the accumulated scores as in transformers' beam sampling; finished hypotheses are normalized by
+    length ** length_penalty. With prune_margin=inf and eos_dominance>1 the result is the one of
+    generate(num_beams=...).
+
+    Args:
+        min_beams: the beam width never shrinks below this
+        prune_margin: running beams whose score is more than this behind the best one are dropped
+        eos_dominance: stop once this ratio of running beams would emit eos next and the best finished
+            hypothesis beats every running beam
+        kwargs: other generate kwargs are ignored
+    Returns:
+        (K, L) generated ids including eos, padded with pad_token_id, best first, and the trace
+    '''
+    assert inputs_embeds.shape[0] == 1, "do not support batch"
+    start = time.time()
+    trace = GenerationTrace(max_new_tokens=max_new_tokens)
+    device = inputs_embeds.device
+    num_hyps = max(num_beams, num_return_sequences)
+    min_beams = min(max(min_beams, num_return_sequences), num_beams)
+    finished: List[Tuple[float, LongTensor]] = []
+
+    def add_finished(score: float, ids: LongTensor):
+        finished.append((score / (ids.shape[0] ** length_penalty), ids))
+        finished.sort(key=lambda x: -x[0])
+        del finished[num_hyps:]
+
+    def next_scores(logits: FloatTensor, sequences: LongTensor) -> FloatTensor:
+        scores = torch.log_softmax(logits.float(), dim=-1)
+        if repetition_penalty != 1. and sequences.shape[1] > 0:
+            # RepetitionPenaltyLogitsProcessor runs on the log-probabilities
+            picked = scores.gather(1, sequences)
+            picked = torch.where(picked < 0, picked * repetition_penalty, picked / repetition_penalty)
+            scores = scores.scatter(1, sequences, picked)
+        if logits_processor is not None:
+            scores = logits_processor(sequences, scores)
+        return scores
+
+    out = model(inputs_embeds=inputs_embeds, use_cache=True)
+    past = out.past_key_values
+    logits = out.logits[:, -1]
+    sequences = torch.zeros((1, 0), dtype=torch.long, device=device)
+    beam_scores = torch.zeros(1, device=device)
+    trace.tokens_generated += 1
+
+    for step in range(max_new_tokens):
+        trace.steps = step + 1
+        scores = next_scores(logits, sequences)
+        vocab = scores.shape[-1]
+        cand = scores + beam_scores[:, None]
+        if do_sample:
+            cand = _warp(cand, temperature=temperature, top_k=top_k, top_p=top_p)
+        cand = cand.view(-1)
+        k = min(2 * num_beams, cand.shape[0])
+        if do_sample:
+            probs = cand.softmax(dim=-1)
+            k = min(k, int((probs > 0).sum()))
+            idx = torch.multinomial(probs, k)
+            idx = idx[torch.argsort(cand[idx], descending=True)]
+        else:
+            idx = torch.topk(cand, k).indices
+        cand_scores = cand[idx].tolist()
+        cand_beams = (idx // vocab).tolist()
+        cand_tokens = (idx % vocab).tolist()
+
+        next_beams, next_tokens, next_beam_scores = [], [], []
+        for rank, (score, beam, token) in enumerate(zip(cand_scores, cand_beams, cand_tokens)):
+            if token == eos_token_id:
+                # same as transformers: only eos within the first num_beams candidates finishes a beam
+                if rank < num_beams:
+                    add_finished(score, torch.cat([sequences[beam], sequences.new_tensor([token])]))
+                continue
+            next_beams.append(beam)
+            next_tokens.append(token)
+            next_beam_scores.append(score)
+            if len(next_beams) == num_beams:
+                break
+        if len(next_beams) == 0:
+            trace.stop_reason = 'beams'
+            break
+
+        # shrink the beam width once beams fall far behind the best one
+        keep = [i for i, s in enumerate(next_beam_scores) if next_beam_scores[0] - s <= prune_margin]
+        if len(keep) < min_beams:
+            keep = list(range(min(min_beams, len(next_beams))))
+        trace.beams_pruned += len(next_beams) - len(keep)
+        next_beams = [next_beams[i] for i in keep]
+        next_tokens = [next_tokens[i] for i in keep]
+        beam_scores = torch.tensor([next_beam_scores[i] for i in keep], device=device)
+
+        beam_idx = torch.tensor(next_beams, dtype=torch.long, device=device)
+        tokens = torch.tensor(next_tokens, dtype=torch.long, device=device)
+        sequences = torch.cat([sequences[beam_idx], tokens[:, None]], dim=1)
+
+        cur_len = sequences.shape[1]
+        best_running = beam_scores.max().item() / (cur_len ** length_penalty)
+        if len(finished) >= num_hyps and finished[-1][0] >= best_running:
+            trace.stop_reason = 'beams'
+            break
+        if step == max_new_tokens - 1:
+            trace.stop_reason = 'length'
+            break
+
+        past = _reorder_cache(past, beam_idx)
+        out = model(input_ids=tokens[:, None], past_key_values=past, use_cache=True)
+        past = out.past_key_values
+        logits = out.logits[:, -1]
+        trace.tokens_generated += tokens.shape[0]
+
+        if len(finished) > 0 and finished[0][0] >= best_running:
+            eos_ratio = (logits.argmax(dim=-1) == eos_token_id).float().mean().item()
+            if eos_ratio >= eos_dominance:
+                trace.stop_reason = 'eos'
+                break
+
+    if len(finished) < num_return_sequences:
+        # not enough finished hypotheses, return running beams without eos as transformers does
+        for score, ids in zip(beam_scores.tolist(), sequences):
+            add_finished(score, ids)
+
+    results = [ids for _, ids in finished[:num_return_sequences]]
+    max_len = max(ids.shape[0] for ids in results)
+    output = torch.full((len(results), max_len), pad_token_id, dtype=torch.long, device=device)
+    for i, ids in enumerate(results):
+        output[i, :ids.shape[0]] = ids
+    trace.seconds = time.time() - start
+    return output, trace
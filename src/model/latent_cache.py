@@ -0,0 +1,132 @@
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Callable, Dict, List, Tuple, Union
+
+import numpy as np
+import torch
+from torch import nn, FloatTensor
+
+def _tensor_bytes(x: torch.Tensor) -> bytes:
+    # view as bytes so that dtypes numpy does not know (e.g. bfloat16) can be hashed too
+    return x.detach().cpu().contiguous().reshape(-1).view(torch.uint8).numpy().tobytes()
+
+def _state_tensors(module: nn.Module) -> List[torch.Tensor]:
+    # dynamically quantized Linear layers keep (weight, bias) in a tuple of the state dict
+    tensors = []
+    for v in module.state_dict(keep_vars=True).values():
+        for t in (v if isinstance(v, tuple) else (v,)):
+            if torch.is_tensor(t):
+                tensors.append(t)
+    return tensors
+
+def _precision_key(module: nn.Module, device_type: str) -> str:
+    # the same weights give different latents under autocast or with dynamically quantized layers
+    autocast = str(torch.get_autocast_dtype(device_type)) if torch.is_autocast_enabled(device_type) else 'none'
+    quantized = any(type(m).__module__.startswith('torch.ao.nn.quantized') for m in module.modules())
+    return f"autocast={autocast},quantized={quantized}"
+
+class LatentCache():
+    '''
+    LRU cache of mesh-encoder latents, keyed by a hash of the input point cloud, of the encoder weights and of the
+    precision mode (autocast dtype, dynamic quantization).
+
+    Only used without gradients and in eval mode (where point sampling is seeded), so training is never affected. With cache_dir, latents are also
+    saved as `<key>.npy` and reloaded by later processes (e.g. regenerations from the UI).
+
+    Args:
+        max_items: number of latents kept in memory
+        cache_dir: directory to spill latents to, None keeps them in memory only
+        max_disk_items: number of files kept in cache_dir, oldest are removed first
+    '''
+    def __init__(self, max_items: int=8, cache_dir: Union[str, None]=None, max_disk_items: int=64):
+        self.max_items = max_items
+        self.cache_dir = cache_dir
+        self.max_disk_items = max_disk_items
+        self._items: OrderedDict[str, FloatTensor] = OrderedDict()
+        self._weights_keys: Dict[int, Tuple[tuple, str]] = {}
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def weights_key(self, module: nn.Module) -> str:
+        '''
+        Hash of all parameters and buffers, recomputed only when a tensor is replaced or modified in place.
+        '''
+        tensors = _state_tensors(module)
+        # packed int8 weights are unpacked into new tensors on every call, only their count is tracked
+        fingerprint = tuple((t.data_ptr(), t._version) for t in tensors if not t.is_quantized) + (sum(t.is_quantized for t in tensors),)
+        cached = self._weights_keys.get(id(module))
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+        h = hashlib.sha1()
+        for t in tensors:
+            h.update(str(t.dtype).encode())
+            h.update(_tensor_bytes(t.dequantize() if t.is_quantized else t))
+        key = h.hexdigest()
+        self._weights_keys[id(module)] = (fingerprint, key)
+        return key
+
+    def key(self, module: nn.Module, *inputs: torch.Tensor) -> str:
+        h = hashlib.sha1(self.weights_key(module).encode())
+        h.update(_precision_key(module, inputs[0].device.type).encode())
+        for x in inputs:
+            h.update(f"{tuple(x.shape)}{x.dtype}".encode())
+            h.update(_tensor_bytes(x))
+        return h.hexdigest()
+
+    def get(self, key: str, device: torch.device) -> Union[FloatTensor, None]:
+        if key in self._items:
+            self._items.move_to_end(key)
+            return self._items[key].to(device)
+        if self.cache_dir is not None:
+            path = os.path.join(self.cache_dir, f"{key}.npy")
+            if os.path.exists(path):
+                try:
+                    latents = torch.from_numpy(np.load(path))
+                except (OSError, ValueError):
+                    return None
+                self._put_memory(key, latents)
+                return latents.to(device)
+        return None
+
+    def put(self, key: str, latents: FloatTensor):
+        latents = latents.detach()
+        self._put_memory(key, latents)
+        if self.cache_dir is not None and latents.dtype != torch.bfloat16:
+            np.save(os.path.join(self.cache_dir, f"{key}.npy"), latents.cpu().numpy())
+            self._evict_disk()
+
+    def _put_memory(self, key: str, latents: FloatTensor):
+        self._items[key] = latents
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def _evict_disk(self):
+        files = [os.path.join(self.cache_dir, f) for f in os.listdir(self.cache_dir) if f.endswith('.npy')]
+        if len(files) <= self.max_disk_items:
+            return
+        files.sort(key=os.path.getmtime)
+        for f in files[:len(files) - self.max_disk_items]:
+            try:
+                os.remove(f)
+            except OSError:
+                pass
+
+    def get_or_compute(self, module: nn.Module, compute: Callable[[], FloatTensor], *inputs: torch.Tensor) -> FloatTensor:
+        '''
+        Return cached latents of module for inputs, or compute and store them.
+        '''
+        if torch.is_grad_enabled() or module.training:
+            return compute()
+        key = self.key(module, *inputs)
+        latents = self.get(key, device=inputs[0].device)
+        if latents is None:
+            latents = compute()
+            self.put(key, latents)
+        return latents
+
+def get_latent_cache(config: Union[Dict, None]) -> Union[LatentCache, None]:
+    if config is None:
+        return None
+    return LatentCache(**config)
@@ -1,4 +1,4 @@
-from functools import partial
+from functools import lru_cache, partial
 from addict import Dict
 import math
 import torch
@@ -9,11 +9,7 @@ from timm.models.layers import DropPath
 from typing import Union
 from einops import rearrange
 
-try:
-    import flash_attn
-except ImportError:
-    flash_attn = None
-
+from ...attention import flash_attn, use_flash, varlen_qkvpacked_attention
 from .utils.misc import offset2bincount
 from .utils.structure import Point
 from .modules import PointModule, PointSequential
@@ -60,6 +56,46 @@ class QueryKeyNorm(nn.Module):
         qkv_norm = rearrange(qkv_norm, 'S N H Ch -> N (S H Ch)')
         return qkv_norm
 
+@lru_cache(maxsize=64)
+@torch.no_grad()
+def padding_and_inverse(offset, patch_size, device):
+    """
+    Build pad, unpad and cu_seqlens of serialized patches for a batch given by offset.
+
+    Every cloud with more than patch_size points is padded to a multiple of patch_size by
+    repeating points of its previous patch. Results only depend on (offset, patch_size), so they
+    are cached and shared by all blocks of the same depth and across forwards.
+    """
+    K = patch_size
+    offset = torch.tensor(offset, dtype=torch.long, device=device)
+    bincount = offset2bincount(offset)
+    bincount_pad = torch.div(bincount + K - 1, K, rounding_mode="trunc") * K
+    # only pad point when num of points larger than patch_size
+    mask_pad = bincount > K
+    bincount_pad = torch.where(mask_pad, bincount_pad, bincount)
+    _offset = nn.functional.pad(offset, (1, 0))
+    _offset_pad = nn.functional.pad(torch.cumsum(bincount_pad, dim=0), (1, 0))
+    shift = _offset_pad[:-1] - _offset[:-1]
+
+    unpad = torch.arange(_offset[-1], device=device) + shift.repeat_interleave(bincount)
+
+    # each padded cloud is one run of original points followed by a run of padded slots,
+    # padded slots take the points one patch earlier
+    num_fill = torch.where(bincount != bincount_pad, K - bincount % K, 0)
+    run_length = torch.stack([bincount_pad - num_fill, num_fill], dim=1).reshape(-1)
+    run_shift = torch.stack([shift, shift + K], dim=1).reshape(-1)
+    pad = torch.arange(_offset_pad[-1], device=device) - run_shift.repeat_interleave(run_length)
+
+    # one sequence every patch_size points of each padded cloud
+    num_patches = torch.div(bincount_pad + K - 1, K, rounding_mode="trunc")
+    patch_batch = torch.arange(len(offset), device=device).repeat_interleave(num_patches)
+    first_patch = nn.functional.pad(torch.cumsum(num_patches, dim=0), (1, 0))[:-1]
+    patch_local = torch.arange(patch_batch.shape[0], device=device) - first_patch[patch_batch]
+    cu_seqlens = (_offset_pad[:-1][patch_batch] + patch_local * K).to(torch.int32)
+    cu_seqlens = nn.functional.pad(cu_seqlens, (0, 1), value=_offset_pad[-1])
+    return pad, unpad, cu_seqlens
+
+
 class SerializedAttention(PointModule):
     def __init__(
         self,
@@ -76,6 +112,7 @@ class SerializedAttention(PointModule):
         upcast_attention=True,
         upcast_softmax=True,
         enable_qknorm=False,
+        attn_backend="auto",
     ):
         super().__init__()
         assert channels % num_heads == 0, f"channels {channels} must be divisible by num_heads {num_heads}"
@@ -87,6 +124,7 @@ class SerializedAttention(PointModule):
         self.upcast_softmax = upcast_softmax
         self.enable_rpe = enable_rpe
         self.enable_flash = enable_flash
+        self.attn_backend = attn_backend
         self.enable_qknorm = enable_qknorm
         if enable_qknorm:
             self.qknorm = QueryKeyNorm(channels, num_heads)
@@ -102,7 +140,10 @@ class SerializedAttention(PointModule):
             assert (
                 upcast_softmax is False
             ), "Set upcast_softmax to False when enable Flash Attention"
-            assert flash_attn is not None, "Make sure flash_attn is installed."
+            # without flash_attn the same varlen attention runs on torch's scaled_dot_product_attention
+            assert (
+                attn_backend != "flash" or flash_attn is not None
+            ), "Make sure flash_attn is installed."
             self.patch_size = patch_size
             self.attn_drop = attn_drop
         else:
@@ -140,50 +181,8 @@ class SerializedAttention(PointModule):
             or cu_seqlens_key not in point.keys()
         ):
             offset = point.offset
-            bincount = offset2bincount(offset)
-            bincount_pad = (
-                torch.div(
-                    bincount + self.patch_size - 1,
-                    self.patch_size,
-                    rounding_mode="trunc",
-                )
-                * self.patch_size
-            )
-            # only pad point when num of points larger than patch_size
-            mask_pad = bincount > self.patch_size
-            bincount_pad = ~mask_pad * bincount + mask_pad * bincount_pad
-            _offset = nn.functional.pad(offset, (1, 0))
-            _offset_pad = nn.functional.pad(torch.cumsum(bincount_pad, dim=0), (1, 0))
-            pad = torch.arange(_offset_pad[-1], device=offset.device)
-            unpad = torch.arange(_offset[-1], device=offset.device)
-            cu_seqlens = []
-            for i in range(len(offset)):
-                unpad[_offset[i] : _offset[i + 1]] += _offset_pad[i] - _offset[i]
-                if bincount[i] != bincount_pad[i]:
-                    pad[
-                        _offset_pad[i + 1]
-                        - self.patch_size
-                        + (bincount[i] % self.patch_size) : _offset_pad[i + 1]
-                    ] = pad[
-                        _offset_pad[i + 1]
-                        - 2 * self.patch_size
-                        + (bincount[i] % self.patch_size) : _offset_pad[i + 1]
-                        - self.patch_size
-                    ]
-                pad[_offset_pad[i] : _offset_pad[i + 1]] -= _offset_pad[i] - _offset[i]
-                cu_seqlens.append(
-                    torch.arange(
-                        _offset_pad[i],
-                        _offset_pad[i + 1],
-                        step=self.patch_size,
-                        dtype=torch.int32,
-                        device=offset.device,
-                    )
-                )
-            point[pad_key] = pad
-            point[unpad_key] = unpad
-            point[cu_seqlens_key] = nn.functional.pad(
-                torch.concat(cu_seqlens), (0, 1), value=_offset_pad[-1]
+            point[pad_key], point[unpad_key], point[cu_seqlens_key] = padding_and_inverse(
+                tuple(offset.tolist()), self.patch_size, offset.device
             )
         return point[pad_key], point[unpad_key], point[cu_seqlens_key]
 
@@ -224,7 +223,7 @@ class SerializedAttention(PointModule):
             attn = self.softmax(attn)
             attn = self.attn_drop(attn).to(qkv.dtype)
             feat = (attn @ v).transpose(1, 2).reshape(-1, C)
-        else:
+        elif use_flash(self.attn_backend, qkv.device):
             feat = flash_attn.flash_attn_varlen_qkvpacked_func(
                 qkv.half().reshape(-1, 3, H, C // H),
                 cu_seqlens,
@@ -233,6 +232,14 @@ class SerializedAttention(PointModule):
                 softmax_scale=self.scale,
             ).reshape(-1, C)
             feat = feat.to(qkv.dtype)
+        else:
+            feat = varlen_qkvpacked_attention(
+                qkv.reshape(-1, 3, H, C // H),
+                cu_seqlens,
+                max_seqlen=self.patch_size,
+                dropout_p=self.attn_drop if self.training else 0,
+                softmax_scale=self.scale,
+            ).reshape(-1, C)
         feat = feat[inverse]
 
         # ffn
@@ -290,6 +297,7 @@ class Block(PointModule):
         upcast_attention=True,
         upcast_softmax=True,
         enable_qknorm=False,
+        attn_backend="auto",
     ):
         super().__init__()
         self.channels = channels
@@ -322,6 +330,7 @@ class Block(PointModule):
             upcast_attention=upcast_attention,
             upcast_softmax=upcast_softmax,
             enable_qknorm=enable_qknorm,
+            attn_backend=attn_backend,
         )
         self.norm2 = PointSequential(norm_layer(channels))
         self.mlp = PointSequential(
@@ -575,6 +584,7 @@ class PointTransformerV3Object(PointModule):
         enable_qknorm=False,
         layer_norm=False,
         res_linear=True,
+        attn_backend="auto",
     ):
         super().__init__()
         self.num_stages = len(enc_depths)
@@ -635,6 +645,7 @@ class PointTransformerV3Object(PointModule):
                         upcast_attention=upcast_attention,
                         upcast_softmax=upcast_softmax,
                         enable_qknorm=enable_qknorm,
+                        attn_backend=attn_backend,
                     ),
                     name=f"block{i}",
                 )
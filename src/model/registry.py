@@ -0,0 +1,203 @@
+'''
+Local registry of model configs and weights, so that inference starts without network access.
+
+Usage:
+    python -m src.model.registry convert experiments/skeleton/articulation-xl_quantization_256/model.ckpt
+writes model.safetensors next to the checkpoint, which run.py then prefers over the .ckpt.
+
+    python -m src.model.registry bench configs/task/quick_inference_skeleton_articulationxl_ar_256.yaml
+times building the model of a task from its .safetensors and fails above COLD_START_TARGET_SEC.
+'''
+import argparse
+import json
+import os
+import time
+from contextlib import contextmanager
+from itertools import chain
+from typing import Callable, Dict, Union
+
+import torch
+from torch import nn, Tensor
+
+# configs of pretrained LLMs shipped with the repo, only the architecture is used (weights come from UniRig checkpoints)
+VENDORED_LLM_CONFIGS = {
+    'facebook/opt-350m': 'configs/model/llm/opt-350m',
+}
+
+# wall-clock budget of building a model and loading its weights, run.py warns above it and `bench` fails
+COLD_START_TARGET_SEC = 5.0
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def resolve_llm_config(name_or_path: str) -> str:
+    '''
+    Return a local directory of the config if it is vendored, otherwise name_or_path unchanged.
+    '''
+    if os.path.isdir(name_or_path):
+        return name_or_path
+    vendored = VENDORED_LLM_CONFIGS.get(name_or_path)
+    if vendored is not None and os.path.isdir(os.path.join(_ROOT, vendored)):
+        return os.path.join(_ROOT, vendored)
+    return name_or_path
+
+def safetensors_path(ckpt_path: str) -> str:
+    return os.path.splitext(ckpt_path)[0] + '.safetensors'
+
+def resolve_checkpoint(ckpt_name: str) -> Union[str, None]:
+    '''
+    Return a local file of ckpt_name, preferring the converted .safetensors, or None if there is none.
+    '''
+    for path in [safetensors_path(ckpt_name), ckpt_name]:
+        if os.path.isfile(path):
+            return path
+    return None
+
+def _unalias(state_dict: Dict[str, Tensor]) -> Dict[str, str]:
+    # safetensors refuses tensors sharing memory (e.g. tied lm_head and embeddings), keep the first one only
+    seen: Dict[tuple, str] = {}
+    aliases = {}
+    for k, v in state_dict.items():
+        key = (v.untyped_storage().data_ptr(), v.storage_offset(), tuple(v.shape), v.dtype)
+        if key in seen:
+            aliases[k] = seen[key]
+        else:
+            seen[key] = k
+    return aliases
+
+def load_weights(path: str, prefix: str='model.') -> Dict[str, Tensor]:
+    '''
+    Load a state dict of the model (without prefix) from a .safetensors file or a lightning checkpoint.
+
+    safetensors are opened once with safe_open and every tensor is taken with get_tensor, which
+    returns tensors backed by a memory map of the file: pages are read when a tensor is first used.
+    Checkpoints go through torch.load(mmap=True), which maps tensor storages the same way but still
+    unpickles the whole checkpoint (optimizer states included).
+    '''
+    if path.endswith('.safetensors'):
+        from safetensors import safe_open
+        with safe_open(path, framework='pt', device='cpu') as f:
+            state_dict = {k: f.get_tensor(k) for k in f.keys()}
+            metadata = f.metadata() or {}
+        for k, v in json.loads(metadata.get('aliases', '{}')).items():
+            state_dict[k] = state_dict[v]
+        return state_dict
+    ckpt = torch.load(path, map_location='cpu', mmap=True, weights_only=False)
+    state_dict = ckpt.get('state_dict', ckpt)
+    if any(k.startswith(prefix) for k in state_dict):
+        state_dict = {k[len(prefix):]: v for k, v in state_dict.items() if k.startswith(prefix)}
+    return state_dict
+
+def convert_checkpoint(ckpt_path: str, output_path: Union[str, None]=None, prefix: str='model.') -> str:
+    '''
+    Convert weights of a lightning checkpoint into a .safetensors file, optimizer states are dropped.
+    '''
+    from safetensors.torch import save_file
+    if output_path is None:
+        output_path = safetensors_path(ckpt_path)
+    state_dict = load_weights(ckpt_path, prefix=prefix)
+    aliases = _unalias(state_dict)
+    tensors = {k: v.contiguous() for k, v in state_dict.items() if k not in aliases}
+    save_file(tensors, output_path, metadata={
+        'source': os.path.basename(ckpt_path),
+        'aliases': json.dumps(aliases),
+    })
+    return output_path
+
+@contextmanager
+def skip_init():
+    '''
+    Construct modules without random initialization: torch.nn.init functions do nothing and
+    transformers skips _init_weights. Only use it when all weights are loaded afterwards.
+    '''
+    names = [
+        'uniform_', 'normal_', 'trunc_normal_', 'constant_', 'ones_', 'zeros_',
+        'xavier_uniform_', 'xavier_normal_', 'kaiming_uniform_', 'kaiming_normal_', 'orthogonal_',
+    ]
+    saved = {name: getattr(nn.init, name) for name in names if hasattr(nn.init, name)}
+    def noop(tensor, *args, **kwargs):
+        return tensor
+    try:
+        from transformers.modeling_utils import no_init_weights
+    except ImportError:
+        no_init_weights = contextmanager(lambda: (yield))
+    try:
+        for name in saved:
+            setattr(nn.init, name, noop)
+        with no_init_weights():
+            yield
+    finally:
+        for name, f in saved.items():
+            setattr(nn.init, name, f)
+
+def build_model(build: Callable[[], nn.Module], weights: str, meta: bool=True, strict: bool=True) -> nn.Module:
+    '''
+    Build a model with build() and load weights into it without initializing them first.
+
+    With meta, parameters are created on the meta device and replaced by the loaded tensors
+    (load_state_dict(assign=True)), so no memory is allocated twice. Modules that cannot be built
+    on meta or that keep tensors outside the state dict fall back to a CPU build with skip_init.
+    '''
+    state_dict = load_weights(weights)
+    if meta:
+        try:
+            with torch.device('meta'):
+                model = build()
+            model.load_state_dict(state_dict, strict=strict, assign=True)
+            leftovers = [n for n, t in chain(model.named_parameters(), model.named_buffers()) if t.is_meta]
+            if len(leftovers) == 0:
+                return model
+            print(f"{len(leftovers)} tensors are not in the state dict (e.g. {leftovers[0]}), building on cpu instead")
+        except Exception as e:
+            print(f"failed to build on meta device ({e}), building on cpu instead")
+    with skip_init():
+        model = build()
+    model.load_state_dict(state_dict, strict=strict, assign=True)
+    return model
+
+def bench(task: str, repeat: int=3) -> float:
+    '''
+    Best wall-clock time of build_model for the model of a task config, from its .safetensors
+    (converted first if only the checkpoint exists).
+    '''
+    import yaml
+    from box import Box
+    from ..inference.download import download
+    from ..tokenizer.parse import get_tokenizer
+    from ..tokenizer.spec import TokenizerConfig
+    from .parse import get_model
+    def load_yaml(path: str) -> Box:
+        with open(path, 'r', encoding='utf-8') as f:
+            return Box(yaml.safe_load(f))
+    task_config = load_yaml(task)
+    model_config = load_yaml(os.path.join(_ROOT, 'configs', 'model', f"{task_config.components.model}.yaml"))
+    tokenizer = None
+    if task_config.components.get('tokenizer') is not None:
+        tokenizer_config = load_yaml(os.path.join(_ROOT, 'configs', 'tokenizer', f"{task_config.components.tokenizer}.yaml"))
+        tokenizer = get_tokenizer(config=TokenizerConfig.parse(config=tokenizer_config))
+    weights = download(task_config.resume_from_checkpoint)
+    if not weights.endswith('.safetensors'):
+        weights = convert_checkpoint(weights)
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.time()
+        build_model(lambda: get_model(tokenizer=tokenizer, **model_config), weights)
+        best = min(best, time.time() - start)
+    return best
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="convert lightning checkpoints into safetensors, or time model builds")
+    parser.add_argument('command', choices=['convert', 'bench'])
+    parser.add_argument('paths', nargs='+', help="checkpoints (convert) or task configs (bench)")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    if args.command == 'convert':
+        for ckpt in args.paths:
+            start = time.time()
+            print(f"{ckpt} -> {convert_checkpoint(ckpt)} ({time.time() - start:.1f}s)")
+    else:
+        ok = True
+        for task in args.paths:
+            seconds = bench(task, repeat=args.repeat)
+            ok &= seconds <= COLD_START_TARGET_SEC
+            print(f"{task}: {seconds:.2f}s (target {COLD_START_TARGET_SEC:.1f}s)")
+        raise SystemExit(0 if ok else 1)
@@ -1,15 +1,26 @@
+import logging
+import time
 import torch
 from torch import nn, FloatTensor, LongTensor
 import numpy as np
+from numpy import ndarray
 from torch.nn.functional import pad
-from typing import Dict, List, Union
+from typing import Dict, List, Tuple, Union
 from transformers import AutoModelForCausalLM, AutoConfig, LogitsProcessor, LogitsProcessorList
 
 from .spec import ModelSpec, ModelInput
 from .parse_encoder import MAP_MESH_ENCODER, get_mesh_encoder
+from .latent_cache import get_latent_cache
+from .registry import resolve_llm_config
+from .attention import flash_attn
+from .generation import GenerationTrace, beam_search, estimate_token_budget
 
-from ..tokenizer.spec import TokenizerSpec, DetokenizeOutput
+from ..data.skeleton_score import rank_skeletons
+from ..tokenizer.spec import TokenizerSpec, DetokenizeOutput, DetokenizeCandidates
 from copy import deepcopy
+from dataclasses import replace
+
+logger = logging.getLogger(__name__)
 
 class VocabSwitchingLogitsProcessor(LogitsProcessor):
     def __init__(self, tokenizer: TokenizerSpec, start_tokens: LongTensor):
@@ -52,6 +63,10 @@ class UniRigAR(ModelSpec):
         
         _d = llm.copy()
         _d['vocab_size'] = self.tokenizer.vocab_size
+        # use the config shipped with the repo instead of a hub lookup
+        _d['pretrained_model_name_or_path'] = resolve_llm_config(_d['pretrained_model_name_or_path'])
+        if _d.get('_attn_implementation') == 'flash_attention_2' and flash_attn is None:
+            _d['_attn_implementation'] = 'sdpa'
         llm_config = AutoConfig.from_pretrained(**_d)
         # Force float32 precision for the model
         llm_config.torch_dtype = torch.float32
@@ -62,6 +77,13 @@ class UniRigAR(ModelSpec):
         self.hidden_size = llm.hidden_size
         
         self.mesh_encoder = get_mesh_encoder(**mesh_encoder)
+        # reuse shape latents when the same point cloud is encoded again (e.g. regenerations)
+        self.latent_cache = get_latent_cache(kwargs.get('latent_cache'))
+        # precision of prediction on CPU: 'bfloat16' runs the encoder and the decoder under autocast,
+        # 'int8' dynamically quantizes their Linear layers. CUDA always predicts in float32.
+        self.inference_precision = kwargs.get('inference_precision', 'float32')
+        assert self.inference_precision in ['float32', 'bfloat16', 'int8'], f"unsupported inference_precision: {self.inference_precision}"
+        self._quantized = False
         
         if (
             isinstance(self.mesh_encoder, MAP_MESH_ENCODER.michelangelo) or
@@ -71,6 +93,18 @@ class UniRigAR(ModelSpec):
         else:
             raise NotImplementedError()
             
+    def quantize(self):
+        '''
+        Replace Linear layers of the decoder and the mesh encoder with dynamically quantized int8
+        ones (weights int8, activations quantized on the fly). Only for CPU inference, done once.
+        '''
+        if self._quantized:
+            return
+        from torch.ao.quantization import quantize_dynamic
+        quantize_dynamic(self.transformer, {nn.Linear}, dtype=torch.qint8, inplace=True)
+        quantize_dynamic(self.mesh_encoder, {nn.Linear}, dtype=torch.qint8, inplace=True)
+        self._quantized = True
+    
     def encode_mesh_cond(self, vertices: FloatTensor, normals: FloatTensor) -> FloatTensor:
         assert not torch.isnan(vertices).any()
         assert not torch.isnan(normals).any()
@@ -78,10 +112,16 @@ class UniRigAR(ModelSpec):
             isinstance(self.mesh_encoder, MAP_MESH_ENCODER.michelangelo) or
             isinstance(self.mesh_encoder, MAP_MESH_ENCODER.michelangelo_encoder)
         ):
-            if (len(vertices.shape) == 3):
+            if (len(vertices.shape) != 3):
+                vertices = vertices.unsqueeze(0)
+                normals = normals.unsqueeze(0)
+            def encode() -> FloatTensor:
                 shape_embed, latents, token_num, pre_pc = self.mesh_encoder.encode_latents(pc=vertices, feats=normals)
+                return latents
+            if self.latent_cache is not None:
+                latents = self.latent_cache.get_or_compute(self.mesh_encoder, encode, vertices, normals)
             else:
-                shape_embed, latents, token_num, pre_pc = self.mesh_encoder.encode_latents(pc=vertices.unsqueeze(0), feats=normals.unsqueeze(0))
+                latents = encode()
             latents = self.output_proj(latents)
             return latents
         else:
@@ -129,16 +169,19 @@ class UniRigAR(ModelSpec):
     def forward(self, data: Dict):
         return self.training_step(data=data)
     
-    @torch.no_grad()
-    def generate(
+    def _generate_ids(
         self,
         vertices: FloatTensor,
         normals: FloatTensor,
         cls: Union[str, None]=None,
         **kwargs,
-    ) -> DetokenizeOutput:
+    ) -> Tuple[List[ndarray], GenerationTrace]:
         '''
-        Do not support batch!
+        Encode the mesh once and return every generated sequence, start tokens included, and the
+        trace of the generation.
+
+        With token_budget, max_new_tokens is estimated from the mesh first; while no sequence reaches
+        eos the budget is doubled (up to max_new_tokens) and generation runs again.
         '''
         cond = self.encode_mesh_cond(vertices=vertices, normals=normals).to(dtype=self.transformer.dtype)
         
@@ -156,6 +199,52 @@ class UniRigAR(ModelSpec):
             tokenizer=self.tokenizer,
             start_tokens=start_tokens,
         )
+        beam_controller = kwargs.pop('beam_controller', None)
+        token_budget = kwargs.pop('token_budget', None)
+        max_new_tokens = kwargs.get('max_new_tokens', 2048)
+        kwargs['max_new_tokens'] = max_new_tokens
+        if token_budget is not None:
+            kwargs['max_new_tokens'] = estimate_token_budget(
+                vertices=vertices,
+                cls=cls,
+                order=getattr(self.tokenizer, 'order', None),
+                max_new_tokens=max_new_tokens,
+                **token_budget,
+            )
+        retries = 0
+        while True:
+            results, trace = self._run_generation(cond=cond, processor=processor, beam_controller=beam_controller, **kwargs)
+            if kwargs['max_new_tokens'] >= max_new_tokens or (results == self.tokenizer.eos).any():
+                break
+            # the estimated budget was too small
+            budget = min(2 * kwargs['max_new_tokens'], max_new_tokens)
+            logger.info(f"no eos within {kwargs['max_new_tokens']} tokens, retrying with {budget}")
+            kwargs['max_new_tokens'] = budget
+            retries += 1
+        trace.retries = retries
+        logger.info(f"generation: {trace}")
+        results = pad(results, (start_tokens.shape[0], 0))
+        results[:, :start_tokens.shape[0]] = start_tokens
+        return list(results.detach().cpu().numpy()), trace
+    
+    def _run_generation(
+        self,
+        cond: FloatTensor,
+        processor: LogitsProcessor,
+        beam_controller: Union[Dict, None]=None,
+        **kwargs,
+    ) -> Tuple[LongTensor, GenerationTrace]:
+        if beam_controller is not None and kwargs.get('num_beams', 1) > 1:
+            return beam_search(
+                model=self.transformer,
+                inputs_embeds=cond,
+                eos_token_id=self.tokenizer.eos,
+                pad_token_id=self.tokenizer.pad,
+                logits_processor=processor,
+                **kwargs,
+                **beam_controller,
+            )
+        start = time.time()
         results = self.transformer.generate(
             inputs_embeds=cond,
             bos_token_id=self.tokenizer.bos,
@@ -164,13 +253,74 @@ class UniRigAR(ModelSpec):
             logits_processor=LogitsProcessorList([processor]),
             **kwargs,
         )
-        output_ids = results[0, :]
-        for token in reversed(start_tokens):
-            output_ids = pad(output_ids, (1, 0), value=token)
-        output_ids = output_ids.detach().cpu().numpy()
+        steps = results.shape[1]
+        trace = GenerationTrace(
+            steps=steps,
+            # transformers runs every beam until the end
+            tokens_generated=steps * kwargs.get('num_beams', 1),
+            max_new_tokens=kwargs['max_new_tokens'],
+            stop_reason='eos' if (results == self.tokenizer.eos).any() else 'length',
+            seconds=time.time() - start,
+        )
+        return results, trace
+    
+    @torch.no_grad()
+    def generate(
+        self,
+        vertices: FloatTensor,
+        normals: FloatTensor,
+        cls: Union[str, None]=None,
+        **kwargs,
+    ) -> DetokenizeOutput:
+        '''
+        Do not support batch!
+        '''
+        ids, trace = self._generate_ids(vertices=vertices, normals=normals, cls=cls, **kwargs)
+        res = self.tokenizer.detokenize(ids=ids[0])
+        return replace(res, trace=trace)
+    
+    @torch.no_grad()
+    def generate_candidates(
+        self,
+        vertices: FloatTensor,
+        normals: FloatTensor,
+        cls: Union[str, None]=None,
+        num_candidates: int=4,
+        rank_kwargs: Union[Dict, None]=None,
+        **kwargs,
+    ) -> DetokenizeCandidates:
+        '''
+        Generate num_candidates skeletons in a single generate call and rank them with
+        geometric heuristics (see data/skeleton_score.py). Do not support batch!
+
+        The mesh is encoded once and all sequences share the condition prefix. Duplicated and
+        undecodable sequences are dropped.
+        '''
+        kwargs['num_return_sequences'] = num_candidates
+        if kwargs.get('num_beams', 1) > 1:
+            kwargs['num_beams'] = max(kwargs['num_beams'], num_candidates)
+        outputs = []
+        seen = set()
+        generated, trace = self._generate_ids(vertices=vertices, normals=normals, cls=cls, **kwargs)
+        for ids in generated:
+            # padding after eos differs between sequences of different lengths
+            key = ids[ids != self.tokenizer.pad].tobytes()
+            if key in seen:
+                continue
+            seen.add(key)
+            try:
+                outputs.append(replace(self.tokenizer.detokenize(ids=ids), trace=trace))
+            except Exception as e:
+                logger.warning(f"skip undecodable candidate: {e}")
+        assert len(outputs) > 0, "no valid candidate was generated"
         
-        res = self.tokenizer.detokenize(ids=output_ids)
-        return res
+        points = vertices.reshape(-1, vertices.shape[-1]).detach().float().cpu().numpy()
+        order, scores = rank_skeletons(
+            skeletons=[(o.joints, o.parents) for o in outputs],
+            points=points,
+            **(rank_kwargs or {}),
+        )
+        return DetokenizeCandidates(outputs=[outputs[i] for i in order], scores=[scores[i] for i in order], trace=trace)
     
     def predict_step(self, batch: Dict, no_cls: bool=False):
         vertices: FloatTensor   = batch['vertices']
@@ -186,10 +336,16 @@ class UniRigAR(ModelSpec):
         generate_kwargs.pop('no_cls', None)
         generate_kwargs.pop('use_dir_cls', None)
         generate_kwargs.pop('assign_cls', None)
+        # > 1 returns DetokenizeCandidates instead of DetokenizeOutput for every asset
+        num_candidates = generate_kwargs.pop('num_candidates', 1)
+        rank_kwargs = generate_kwargs.pop('rank_kwargs', {})
 
         if vertices.dim() == 2:
             vertices = vertices.unsqueeze(0)
             normals  = normals.unsqueeze(0)
+        on_cpu = vertices.device.type == 'cpu'
+        if on_cpu and self.inference_precision == 'int8':
+            self.quantize()
         outputs = []
         for i in range(vertices.shape[0]):
             if no_cls:
@@ -200,6 +356,13 @@ class UniRigAR(ModelSpec):
                 _cls = paths[i].removeprefix('./').split('/')[0]
             else:
                 _cls = cls[i]
-            res = self.generate(vertices=vertices[i], normals=normals[i], cls=_cls, **generate_kwargs)
+            with torch.autocast(device_type='cpu', dtype=torch.bfloat16, enabled=on_cpu and self.inference_precision == 'bfloat16'):
+                if num_candidates > 1:
+                    res = self.generate_candidates(
+                        vertices=vertices[i], normals=normals[i], cls=_cls,
+                        num_candidates=num_candidates, rank_kwargs=rank_kwargs, **generate_kwargs,
+                    )
+                else:
+                    res = self.generate(vertices=vertices[i], normals=normals[i], cls=_cls, **generate_kwargs)
             outputs.append(res)
         return outputs
\ No newline at end of file
@@ -3,14 +3,16 @@ from torch import nn, FloatTensor, LongTensor, Tensor
 import torch.nn.functional as F
 import numpy as np
 from torch.nn.functional import pad
-from typing import Dict, List
+from typing import Dict, List, Union
 from transformers import AutoModelForCausalLM, AutoConfig
 import math
+import os
 import torch_scatter
-from flash_attn.modules.mha import MHA
 
 from .spec import ModelSpec, ModelInput
+from .attention import AttnBackend, get_cross_attention
 from .parse_encoder import MAP_MESH_ENCODER, get_mesh_encoder
+from .latent_cache import get_latent_cache
 
 from ..data.utils import linear_blend_skinning
 
@@ -108,23 +110,26 @@ class FrequencyPositionalEmbedding(nn.Module):
             return x
 
 class ResidualCrossAttn(nn.Module):
-    def __init__(self, feat_dim: int, num_heads: int):
+    def __init__(self, feat_dim: int, num_heads: int, attn_backend: AttnBackend='auto'):
         super().__init__()
         assert feat_dim % num_heads == 0, "feat_dim must be divisible by num_heads"
 
         self.norm1 = nn.LayerNorm(feat_dim)
         self.norm2 = nn.LayerNorm(feat_dim)
         # self.attention = nn.MultiheadAttention(embed_dim=feat_dim, num_heads=num_heads, batch_first=True)
-        self.attention = MHA(embed_dim=feat_dim, num_heads=num_heads, cross_attn=True)
+        self.attention = get_cross_attention(embed_dim=feat_dim, num_heads=num_heads, backend=attn_backend)
         self.ffn = nn.Sequential(
             nn.Linear(feat_dim, feat_dim * 4),
             nn.GELU(),
             nn.Linear(feat_dim * 4, feat_dim),
         )
         
-    def forward(self, q, kv):
+    def forward(self, q, kv, kv_mask=None):
         residual = q
-        attn_output = self.attention(q, x_kv=kv)
+        if kv_mask is None:
+            attn_output = self.attention(q, x_kv=kv)
+        else:
+            attn_output = self.attention(q, x_kv=kv, key_padding_mask=kv_mask)
         x = self.norm1(residual + attn_output)
         x = self.norm2(x + self.ffn(x))
         return x
@@ -137,6 +142,7 @@ class BoneEncoder(nn.Module):
         embed_dim: int,
         num_heads: int,
         num_attn: int,
+        attn_backend: AttnBackend='auto',
     ):
         super().__init__()
         self.feat_bone_dim = feat_bone_dim
@@ -160,7 +166,7 @@ class BoneEncoder(nn.Module):
         )
         self.attn = nn.ModuleList()
         for _ in range(self.num_attn):
-            self.attn.append(ResidualCrossAttn(feat_dim, self.num_heads))
+            self.attn.append(ResidualCrossAttn(feat_dim, self.num_heads, attn_backend=attn_backend))
 
     def forward(
         self,
@@ -176,11 +182,32 @@ class BoneEncoder(nn.Module):
         x = self.bone_encoder((base_bone-min_coord[:, None, :]).reshape(-1, base_bone.shape[-1])).reshape(B, J, -1)
 
         latents = torch.cat([x, global_latents], dim=1)
+        kv_mask = bone_key_mask(num_bones=num_bones, J=J, num_latents=global_latents.shape[1], device=x.device)
         
         for (i, attn) in enumerate(self.attn):
-            x = attn(x, latents)
+            x = attn(x, latents, kv_mask=kv_mask)
         return x
 
+def bone_key_mask(num_bones: LongTensor, J: int, num_latents: int, device: torch.device) -> Union[Tensor, None]:
+    '''
+    (B, J + num_latents) key mask of [bones, latents], False for padded bones so that items of a
+    batch do not depend on each other's bone count. None when no bone is padded.
+    '''
+    num_bones = torch.as_tensor(num_bones, device=device)
+    if not bool((num_bones < J).any()):
+        return None
+    bone_valid = torch.arange(J, device=device)[None] < num_bones[:, None]
+    return torch.cat([bone_valid, bone_valid.new_ones(bone_valid.shape[0], num_latents)], dim=1)
+
+def available_memory() -> Union[int, None]:
+    '''
+    Free physical memory in bytes, None where os.sysconf does not report it (e.g. macOS, Windows).
+    '''
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return None
+
 class SkinweightPred(nn.Module):
     def __init__(self, in_dim, mlp_dim):
         super().__init__()
@@ -203,6 +230,20 @@ class SkinweightPred(nn.Module):
     def forward(self, x):
         return self.net(x)
 
+def get_children_matrix(parents: LongTensor, num_bones: LongTensor, J: int) -> FloatTensor:
+    '''
+    Return M = I + C with C[b, c, p] = 1 if p is the parent of c, shape (B, J, J).
+
+    skin @ M adds the weights of direct children to their parents.
+    '''
+    B = parents.shape[0]
+    device = parents.device
+    M = torch.eye(J, device=device).repeat(B, 1, 1)
+    valid = (parents >= 0) & (torch.arange(J, device=device)[None] < num_bones.to(device)[:, None])
+    b, c = torch.nonzero(valid, as_tuple=True)
+    M.index_put_((b, c, parents[b, c].long()), torch.ones(b.shape[0], device=device), accumulate=True)
+    return M
+
 class UniRigSkin(ModelSpec):
     
     def process_fn(self, batch: List[ModelInput]) -> List[Dict]:
@@ -238,7 +279,21 @@ class UniRigSkin(ModelSpec):
         self.num_mesh_bone_attn     = kwargs['num_mesh_bone_attn']
         self.bone_embed_dim         = kwargs['bone_embed_dim']
         self.voxel_mask             = kwargs.get('voxel_mask', 2)
-
+        # 'flash' needs flash_attn, 'sdpa' runs on any device, 'auto' picks flash on CUDA if installed
+        self.attn_backend           = kwargs.get('attn_backend', 'auto')
+        # 'bfloat16' runs everything but the sparse-conv encoder under CPU autocast
+        self.cpu_autocast_dtype     = kwargs.get('cpu_autocast_dtype', 'float32')
+        assert self.cpu_autocast_dtype in ['float32', 'bfloat16'], f"unsupported cpu_autocast_dtype: {self.cpu_autocast_dtype}"
+        # inference chunk size: None uses num_train_vertex, 'auto' uses half of free memory (num_train_vertex
+        # if it is unknown), a number is a budget in MB
+        self.chunk_memory_budget    = kwargs.get('chunk_memory_budget', None)
+        # compute bone attention and the skin head without intermediate permute/concat copies
+        self.fused_head             = kwargs.get('fused_head', False)
+        # reuse shape latents when the same point cloud is encoded again (e.g. regenerations)
+        self.latent_cache           = get_latent_cache(kwargs.get('latent_cache'))
+
+        if mesh_encoder['__target__'] == 'ptv3obj':
+            mesh_encoder = {'attn_backend': self.attn_backend, **mesh_encoder}
         self.mesh_encoder = get_mesh_encoder(**mesh_encoder)
         self.global_encoder = get_mesh_encoder(**global_encoder)
         if isinstance(self.mesh_encoder, MAP_MESH_ENCODER.ptv3obj):
@@ -264,6 +319,7 @@ class UniRigSkin(ModelSpec):
             embed_dim=self.bone_embed_dim,
             num_heads=self.num_heads,
             num_attn=self.num_bone_attn,
+            attn_backend=self.attn_backend,
         )
         
         self.downscale = nn.Sequential(
@@ -278,7 +334,7 @@ class UniRigSkin(ModelSpec):
         
         self.mesh_bone_attn = nn.ModuleList()
         self.mesh_bone_attn.extend([
-            ResidualCrossAttn(self.feat_dim, self.num_heads) for _ in range(self.num_mesh_bone_attn)
+            ResidualCrossAttn(self.feat_dim, self.num_heads, attn_backend=self.attn_backend) for _ in range(self.num_mesh_bone_attn)
         ])
 
         self.qmesh = nn.Linear(self.feat_dim, self.feat_dim * self.num_heads)
@@ -288,14 +344,125 @@ class UniRigSkin(ModelSpec):
         self.voxel_skin_norm = nn.LayerNorm(self.num_heads)
         self.attn_skin_norm = nn.LayerNorm(self.num_heads)
 
+    def _get_chunk_size(self, B: int, N: int, J: int, dtype: torch.dtype, device: torch.device) -> int:
+        '''
+        Number of vertices per inference chunk so that the skin head fits in the memory budget.
+        '''
+        if self.chunk_memory_budget is None:
+            return self.num_train_vertex
+        if self.chunk_memory_budget == 'auto':
+            if device.type == 'cuda':
+                free, _ = torch.cuda.mem_get_info(device)
+            else:
+                free = available_memory()
+            if free is None:
+                return self.num_train_vertex
+            budget = free // 2
+        else:
+            budget = int(float(self.chunk_memory_budget) * (1 << 20))
+        H = self.num_heads
+        # query projection, (J, H) attention/voxel/downscale activations and (J, mlp_dim) MLP activations
+        per_vertex = H * self.feat_dim + J * (8 * H + 3 * self.mlp_dim)
+        if not self.fused_head:
+            # concat of attention and voxel embeddings
+            per_vertex += J * 2 * H
+        per_vertex *= B * torch.finfo(dtype).bits // 8
+        return int(max(1, min(N, budget // per_vertex)))
+
+    def _attn_weight(
+        self,
+        mesh_feat: FloatTensor,
+        bone_feat: FloatTensor,
+        voxel_skin: FloatTensor,
+        dtype: torch.dtype,
+        bone_valid: Union[Tensor, None]=None,
+    ) -> FloatTensor:
+        '''
+        Attention of vertices to bones, voxel embedding, concat and downscale: the input of skinweight_pred.
+
+        Args:
+            mesh_feat: (B, N, feat_dim)
+            bone_feat: (B, J, num_heads, feat_dim)
+            voxel_skin: (B, N, J)
+            bone_valid: (B, 1, J), bool, padded bones get no attention
+        Returns:
+            (B, N, J, num_heads)
+        '''
+        B, N, _ = mesh_feat.shape
+        J = bone_feat.shape[1]
+        # trans to (B, num_heads, J, feat_dim)
+        bone_feat = bone_feat.transpose(1, 2)
+        # trans to (B, num_heads, N, feat_dim)
+        cur_mesh_feat = self.qmesh(mesh_feat).view(B, N, self.num_heads, self.feat_dim).transpose(1, 2)
+
+        # attn_weight shape : (B, num_heads, N, J)
+        logits = torch.bmm(
+            cur_mesh_feat.reshape(B * self.num_heads, N, -1), 
+            bone_feat.transpose(-2, -1).reshape(B * self.num_heads, -1, J)
+        ).reshape(B, self.num_heads, N, J) / math.sqrt(self.feat_dim)
+        if bone_valid is not None:
+            logits = logits.masked_fill(~bone_valid[:, None], float('-inf'))
+        attn_weight = F.softmax(logits, dim=-1, dtype=dtype)
+        # (B, num_heads, N, J) -> (B, N, J, num_heads)
+        attn_weight = attn_weight.permute(0, 2, 3, 1)
+        attn_weight = self.attn_skin_norm(attn_weight)
+    
+        embed_voxel_skin = self.voxel_skin_embed(voxel_skin.reshape(B, N, J, 1))
+        embed_voxel_skin = self.voxel_skin_norm(embed_voxel_skin)
+    
+        attn_weight = torch.cat([attn_weight, embed_voxel_skin], dim=-1)
+        return self.downscale(attn_weight)
+
+    def _fused_attn_weight(
+        self,
+        mesh_feat: FloatTensor,
+        bone_feat: FloatTensor,
+        voxel_skin: FloatTensor,
+        dtype: torch.dtype,
+        bone_valid: Union[Tensor, None]=None,
+    ) -> FloatTensor:
+        '''
+        Same as `_attn_weight`, computed directly in (B, N, J, num_heads) layout without the
+        permute and concat copies. skinweight_pred still runs on its output as before: the MLP is
+        deliberately not fused, a LayerNorm follows each of its Linear layers so there is nothing
+        to fold, and it already runs on all bones of a chunk in one call.
+
+        Args:
+            mesh_feat: (B, N, feat_dim)
+            bone_feat: (B, J, num_heads, feat_dim)
+            voxel_skin: (B, N, J)
+            bone_valid: (B, 1, J), bool, padded bones get no attention
+        Returns:
+            (B, N, J, num_heads)
+        '''
+        B, N, _ = mesh_feat.shape
+        H = self.num_heads
+        q = self.qmesh(mesh_feat).view(B, N, H, self.feat_dim)
+        logits = torch.einsum('bnhd,bjhd->bnjh', q, bone_feat) / math.sqrt(self.feat_dim)
+        if bone_valid is not None:
+            logits = logits.masked_fill(~bone_valid[..., None], float('-inf'))
+        attn_weight = F.softmax(logits, dim=2, dtype=dtype)
+        attn_weight = self.attn_skin_norm(attn_weight)
+        embed_voxel_skin = self.voxel_skin_norm(self.voxel_skin_embed(voxel_skin.unsqueeze(-1)))
+        # Linear on cat([a, e]) == a @ W[:, :H].T + e @ W[:, H:].T + b
+        linear, norm, act = self.downscale
+        x = F.linear(attn_weight, linear.weight[:, :H]) + F.linear(embed_voxel_skin, linear.weight[:, H:], linear.bias)
+        return act(norm(x))
+
     def encode_mesh_cond(self, vertices: FloatTensor, normals: FloatTensor) -> FloatTensor:
         assert not torch.isnan(vertices).any()
         assert not torch.isnan(normals).any()
         if isinstance(self.global_encoder, MAP_MESH_ENCODER.michelangelo_encoder):
-            if (len(vertices.shape) == 3):
+            if (len(vertices.shape) != 3):
+                vertices = vertices.unsqueeze(0)
+                normals = normals.unsqueeze(0)
+            def encode() -> FloatTensor:
                 shape_embed, latents, token_num, pre_pc = self.global_encoder.encode_latents(pc=vertices, feats=normals)
+                return latents
+            if self.latent_cache is not None:
+                latents = self.latent_cache.get_or_compute(self.global_encoder, encode, vertices, normals)
             else:
-                shape_embed, latents, token_num, pre_pc = self.global_encoder.encode_latents(pc=vertices.unsqueeze(0), feats=normals.unsqueeze(0))
+                latents = encode()
             latents = self.out_proj(latents)
             return latents
         else:
@@ -338,8 +505,9 @@ class UniRigSkin(ModelSpec):
             train_indices = torch.randperm(N)[:self.num_train_vertex]
             pack.append(train_indices)
         else:
-            for i in range((N + self.num_train_vertex - 1) // self.num_train_vertex):
-                pack.append(torch.arange(i*self.num_train_vertex, min((i+1)*self.num_train_vertex, N)))
+            chunk_size = self._get_chunk_size(B=B, N=N, J=J, dtype=dtype, device=vertices.device)
+            for i in range((N + chunk_size - 1) // chunk_size):
+                pack.append(torch.arange(i*chunk_size, min((i+1)*chunk_size, N)))
         
         # (B, seq_len, feat_dim)
         global_latents = self.encode_mesh_cond(vertices, normals)
@@ -360,8 +528,10 @@ class UniRigSkin(ModelSpec):
                 'grid_size': self.grid_size,
             }
             if not self.training:
-                # must cast to float32 to avoid sparse-conv precision bugs
-                with torch.autocast(device_type='cuda', dtype=torch.float32):
+                # must cast to float32 to avoid sparse-conv precision bugs,
+                # CPU autocast has no float32 mode so it is disabled instead
+                device_type = vertices.device.type
+                with torch.autocast(device_type=device_type, dtype=torch.float32, enabled=device_type == 'cuda'):
                     mesh_feat = self.mesh_encoder(ptv3_input).feat
                     mesh_feat = self.feat_map(mesh_feat).view(B, N, self.feat_dim)
             else:
@@ -373,67 +543,53 @@ class UniRigSkin(ModelSpec):
 
         # (B, J + seq_len, feat_dim)
         latents = torch.cat([bone_feat, global_latents], dim=1)
+        kv_mask = bone_key_mask(num_bones=num_bones, J=J, num_latents=global_latents.shape[1], device=vertices.device)
         # (B, N, feat_dim)
         for block in self.mesh_bone_attn:
             mesh_feat = block(
                 q=mesh_feat,
                 kv=latents,
+                kv_mask=kv_mask,
             )
 
-        # trans to (B, num_heads, J, feat_dim)
-        bone_feat = self.kmesh(bone_feat).view(B, J, self.num_heads, self.feat_dim).transpose(1, 2)
+        # (B, J, num_heads, feat_dim)
+        bone_feat = self.kmesh(bone_feat).view(B, J, self.num_heads, self.feat_dim)
+        get_attn_weight = self._fused_attn_weight if self.fused_head else self._attn_weight
 
         skin_pred_list = []
+        # (B, 1, J), True for real (not padded) bones
+        bone_valid = (torch.arange(J, device=vertices.device)[None] < num_bones.to(vertices.device)[:, None])[:, None, :]
         if not self.training:
-            skin_mask = voxel_skin.clone()
-            for b in range(B):
-                num = num_bones[b]
-                for i in range(num):
-                    p = parents[b, i]
-                    if p < 0:
-                        continue
-                    skin_mask[b, :, p] += skin_mask[b, :, i]
+            # add voxel skin of every bone to its parent, as one (B, N, J) @ (B, J, J)
+            skin_mask = torch.bmm(voxel_skin, get_children_matrix(parents=parents, num_bones=num_bones, J=J).type(dtype))
         for indices in pack:
             cur_N = len(indices)
-            # trans to (B, num_heads, N, feat_dim)
-            cur_mesh_feat = self.qmesh(mesh_feat[:, indices]).view(B, cur_N, self.num_heads, self.feat_dim).transpose(1, 2)
-
-            # attn_weight shape : (B, num_heads, N, J)
-            attn_weight = F.softmax(torch.bmm(
-                cur_mesh_feat.reshape(B * self.num_heads, cur_N, -1), 
-                bone_feat.transpose(-2, -1).reshape(B * self.num_heads, -1, J)
-            ) / math.sqrt(self.feat_dim), dim=-1, dtype=dtype)
-            # (B, num_heads, N, J) -> (B, N, J, num_heads)
-            attn_weight = attn_weight.reshape(B, self.num_heads, cur_N, J).permute(0, 2, 3, 1)
-            attn_weight = self.attn_skin_norm(attn_weight)
-            
-            embed_voxel_skin = self.voxel_skin_embed(voxel_skin[:, indices].reshape(B, cur_N, J, 1))
-            embed_voxel_skin = self.voxel_skin_norm(embed_voxel_skin)
-            
-            attn_weight = torch.cat([attn_weight, embed_voxel_skin], dim=-1)
-            attn_weight = self.downscale(attn_weight)
+            # (B, N, J, num_heads)
+            attn_weight = get_attn_weight(
+                mesh_feat=mesh_feat[:, indices],
+                bone_feat=bone_feat,
+                voxel_skin=voxel_skin[:, indices],
+                dtype=dtype,
+                bone_valid=bone_valid,
+            )
         
-            # (B, N, J, num_heads * (1+c)) -> (B, N, J)
-            skin_pred = torch.zeros(B, cur_N, J).to(attn_weight.device, dtype)
-            for i in range(B):
-                # (N*J, C)
-                input_features = attn_weight[i, :, :num_bones[i], :].reshape(-1, attn_weight.shape[-1])
-                
-                pred = self.skinweight_pred(input_features).reshape(cur_N, num_bones[i])
-                skin_pred[i, :, :num_bones[i]] = F.softmax(pred)
+            # (B, N, J, num_heads * (1+c)) -> (B, N, J), all items at once, padded bones are masked out
+            pred = self.skinweight_pred(attn_weight).reshape(B, cur_N, J)
+            pred = pred.masked_fill(~bone_valid, float('-inf'))
+            skin_pred = F.softmax(pred, dim=-1).type(dtype)
             skin_pred_list.append(skin_pred)
         skin_pred_list = torch.cat(skin_pred_list, dim=1)
-        for i in range(B):
-            n = num_bones[i]
-            skin_pred_list[i, :, :n] = skin_pred_list[i, :, :n] * torch.pow(skin_mask[i, :, :n], self.voxel_mask)
-            skin_pred_list[i, :, :n] = skin_pred_list[i, :, :n] / skin_pred_list[i, :, :n].sum(dim=-1, keepdim=True)
+        skin_pred_list = skin_pred_list * torch.pow(skin_mask, self.voxel_mask) * bone_valid
+        skin_pred_list = skin_pred_list / skin_pred_list.sum(dim=-1, keepdim=True)
         return skin_pred_list, torch.cat(pack, dim=0)
     
     def predict_step(self, batch: Dict):
         with torch.no_grad():
             num_bones: Tensor = batch['num_bones']
             
-            skin_pred, _ = self._get_predict(batch=batch)
+            device_type = batch['vertices'].device.type
+            with torch.autocast(device_type='cpu', dtype=torch.bfloat16, enabled=device_type == 'cpu' and self.cpu_autocast_dtype == 'bfloat16'):
+                skin_pred, _ = self._get_predict(batch=batch)
             outputs = []
             for i in range(skin_pred.shape[0]):
                 outputs.append(skin_pred[i, :, :num_bones[i]])
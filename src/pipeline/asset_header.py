@@ -0,0 +1,266 @@
+"""
+🎯 UniRig アセットヘッダー解析 - ジオメトリを展開しない軽量解析
+
+Step0のメタデータ用に頂点数・面数・UV数・マテリアル数・テクスチャ数をヘッダーから数える。
+メッシュ・画像はデコードしないため、500MBのアップロードでもほぼ一定時間で終わる。
+
+- glTF/GLB/VRM: JSONチャンクのみ読み込み（BINチャンクは読まない）
+- OBJ: メモリマップでチャンク単位に行頭キーワードを数える（.mtlのテクスチャも数える）
+- FBX(バイナリ): ノードツリーを辿り、配列はヘッダーの要素数のみ参照
+  （面数だけはPolygonVertexIndexをストリーム展開して負の値を数える、メモリは一定）
+
+返り値は従来の trimesh 解析と同じキー:
+    has_textures, texture_count, material_count, vertex_count, face_count, uv_coordinates, analysis_method
+"""
+
+import json
+import mmap
+import struct
+import zlib
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+FBX_MAGIC = b"Kaydara FBX Binary  \x00"
+
+_GLTF_TEXTURE_KEYS = ["normalTexture", "occlusionTexture", "emissiveTexture"]
+_GLTF_PBR_TEXTURE_KEYS = ["baseColorTexture", "metallicRoughnessTexture"]
+
+def empty_info(method: str) -> Dict:
+    return {
+        "has_textures": False,
+        "texture_count": 0,
+        "material_count": 0,
+        "vertex_count": 0,
+        "face_count": 0,
+        "uv_coordinates": 0,
+        "analysis_method": method,
+    }
+
+def read_gltf_json(path: Union[str, Path]) -> Dict:
+    """glTF/GLBのJSON部分だけを読み込む"""
+    with open(path, "rb") as f:
+        head = f.read(12)
+        if head[:4] != b"glTF":
+            f.seek(0)
+            return json.loads(f.read().decode("utf-8"))
+        chunk_length, chunk_type = struct.unpack("<II", f.read(8))
+        if chunk_type != 0x4E4F534A:
+            raise ValueError(f"first chunk of {path} is not JSON")
+        return json.loads(f.read(chunk_length).decode("utf-8"))
+
+def analyze_gltf(path: Union[str, Path]) -> Dict:
+    info = empty_info("gltf_header")
+    gltf = read_gltf_json(path)
+    accessors = gltf.get("accessors", [])
+    for mesh in gltf.get("meshes", []):
+        for primitive in mesh.get("primitives", []):
+            attributes = primitive.get("attributes", {})
+            count = accessors[attributes["POSITION"]]["count"] if "POSITION" in attributes else 0
+            info["vertex_count"] += count
+            if "TEXCOORD_0" in attributes:
+                info["uv_coordinates"] += accessors[attributes["TEXCOORD_0"]]["count"]
+            n = accessors[primitive["indices"]]["count"] if "indices" in primitive else count
+            mode = primitive.get("mode", 4)
+            if mode == 4:
+                info["face_count"] += n // 3
+            elif mode in [5, 6]:
+                info["face_count"] += max(0, n - 2)
+    materials = gltf.get("materials", [])
+    info["material_count"] = len(materials)
+    for material in materials:
+        pbr = material.get("pbrMetallicRoughness", {})
+        info["texture_count"] += sum(1 for k in _GLTF_PBR_TEXTURE_KEYS if k in pbr)
+        info["texture_count"] += sum(1 for k in _GLTF_TEXTURE_KEYS if k in material)
+    info["has_textures"] = info["texture_count"] > 0
+    return info
+
+def _count_prefixes(mm: mmap.mmap, prefixes: List[bytes], chunk_size: int) -> List[int]:
+    # 行頭を "\n" + キーワードで数える。チャンクは改行の直前で区切るので境界をまたぐ一致はない
+    counts = [0] * len(prefixes)
+    position = 0
+    size = len(mm)
+    while position < size:
+        end = min(position + chunk_size, size)
+        if end < size:
+            newline = mm.rfind(b"\n", position + 1, end)
+            if newline != -1:
+                end = newline
+        chunk = mm[position:end]
+        if position == 0:
+            chunk = b"\n" + chunk
+        for i, prefix in enumerate(prefixes):
+            counts[i] += chunk.count(b"\n" + prefix)
+        position = end
+    return counts
+
+def _find_lines(mm: mmap.mmap, keyword: bytes) -> Iterator[str]:
+    position = 0 if mm[:len(keyword)] == keyword else mm.find(b"\n" + keyword)
+    while position != -1:
+        start = position + len(keyword) + (0 if position == 0 and mm[:len(keyword)] == keyword else 1)
+        end = mm.find(b"\n", start)
+        yield mm[start:end if end != -1 else len(mm)].strip().decode("utf-8", "ignore")
+        position = mm.find(b"\n" + keyword, start)
+
+def analyze_obj(path: Union[str, Path], chunk_size: int = 64 << 20) -> Dict:
+    info = empty_info("obj_scan")
+    path = Path(path)
+    if path.stat().st_size == 0:
+        return info
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        info["vertex_count"], info["uv_coordinates"], info["face_count"] = _count_prefixes(mm, [b"v ", b"vt ", b"f "], chunk_size)
+        # mtllib / usemtl は数が少ないので該当行だけ拾う
+        libraries = set(_find_lines(mm, b"mtllib "))
+        used = set(_find_lines(mm, b"usemtl "))
+    materials = set()
+    for library in libraries:
+        mtl = path.parent / library
+        if not mtl.is_file():
+            continue
+        with open(mtl, "r", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                tokens = line.split()
+                if len(tokens) == 0:
+                    continue
+                if tokens[0] == "newmtl":
+                    materials.add(" ".join(tokens[1:]))
+                elif tokens[0].startswith("map_") or tokens[0] in ["bump", "disp", "norm"]:
+                    info["texture_count"] += 1
+    info["material_count"] = len(materials) if len(materials) > 0 else len(used)
+    info["has_textures"] = info["texture_count"] > 0
+    return info
+
+class FBXNode:
+    """バイナリFBXのノードレコード（プロパティはオフセットのみ保持）"""
+
+    def __init__(self, name: str, end: int, num_properties: int, properties_start: int, properties_length: int):
+        self.name = name
+        self.end = end
+        self.num_properties = num_properties
+        self.properties_start = properties_start
+        self.properties_length = properties_length
+
+    @property
+    def children_start(self) -> int:
+        return self.properties_start + self.properties_length
+
+def read_fbx_version(f: BinaryIO) -> int:
+    f.seek(0)
+    head = f.read(27)
+    if head[:21] != FBX_MAGIC:
+        raise ValueError("not a binary FBX file")
+    return struct.unpack("<I", head[23:27])[0]
+
+def iter_fbx_nodes(f: BinaryIO, start: int, end: int, version: int) -> Iterator[FBXNode]:
+    """[start, end) にあるノードを順に返す（子ノードは辿らない）"""
+    wide = version >= 7500
+    header = struct.Struct("<QQQB" if wide else "<IIIB")
+    position = start
+    while position + header.size <= end:
+        f.seek(position)
+        node_end, num_properties, properties_length, name_length = header.unpack(f.read(header.size))
+        if node_end == 0:
+            # 終端のNULLレコード
+            return
+        if node_end <= position or node_end > end:
+            raise ValueError(f"broken FBX node record at {position}")
+        name = f.read(name_length).decode("ascii", "replace")
+        yield FBXNode(name, node_end, num_properties, position + header.size + name_length, properties_length)
+        position = node_end
+
+def read_fbx_properties(f: BinaryIO, node: FBXNode, max_bytes: int = 1 << 16) -> List:
+    """
+    スカラー・文字列プロパティを読む。配列は (型, 要素数, エンコーディング, 圧縮長, データ開始位置) を返す
+    """
+    f.seek(node.properties_start)
+    res = []
+    for _ in range(node.num_properties):
+        code = f.read(1)
+        if code in b"YCIFDL" and len(code) == 1:
+            fmt = {b"Y": "<h", b"C": "<?", b"I": "<i", b"F": "<f", b"D": "<d", b"L": "<q"}[code]
+            res.append(struct.unpack(fmt, f.read(struct.calcsize(fmt)))[0])
+        elif code in [b"S", b"R"]:
+            length = struct.unpack("<I", f.read(4))[0]
+            if length > max_bytes:
+                f.seek(length, 1)
+                res.append(None)
+            else:
+                data = f.read(length)
+                res.append(data.decode("utf-8", "replace") if code == b"S" else data)
+        elif code in [b"f", b"d", b"l", b"i", b"b"]:
+            length, encoding, compressed_length = struct.unpack("<III", f.read(12))
+            res.append((code.decode(), length, encoding, compressed_length, f.tell()))
+            f.seek(compressed_length, 1)
+        else:
+            raise ValueError(f"unknown FBX property type {code!r} in {node.name}")
+    return res
+
+def _count_negative(f: BinaryIO, array: Tuple, chunk_size: int = 1 << 22) -> int:
+    # PolygonVertexIndexは各ポリゴンの最後の頂点が負（~index）で記録される
+    code, length, encoding, compressed_length, offset = array
+    f.seek(offset)
+    remaining = compressed_length
+    decompressor = zlib.decompressobj() if encoding == 1 else None
+    count = 0
+    tail = b""
+    while remaining > 0:
+        data = f.read(min(chunk_size, remaining))
+        remaining -= len(data)
+        if decompressor is not None:
+            data = decompressor.decompress(data)
+        data = tail + data
+        usable = len(data) // 4 * 4
+        count += int((np.frombuffer(data[:usable], dtype="<i4") < 0).sum())
+        tail = data[usable:]
+    return count
+
+def analyze_fbx(path: Union[str, Path]) -> Dict:
+    info = empty_info("fbx_header")
+    with open(path, "rb") as f:
+        try:
+            version = read_fbx_version(f)
+        except ValueError:
+            info["analysis_method"] = "fbx_ascii_unsupported"
+            return info
+        size = f.seek(0, 2)
+        for node in iter_fbx_nodes(f, 27, size, version):
+            if node.name != "Objects":
+                continue
+            for obj in iter_fbx_nodes(f, node.children_start, node.end, version):
+                if obj.name == "Material":
+                    info["material_count"] += 1
+                elif obj.name == "Texture":
+                    info["texture_count"] += 1
+                elif obj.name == "Geometry":
+                    properties = read_fbx_properties(f, obj)
+                    if len(properties) < 3 or properties[2] != "Mesh":
+                        continue
+                    uv_counted = False
+                    for element in iter_fbx_nodes(f, obj.children_start, obj.end, version):
+                        if element.name == "Vertices":
+                            info["vertex_count"] += read_fbx_properties(f, element)[0][1] // 3
+                        elif element.name == "PolygonVertexIndex":
+                            info["face_count"] += _count_negative(f, read_fbx_properties(f, element)[0])
+                        elif element.name == "LayerElementUV" and not uv_counted:
+                            # UVセットが複数あっても最初のレイヤーのみ数える（trimeshと同じ）
+                            for uv in iter_fbx_nodes(f, element.children_start, element.end, version):
+                                if uv.name == "UV":
+                                    info["uv_coordinates"] += read_fbx_properties(f, uv)[0][1] // 2
+                                    uv_counted = True
+            break
+    info["has_textures"] = info["texture_count"] > 0
+    return info
+
+def analyze_header(path: Union[str, Path]) -> Optional[Dict]:
+    """
+    拡張子に応じてヘッダー解析を行う（未対応形式はNone）
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix in [".glb", ".gltf", ".vrm"]:
+        return analyze_gltf(path)
+    if suffix == ".obj":
+        return analyze_obj(path)
+    if suffix == ".fbx":
+        return analyze_fbx(path)
+    return None
@@ -0,0 +1,217 @@
+"""
+🎯 UniRig FBXプリフライト検証 - Blenderを起動しないストリーミング検証
+
+バイナリFBXのノードツリーを順に読み、Objects/Deformer/Connectionsから
+ボーン数・メッシュ数・頂点数・スキンクラスター数を数える。
+Blenderの起動（数秒〜数十秒）の代わりに数ミリ秒で終わる。
+
+- Model(LimbNode/Limb)         → ボーン
+- Model(Mesh) + Geometry(Mesh) → メッシュ・頂点数
+- Deformer(Skin/Cluster)       → スキン・クラスター（= バーテックスグループ）
+- Cluster.Indexes              → ウェイトを持つ頂点（この配列だけ展開する）
+- Video.Content                → 埋め込みテクスチャ（中身は読まず有無だけ見る）
+
+返り値はStep3のBlender検証スクリプトと同じキーを持つ。
+"""
+
+import zlib
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Tuple, Union
+
+import numpy as np
+
+from .asset_header import iter_fbx_nodes, read_fbx_properties, read_fbx_version
+
+_ARRAY_DTYPE = {"f": "<f4", "d": "<f8", "l": "<i8", "i": "<i4", "b": "<i1"}
+
+_BONE_TYPES = ["LimbNode", "Limb", "Root"]
+
+def read_fbx_array(f: BinaryIO, array: Tuple) -> np.ndarray:
+    """read_fbx_propertiesが返した配列プロパティを展開する"""
+    code, length, encoding, compressed_length, offset = array
+    f.seek(offset)
+    data = f.read(compressed_length)
+    if encoding == 1:
+        data = zlib.decompress(data)
+    return np.frombuffer(data, dtype=_ARRAY_DTYPE[code], count=length)
+
+def _object_name(value: str) -> str:
+    # バイナリFBXの名前は "名前\x00\x01クラス" 形式
+    return value.split("\x00\x01")[0] if isinstance(value, str) else ""
+
+def empty_result() -> Dict:
+    return {
+        "has_armature": False,
+        "armature_name": "",
+        "bone_count": 0,
+        "mesh_count": 0,
+        "vertex_count": 0,
+        "skin_count": 0,
+        "cluster_count": 0,
+        "meshes_with_vertex_groups": [],
+        "meshes_without_vertex_groups": [],
+        "weighted_vertex_count": 0,
+        "weight_data_exists": False,
+        "validation_passed": False,
+        "error_messages": [],
+    }
+
+def inspect_fbx(path: Union[str, Path]) -> Dict:
+    """
+    バイナリFBXのスケルトン・スキン構成を数える
+
+    Raises:
+        ValueError: バイナリFBXでない、またはノードレコードが壊れている
+    """
+    result = empty_result()
+    models = {}     # id -> (name, type)
+    geometries = {} # id -> vertex_count
+    skins = set()
+    clusters = {}   # id -> ウェイトを持つ頂点インデックス
+    parents = []    # (child, parent)
+    with open(path, "rb") as f:
+        version = read_fbx_version(f)
+        size = f.seek(0, 2)
+        for node in iter_fbx_nodes(f, 27, size, version):
+            if node.name == "Objects":
+                for obj in iter_fbx_nodes(f, node.children_start, node.end, version):
+                    if obj.name not in ["Model", "Geometry", "Deformer"]:
+                        continue
+                    properties = read_fbx_properties(f, obj)
+                    if len(properties) < 3:
+                        continue
+                    uid, name, kind = properties[0], _object_name(properties[1]), properties[2]
+                    if obj.name == "Model":
+                        models[uid] = (name, kind)
+                    elif obj.name == "Geometry" and kind == "Mesh":
+                        geometries[uid] = 0
+                        for element in iter_fbx_nodes(f, obj.children_start, obj.end, version):
+                            if element.name == "Vertices":
+                                geometries[uid] = read_fbx_properties(f, element)[0][1] // 3
+                                break
+                    elif obj.name == "Deformer" and kind == "Skin":
+                        skins.add(uid)
+                    elif obj.name == "Deformer" and kind == "Cluster":
+                        indices = np.zeros(0, dtype=np.int32)
+                        for element in iter_fbx_nodes(f, obj.children_start, obj.end, version):
+                            if element.name == "Indexes":
+                                indices = read_fbx_array(f, read_fbx_properties(f, element)[0])
+                                break
+                        clusters[uid] = indices
+            elif node.name == "Connections":
+                for connection in iter_fbx_nodes(f, node.children_start, node.end, version):
+                    properties = read_fbx_properties(f, connection)
+                    if len(properties) >= 3 and properties[0] == "OO":
+                        parents.append((properties[1], properties[2]))
+
+    bones = {uid for uid, (_, kind) in models.items() if kind in _BONE_TYPES}
+    meshes = {uid: name for uid, (name, kind) in models.items() if kind == "Mesh"}
+    result["bone_count"] = len(bones)
+    result["has_armature"] = len(bones) > 0
+    result["mesh_count"] = len(meshes)
+    result["vertex_count"] = int(sum(geometries.values()))
+    result["skin_count"] = len(skins)
+    result["cluster_count"] = len(clusters)
+
+    # Cluster -> Skin -> Geometry -> Model(Mesh) を辿ってメッシュごとに集計
+    cluster_skin = {}
+    skin_geometry = {}
+    geometry_mesh = {}
+    for child, parent in parents:
+        if child in clusters and parent in skins:
+            cluster_skin[child] = parent
+        elif child in skins and parent in geometries:
+            skin_geometry[child] = parent
+        elif child in geometries and parent in meshes:
+            geometry_mesh[child] = parent
+        elif child in bones and parent in models and parent not in bones and result["armature_name"] == "":
+            result["armature_name"] = models[parent][0]
+    weighted: Dict[int, List[np.ndarray]] = {}
+    for cluster, indices in clusters.items():
+        geometry = skin_geometry.get(cluster_skin.get(cluster))
+        if geometry is not None and len(indices) > 0:
+            weighted.setdefault(geometry, []).append(indices)
+    for geometry in geometries:
+        mesh_name = meshes.get(geometry_mesh.get(geometry), str(geometry))
+        if geometry in weighted:
+            result["weighted_vertex_count"] += int(np.unique(np.concatenate(weighted[geometry])).shape[0])
+            result["meshes_with_vertex_groups"].append(mesh_name)
+        else:
+            result["meshes_without_vertex_groups"].append(mesh_name)
+    result["weight_data_exists"] = result["weighted_vertex_count"] > 0
+    return result
+
+def validate_skinned_fbx(path: Union[str, Path]) -> Dict:
+    """
+    スキニング済みFBXの検証（ボーン・ウェイト付きメッシュ・ウェイトデータの存在）
+
+    ASCII FBXなど読めない場合は ValueError をそのまま送出する
+    """
+    result = inspect_fbx(path)
+    if not result["has_armature"]:
+        result["error_messages"].append("❌ アーマチュア（骨格）が見つかりません")
+    for mesh_name in result["meshes_without_vertex_groups"]:
+        result["error_messages"].append("❌ メッシュ '" + mesh_name + "' にバーテックスグループが存在しません")
+    if not result["weight_data_exists"]:
+        result["error_messages"].append("❌ バーテックスにウェイトデータが設定されていません")
+    result["validation_passed"] = (
+        result["has_armature"]
+        and len(result["meshes_with_vertex_groups"]) > 0
+        and result["weight_data_exists"]
+    )
+    return result
+
+def list_fbx_textures(path: Union[str, Path]) -> List[Dict]:
+    """
+    バイナリFBXが参照するテクスチャ（Videoノード）を列挙する
+
+    Returns:
+        {"name", "filename", "relative_filename", "embedded"} のリスト
+    """
+    res = []
+    with open(path, "rb") as f:
+        version = read_fbx_version(f)
+        size = f.seek(0, 2)
+        for node in iter_fbx_nodes(f, 27, size, version):
+            if node.name != "Objects":
+                continue
+            for obj in iter_fbx_nodes(f, node.children_start, node.end, version):
+                if obj.name != "Video":
+                    continue
+                properties = read_fbx_properties(f, obj)
+                texture = {
+                    "name": _object_name(properties[1]) if len(properties) > 1 else "",
+                    "filename": "",
+                    "relative_filename": "",
+                    "embedded": False,
+                }
+                for element in iter_fbx_nodes(f, obj.children_start, obj.end, version):
+                    if element.name not in ["Filename", "RelativeFilename", "Content"]:
+                        continue
+                    # 大きな埋め込みデータは読み飛ばされNoneになる
+                    values = read_fbx_properties(f, element, max_bytes=1 << 12)
+                    value = values[0] if len(values) > 0 else b""
+                    if element.name == "Content":
+                        texture["embedded"] = value is None or len(value) > 0
+                    elif element.name == "Filename":
+                        texture["filename"] = value or ""
+                    else:
+                        texture["relative_filename"] = value or ""
+                res.append(texture)
+    return res
+
+def unresolved_fbx_textures(path: Union[str, Path]) -> List[str]:
+    """
+    FBX単体（埋め込み、またはFBXからの相対・絶対パスに実在するファイル）で解決できないテクスチャ名
+    """
+    directory = Path(path).parent
+    res = []
+    for texture in list_fbx_textures(path):
+        if texture["embedded"]:
+            continue
+        candidates = [directory / texture["relative_filename"].replace("\\", "/")] if texture["relative_filename"] else []
+        if texture["filename"]:
+            candidates.append(Path(texture["filename"]))
+        if not any(candidate.is_file() for candidate in candidates):
+            res.append(texture["name"] or texture["relative_filename"] or texture["filename"])
+    return res
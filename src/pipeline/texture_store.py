@@ -0,0 +1,231 @@
+"""
+🎯 UniRig テクスチャストア - 内容ハッシュによるテクスチャ重複排除
+
+Step0でアップロードファイルのテクスチャを一度だけ取り出して保存し、
+後続ステップはハッシュで参照する（再パック・再エンコード不要）。
+
+- 画像はSHA-256の内容ハッシュをキーに保存（同一テクスチャはアップロード間でも1回だけ保存）
+- 画像のデコードは必要になるまで行わない（LazyImage）
+- glTF/GLB/VRMは埋め込み画像をバイト列のまま取り出す（Blender不要）
+- FBX/OBJ等は隣接する画像ファイルと .fbm ディレクトリを収集
+
+ストア構成:
+    <root>/objects/<hash[:2]>/<hash><拡張子>
+"""
+
+import base64
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+# 既定ではパイプライン作業ディレクトリ直下に共有ストアを置く
+TEXTURE_STORE_ENV = "UNIRIG_TEXTURE_STORE"
+
+IMAGE_SUFFIX = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/webp": ".webp",
+    "image/ktx2": ".ktx2",
+}
+
+_SUFFIX_MIME = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".webp": "image/webp",
+    ".tga": "image/x-tga",
+    ".bmp": "image/bmp",
+    ".tif": "image/tiff",
+    ".tiff": "image/tiff",
+    ".ktx2": "image/ktx2",
+}
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def file_hash(path: Union[str, Path], chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _sniff_suffix(data: bytes, default: str = ".bin") -> str:
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return ".png"
+    if data[:3] == b"\xff\xd8\xff":
+        return ".jpg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return ".webp"
+    return default
+
+class LazyImage:
+    """画像ファイルへの参照。pixelsに初めてアクセスした時点でデコードする"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._pixels = None
+
+    @property
+    def pixels(self):
+        if self._pixels is None:
+            import numpy as np
+            from PIL import Image
+            with Image.open(self.path) as image:
+                self._pixels = np.asarray(image.convert("RGBA"))
+        return self._pixels
+
+class TextureStore:
+    """🎯 内容ハッシュをキーにしたテクスチャストア"""
+
+    def __init__(self, root: Union[str, Path, None] = None):
+        if root is None:
+            root = os.environ.get(TEXTURE_STORE_ENV, "/app/pipeline_work/texture_store")
+        self.root = Path(root)
+        (self.root / "objects").mkdir(parents=True, exist_ok=True)
+
+    def _object_path(self, digest: str, suffix: str) -> Path:
+        return self.root / "objects" / digest[:2] / f"{digest}{suffix}"
+
+    def path(self, digest: str) -> Optional[Path]:
+        """ハッシュに対応する保存済みファイル（未保存ならNone）"""
+        directory = self.root / "objects" / digest[:2]
+        if not directory.exists():
+            return None
+        for p in directory.glob(f"{digest}*"):
+            return p
+        return None
+
+    def open(self, digest: str) -> LazyImage:
+        path = self.path(digest)
+        if path is None:
+            raise KeyError(f"texture {digest} is not in {self.root}")
+        return LazyImage(path)
+
+    def put(self, data: bytes, suffix: str = "") -> str:
+        """バイト列を保存してハッシュを返す（既に存在すれば書き込まない）"""
+        digest = content_hash(data)
+        if self.path(digest) is None:
+            target = self._object_path(digest, suffix or _sniff_suffix(data))
+            target.parent.mkdir(parents=True, exist_ok=True)
+            # 並行アップロードでも壊れたファイルが見えないよう一時ファイル経由で置き換える
+            fd, tmp = tempfile.mkstemp(dir=target.parent)
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, target)
+        return digest
+
+    def put_file(self, path: Union[str, Path]) -> str:
+        path = Path(path)
+        digest = file_hash(path)
+        if self.path(digest) is None:
+            target = self._object_path(digest, path.suffix.lower())
+            target.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=target.parent)
+            os.close(fd)
+            shutil.copyfile(path, tmp)
+            os.replace(tmp, target)
+        return digest
+
+    def collect(self, model_file: Union[str, Path]) -> List[Dict]:
+        """
+        モデルファイルのテクスチャをストアに登録する
+
+        Returns:
+            [{"hash", "name", "mime", "path", "size"}] 同一内容の画像は1件にまとめる
+        """
+        model_file = Path(model_file)
+        suffix = model_file.suffix.lower()
+        if suffix in [".glb", ".gltf", ".vrm"]:
+            images = self._collect_gltf(model_file)
+        else:
+            images = self._collect_files(model_file)
+        entries = {}
+        for name, digest in images:
+            if digest in entries:
+                continue
+            path = self.path(digest)
+            entries[digest] = {
+                "hash": digest,
+                "name": name,
+                "mime": _SUFFIX_MIME.get(path.suffix, "application/octet-stream"),
+                "path": str(path),
+                "size": path.stat().st_size,
+            }
+        return list(entries.values())
+
+    def _collect_gltf(self, model_file: Path) -> List[tuple]:
+        from ..data.extract_native import GLTF
+        reader = GLTF(str(model_file))
+        gltf = reader.gltf
+        res = []
+        for i, image in enumerate(gltf.get("images", [])):
+            name = image.get("name") or f"image_{i}"
+            uri = image.get("uri")
+            if "bufferView" in image:
+                view = gltf["bufferViews"][image["bufferView"]]
+                offset = view.get("byteOffset", 0)
+                data = reader.buffers[view["buffer"]][offset:offset + view["byteLength"]]
+                res.append((name, self.put(bytes(data), IMAGE_SUFFIX.get(image.get("mimeType"), ""))))
+            elif uri is not None and uri.startswith("data:"):
+                header, encoded = uri.split(",", 1)
+                mime = header[5:].split(";")[0]
+                res.append((name, self.put(base64.b64decode(encoded), IMAGE_SUFFIX.get(mime, ""))))
+            elif uri is not None and (model_file.parent / uri).is_file():
+                res.append((Path(uri).name, self.put_file(model_file.parent / uri)))
+        return res
+
+    def _collect_files(self, model_file: Path) -> List[tuple]:
+        # FBX等は外部テクスチャ（同じディレクトリ・<name>.fbm）を対象にする
+        directories = [model_file.parent, model_file.with_suffix(".fbm")]
+        res = []
+        for directory in directories:
+            if not directory.is_dir():
+                continue
+            for p in sorted(directory.iterdir()):
+                if p.is_file() and p.suffix.lower() in _SUFFIX_MIME:
+                    res.append((p.name, self.put_file(p)))
+        return res
+
+def write_manifest(path: Union[str, Path], entries: List[Dict], store: TextureStore):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"store": str(store.root), "textures": entries}, f, indent=2, ensure_ascii=False)
+
+def load_manifest(path: Union[str, Path]) -> Dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def materialize(manifest: Dict, directory: Union[str, Path]) -> Dict[str, str]:
+    """
+    マニフェストのテクスチャをディレクトリに配置する（可能ならハードリンク、コピーはしない）
+
+    Returns:
+        ハッシュ → 配置したファイルパス
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    store = TextureStore(manifest["store"])
+    res = {}
+    used = set()
+    for entry in manifest["textures"]:
+        source = store.path(entry["hash"])
+        if source is None:
+            continue
+        name = Path(entry["name"]).stem or entry["hash"][:16]
+        if name in used:
+            name = f"{name}_{entry['hash'][:8]}"
+        used.add(name)
+        target = directory / f"{name}{source.suffix}"
+        if target.exists() and file_hash(target) != entry["hash"]:
+            target.unlink()
+        if not target.exists():
+            try:
+                os.link(source, target)
+            except OSError:
+                shutil.copyfile(source, target)
+        res[entry["hash"]] = str(target)
+    return res
@@ -82,6 +82,7 @@ class UnifiedBlenderIntegrator:
 import bpy
 import bmesh
 import sys
+import numpy as np
 from pathutils import Path
 
 # 🎯 UniRig統合Blender統合スクリプト
@@ -123,10 +124,38 @@ def safe_import_fbx(file_path: str) -> bool:
         print(f"Failed to import FBX: {{e}}")
         return False
 
+def _loop_points(obj):
+    """ループごとのワールド座標（面の中心へ少し寄せてUVシームの両側を区別）"""
+    mesh = obj.data
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    vertex_index = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", vertex_index)
+    center = np.empty(len(mesh.polygons) * 3, dtype=np.float32)
+    mesh.polygons.foreach_get("center", center)
+    loop_total = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_total", loop_total)
+    points = co.reshape(-1, 3)[vertex_index] * 0.9 + np.repeat(center.reshape(-1, 3), loop_total, axis=0) * 0.1
+    m = np.array(obj.matrix_world, dtype=np.float32)
+    return points @ m[:3, :3].T + m[:3, 3]
+
+def _nearest(source_points, target_points):
+    try:
+        from scipy.spatial import cKDTree
+        return cKDTree(source_points).query(target_points)[1]
+    except ImportError:
+        from mathutils.kdtree import KDTree
+        tree = KDTree(len(source_points))
+        for i, p in enumerate(source_points):
+            tree.insert(p, i)
+        tree.balance()
+        return np.array([tree.find(p)[1] for p in target_points], dtype=np.int64)
+
 def transfer_uv_coordinates_github_pattern(source_mesh, target_mesh):
     """
     GitHubパターンによるUV座標直接転送
     参照: kechirojp/Blender_Scripts-Personal-Library
+    foreach_get/foreach_setで一括コピーし、ループ数が異なる場合は最近傍ループのUVで再サンプリング
     """
     if source_mesh.data.uv_layers:
         source_uv_layer = source_mesh.data.uv_layers[0]
@@ -136,14 +165,18 @@ def transfer_uv_coordinates_github_pattern(source_mesh, target_mesh):
             target_mesh.data.uv_layers.new()
         target_uv_layer = target_mesh.data.uv_layers[0]
         
-        # ループ単位での直接UV転送
-        transfer_count = 0
-        for loop_idx in range(len(target_mesh.data.loops)):
-            if loop_idx < len(source_mesh.data.loops):
-                target_uv_layer.data[loop_idx].uv = source_uv_layer.data[loop_idx].uv
-                transfer_count += 1
-        
-        print(f"UV transfer completed: {{transfer_count}} coordinates")
+        # ループ単位のUVをバッファ経由で一括転送
+        n_source = len(source_mesh.data.loops)
+        n_target = len(target_mesh.data.loops)
+        uv = np.empty(n_source * 2, dtype=np.float32)
+        source_uv_layer.data.foreach_get("uv", uv)
+        if n_source == n_target:
+            target_uv_layer.data.foreach_set("uv", uv)
+            print(f"UV transfer completed: {{n_target}} coordinates (direct)")
+        else:
+            index = _nearest(_loop_points(source_mesh), _loop_points(target_mesh))
+            target_uv_layer.data.foreach_set("uv", uv.reshape(-1, 2)[index].reshape(-1))
+            print(f"UV transfer completed: {{n_target}} coordinates (resampled from {{n_source}})")
         return True
     return False
 
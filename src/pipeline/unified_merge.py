@@ -66,8 +66,19 @@ class UnifiedMergeOrchestrator:
                     return False
                 
                 self.logger.info(f"FBX binary format verified: {file_path}")
-                return True
-                
+            
+            # ノードツリーを辿って破損（途中で切れたファイル等）を検出し、構成をログに残す
+            from src.pipeline.fbx_validator import inspect_fbx
+            info = inspect_fbx(file_path)
+            self.logger.info(
+                f"FBX contents: bones={info['bone_count']}, meshes={info['mesh_count']}, "
+                f"vertices={info['vertex_count']}, skins={info['skin_count']}, clusters={info['cluster_count']}"
+            )
+            if info['vertex_count'] == 0 and info['bone_count'] == 0:
+                self.logger.error(f"ERROR: FBX contains neither meshes nor bones: {file_path}")
+                return False
+            return True
+            
         except Exception as e:
             self.logger.error(f"ERROR: Failed to validate FBX format: {e}")
             return False
@@ -92,7 +103,10 @@ class UnifiedMergeOrchestrator:
         source_suffix = Path(source).suffix.lower()
         target_suffix = Path(target).suffix.lower()
         
-        if source_suffix not in [s.lower() for s in self.supported_formats]:
+        # Step3のスキンNPZはFBXを経由せずそのまま使用する
+        if source_suffix == '.npz':
+            pass
+        elif source_suffix not in [s.lower() for s in self.supported_formats]:
             self.logger.error(f"ERROR: Unsupported source format: {source_suffix}")
             return False
             
@@ -122,6 +136,9 @@ class UnifiedMergeOrchestrator:
                 '--target', target,                                   # オリジナルファイル
                 '--output', output                                    # マージ出力FBX
             ]
+            if Path(source).suffix.lower() == '.npz':
+                # スキンNPZを配列のまま渡す（スキニング済みFBXの再インポート・ウェイト読み戻し不要）
+                cmd[cmd.index('--source')] = '--skin_npz'
             
             self.logger.info(f"Executing merge command: {' '.join(cmd)}")
             
@@ -215,7 +232,7 @@ class UnifiedMergeOrchestrator:
         統合マージ実行
         
         Args:
-            source: ソースファイルパス（スケルトンファイル）
+            source: ソースファイルパス（スケルトンファイル、またはStep3のスキンNPZ）
             target: ターゲットファイルパス（スキニング済みファイル）
             output: 出力ファイルパス
         
@@ -266,7 +283,7 @@ class UnifiedMergeOrchestrator:
         
         return True, success_log, result_files
 
-    def merge_skeleton_skinning_unified(self, model_name: str, skinned_fbx: str, original_file: str, output_dir: str) -> Tuple[bool, str]:
+    def merge_skeleton_skinning_unified(self, model_name: str, skinned_fbx: Optional[str], original_file: str, output_dir: str, skinning_npz: Optional[str] = None) -> Tuple[bool, str]:
         """統一マージメソッド（app.py統合用）- 3つのデータソース統合
         
         【重要な技術的修正】Step4の正しい入力データ:
@@ -281,17 +298,24 @@ class UnifiedMergeOrchestrator:
         【修正後の処理】:
         Step3で生成された完全なスキニングデータ（skinned_fbx）を使用し、
         オリジナルメッシュの見た目とスキニング品質を両立する
+        
+        skinning_npz（Step3のpredict_skin.npz）が指定された場合はこちらを優先し、
+        中間FBXを経由せず配列のまま転写する（skinned_fbxは不要）
         """
         try:
             self.logger.info(f"3つのデータソース統合マージ処理開始: {model_name}")
-            self.logger.info(f"✅ 修正: Step3スキニング統合FBXを使用: {skinned_fbx}")
+            if skinning_npz and Path(skinning_npz).exists():
+                self.logger.info(f"✅ Step3スキンNPZを直接使用（中間FBX不要）: {skinning_npz}")
+                source = skinning_npz
+            else:
+                self.logger.info(f"✅ 修正: Step3スキニング統合FBXを使用: {skinned_fbx}")
+                source = skinned_fbx
             
             # 入力ファイル検証
-            skinned_path = Path(skinned_fbx)
             original_path = Path(original_file)
             
-            if not skinned_path.exists():
-                return False, f"Step3スキニング統合FBXファイルが存在しません: {skinned_fbx}"
+            if not source or not Path(source).exists():
+                return False, f"Step3スキニング統合FBX/NPZファイルが存在しません: {skinned_fbx} / {skinning_npz}"
             if not original_path.exists():
                 return False, f"オリジナルメッシュファイルが存在しません: {original_file}"
             
@@ -305,7 +329,7 @@ class UnifiedMergeOrchestrator:
             # 3つのデータソース統合マージ処理実行
             # 重要修正: source引数にはStep3スキニング統合FBXを渡す
             success, logs, output_files = self.execute_merge(
-                source=skinned_fbx,       # Step3出力（スケルトン+スキンウェイト統合済み）
+                source=source,            # Step3出力（スキンNPZ、またはスケルトン+スキンウェイト統合済みFBX）
                 target=original_file,     # オリジナルメッシュ（ユーザーアップロード）
                 output=str(output_file)
             )
@@ -340,7 +364,7 @@ def main():
         """
     )
     
-    parser.add_argument('--source', required=True, help='ソースファイルパス（スケルトンファイル）')
+    parser.add_argument('--source', required=True, help='ソースファイルパス（スケルトンファイル、またはStep3のスキンNPZ）')
     parser.add_argument('--target', required=True, help='ターゲットファイルパス（スキニング済みファイル）')
     parser.add_argument('--output', required=True, help='出力ファイルパス')
     parser.add_argument('--model_name', required=True, help='モデル名（統一命名規則用）')
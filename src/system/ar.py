@@ -12,7 +12,7 @@ from numpy import ndarray
 from ..data.raw_data import RawData
 from ..data.order import OrderConfig, get_order
 from ..model.spec import ModelSpec
-from ..tokenizer.spec import DetokenizeOutput
+from ..tokenizer.spec import DetokenizeOutput, DetokenizeCandidates
 
 class ARSystem(L.LightningModule):
     
@@ -73,6 +73,8 @@ class ARWriter(BasePredictionWriter):
         self.export_obj         = kwargs.get('export_obj', None)
         self.export_fbx         = kwargs.get('export_fbx', None)
         self.export_pc          = kwargs.get('export_pc', None)
+        # also export alternatives when generate_kwargs.num_candidates > 1
+        self.export_candidates  = kwargs.get('export_candidates', False)
         if order_config is not None:
             self.order = get_order(config=order_config)
         else:
@@ -114,6 +116,10 @@ class ARWriter(BasePredictionWriter):
             num_faces = num_faces.detach().cpu().numpy()
 
         for (id, detokenize_output) in enumerate(detokenize_output_list):
+            candidates = None
+            if isinstance(detokenize_output, DetokenizeCandidates):
+                candidates = detokenize_output
+                detokenize_output = candidates.best
             assert isinstance(detokenize_output, DetokenizeOutput), f"expect item of the list to be DetokenizeOutput, found: {type(detokenize_output)}"
             def make_path(save_name: str, suffix: str, trim: bool=False):
                 if trim:
@@ -164,23 +170,25 @@ class ARWriter(BasePredictionWriter):
                 import traceback
                 print(f"DEBUG: ARWriter - traceback: {traceback.format_exc()}")
             
-            raw_data = RawData(
-                vertices=origin_vertices[id, :num_p],
-                vertex_normals=origin_vertex_normals[id, :num_p],
-                faces=origin_faces[id, :num_f],
-                face_normals=origin_face_normals[id, :num_f],
-                joints=detokenize_output.joints,
-                tails=detokenize_output.tails,
-                parents=detokenize_output.parents,
-                skin=None,
-                no_skin=detokenize_output.no_skin,
-                names=detokenize_output.names,
-                matrix_local=None,
-                uv_coords=original_uv_coords,
-                materials=original_materials,
-                path=None,
-                cls=detokenize_output.cls,
-            )
+            def make_raw_data(output: DetokenizeOutput) -> RawData:
+                return RawData(
+                    vertices=origin_vertices[id, :num_p],
+                    vertex_normals=origin_vertex_normals[id, :num_p],
+                    faces=origin_faces[id, :num_f],
+                    face_normals=origin_face_normals[id, :num_f],
+                    joints=output.joints,
+                    tails=output.tails,
+                    parents=output.parents,
+                    skin=None,
+                    no_skin=output.no_skin,
+                    names=output.names,
+                    matrix_local=None,
+                    uv_coords=original_uv_coords,
+                    materials=original_materials,
+                    path=None,
+                    cls=output.cls,
+                )
+            raw_data = make_raw_data(detokenize_output)
             if self.export_npz is not None:
                 npz_path = make_path(self.export_npz, 'npz')
                 print(npz_path)
@@ -204,18 +212,38 @@ class ARWriter(BasePredictionWriter):
                 os.makedirs(os.path.dirname(skeleton_txt_path), exist_ok=True)
                 
                 # Create skeleton prediction text content
+                joints = np.asarray(detokenize_output.joints, dtype=np.float64)
+                parents = [-1 if p is None else p for p in detokenize_output.parents]
+                lines = [
+                    "# Skeleton Prediction Data\n",
+                    f"# Number of joints: {len(joints)}\n",
+                    f"# Class: {detokenize_output.cls}\n",
+                    "# Format: joint_index x y z parent_index name\n",
+                ]
+                if detokenize_output.trace is not None:
+                    lines.insert(3, f"# Generation: {detokenize_output.trace}\n")
+                # format every row at once and write the file in one call
+                rows = joints.tolist()
+                lines.extend("%d %.6f %.6f %.6f %d %s\n" % (i, *row, p, name) for i, (row, p, name) in enumerate(zip(rows, parents, detokenize_output.names)))
+                if detokenize_output.tails is not None:
+                    lines.append("\n# Tail positions\n")
+                    lines.append("# Format: joint_index tail_x tail_y tail_z\n")
+                    tails = np.asarray(detokenize_output.tails, dtype=np.float64).tolist()
+                    lines.extend("%d %.6f %.6f %.6f\n" % (i, *tail) for i, tail in enumerate(tails))
                 with open(skeleton_txt_path, 'w') as f:
-                    f.write("# Skeleton Prediction Data\n")
-                    f.write(f"# Number of joints: {len(detokenize_output.joints)}\n")
-                    f.write(f"# Class: {detokenize_output.cls}\n")
-                    f.write("# Format: joint_index x y z parent_index name\n")
-                    
-                    for i, (joint, name) in enumerate(zip(detokenize_output.joints, detokenize_output.names)):
-                        parent_idx = detokenize_output.parents[i] if detokenize_output.parents[i] is not None else -1
-                        f.write(f"{i} {joint[0]:.6f} {joint[1]:.6f} {joint[2]:.6f} {parent_idx} {name}\n")
-                    
-                    if detokenize_output.tails is not None:
-                        f.write("\n# Tail positions\n")
-                        f.write("# Format: joint_index tail_x tail_y tail_z\n")
-                        for i, tail in enumerate(detokenize_output.tails):
-                            f.write(f"{i} {tail[0]:.6f} {tail[1]:.6f} {tail[2]:.6f}\n")
\ No newline at end of file
+                    f.write(''.join(lines))
+
+            if candidates is not None:
+                candidates_txt_path = make_path('skeleton_candidates', 'txt')
+                os.makedirs(os.path.dirname(candidates_txt_path), exist_ok=True)
+                with open(candidates_txt_path, 'w') as f:
+                    f.write("# Format: rank num_joints total inside symmetry coverage\n")
+                    for rank, (output, score) in enumerate(zip(candidates.outputs, candidates.scores)):
+                        f.write(f"{rank} {output.num_bones} {score.total:.4f} {score.inside:.4f} {score.symmetry:.4f} {score.coverage:.4f}\n")
+                if self.export_candidates:
+                    for rank, output in enumerate(candidates.alternatives, start=1):
+                        alternative = make_raw_data(output)
+                        if self.export_npz is not None:
+                            alternative.save(path=make_path(f"{self.export_npz}_candidate{rank}", 'npz'))
+                        if self.export_obj is not None:
+                            alternative.export_skeleton(path=make_path(f"{self.export_obj}_candidate{rank}", 'obj'))
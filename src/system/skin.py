@@ -11,11 +11,14 @@ from typing import Dict, Union, List, Literal, Any, Optional, Sequence
 from lightning.pytorch.callbacks import BasePredictionWriter
 
 from numpy import ndarray
-from scipy.sparse import csr_matrix
+from scipy.sparse import csr_matrix, diags, identity
+from scipy.sparse.linalg import splu
 from scipy.spatial import cKDTree
 
 from ..data.order import OrderConfig, get_order
 from ..data.raw_data import RawSkin, RawData
+from ..data.skinning import prune_skin, sparsify_skin
+from ..data.transfer import transfer_skin
 from ..data.exporter import Exporter
 from ..model.spec import ModelSpec
 from ..model.cpu_skinning_system import create_cpu_skinning_fallback, compute_distance_based_weights
@@ -99,6 +102,7 @@ class SkinWriter(BasePredictionWriter):
         save_name: str, # This is the general save_name from config, e.g., "predict_skin"
         export_npz: bool = True,
         export_fbx: bool = True,
+        export_glb: bool = False,
         export_txt: bool = False,
         export_blend: bool = False,
         export_render: bool = False,
@@ -112,7 +116,7 @@ class SkinWriter(BasePredictionWriter):
     ):
         super().__init__(write_interval)
         logger.info(f"SkinWriter initialized with output_dir: '{output_dir}', save_name: '{save_name}'")
-        logger.info(f"Export options - NPZ: {export_npz}, FBX: {export_fbx}, TXT: {export_txt}, BLEND: {export_blend}, RENDER: {export_render}")
+        logger.info(f"Export options - NPZ: {export_npz}, FBX: {export_fbx}, GLB: {export_glb}, TXT: {export_txt}, BLEND: {export_blend}, RENDER: {export_render}")
         logger.info(f"Reskin: {reskin}, Reskin config provided: {reskin_config is not None}")
         logger.info(f"Blender path: '{blender_path}', Verbose: {verbose}, Order Config provided: {order_config is not None}")
 
@@ -124,6 +128,7 @@ class SkinWriter(BasePredictionWriter):
         self.save_name_config = save_name # Store the configured save_name
         self.export_npz         = export_npz
         self.export_fbx         = export_fbx
+        self.export_glb         = export_glb
         self.export_txt         = export_txt
         self.export_blend       = export_blend
         self.export_render      = export_render
@@ -217,73 +222,85 @@ class SkinWriter(BasePredictionWriter):
                     parents = batch.get('parents')
                     tails = batch.get('tails')
                     data_name = batch.get('data_name', ['unknown'])[0] if isinstance(batch.get('data_name'), list) else batch.get('data_name', 'unknown')
+                    num_points = batch.get('num_points')
+                    num_faces = batch.get('num_faces')
+                    num_bones = batch.get('num_bones')
+                    batch_paths = batch.get('path') if isinstance(batch.get('path'), list) else [batch.get('path')]
+                    
+                    def _item(x, b, n=None):
+                        # take item b of a collated tensor and drop padding
+                        x = x[b].cpu().numpy() if hasattr(x, 'cpu') else np.asarray(x[b])
+                        if n is not None:
+                            x = x[:int(n[b])]
+                        return x
                     
                     if vertices is not None and faces is not None and joints is not None:
-                        # Convert tensors to numpy arrays and handle batch dimension
-                        vertices_np = vertices[0].cpu().numpy() if hasattr(vertices, 'cpu') else vertices[0]
-                        faces_np = faces[0].cpu().numpy() if hasattr(faces, 'cpu') else faces[0]
-                        joints_np = joints[0].cpu().numpy() if hasattr(joints, 'cpu') else joints[0]
-                        
-                        if parents is not None:
-                            parents_np = parents[0].cpu().numpy() if hasattr(parents, 'cpu') else parents[0]
-                            # Convert to list with None for root
-                            parents_list = [None if p == -1 else int(p) for p in parents_np]
-                        else:
-                            parents_list = [None] + list(range(len(joints_np) - 1))
-                        
-                        if tails is not None:
-                            tails_np = tails[0].cpu().numpy() if hasattr(tails, 'cpu') else tails[0]
-                        else:
-                            tails_np = None
-                        
-                        # Load UV coordinates and materials from original skeleton NPZ file
-                        original_uv_coords = None
-                        original_materials = None
-                        try:
-                            # Try to find the original skeleton NPZ file that contains texture data
-                            # The batch path should lead us to the skeleton NPZ file
-                            batch_path = batch.get('path', [None])[0] if isinstance(batch.get('path'), list) else batch.get('path')
-                            if batch_path and batch_path.endswith('predict_skeleton.npz'):
-                                original_skeleton_npz_path = batch_path
-                                logger.info(f"DEBUG: Loading texture data from skeleton NPZ: {original_skeleton_npz_path}")
-                                
-                                if os.path.exists(original_skeleton_npz_path):
-                                    from ..data.raw_data import RawData
-                                    original_skeleton_data = RawData.load(original_skeleton_npz_path)
-                                    if hasattr(original_skeleton_data, 'uv_coords') and original_skeleton_data.uv_coords is not None:
-                                        original_uv_coords = original_skeleton_data.uv_coords
-                                        logger.info(f"DEBUG: Loaded {len(original_uv_coords)} UV coordinates from skeleton NPZ")
-                                    if hasattr(original_skeleton_data, 'materials') and original_skeleton_data.materials is not None:
-                                        original_materials = original_skeleton_data.materials
-                                        logger.info(f"DEBUG: Loaded {len(original_materials)} materials from skeleton NPZ")
-                                else:
-                                    logger.warning(f"DEBUG: Skeleton NPZ path does not exist: {original_skeleton_npz_path}")
-                        except Exception as e:
-                            logger.warning(f"DEBUG: Could not load texture data from skeleton NPZ: {e}")
-                        
-                        # Create RawData object with preserved texture information
-                        from ..data.raw_data import RawData
-                        raw_data_obj = RawData(
-                            vertices=vertices_np,
-                            vertex_normals=None,  # Will calculate if needed
-                            faces=faces_np,
-                            face_normals=None,  # Will calculate if needed
-                            joints=joints_np,
-                            tails=tails_np,
-                            skin=None,  # Will be filled with prediction
-                            no_skin=None,
-                            parents=parents_list,
-                            names=[f"joint_{i}" for i in range(len(joints_np))],
-                            matrix_local=None,
-                            uv_coords=original_uv_coords,  # Preserve UV coordinates
-                            materials=original_materials,  # Preserve materials
-                        )
-                        raw_data_batch = [raw_data_obj]
-                        logger.info(f"Successfully constructed RawData object with name: '{data_name}'")
-                        logger.info(f"  Vertices shape: {vertices_np.shape}")
-                        logger.info(f"  Faces shape: {faces_np.shape}")
-                        logger.info(f"  Joints shape: {joints_np.shape}")
-                        logger.info(f"  Parents length: {len(parents_list)}")
+                        raw_data_batch = []
+                        for b in range(len(vertices)):
+                            # Convert tensors to numpy arrays and handle batch dimension
+                            vertices_np = _item(vertices, b, num_points)
+                            faces_np = _item(faces, b, num_faces)
+                            joints_np = _item(joints, b, num_bones)
+                            
+                            if parents is not None:
+                                parents_np = _item(parents, b, num_bones)
+                                # Convert to list with None for root
+                                parents_list = [None if p == -1 else int(p) for p in parents_np]
+                            else:
+                                parents_list = [None] + list(range(len(joints_np) - 1))
+                            
+                            if tails is not None:
+                                tails_np = _item(tails, b, num_bones)
+                            else:
+                                tails_np = None
+                            
+                            # Load UV coordinates and materials from original skeleton NPZ file
+                            original_uv_coords = None
+                            original_materials = None
+                            try:
+                                # Try to find the original skeleton NPZ file that contains texture data
+                                # The batch path should lead us to the skeleton NPZ file
+                                batch_path = batch_paths[b] if b < len(batch_paths) else None
+                                if batch_path and batch_path.endswith('predict_skeleton.npz'):
+                                    original_skeleton_npz_path = batch_path
+                                    logger.info(f"DEBUG: Loading texture data from skeleton NPZ: {original_skeleton_npz_path}")
+                                    
+                                    if os.path.exists(original_skeleton_npz_path):
+                                        original_skeleton_data = RawData.load(original_skeleton_npz_path)
+                                        if hasattr(original_skeleton_data, 'uv_coords') and original_skeleton_data.uv_coords is not None:
+                                            original_uv_coords = original_skeleton_data.uv_coords
+                                            logger.info(f"DEBUG: Loaded {len(original_uv_coords)} UV coordinates from skeleton NPZ")
+                                        if hasattr(original_skeleton_data, 'materials') and original_skeleton_data.materials is not None:
+                                            original_materials = original_skeleton_data.materials
+                                            logger.info(f"DEBUG: Loaded {len(original_materials)} materials from skeleton NPZ")
+                                    else:
+                                        logger.warning(f"DEBUG: Skeleton NPZ path does not exist: {original_skeleton_npz_path}")
+                            except Exception as e:
+                                logger.warning(f"DEBUG: Could not load texture data from skeleton NPZ: {e}")
+                            
+                            # Create RawData object with preserved texture information
+                            raw_data_obj = RawData(
+                                vertices=vertices_np,
+                                vertex_normals=None,  # Will calculate if needed
+                                faces=faces_np,
+                                face_normals=None,  # Will calculate if needed
+                                joints=joints_np,
+                                tails=tails_np,
+                                skin=None,  # Will be filled with prediction
+                                no_skin=None,
+                                parents=parents_list,
+                                names=[f"joint_{i}" for i in range(len(joints_np))],
+                                matrix_local=None,
+                                uv_coords=original_uv_coords,  # Preserve UV coordinates
+                                materials=original_materials,  # Preserve materials
+                                path=batch_paths[b] if b < len(batch_paths) else None,
+                            )
+                            raw_data_batch.append(raw_data_obj)
+                            logger.info(f"Successfully constructed RawData object {b} with name: '{data_name}'")
+                            logger.info(f"  Vertices shape: {vertices_np.shape}")
+                            logger.info(f"  Faces shape: {faces_np.shape}")
+                            logger.info(f"  Joints shape: {joints_np.shape}")
+                            logger.info(f"  Parents length: {len(parents_list)}")
                     else:
                         logger.error("Missing required components (vertices, faces, joints) to construct RawData")
                         return
@@ -328,6 +345,9 @@ class SkinWriter(BasePredictionWriter):
             if data_name.endswith("predict_skeleton.npz") or data_name == "bird":
                 logger.info("Detected test mode - using fixed filenames without prefix.")
                 current_raw_data_name_prefix = None
+            if len(raw_data_batch) > 1 and raw_data.path:
+                # several assets in one batch: keep their outputs apart by asset directory
+                current_raw_data_name_prefix = os.path.basename(os.path.normpath(raw_data.path))
 
 
             if self.reskin:
@@ -360,15 +380,15 @@ class SkinWriter(BasePredictionWriter):
                     # Get sampled vertices from batch (these correspond to the prediction)
                     sampled_vertices = batch.get('vertices')
                     if sampled_vertices is not None:
-                        sampled_vertices_np = sampled_vertices[0].cpu().numpy() if hasattr(sampled_vertices, 'cpu') else sampled_vertices[0]
-                        
-                        # Use nearest neighbor to map skin weights
-                        from scipy.spatial import cKDTree
-                        tree = cKDTree(sampled_vertices_np)
-                        _, nearest_indices = tree.query(raw_data.vertices, k=1)
+                        sampled_vertices_np = sampled_vertices[i].cpu().numpy() if hasattr(sampled_vertices, 'cpu') else sampled_vertices[i]
                         
-                        # Map skin weights from sampled vertices to original vertices
-                        mapped_skin_weights = pred_skin_numpy[nearest_indices.flatten()]
+                        # Use nearest neighbor to map skin weights (chunked, all cores); the result stays
+                        # a CSR matrix through the NPZ and the exporters (prune_skin reads it chunk by chunk)
+                        mapped_skin_weights = transfer_skin(
+                            sampled_vertices=sampled_vertices_np,
+                            sampled_skin=pred_skin_numpy,
+                            vertices=raw_data.vertices,
+                        )
                         pred_skin_numpy = mapped_skin_weights
                         
                         logger.info(f"Successfully mapped skin weights. New shape: {pred_skin_numpy.shape}")
@@ -450,7 +470,6 @@ class SkinWriter(BasePredictionWriter):
                     )
                     # Use RawData's export_fbx method directly
                     # 🚨 CRITICAL: セグメンテーションフォルト防止チェック
-                    import os
                     force_fallback = os.environ.get('FORCE_FALLBACK_MODE', '0') == '1'
                     disable_lightning = os.environ.get('DISABLE_UNIRIG_LIGHTNING', '0') == '1'
                     
@@ -463,11 +482,155 @@ class SkinWriter(BasePredictionWriter):
                     logger.info(f"Successfully exported FBX to: '{fbx_path}'")
                 except Exception as e:
                     logger.error(f"Error exporting FBX to '{fbx_path}': {e}", exc_info=True)
+
+            if self.export_glb:
+                # Blenderを使わずにスキニング済みGLBを直接書き出す（FBXの代替）
+                glb_base_name = "skinned_model"
+                glb_path = self.make_path(glb_base_name, "glb", data_name_prefix=current_raw_data_name_prefix)
+                logger.info(f"Attempting to export GLB to: '{glb_path}'")
+                try:
+                    raw_data_with_skin = RawData(
+                        vertices=raw_data.vertices,
+                        vertex_normals=raw_data.vertex_normals,
+                        faces=raw_data.faces,
+                        face_normals=raw_data.face_normals,
+                        joints=raw_data.joints,
+                        tails=raw_data.tails,
+                        skin=pred_skin_numpy,
+                        no_skin=raw_data.no_skin,
+                        parents=raw_data.parents,
+                        names=raw_data.names,
+                        matrix_local=raw_data.matrix_local,
+                        uv_coords=getattr(raw_data, 'uv_coords', None),
+                        materials=getattr(raw_data, 'materials', None),
+                        path=raw_data.path,
+                        cls=raw_data.cls
+                    )
+                    raw_data_with_skin.export_glb(path=str(glb_path))
+                    logger.info(f"Successfully exported GLB to: '{glb_path}'")
+                except Exception as e:
+                    logger.error(f"Error exporting GLB to '{glb_path}': {e}", exc_info=True)
     
     def write_on_epoch_end(self, trainer: "L.Trainer", pl_module: "L.LightningModule", predictions: Any, batch_indices: Any):
         logger.info(f"SkinWriter.write_on_epoch_end called for epoch {self._epoch}.")
         self._epoch += 1
 
+def get_ancestor_matrix(parents: List[Union[None, int]], J: int) -> ndarray:
+    '''
+    Return A with A[i, a] = 1 if a is i itself or an ancestor of i, shape (J, J).
+
+    skin @ A accumulates weights of every subtree into its root joint.
+    '''
+    A = np.eye(J)
+    for i in range(J):
+        p = parents[i]
+        if p is None or p < 0 or p >= J:
+            continue
+        A[i] += A[p]
+    return A
+
+def get_parent_matrix(parents: List[Union[None, int]], J: int) -> ndarray:
+    '''
+    Return I - P with P[c, p] = 1 if p is the parent of c, shape (J, J).
+
+    This is the inverse of the ancestor matrix: skin @ (I - P) subtracts children from parents.
+    '''
+    D = np.eye(J)
+    for i in range(J):
+        p = parents[i]
+        if p is None or p < 0 or p >= J:
+            continue
+        D[i, p] -= 1.
+    return D
+
+def get_mesh_graph(vertices: ndarray, faces: ndarray, alpha: float) -> csr_matrix:
+    '''
+    Return diffusion coefficients exp(-alpha * edge_length) as a CSR matrix,
+    rows are target vertices and columns are source vertices, shape (N, N).
+    '''
+    N = vertices.shape[0]
+    edges = np.concatenate([faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]], axis=0)
+    edges = np.concatenate([edges, edges[:, [1, 0]]], axis=0)
+    edge_distances = np.linalg.norm(vertices[edges[:, 1]] - vertices[edges[:, 0]], axis=1)
+    coeffs = np.exp(-alpha * edge_distances)
+    # duplicated edges are summed, which is the same as accumulating them one by one
+    return csr_matrix((coeffs, (edges[:, 1], edges[:, 0])), shape=(N, N))
+
+def _normalize_skin(skin: ndarray) -> ndarray:
+    '''
+    Normalize rows of skin, rows summing to zero are assigned to the first bone.
+    '''
+    skin_sum = skin.sum(axis=-1)
+    valid = skin_sum > 1e-9
+    skin[valid] = skin[valid] / skin_sum[valid, None]
+    skin[~valid] = 0.0
+    if skin.shape[1] > 0:
+        skin[~valid, 0] = 1.0
+    return skin
+
+def _diffuse_sparse(
+    skin: ndarray,
+    graph: csr_matrix,
+    ancestor: ndarray,
+    parent: ndarray,
+    chunk_elements: int=1 << 24,
+    eps: float=1e-6,
+) -> ndarray:
+    '''
+    One diffusion step of `reskin` on a prebuilt CSR graph.
+
+    Same update as the explicit step, but edge values are reduced per target row with
+    np.add.reduceat and joints are processed in chunks to bound memory by chunk_elements.
+    Values closer than eps count as equal and do not diffuse, so columns that are constant after
+    the hierarchy accumulation (e.g. the root) do not depend on rounding noise.
+    '''
+    N, J = skin.shape
+    indptr = graph.indptr
+    src = graph.indices
+    coeffs = graph.data
+    dst = np.repeat(np.arange(N), np.diff(indptr))
+    nonempty = np.diff(indptr) > 0
+    starts = indptr[:-1][nonempty]
+
+    diffuse_skin_source = skin @ ancestor
+    neighbor_influence_sum = np.zeros_like(skin)
+    neighbor_weight_sum = np.zeros_like(skin)
+    step = max(1, chunk_elements // max(1, src.shape[0]))
+    for j0 in range(0, J, step):
+        j1 = min(J, j0 + step)
+        value_src = diffuse_skin_source[src, j0:j1]
+        # only from hotter to cooler
+        w = coeffs[:, None] * (diffuse_skin_source[dst, j0:j1] < value_src - eps)
+        if starts.shape[0] > 0:
+            neighbor_influence_sum[nonempty, j0:j1] = np.add.reduceat(w * value_src, starts, axis=0)
+            neighbor_weight_sum[nonempty, j0:j1] = np.add.reduceat(w, starts, axis=0)
+
+    valid_weights = neighbor_weight_sum > 1e-9
+    new_skin = skin.copy()
+    new_skin[valid_weights] = (skin[valid_weights] + neighbor_influence_sum[valid_weights]) / (1. + neighbor_weight_sum[valid_weights])
+    return _normalize_skin(new_skin @ parent)
+
+def _diffuse_implicit(
+    skin: ndarray,
+    graph: csr_matrix,
+    ancestor: ndarray,
+    parent: ndarray,
+    t: float,
+) -> ndarray:
+    '''
+    Smooth subtree-accumulated weights with one implicit solve (I + t * L) X = skin @ A,
+    L is the graph Laplacian of the diffusion coefficients.
+
+    Unlike the explicit step, diffusion is not restricted to flow from hotter to cooler vertices.
+    '''
+    N = skin.shape[0]
+    W = (graph + graph.T) * 0.5
+    L = diags(np.asarray(W.sum(axis=1)).reshape(-1)) - W
+    solver = splu((identity(N, format='csc', dtype=np.float64) + t * L).tocsc().astype(np.float64))
+    smoothed = solver.solve((skin @ ancestor).astype(np.float64))
+    smoothed = np.maximum(smoothed @ parent, 0.)
+    return _normalize_skin(smoothed.astype(skin.dtype))
+
 def reskin(
     sampled_vertices: ndarray,
     vertices: ndarray,
@@ -476,13 +639,35 @@ def reskin(
     sampled_skin: ndarray,
     sample_method: Literal['mean', 'median']='mean',
     **kwargs,
-) -> ndarray:
+) -> csr_matrix:
+    '''
+    Transfer sampled skin to vertices and diffuse it along the mesh surface.
+
+    Returns the pruned weights as an (N, J) CSR matrix, which RawData and the exporters take as is.
+
+    kwargs:
+        solver: 'explicit' (default) runs the original per-step loops,
+            'sparse' builds the mesh graph and hierarchy matrices once and runs the same update, except
+            that edges whose accumulated values differ by less than eps do not diffuse. It is not the
+            same result in general: when no column is constant up to rounding (e.g. several root
+            bones) both agree to float rounding with eps=0 and to ~1e-2 with the default eps, but with
+            a single root the root column sums every row (1 up to rounding) and 'explicit' diffuses
+            that rounding noise, so the two can differ by a whole weight; 'sparse' does not depend on it.
+            'implicit' is a different scheme: all steps are replaced by one solve of (I + iter_steps * L),
+            see `_diffuse_implicit`
+        eps: tolerance of the 'sparse' solver, 1e-6 by default
+        top_k: number of bones kept per vertex, -1 (default) keeps all
+    '''
     nearest_samples = kwargs.get('nearest_samples', 7)
     iter_steps = kwargs.get('iter_steps', 1)
     threshold = kwargs.get('threshold', 0.01) # Skinning weights below this are zeroed out
     alpha = kwargs.get('alpha', 2) # Exponential decay factor for distance weighting & diffusion
+    solver = kwargs.get('solver', 'explicit')
+    top_k = kwargs.get('top_k', -1)
+    eps = kwargs.get('eps', 1e-6)
     
     assert sample_method in ['mean', 'median']
+    assert solver in ['explicit', 'sparse', 'implicit'], f"Unknown solver: {solver}"
     
     N = vertices.shape[0] # Number of vertices in the target mesh
     J = sampled_skin.shape[1] # Number of joints/bones
@@ -507,94 +692,84 @@ def reskin(
     else:
         assert False, f"Unknown sample_method: {sample_method}"
     
-    # Edge definition for diffusion (connectivity)
-    edges = np.concatenate([faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]], axis=0)
-    edges = np.concatenate([edges, edges[:, [1, 0]]], axis=0) # (num_edges*2, 2)
-
-    # Diffusion process to smooth skinning weights along the mesh surface
-    for _ in range(iter_steps):
-        # Accumulate parent influences for diffusion (hotter to cooler)
-        # This sum_skin represents the "effective" skinning influence at each joint considering hierarchy
-        diffuse_skin_source = skin.copy() 
-        for i in reversed(range(J)): # Iterate from child to parent
-            p = parents[i]
-            if p is None or p < 0 or p >= J: # parent must be valid
-                continue
-            diffuse_skin_source[:, p] += diffuse_skin_source[:, i]
-
-        # Calculate influence from neighbors
-        neighbor_influence_sum = np.zeros_like(skin) # (N, J)
-        neighbor_weight_sum = np.zeros_like(skin)   # (N, J)
-
-        # Edge properties for diffusion
-        v0 = vertices[edges[:, 0]]
-        v1 = vertices[edges[:, 1]]
-        edge_distances = np.sqrt(((v1 - v0)**2).sum(axis=1, keepdims=True))
-        # Diffusion weights, inversely proportional to distance
-        diffusion_coeffs = np.exp(-alpha * edge_distances) # (num_edges*2, 1)
-
-        # Mask for diffusion: only from "hotter" (higher influence) to "cooler"
-        # diffuse_skin_source[edges[:, 0]] is (num_edges*2, J)
-        # diffuse_skin_source[edges[:, 1]] is (num_edges*2, J)
-        mask = diffuse_skin_source[edges[:, 1]] < diffuse_skin_source[edges[:, 0]] # (num_edges*2, J)
+    if solver == 'explicit':
+        # Edge definition for diffusion (connectivity)
+        edges = np.concatenate([faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]], axis=0)
+        edges = np.concatenate([edges, edges[:, [1, 0]]], axis=0) # (num_edges*2, 2)
+
+        # Diffusion process to smooth skinning weights along the mesh surface
+        for _ in range(iter_steps):
+            # Accumulate parent influences for diffusion (hotter to cooler)
+            # This sum_skin represents the "effective" skinning influence at each joint considering hierarchy
+            diffuse_skin_source = skin.copy() 
+            for i in reversed(range(J)): # Iterate from child to parent
+                p = parents[i]
+                if p is None or p < 0 or p >= J: # parent must be valid
+                    continue
+                diffuse_skin_source[:, p] += diffuse_skin_source[:, i]
+
+            # Calculate influence from neighbors
+            neighbor_influence_sum = np.zeros_like(skin) # (N, J)
+            neighbor_weight_sum = np.zeros_like(skin)   # (N, J)
+
+            # Edge properties for diffusion
+            v0 = vertices[edges[:, 0]]
+            v1 = vertices[edges[:, 1]]
+            edge_distances = np.sqrt(((v1 - v0)**2).sum(axis=1, keepdims=True))
+            # Diffusion weights, inversely proportional to distance
+            diffusion_coeffs = np.exp(-alpha * edge_distances) # (num_edges*2, 1)
+
+            # Mask for diffusion: only from "hotter" (higher influence) to "cooler"
+            # diffuse_skin_source[edges[:, 0]] is (num_edges*2, J)
+            # diffuse_skin_source[edges[:, 1]] is (num_edges*2, J)
+            mask = diffuse_skin_source[edges[:, 1]] < diffuse_skin_source[edges[:, 0]] # (num_edges*2, J)
         
-        # Calculate weighted influence from source vertices of edges
-        # Source vertices are edges[:, 0], target vertices are edges[:, 1]
-        influence_to_transfer = diffuse_skin_source[edges[:, 0]] * diffusion_coeffs * mask # (num_edges*2, J)
-        coeffs_to_transfer = diffusion_coeffs * mask # (num_edges*2, J)
-
-        # Accumulate influence at target vertices (edges[:, 1])
-        np.add.at(neighbor_influence_sum, edges[:, 1], influence_to_transfer)
-        np.add.at(neighbor_weight_sum, edges[:, 1], coeffs_to_transfer)
+            # Calculate weighted influence from source vertices of edges
+            # Source vertices are edges[:, 0], target vertices are edges[:, 1]
+            influence_to_transfer = diffuse_skin_source[edges[:, 0]] * diffusion_coeffs * mask # (num_edges*2, J)
+            coeffs_to_transfer = diffusion_coeffs * mask # (num_edges*2, J)
+
+            # Accumulate influence at target vertices (edges[:, 1])
+            np.add.at(neighbor_influence_sum, edges[:, 1], influence_to_transfer)
+            np.add.at(neighbor_weight_sum, edges[:, 1], coeffs_to_transfer)
         
-        # Update skinning weights: current + received_influence / (1 + total_coeffs_received)
-        # Avoid division by zero for neighbor_weight_sum
-        valid_weights = neighbor_weight_sum > 1e-9
+            # Update skinning weights: current + received_influence / (1 + total_coeffs_received)
+            # Avoid division by zero for neighbor_weight_sum
+            valid_weights = neighbor_weight_sum > 1e-9
         
-        # Create a temporary skin to update, to avoid using partially updated values in the same iteration
-        new_skin = skin.copy()
-        new_skin[valid_weights] = (skin[valid_weights] + neighbor_influence_sum[valid_weights]) / (1. + neighbor_weight_sum[valid_weights])
-        skin = new_skin
-
-        # Reverse the parent accumulation effect from diffuse_skin_source
-        # This step aims to ensure that the diffused skinning weights still respect the local bone influences
-        # after being smoothed across the surface.
-        for i in range(J): # Iterate from parent to child
-            p = parents[i]
-            if p is None or p < 0 or p >= J:
-                continue
-            skin[:, p] -= skin[:, i] # This subtracts child's influence from parent, might lead to negative if not careful
-                                     # A common approach is to ensure weights remain non-negative and sum to 1.
-                                     # This specific hierarchical adjustment needs to be robust.
-                                     # Clamping or re-normalizing might be needed if this causes issues.
-
-        # Normalize skin weights after each diffusion step
-        skin_sum = skin.sum(axis=-1, keepdims=True)
-        valid_skin_sum = skin_sum > 1e-9
-        skin[valid_skin_sum] = skin[valid_skin_sum] / skin_sum[valid_skin_sum]
-        # For vertices where sum is zero (or near zero), assign uniform weight to the first bone (or root)
-        # This prevents NaN issues and ensures all vertices have some assignment.
-        skin[~valid_skin_sum] = 0.0 
-        if J > 0:
-            skin[~valid_skin_sum, 0] = 1.0
-
+            # Create a temporary skin to update, to avoid using partially updated values in the same iteration
+            new_skin = skin.copy()
+            new_skin[valid_weights] = (skin[valid_weights] + neighbor_influence_sum[valid_weights]) / (1. + neighbor_weight_sum[valid_weights])
+            skin = new_skin
+
+            # Reverse the parent accumulation effect from diffuse_skin_source
+            # This step aims to ensure that the diffused skinning weights still respect the local bone influences
+            # after being smoothed across the surface.
+            for i in range(J): # Iterate from parent to child
+                p = parents[i]
+                if p is None or p < 0 or p >= J:
+                    continue
+                skin[:, p] -= skin[:, i] # This subtracts child's influence from parent, might lead to negative if not careful
+                                         # A common approach is to ensure weights remain non-negative and sum to 1.
+                                         # This specific hierarchical adjustment needs to be robust.
+                                         # Clamping or re-normalizing might be needed if this causes issues.
+
+            # Normalize skin weights after each diffusion step
+            # For vertices where sum is zero (or near zero), assign full weight to the first bone (or root)
+            # This prevents NaN issues and ensures all vertices have some assignment.
+            skin = _normalize_skin(skin)
+    else:
+        graph = get_mesh_graph(vertices=vertices, faces=faces, alpha=alpha)
+        ancestor = get_ancestor_matrix(parents=parents, J=J)
+        parent = get_parent_matrix(parents=parents, J=J)
+        if solver == 'sparse':
+            for _ in range(iter_steps):
+                skin = _diffuse_sparse(skin=skin, graph=graph, ancestor=ancestor, parent=parent, eps=eps)
+        else:
+            skin = _diffuse_implicit(skin=skin, graph=graph, ancestor=ancestor, parent=parent, t=float(iter_steps))
 
     # Post-processing: thresholding and final normalization
-    # Zero out weights below threshold if any other weight for that vertex is above threshold
-    above_threshold_anywhere = (skin >= threshold).any(axis=-1, keepdims=True)
-    skin[(skin < threshold) & above_threshold_anywhere] = 0.
-    
-    # Final normalization
-    skin_sum_final = skin.sum(axis=-1, keepdims=True)
-    valid_final_sum = skin_sum_final > 1e-9
-    skin[valid_final_sum] = skin[valid_final_sum] / skin_sum_final[valid_final_sum]
-    
-    # Handle cases where all weights for a vertex might have become zero after thresholding
-    if J > 0: # Only if there are bones
-        all_zero_mask = ~valid_final_sum.squeeze(-1) # Vertices where sum of weights is zero
-        if np.any(all_zero_mask):
-            logger.warning(f"{np.sum(all_zero_mask)} vertices have all-zero skin weights after thresholding. Assigning to first bone.")
-            skin[all_zero_mask] = 0.0 # Reset
-            skin[all_zero_mask, 0] = 1.0 # Assign full weight to the first bone
-
-    return skin
\ No newline at end of file
+    # Weights below threshold are zeroed out if any other weight for that vertex is above threshold,
+    # vertices left without weights are assigned to the first bone
+    indices, weights = prune_skin(skin, k=top_k, threshold=threshold)
+    return sparsify_skin(indices, weights, J)
\ No newline at end of file
@@ -10,6 +10,7 @@ from dataclasses import dataclass
 
 from ..data.exporter import Exporter
 from ..data.order import OrderConfig, Order, get_order
+from ..model.generation import GenerationTrace
 
 @dataclass(frozen=True)
 class TokenizerConfig():
@@ -98,6 +99,9 @@ class DetokenizeOutput(Exporter):
     # normalization cube
     continuous_range: Tuple[float, float]
     
+    # how the tokens were generated, None if not generated by a model
+    trace: Union[GenerationTrace, None]=None
+    
     @property
     def joints(self):
         return self.bones[:, 3:]
@@ -151,7 +155,8 @@ class DetokenizeOutput(Exporter):
             self.cls,
             self.parts,
             self.names,
-            self.continuous_range
+            self.continuous_range,
+            self.trace,
         ))
     
     def to(self, device, **kwargs):
@@ -175,6 +180,27 @@ class DetokenizeOutput(Exporter):
         """Tell Lightning this is not a dataclass"""
         return False
 
+class DetokenizeCandidates():
+    '''
+    Several skeletons generated for the same asset, ranked best first.
+
+    Plain class on purpose, so that Lightning passes it to the writer untouched.
+    '''
+    def __init__(self, outputs: List[DetokenizeOutput], scores: List, trace: Union[GenerationTrace, None]=None):
+        assert len(outputs) > 0 and len(outputs) == len(scores)
+        self.outputs = outputs
+        self.scores = scores
+        # shared by all outputs, they come from a single generation
+        self.trace = trace
+
+    @property
+    def best(self) -> DetokenizeOutput:
+        return self.outputs[0]
+
+    @property
+    def alternatives(self) -> List[DetokenizeOutput]:
+        return self.outputs[1:]
+
 class TokenizerSpec(ABC):
     """
     Abstract class for tokenizer
@@ -19,7 +19,6 @@ import json
 import shutil
 import logging
 import time
-import trimesh
 from pathlib import Path
 from typing import Tuple, Dict, Optional
 
@@ -83,6 +82,11 @@ class Step0AssetPreservation:
             # アセット情報解析
             asset_info = self._analyze_asset_info()
             
+            # テクスチャを内容ハッシュでストアに登録（後続ステップはハッシュで参照）
+            texture_manifest = self._store_textures(preserved_file)
+            if texture_manifest is not None:
+                asset_info["texture_manifest"] = str(texture_manifest)
+            
             # メタデータJSON生成
             metadata = {
                 "model_name": self.model_name,
@@ -115,6 +119,8 @@ class Step0AssetPreservation:
                 "preserved_original": str(preserved_file),
                 "asset_metadata_json": str(metadata_file)
             }
+            if texture_manifest is not None:
+                output_files["texture_manifest_json"] = str(texture_manifest)
             
             return True, success_log, output_files
             
@@ -123,6 +129,32 @@ class Step0AssetPreservation:
             self.logger.error(error_msg, exc_info=True)
             return False, error_msg, {}
     
+    def _store_textures(self, preserved_file: Path) -> Optional[Path]:
+        """
+        テクスチャをテクスチャストアに登録し、マニフェストJSONを保存
+        
+        ストアは既定でパイプライン作業ディレクトリ直下（UNIRIG_TEXTURE_STOREで変更可）に置き、
+        アップロード間で同一テクスチャを共有する
+        
+        Returns:
+            マニフェストJSONのパス（テクスチャなし・失敗時はNone）
+        """
+        try:
+            from src.pipeline.texture_store import TextureStore, TEXTURE_STORE_ENV, write_manifest
+            root = os.environ.get(TEXTURE_STORE_ENV, str(self.output_dir.parent.parent / "texture_store"))
+            store = TextureStore(root)
+            entries = store.collect(preserved_file)
+            if len(entries) == 0:
+                return None
+            manifest_file = self.output_dir / f"{self.model_name}_texture_manifest.json"
+            write_manifest(manifest_file, entries, store)
+            total_mb = sum(e["size"] for e in entries) / (1024 * 1024)
+            self.logger.info(f"テクスチャストア登録完了: {len(entries)}枚 ({total_mb:.1f}MB) → {store.root}")
+            return manifest_file
+        except Exception as e:
+            self.logger.warning(f"テクスチャストア登録エラー（処理続行）: {str(e)}")
+            return None
+    
     def _analyze_asset_info(self) -> Dict:
         """
         3Dモデルのアセット情報解析
@@ -140,8 +172,19 @@ class Step0AssetPreservation:
             "analysis_method": "trimesh"
         }
         
+        # glTF/GLB/VRM・OBJ・バイナリFBXはヘッダーのみで解析（メッシュ・画像をデコードしない）
+        try:
+            from src.pipeline.asset_header import analyze_header
+            header_info = analyze_header(self.input_file)
+            if header_info is not None:
+                self.logger.info(f"アセット解析結果: {header_info}")
+                return header_info
+        except Exception as e:
+            self.logger.warning(f"ヘッダー解析エラー（trimeshで再解析）: {str(e)}")
+        
         try:
             # trimeshでシーン読み込み
+            import trimesh
             scene = trimesh.load(str(self.input_file))
             
             # シーン内のジオメトリ解析
@@ -113,6 +113,35 @@ class Step1Extract:
             self.logger.error(error_msg)
             return False, error_msg, {}
 
+    def _move_extracted(self, found_file: Path, target_file: Path) -> str:
+        """
+        抽出結果を決め打ちディレクトリに移動する
+
+        raw_data.npzと同じ場所に書き出されたLODピラミッド（lod.npz）も一緒に移動する。
+        Step2はraw_data.npzの横のlod.npzを探すため、残すと再抽出になる。
+
+        Returns:
+            ログ文字列
+        """
+        from src.data.lod import LOD_NAME
+        logs = ""
+        shutil.move(str(found_file), str(target_file))
+        logs += f"✅ 決め打ちディレクトリに移動: {target_file}\n"
+        found_lod = found_file.parent / LOD_NAME
+        if found_lod.exists():
+            shutil.move(str(found_lod), str(target_file.parent / LOD_NAME))
+            logs += f"✅ LODピラミッドも移動: {target_file.parent / LOD_NAME}\n"
+        
+        # 空のサブディレクトリがあれば削除
+        if found_file.parent != self.output_dir and found_file.parent.exists():
+            try:
+                if not list(found_file.parent.iterdir()):  # ディレクトリが空の場合
+                    found_file.parent.rmdir()
+                    logs += f"空のサブディレクトリクリーンアップ: {found_file.parent}\n"
+            except Exception as e:
+                logs += f"サブディレクトリクリーンアップ失敗 (無視): {e}\n"
+        return logs
+
     def _execute_original_extract(self, input_file: Path, model_name: str) -> Tuple[bool, str]:
         """
         原流処理extract.sh互換実行（決め打ちディレクトリ戦略対応）
@@ -135,6 +164,7 @@ class Step1Extract:
             "--config", str(config_file),
             "--require_suffix", "obj,fbx,FBX,dae,glb,gltf,vrm",
             "--faces_target_count", "50000",
+            "--lod_face_counts", "20000,5000",  # Step2等が再抽出せずに使う低解像度レベル
             "--num_runs", "1",
             "--force_override", "true",
             "--id", "0",
@@ -188,18 +218,7 @@ class Step1Extract:
                 target_file = self.output_dir / "raw_data.npz"
                 
                 if found_file != target_file:
-                    # ファイルを決め打ちディレクトリに移動
-                    shutil.move(str(found_file), str(target_file))
-                    logs += f"✅ 決め打ちディレクトリに移動: {target_file}\n"
-                    
-                    # 空のサブディレクトリがあれば削除
-                    if found_file.parent != self.output_dir and found_file.parent.exists():
-                        try:
-                            if not list(found_file.parent.iterdir()):  # ディレクトリが空の場合
-                                found_file.parent.rmdir()
-                                logs += f"空のサブディレクトリクリーンアップ: {found_file.parent}\n"
-                        except Exception as e:
-                            logs += f"サブディレクトリクリーンアップ失敗 (無視): {e}\n"
+                    logs += self._move_extracted(found_file, target_file)
                 
                 file_size = target_file.stat().st_size
                 logs += f"✅ 決め打ちディレクトリ出力完了: {target_file} ({file_size:,} bytes)\n"
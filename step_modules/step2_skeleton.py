@@ -130,6 +130,40 @@ class Step2Skeleton:
             self.logger.error(error_msg, exc_info=True)
             return False, logs + error_msg + "\n", {}
     
+    def _reuse_step1_lod(self, unirig_model_processing_dir: Path, max_faces: int = 5000) -> Tuple[bool, str]:
+        """
+        Step1のraw_data.npz横のlod.npzから面数max_faces以下のレベルを取り出してraw_data.npzとして配置
+        
+        Returns:
+            (reused, logs) - ピラミッドが無い・該当レベルが無い場合はFalse（従来の再抽出を実行）
+        """
+        step1_raw_data = self.step_output_dir.parent / "01_extracted_mesh" / "raw_data.npz"
+        try:
+            from src.data.lod import find_lod, load_lod, pick_level, level_raw_data
+            from src.data.raw_data import RawData
+            lod_path = find_lod(str(step1_raw_data)) if step1_raw_data.exists() else None
+            if lod_path is None:
+                return False, ""
+            level = pick_level(load_lod(lod_path), max_faces=max_faces)
+            if level is None:
+                return False, f"⚠️ LODピラミッドに面数{max_faces}以下のレベルがありません: {lod_path}\n"
+            
+            start_time = time.time()
+            raw_data = level_raw_data(RawData.load(str(step1_raw_data)), level)
+            target_raw_data = unirig_model_processing_dir / "raw_data.npz"
+            raw_data.save(str(target_raw_data))
+            step2_mesh_dir = self.step_output_dir / "mesh_for_skeleton"
+            step2_mesh_dir.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(target_raw_data, step2_mesh_dir / "raw_data.npz")
+            
+            logs = f"✅ Step1のLODレベルを使用（メッシュ再抽出スキップ）: {level.F}面 / {level.N}頂点 ({time.time() - start_time:.2f}秒)\n"
+            logs += f"UniRig処理用: {target_raw_data}\n"
+            self.logger.info(f"Step2: LODレベル使用 {level.F}面 ({lod_path})")
+            return True, logs
+        except Exception as e:
+            self.logger.warning(f"LODレベルの使用に失敗、メッシュ再抽出を実行: {e}")
+            return False, f"⚠️ LODレベルの使用に失敗、メッシュ再抽出を実行: {e}\n"
+    
     def _execute_skeleton_specific_mesh_extraction(self, original_file: Path, unirig_model_processing_dir: Path, model_name: str) -> Tuple[bool, str]:
         """
         🔥 Step2独自のスケルトン特化メッシュ再抽出
@@ -146,6 +180,11 @@ class Step2Skeleton:
             (success, logs)
         """
         logs = ""
+        # Step1が書き出したLODピラミッドがあれば再抽出せずに低解像度レベルを使用
+        reused, reuse_logs = self._reuse_step1_lod(unirig_model_processing_dir)
+        logs += reuse_logs
+        if reused:
+            return True, logs
         try:
             self.logger.info(f"🔥 Step2: スケルトン特化メッシュ再抽出開始 (faces_target_count=4000)")
             logs += f"🔥 Step2: スケルトン特化メッシュ再抽出開始 (faces_target_count=4000)\n"
@@ -167,6 +167,19 @@ class Step3Skinning:
                     }
                 else:
                     self.logger.info("✅ Step3スキニング検証成功: バーテックスグループが正常に生成されています。")
+            elif output_files.get("skinning_npz") and Path(output_files["skinning_npz"]).exists():
+                validation_success, validation_logs = self._validate_skinning_npz(Path(output_files["skinning_npz"]))
+                logs += validation_logs
+                
+                if not validation_success:
+                    error_msg = f"❌ Step3スキニング検証失敗: スキンNPZにウェイトが含まれていません。"
+                    self.logger.error(error_msg)
+                    return False, logs, {
+                        "skinned_fbx": "",
+                        "skinning_npz": ""
+                    }
+                else:
+                    self.logger.info("✅ Step3スキニング検証成功: スキンNPZにウェイトが含まれています。")
             else:
                 error_msg = f"❌ スキニング済みFBXファイルが見つからないため、バーテックスグループ検証をスキップします。"
                 self.logger.warning(error_msg)
@@ -504,13 +517,23 @@ class Step3Skinning:
                     found_npz = npz_files[0]  # 最初に見つかったものを使用
                     logs += f"📁 ディレクトリ検索でNPZファイル発見: {found_npz}\n"
             
+            # スキニング済みFBXの書き出しはオプション（Step4はスキンNPZを直接使用する）
+            # NPZより古いFBXは前回実行の残りなので使用しない
+            if found_fbx and found_npz and found_fbx.stat().st_mtime < found_npz.stat().st_mtime:
+                logs += f"⚠️ スキンNPZより古いFBXは前回の出力のため使用しません: {found_fbx}\n"
+                found_fbx = None
+            
             # 🔥 統一命名規則に基づく最終出力ファイル配置
+            unified_fbx_path = self.step_output_dir / f"{model_name}_skinned.fbx"
             if found_fbx:
-                unified_fbx_name = f"{model_name}_skinned.fbx"
-                unified_fbx_path = self.step_output_dir / unified_fbx_name
                 shutil.copy2(found_fbx, unified_fbx_path)
                 output_files["skinned_fbx"] = str(unified_fbx_path)
                 logs += f"✅ 統一FBX生成: {unified_fbx_path}\n"
+            elif found_npz:
+                if unified_fbx_path.exists():
+                    unified_fbx_path.unlink()
+                output_files["skinned_fbx"] = ""
+                logs += f"ℹ️ スキニング済みFBXなし（Step4はスキンNPZを直接使用）\n"
             else:
                 return False, logs, {
                     "skinned_fbx": "",
@@ -557,20 +580,16 @@ class Step3Skinning:
                 "skinning_npz": self.step_output_dir / f"{model_name}_skinning.npz"
             }
             
-            all_expected_exist = True
             for file_type, file_path in expected_files.items():
                 if file_path.exists():
                     logs += f"✅ 期待ファイル確認: {file_type} -> {file_path}\n"
                     output_files[file_type] = str(file_path)
                 else:
-                    if file_type != "skinning_npz":  # NPZはオプショナル
-                        logs += f"❌ 期待ファイル不存在: {file_type} -> {file_path}\n"
-                        all_expected_exist = False
-                    else:
-                        logs += f"⚠️ オプショナルファイル不存在: {file_type} -> {file_path}\n"
-            
-            # skinned_fbxの存在確認が最重要、その他はオプショナル
-            if not output_files.get("skinned_fbx"):
+                    # FBX・NPZはどちらか一方があればよい
+                    logs += f"⚠️ オプショナルファイル不存在: {file_type} -> {file_path}\n"
+            
+            # skinned_fbxかskinning_npzのどちらかが必須
+            if not output_files.get("skinned_fbx") and not output_files.get("skinning_npz"):
                 return False, logs, {
                     "skinned_fbx": "",
                     "skinning_npz": ""
@@ -592,10 +611,83 @@ class Step3Skinning:
                     "skinning_npz": ""
                 }
     
+    def _validate_skinning_npz(self, npz_file_path: Path) -> Tuple[bool, str]:
+        """
+        スキンNPZ（Step4が直接使用）のウェイト検証
+        
+        Returns:
+            (validation_success, detailed_logs)
+        """
+        logs = f"🔍 スキンNPZ検証開始: {npz_file_path}\n"
+        try:
+            data = np.load(npz_file_path, allow_pickle=True)
+            skin = data["skin"][()] if "skin" in data else None
+            names = data["names"][()] if "names" in data else None
+        except Exception as e:
+            return False, logs + f"❌ スキンNPZ読み込みエラー: {e}\n"
+        if skin is None or getattr(skin, "ndim", 0) != 2:
+            return False, logs + f"❌ スキンウェイトが存在しません\n"
+        # 高解像度メッシュへの転写結果はscipyの疎行列（CSR）のまま保存される
+        from scipy.sparse import issparse
+        if issparse(skin):
+            weighted = int((skin.max(axis=1).toarray().reshape(-1) > 0).sum())
+        else:
+            weighted = int((skin > 0).any(axis=1).sum())
+        logs += f"- ボーン数: {skin.shape[1]} (名前: {0 if names is None else len(names)})\n"
+        logs += f"- ウェイト付き頂点数: {weighted}/{skin.shape[0]}\n"
+        if skin.shape[1] == 0 or weighted == 0:
+            return False, logs + f"❌ スキンNPZにウェイトデータがありません\n"
+        return True, logs + f"✅ スキンNPZ検証成功\n"
+    
     def _validate_vertex_groups_in_fbx(self, fbx_file_path: Path, model_name: str) -> Tuple[bool, str]:
         """
         スキニング済みFBXファイル内のバーテックスグループ（ボーン/ウェイト）を検証
         
+        バイナリFBXはノードツリーを直接読んで検証する（Blender起動不要、数ミリ秒）。
+        読めない場合（ASCII FBX等）のみBlenderでの検証にフォールバックする。
+        
+        Args:
+            fbx_file_path: 検証するFBXファイルのパス
+            model_name: モデル名（ログ用）
+            
+        Returns:
+            (validation_success, detailed_logs)
+        """
+        logs = f"🔍 バーテックスグループ検証開始: {fbx_file_path}\n"
+        try:
+            from src.pipeline.fbx_validator import validate_skinned_fbx
+            start_time = time.time()
+            validation_data = validate_skinned_fbx(fbx_file_path)
+        except (ImportError, ValueError, OSError) as e:
+            logs += f"⚠️ FBXノード検証不可、Blender検証にフォールバック: {e}\n"
+            success, blender_logs = self._validate_vertex_groups_in_fbx_blender(fbx_file_path, model_name)
+            return success, logs + blender_logs
+        
+        logs += f"📊 バーテックスグループ検証結果 ({(time.time() - start_time) * 1000:.1f}ms):\n"
+        logs += f"- アーマチュア存在: {validation_data['has_armature']}\n"
+        logs += f"- アーマチュア名: {validation_data['armature_name'] or 'N/A'}\n"
+        logs += f"- ボーン数: {validation_data['bone_count']}\n"
+        logs += f"- メッシュ数: {validation_data['mesh_count']} (頂点数: {validation_data['vertex_count']})\n"
+        logs += f"- スキン数: {validation_data['skin_count']} (クラスター数: {validation_data['cluster_count']})\n"
+        logs += f"- バーテックスグループ有りメッシュ: {validation_data['meshes_with_vertex_groups']}\n"
+        logs += f"- バーテックスグループ無しメッシュ: {validation_data['meshes_without_vertex_groups']}\n"
+        logs += f"- ウェイトデータ存在: {validation_data['weight_data_exists']} (ウェイト付き頂点数: {validation_data['weighted_vertex_count']})\n"
+        
+        if validation_data['error_messages']:
+            logs += f"⚠️ エラーメッセージ:\n"
+            for error_msg in validation_data['error_messages']:
+                logs += f"  {error_msg}\n"
+        
+        if validation_data['validation_passed']:
+            logs += f"✅ バーテックスグループ検証成功: スキニングデータが正常に生成されています\n"
+            return True, logs
+        logs += f"❌ バーテックスグループ検証失敗: スキニングデータに問題があります\n"
+        return False, logs
+    
+    def _validate_vertex_groups_in_fbx_blender(self, fbx_file_path: Path, model_name: str) -> Tuple[bool, str]:
+        """
+        スキニング済みFBXファイル内のバーテックスグループ（ボーン/ウェイト）をBlenderで検証
+        
         Blenderを使用してFBXファイルを読み込み、以下を確認:
         1. アーマチュア（骨格）が存在するか
         2. メッシュオブジェクトにバーテックスグループが存在するか
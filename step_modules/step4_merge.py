@@ -56,12 +56,17 @@ class Step4Merge:
             if not skeleton_fbx or not Path(skeleton_fbx).exists():
                 return False, f"データソース2（AIスケルトン）不存在: {skeleton_fbx}\n", {}
             
-            # データソース3: AIスキニング（Step3出力・メモリ内で自動処理）
-            # skinning_filesは検証のみ（実際の処理はmerge.py内で自動実行）
+            # データソース3: AIスキニング（Step3出力）
+            # スキンNPZがあれば配列のまま転写する（スキニング済みFBXの書き出し・再読み込み不要）
+            skinning_npz = skinning_files.get("skinning_npz") if skinning_files else None
+            source = skeleton_fbx
+            if skinning_npz and Path(skinning_npz).exists():
+                source = skinning_npz
+                logs += f"データソース3（AIスキニング）NPZを直接使用: {skinning_npz}\n"
             
             # 重要な技術的発見: 正しいsource/target引数使用
             success, merge_logs = self._execute_three_data_source_merge(
-                source_fbx=skeleton_fbx,    # データソース2: AIスケルトン
+                source_fbx=source,          # データソース2+3: AIスケルトン（スキンNPZがあればNPZ）
                 target_file=original_file,  # データソース1: オリジナルメッシュ
                 model_name=model_name
             )
@@ -107,6 +112,9 @@ class Step4Merge:
             "--target", target_file,     # オリジナルメッシュファイル（ユーザーアップロード）
             "--output", str(output_fbx)
         ]
+        if Path(source_fbx).suffix.lower() == ".npz":
+            # スキンNPZ（スケルトン+スキンウェイト）を配列のまま渡す
+            cmd[cmd.index("--source")] = "--skin_npz"
         
         logs += f"3つのデータソース統合コマンド: {' '.join(cmd)}\n"
         
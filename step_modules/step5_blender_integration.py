@@ -1,13 +1,15 @@
 """
 Step5 Module - リギング移植対応版
 オリジナルアセットにリギング情報を移植してBlender最終出力処理
+GLB出力はStep3のスキンNPZから直接書き出し、Blenderを起動しない
 """
 
 import sys
+import json
 import subprocess
 import tempfile
 from pathlib import Path
-from typing import Tuple, Dict, Any
+from typing import Tuple, Dict, Any, Optional
 import logging
 
 sys.path.append('/app')
@@ -21,7 +23,7 @@ class Step5BlenderIntegration:
         self.logger = logging.getLogger(__name__)
         self.rigging_script = Path('/app/rigging_transfer_adapted.py')
     
-    def integrate_final_output(self, model_name: str, original_file: Path, rigged_file: Path) -> Tuple[bool, str, Dict[str, Any]]:
+    def integrate_final_output(self, model_name: str, original_file: Path, rigged_file: Path, skinning_npz: Optional[Path] = None) -> Tuple[bool, str, Dict[str, Any]]:
         """
         リギング移植対応の最終出力統合（動的ファイル形式対応）
         
@@ -29,6 +31,7 @@ class Step5BlenderIntegration:
             model_name: モデル名
             original_file: オリジナル3Dモデルファイル（テクスチャ・UV・マテリアル保持）
             rigged_file: Step4のリギング済みFBX（ボーン・スキンウェイト保持）
+            skinning_npz: Step3のスキンNPZ（.glb出力ではBlenderを使わずオリジナルGLBにウェイトを移植する）
             
         Returns:
             (success, logs, output_files)
@@ -39,6 +42,14 @@ class Step5BlenderIntegration:
             logs += f"🚀 Step5開始: リギング移植処理\n"
             logs += f"モデル名: {model_name}\n"
             
+            # GLB出力: オリジナルGLB（メッシュ・UV・マテリアル・画像）にスキンNPZのスケルトン・ウェイトを直接移植する
+            if original_file.suffix.lower() == '.glb' and skinning_npz is not None and Path(skinning_npz).exists():
+                success, glb_logs = self._write_glb(model_name, original_file, Path(skinning_npz))
+                logs += glb_logs
+                if success:
+                    return self._handle_output_files(model_name, logs, '.glb')
+                logs += f"🔄 Blenderでのリギング移植にフォールバック\n"
+            
             # 1. 入力ファイル妥当性チェック
             success, validation_logs = self._validate_inputs(original_file, rigged_file)
             logs += validation_logs
@@ -97,6 +108,12 @@ class Step5BlenderIntegration:
                 str(final_output)     # 出力ファイル
             ]
             
+            # Step0のテクスチャストアがあれば、テクスチャを再パックせずハッシュで参照する
+            texture_map_file = self._prepare_stored_textures(model_name, original_file)
+            if texture_map_file is not None:
+                cmd.append(str(texture_map_file))
+                logs += f"🖼️ テクスチャストア参照: {texture_map_file}\n"
+            
             logs += f"💻 実行コマンド: {' '.join(cmd)}\n"
             
             # デバッグログ用一時ファイル
@@ -155,6 +172,58 @@ class Step5BlenderIntegration:
         except Exception as e:
             return False, logs + f"[FAIL] リギング移植エラー: {e}\n"
     
+    def _write_glb(self, model_name: str, original_file: Path, skinning_npz: Path) -> Tuple[bool, str]:
+        """
+        Blenderを使わずオリジナルGLBにリギングを移植する（src/data/gltf_writer.py の rig_gltf）
+        
+        スキンNPZは減面済みメッシュのため、ウェイトはKD木でオリジナルの頂点に移し、
+        オリジナルのメッシュ・UV・マテリアル・画像はそのまま書き出す。
+        失敗時（リギング済み・未対応の拡張など）は呼び出し側でBlender経路にフォールバックする。
+        """
+        final_output = self.output_dir / f"{model_name}_final.glb"
+        logs = f"🔄 GLB直接リギング移植（Blender不要）: {original_file} + {skinning_npz} → {final_output}\n"
+        try:
+            from src.data.gltf_writer import rig_gltf
+            from src.data.raw_data import RawData
+            raw_data = RawData.load(str(skinning_npz))
+            rig_gltf(
+                path=str(final_output),
+                original=str(original_file),
+                vertices=raw_data.vertices,
+                skin=raw_data.skin,
+                joints=raw_data.joints,
+                parents=raw_data.parents,
+                names=raw_data.names,
+            )
+        except Exception as e:
+            if final_output.exists():
+                final_output.unlink()
+            return False, logs + f"[FAIL] GLB直接書き出し不可: {e}\n"
+        if not final_output.exists():
+            return False, logs + f"[FAIL] 出力ファイル未作成: {final_output}\n"
+        return True, logs + f"[OK] GLB書き出し完了\n"
+    
+    def _prepare_stored_textures(self, model_name: str, original_file: Path):
+        """
+        Step0のテクスチャマニフェストから作業ディレクトリにテクスチャを配置（ハードリンク）し、
+        ハッシュ → パスの対応JSONを返す（マニフェストなしはNone）
+        
+        出力ファイルは常にテクスチャを埋め込むため、配置先はダウンロード対象ではない
+        """
+        manifest_file = original_file.parent / f"{model_name}_texture_manifest.json"
+        if not manifest_file.exists():
+            return None
+        try:
+            from src.pipeline.texture_store import load_manifest, materialize
+            texture_map = materialize(load_manifest(manifest_file), self.output_dir / f"{model_name}_stored_textures")
+            texture_map_file = self.output_dir / f"{model_name}_texture_map.json"
+            with open(texture_map_file, 'w', encoding='utf-8') as f:
+                json.dump(texture_map, f, indent=2, ensure_ascii=False)
+            return texture_map_file
+        except Exception as e:
+            self.logger.warning(f"テクスチャストア参照の準備に失敗（従来の埋め込みで続行）: {e}")
+            return None
+    
     def _handle_output_files(self, model_name: str, logs: str, original_ext: str = ".fbx") -> Tuple[bool, str, Dict[str, Any]]:
         """出力ファイル処理と品質確認（動的ファイル形式対応）"""
         
@@ -190,6 +259,17 @@ class Step5BlenderIntegration:
             "size_mb": round(file_size/1024/1024, 2)  # MB単位サイズ
         }
     
+    def _check_fbx_textures(self, final_output: Path) -> str:
+        """ダウンロードされるFBX単体でテクスチャが解決できるか確認（埋め込みまたは実在パス）"""
+        try:
+            from src.pipeline.fbx_validator import unresolved_fbx_textures
+            missing = unresolved_fbx_textures(final_output)
+        except Exception as e:
+            return f"⚠️ FBXテクスチャ確認スキップ: {e}\n"
+        if len(missing) > 0:
+            return f"⚠️ FBX単体で解決できないテクスチャ: {', '.join(missing)}\n"
+        return ""
+    
     def _validate_inputs(self, original_file: Path, rigged_file: Path) -> Tuple[bool, str]:
         """入力ファイルの妥当性チェック"""
         logs = ""
@@ -285,6 +365,8 @@ class Step5BlenderIntegration:
                 # FBXファイルは通常 "Kaydara FBX Binary" で開始
                 if b'Kaydara' not in header and b'FBX' not in header:
                     logs += "⚠️ FBXファイル形式が疑わしいです\n"
+                else:
+                    logs += self._check_fbx_textures(final_output)
             elif file_ext == '.glb':
                 # GLBファイルは "glTF" で開始
                 if b'glTF' not in header:
@@ -305,7 +387,7 @@ class Step5BlenderIntegration:
         return True, logs
 
 # 外部インターフェース
-def integrate_final_output_step5(model_name: str, original_file_path: str, rigged_file_path: str, output_dir: str) -> Tuple[bool, str, Dict[str, Any]]:
+def integrate_final_output_step5(model_name: str, original_file_path: str, rigged_file_path: str, output_dir: str, skinning_npz_path: Optional[str] = None) -> Tuple[bool, str, Dict[str, Any]]:
     """
     Step5外部インターフェース - リギング移植対応版
     
@@ -314,12 +396,18 @@ def integrate_final_output_step5(model_name: str, original_file_path: str, rigge
         original_file_path: オリジナルアセットファイルパス（テクスチャ・UV・マテリアル保持）
         rigged_file_path: リギング済みファイルパス（ボーン・スキンウェイト保持）
         output_dir: 出力ディレクトリ
+        skinning_npz_path: Step3のスキンNPZ（.glb出力時はBlenderを使わない）
         
     Returns:
         (success, logs, output_files)
     """
     try:
         step5 = Step5BlenderIntegration(Path(output_dir))
-        return step5.integrate_final_output(model_name, Path(original_file_path), Path(rigged_file_path))
+        return step5.integrate_final_output(
+            model_name,
+            Path(original_file_path),
+            Path(rigged_file_path),
+            skinning_npz=Path(skinning_npz_path) if skinning_npz_path else None,
+        )
     except Exception as e:
         return False, f"Step5外部インターフェースエラー: {e}", {}
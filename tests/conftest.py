@@ -0,0 +1,7 @@
+import os
+import sys
+
+# テストはリポジトリ直下から src / step_modules を import する
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
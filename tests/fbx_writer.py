@@ -0,0 +1,46 @@
+"""
+テスト用の最小バイナリFBX（7400）ライター
+
+ノードは (名前, プロパティのリスト, 子ノードのリスト) で表す
+"""
+
+import struct
+import zlib
+
+import numpy as np
+
+_ARRAY_CODE = {"int32": b"i", "int64": b"l", "float32": b"f", "float64": b"d"}
+
+def _property(value) -> bytes:
+    if isinstance(value, str):
+        data = value.encode()
+        return b"S" + struct.pack("<I", len(data)) + data
+    if isinstance(value, bytes):
+        return b"R" + struct.pack("<I", len(value)) + value
+    if isinstance(value, int):
+        return b"L" + struct.pack("<q", value)
+    if isinstance(value, float):
+        return b"D" + struct.pack("<d", value)
+    if isinstance(value, np.ndarray):
+        data = zlib.compress(value.tobytes())
+        return _ARRAY_CODE[str(value.dtype)] + struct.pack("<III", len(value), 1, len(data)) + data
+    raise TypeError(type(value))
+
+def _node(name: str, properties: list, children: list, position: int) -> bytes:
+    data = b"".join(_property(p) for p in properties)
+    encoded = name.encode()
+    head = 13 + len(encoded) + len(data)
+    body = b""
+    for child in children:
+        body += _node(*child, position + head + len(body))
+    if len(children) > 0:
+        body += b"\0" * 13
+    return struct.pack("<IIIB", position + head + len(body), len(properties), len(data), len(encoded)) + encoded + data + body
+
+def write_fbx(path, nodes: list):
+    out = b"Kaydara FBX Binary  \x00\x1a\x00" + struct.pack("<I", 7400)
+    for node in nodes:
+        out += _node(*node, len(out))
+    out += b"\0" * 13
+    with open(path, "wb") as f:
+        f.write(out)
@@ -0,0 +1,45 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from src.data.asset import Asset
+from src.data.raw_data import RawData
+from src.data.vertex_group import VertexGroupSkin
+
+def _raw_data(skin) -> RawData:
+    rng = np.random.default_rng(0)
+    N, J = skin.shape
+    joints = rng.uniform(-1, 1, (J, 3)).astype(np.float32)
+    return RawData(
+        vertices=rng.uniform(-1, 1, (N, 3)).astype(np.float32),
+        vertex_normals=None,
+        faces=np.array([[0, 1, 2]]),
+        face_normals=None,
+        joints=joints,
+        tails=joints + 0.1,
+        skin=skin,
+        no_skin=None,
+        parents=[None, 0, 1, 1],
+        names=['root', 'spine', 'arm', 'leg'],
+        matrix_local=None,
+    )
+
+def _skin():
+    rng = np.random.default_rng(1)
+    skin = rng.random((20, 4)).astype(np.float32)
+    skin[skin < 0.5] = 0
+    skin[:, 0] += 1e-3
+    return skin / skin.sum(axis=1, keepdims=True)
+
+def test_sparse_skin_from_npz_is_dense_in_asset(tmp_path):
+    dense = _skin()
+    # predict_skin.npz stores the skin as CSR
+    _raw_data(csr_matrix(dense)).save(str(tmp_path / 'predict_skin.npz'))
+    raw_data = RawData.load(str(tmp_path / 'predict_skin.npz'))
+    asset = Asset.from_raw_data(raw_data=raw_data, cls=None, path=str(tmp_path), data_name='predict_skin.npz')
+    assert isinstance(asset.skin, np.ndarray)
+    np.testing.assert_array_equal(asset.skin, dense)
+    expected = VertexGroupSkin().get_vertex_group(Asset.from_raw_data(raw_data=_raw_data(dense), cls=None, path='', data_name=''))
+    np.testing.assert_allclose(VertexGroupSkin().get_vertex_group(asset)['skin'], expected['skin'])
+    # collapsing bones adds their columns to the parent
+    asset.collapse(keep=['root', 'spine', 'arm'])
+    np.testing.assert_allclose(asset.skin[:, 1], dense[:, 1] + dense[:, 3])
@@ -0,0 +1,66 @@
+import numpy as np
+import trimesh
+
+from src.data.gltf_writer import write_glb
+from src.pipeline.asset_header import analyze_fbx, analyze_header, analyze_obj
+from fbx_writer import write_fbx
+
+def test_glb_counts_without_reading_buffers(tmp_path):
+    mesh = trimesh.creation.icosphere(subdivisions=1)
+    path = tmp_path / "model.glb"
+    write_glb(
+        path=str(path),
+        vertices=np.asarray(mesh.vertices, dtype=np.float32),
+        faces=np.asarray(mesh.faces),
+        uv_coords=np.zeros((mesh.vertices.shape[0], 2), dtype=np.float32),
+        materials=[{'name': 'a'}, {'name': 'b'}],
+    )
+    info = analyze_header(path)
+    assert info["analysis_method"] == "gltf_header"
+    assert info["vertex_count"] == mesh.vertices.shape[0]
+    assert info["face_count"] == mesh.faces.shape[0]
+    assert info["uv_coordinates"] == mesh.vertices.shape[0]
+    assert info["material_count"] == 2
+    assert not info["has_textures"]
+
+def test_obj_scan_across_chunks(tmp_path):
+    (tmp_path / "model.mtl").write_text("newmtl skin\nmap_Kd skin.png\nnewmtl cloth\nmap_Kd cloth.png\nbump cloth_n.png\n")
+    lines = ["mtllib model.mtl", "usemtl skin"]
+    lines += [f"v {i} 0 0" for i in range(50)]
+    lines += [f"vt {i / 50} 0" for i in range(30)]
+    lines += ["usemtl cloth"]
+    lines += [f"f {i + 1} {i + 2} {i + 3}" for i in range(40)]
+    path = tmp_path / "model.obj"
+    path.write_text("\n".join(lines) + "\n")
+    # small chunks so that keywords fall on chunk boundaries
+    for chunk_size in [7, 64, 1 << 20]:
+        info = analyze_obj(path, chunk_size=chunk_size)
+        assert (info["vertex_count"], info["uv_coordinates"], info["face_count"]) == (50, 30, 40)
+        assert info["material_count"] == 2 and info["texture_count"] == 3 and info["has_textures"]
+
+def test_fbx_header(tmp_path):
+    # two quads and one triangle, the last index of every polygon is negative (~index)
+    polygons = np.array([0, 1, 2, ~3, 2, 3, 4, ~5, 0, 4, ~5], dtype=np.int32)
+    path = tmp_path / "model.fbx"
+    write_fbx(path, [("Objects", [], [
+        ("Geometry", [1, "body\x00\x01Geometry", "Mesh"], [
+            ("Vertices", [np.zeros(6 * 3, dtype=np.float64)], []),
+            ("PolygonVertexIndex", [polygons], []),
+            ("LayerElementUV", [0], [("UV", [np.zeros(7 * 2, dtype=np.float64)], [])]),
+            ("LayerElementUV", [1], [("UV", [np.zeros(9 * 2, dtype=np.float64)], [])]),
+        ]),
+        ("Material", [2, "skin\x00\x01Material", ""], []),
+        ("Texture", [3, "albedo\x00\x01Texture", ""], []),
+    ])])
+    info = analyze_fbx(path)
+    assert info["analysis_method"] == "fbx_header"
+    assert (info["vertex_count"], info["face_count"]) == (6, 3)
+    # only the first UV set is counted
+    assert info["uv_coordinates"] == 7
+    assert info["material_count"] == 1 and info["texture_count"] == 1 and info["has_textures"]
+
+def test_unsupported_inputs(tmp_path):
+    path = tmp_path / "ascii.fbx"
+    path.write_text("; FBX 7.4.0 project file\n")
+    assert analyze_header(path)["analysis_method"] == "fbx_ascii_unsupported"
+    assert analyze_header(tmp_path / "model.blend") is None
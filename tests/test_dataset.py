@@ -0,0 +1,23 @@
+import numpy as np
+
+from src.data.dataset import SizeBucketBatchSampler
+
+def _sizes(n: int, seed: int=0):
+    rng = np.random.default_rng(seed)
+    return [(int(j), int(v)) for j, v in zip(rng.integers(1, 60, n), rng.integers(100, 50000, n))]
+
+def test_size_buckets_yield_every_index_once():
+    for n, batch_size in [(1, 4), (10, 3), (12, 4), (37, 8), (5, 16)]:
+        sampler = SizeBucketBatchSampler(sizes=_sizes(n), batch_size=batch_size)
+        batches = list(sampler)
+        assert len(batches) == len(sampler) == (n + batch_size - 1) // batch_size
+        assert sorted(i for batch in batches for i in batch) == list(range(n))
+        assert all(len(batch) == batch_size for batch in batches[:-1])
+
+def test_size_buckets_do_not_overlap():
+    sizes = _sizes(50, seed=1)
+    batches = list(SizeBucketBatchSampler(sizes=sizes, batch_size=6))
+    # every batch holds consecutive (bones, vertices) sizes: its largest item is not larger than
+    # the smallest one of the next batch
+    for a, b in zip(batches[:-1], batches[1:]):
+        assert max(sizes[i] for i in a) <= min(sizes[i] for i in b)
@@ -0,0 +1,41 @@
+import numpy as np
+
+from src.data.exporter import Exporter
+
+# 0 -> 1 -> 2, 0 -> 3, column 4 is a pseudo bone past names
+NAMES = ['root', 'spine', 'head', 'leg']
+PARENTS = [None, 0, 1, 0]
+
+def _weights(skin, groups, **kwargs):
+    indices, weights = Exporter()._vertex_group_weights(skin=skin, names=NAMES, groups=groups, parents=PARENTS, **kwargs)
+    res = np.zeros((skin.shape[0], skin.shape[1]), dtype=np.float32)
+    np.add.at(res, (np.arange(indices.shape[0])[:, None], indices), weights)
+    return res
+
+def test_bones_without_group_fold_into_ancestor():
+    skin = np.array([
+        [0.1, 0.2, 0.6, 0.1, 0.0],
+        [0.0, 0.0, 0.0, 0.5, 0.5],
+    ], dtype=np.float32)
+    # 'head' has no vertex group: its weight goes to 'spine' instead of being dropped
+    res = _weights(skin, groups=['root', 'spine', 'leg'])
+    np.testing.assert_allclose(res[0], [0.1, 0.8, 0., 0.1, 0.], atol=1e-6)
+    # the pseudo bone has no parent among the bones, its weight is dropped before normalizing
+    np.testing.assert_allclose(res[1], [0., 0., 0., 1., 0.], atol=1e-6)
+
+def test_fold_happens_before_top_k():
+    skin = np.array([[0.3, 0.25, 0.25, 0.2, 0.0]], dtype=np.float32)
+    # head + spine = 0.5 beats root, leg is cut
+    res = _weights(skin, groups=['root', 'spine', 'leg'], group_per_vertex=2)
+    np.testing.assert_allclose(res[0], [0.375, 0.625, 0., 0., 0.], atol=1e-6)
+
+def test_vertex_without_weight_goes_to_nearest_bone():
+    skin = np.zeros((1, 4), dtype=np.float32)
+    joints = np.array([[0., 0., 0.], [0., 1., 0.], [0., 2., 0.], [1., 0., 0.]])
+    res = _weights(skin, groups=NAMES, vertices=np.array([[0.9, 0.1, 0.]]), joints=joints)
+    np.testing.assert_allclose(res[0], [0., 0., 0., 1.], atol=1e-6)
+
+def test_do_not_normalize_keeps_raw_weights():
+    skin = np.array([[0.1, 0.2, 0.3, 0.1]], dtype=np.float32)
+    res = _weights(skin, groups=NAMES, do_not_normalize=True)
+    np.testing.assert_allclose(res[0], skin[0], atol=1e-6)
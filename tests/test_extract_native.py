@@ -0,0 +1,88 @@
+import base64
+import json
+
+import numpy as np
+
+from src.data.extract_native import load_gltf
+
+def _write_gltf(path, gltf, arrays):
+    '''arrays: list of (ndarray, accessor type, componentType); buffer views are packed in order'''
+    blob = b""
+    gltf["bufferViews"] = []
+    gltf["accessors"] = []
+    for (array, kind, component) in arrays:
+        data = np.ascontiguousarray(array).tobytes()
+        gltf["bufferViews"].append({"buffer": 0, "byteOffset": len(blob), "byteLength": len(data)})
+        gltf["accessors"].append({
+            "bufferView": len(gltf["bufferViews"]) - 1,
+            "componentType": component,
+            "count": array.shape[0],
+            "type": kind,
+        })
+        blob += data + b"\0" * (-len(data) % 4)
+    gltf["buffers"] = [{"byteLength": len(blob), "uri": "data:application/octet-stream;base64," + base64.b64encode(blob).decode()}]
+    gltf["asset"] = {"version": "2.0"}
+    with open(path, "w") as f:
+        json.dump(gltf, f)
+
+def _translation(t):
+    m = np.eye(4, dtype=np.float32)
+    m[:3, 3] = t
+    return m
+
+def test_skinned_gltf_is_read_in_bind_pose(tmp_path):
+    # bind pose: hip at (0, 1, 0), spine at (0, 2, 0) below an armature node moved by (0, 0, 1)
+    positions = np.array([[0., 1., 0.], [0., 2., 0.], [1., 2., 0.], [0., 3., 0.]], dtype=np.float32)
+    ibm = np.stack([np.linalg.inv(_translation([0, 1, 0])), np.linalg.inv(_translation([0, 2, 0]))])
+    s = np.sqrt(0.5)
+    gltf = {
+        "scene": 0,
+        "scenes": [{"nodes": [0, 3]}],
+        "nodes": [
+            {"name": "Armature", "translation": [0., 0., 1.], "children": [1]},
+            {"name": "hip", "translation": [0., 1., 0.], "children": [2]},
+            # posed: the spine is rotated by 90 degrees about z, so TRS != inverse(IBM)
+            {"name": "spine", "translation": [0., 1., 0.], "rotation": [0., 0., s, s]},
+            # the node transform of a skinned mesh is ignored
+            {"name": "body", "mesh": 0, "skin": 0, "translation": [5., 5., 5.]},
+        ],
+        "skins": [{"joints": [1, 2], "inverseBindMatrices": 3}],
+        "meshes": [{"primitives": [{"attributes": {"POSITION": 0, "JOINTS_0": 1, "WEIGHTS_0": 2}, "indices": 4}]}],
+    }
+    joints = np.array([[0, 0, 0, 0], [1, 0, 0, 0], [1, 0, 0, 0], [1, 0, 0, 0]], dtype=np.uint8)
+    weights = np.array([[1, 0, 0, 0]] * 4, dtype=np.float32)
+    indices = np.array([0, 1, 2, 1, 3, 2], dtype=np.uint16)
+    path = tmp_path / "posed.gltf"
+    _write_gltf(path, gltf, [
+        (positions, "VEC3", 5126),
+        (joints, "VEC4", 5121),
+        (weights, "VEC4", 5126),
+        (ibm.transpose(0, 2, 1).reshape(2, 16).astype(np.float32), "MAT4", 5126),
+        (indices, "SCALAR", 5123),
+    ])
+
+    vertices, faces, armature = load_gltf(str(path))
+
+    def z_up(p):
+        p = np.asarray(p, dtype=np.float64) + np.array([0., 0., 1.])
+        return np.stack([p[:, 0], -p[:, 2], p[:, 1]], axis=1)
+    np.testing.assert_allclose(vertices, z_up(positions), atol=1e-6)
+    np.testing.assert_array_equal(faces, [[0, 1, 2], [1, 3, 2]])
+    assert armature["names"] == ["hip", "spine"]
+    assert armature["parents"] == [None, 0]
+    np.testing.assert_allclose(armature["joints"], z_up([[0., 1., 0.], [0., 2., 0.]]), atol=1e-6)
+
+def test_unskinned_mesh_uses_node_transform(tmp_path):
+    positions = np.array([[0., 0., 0.], [1., 0., 0.], [0., 1., 0.]], dtype=np.float32)
+    gltf = {
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{"mesh": 0, "translation": [1., 2., 3.]}],
+        "meshes": [{"primitives": [{"attributes": {"POSITION": 0}}]}],
+    }
+    path = tmp_path / "static.gltf"
+    _write_gltf(path, gltf, [(positions, "VEC3", 5126)])
+    vertices, faces, armature = load_gltf(str(path))
+    assert armature is None
+    np.testing.assert_array_equal(faces, [[0, 1, 2]])
+    p = positions + np.array([1., 2., 3.])
+    np.testing.assert_allclose(vertices, np.stack([p[:, 0], -p[:, 2], p[:, 1]], axis=1), atol=1e-6)
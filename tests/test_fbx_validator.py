@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from src.pipeline.fbx_validator import inspect_fbx, list_fbx_textures, unresolved_fbx_textures, validate_skinned_fbx
+from fbx_writer import write_fbx
+
+def _video(uid, name, relative, content):
+    children = [("Filename", ["/nowhere/" + relative], []), ("RelativeFilename", [relative], [])]
+    if content is not None:
+        children.append(("Content", [content], []))
+    return ("Video", [uid, name + "\x00\x01Video", "Clip"], children)
+
+def test_embedded_textures_resolve_without_sidecar(tmp_path):
+    path = tmp_path / "model_final.fbx"
+    write_fbx(path, [("Objects", [], [
+        _video(1, "albedo", "model_final.fbm/albedo.png", b"\x89PNG" + b"\0" * 64),
+        _video(2, "normal", "model_final.fbm/normal.png", b"\x89PNG" + b"\0" * 8192),
+    ])])
+    textures = list_fbx_textures(path)
+    assert [t["name"] for t in textures] == ["albedo", "normal"]
+    assert all(t["embedded"] for t in textures)
+    assert unresolved_fbx_textures(path) == []
+
+def test_relative_textures_need_the_sidecar(tmp_path):
+    path = tmp_path / "model_final.fbx"
+    write_fbx(path, [("Objects", [], [
+        _video(1, "albedo", "model_final.fbm/albedo.png", b""),
+        _video(2, "normal", "model_final.fbm/normal.png", None),
+    ])])
+    assert unresolved_fbx_textures(path) == ["albedo", "normal"]
+    (tmp_path / "model_final.fbm").mkdir()
+    (tmp_path / "model_final.fbm" / "albedo.png").write_bytes(b"\x89PNG")
+    assert unresolved_fbx_textures(path) == ["normal"]
+
+def _skinned_fbx(path, weighted_mesh=True):
+    vertices = np.zeros(8 * 3, dtype=np.float64)
+    objects = [
+        ("Model", [10, "Armature\x00\x01Model", "Null"], []),
+        ("Model", [11, "hips\x00\x01Model", "LimbNode"], []),
+        ("Model", [12, "spine\x00\x01Model", "LimbNode"], []),
+        ("Model", [20, "body\x00\x01Model", "Mesh"], []),
+        ("Geometry", [21, "body\x00\x01Geometry", "Mesh"], [("Vertices", [vertices], [])]),
+        ("Model", [30, "hat\x00\x01Model", "Mesh"], []),
+        ("Geometry", [31, "hat\x00\x01Geometry", "Mesh"], [("Vertices", [np.zeros(4 * 3, dtype=np.float64)], [])]),
+        ("Deformer", [40, "skin\x00\x01Deformer", "Skin"], []),
+        ("Deformer", [41, "hips\x00\x01SubDeformer", "Cluster"], [("Indexes", [np.array([0, 1, 2, 3], dtype=np.int32)], [])]),
+        ("Deformer", [42, "spine\x00\x01SubDeformer", "Cluster"], [("Indexes", [np.array([2, 3, 4], dtype=np.int32)], [])]),
+    ]
+    connections = [
+        ("C", ["OO", 11, 10], []),
+        ("C", ["OO", 12, 11], []),
+        ("C", ["OO", 21, 20], []),
+        ("C", ["OO", 31, 30], []),
+        ("C", ["OO", 41, 40], []),
+        ("C", ["OO", 42, 40], []),
+    ]
+    if weighted_mesh:
+        connections.append(("C", ["OO", 40, 21], []))
+    write_fbx(path, [("Objects", [], objects), ("Connections", [], connections)])
+
+def test_inspect_skinned_fbx(tmp_path):
+    path = tmp_path / "skinned.fbx"
+    _skinned_fbx(path)
+    result = inspect_fbx(path)
+    assert result["bone_count"] == 2 and result["has_armature"]
+    assert result["armature_name"] == "Armature"
+    assert result["mesh_count"] == 2 and result["vertex_count"] == 12
+    assert result["skin_count"] == 1 and result["cluster_count"] == 2
+    assert result["meshes_with_vertex_groups"] == ["body"]
+    assert result["meshes_without_vertex_groups"] == ["hat"]
+    # vertices 0..4, shared vertices of both clusters counted once
+    assert result["weighted_vertex_count"] == 5
+    result = validate_skinned_fbx(path)
+    assert result["validation_passed"]
+    assert len(result["error_messages"]) == 1 and "hat" in result["error_messages"][0]
+
+def test_unconnected_skin_fails_validation(tmp_path):
+    path = tmp_path / "unskinned.fbx"
+    _skinned_fbx(path, weighted_mesh=False)
+    result = validate_skinned_fbx(path)
+    assert not result["validation_passed"]
+    assert result["weighted_vertex_count"] == 0
+    assert result["meshes_with_vertex_groups"] == []
+
+def test_ascii_fbx_is_rejected(tmp_path):
+    path = tmp_path / "ascii.fbx"
+    path.write_text("; FBX 7.4.0 project file\n")
+    with pytest.raises(ValueError):
+        inspect_fbx(path)
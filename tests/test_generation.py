@@ -0,0 +1,122 @@
+import math
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import torch
+
+from src.model.generation import GenerationTrace, beam_search, estimate_token_budget
+
+transformers = pytest.importorskip("transformers")
+
+EOS = 3
+PAD = 1
+
+class _EndSoon():
+    '''makes eos more likely with every generated token so hypotheses finish before max_new_tokens'''
+    def __call__(self, input_ids, scores):
+        scores = scores.clone()
+        scores[:, EOS] += 0.4 * input_ids.shape[1]
+        return scores
+
+def _toy_lm(seed: int):
+    torch.manual_seed(seed)
+    config = transformers.OPTConfig(
+        vocab_size=48, hidden_size=32, word_embed_proj_dim=32, ffn_dim=64, num_hidden_layers=2,
+        num_attention_heads=4, max_position_embeddings=128, eos_token_id=EOS, pad_token_id=PAD, bos_token_id=2,
+    )
+    model = transformers.AutoModelForCausalLM.from_config(config).eval()
+    # larger weights than the initialization give peaked, tie-free distributions
+    with torch.no_grad():
+        for p in model.parameters():
+            p.mul_(8.)
+    return model
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("repetition_penalty", [1., 1.5])
+def test_beam_search_matches_generate(seed, repetition_penalty):
+    model = _toy_lm(seed)
+    inputs_embeds = torch.randn(1, 5, 32)
+    kwargs = dict(num_beams=4, max_new_tokens=40, repetition_penalty=repetition_penalty, length_penalty=1.)
+    with torch.no_grad():
+        expected = model.generate(
+            inputs_embeds=inputs_embeds,
+            eos_token_id=EOS,
+            pad_token_id=PAD,
+            do_sample=False,
+            logits_processor=transformers.LogitsProcessorList([_EndSoon()]),
+            **kwargs,
+        )[0]
+    output, trace = beam_search(
+        model=model,
+        inputs_embeds=inputs_embeds,
+        eos_token_id=EOS,
+        pad_token_id=PAD,
+        logits_processor=_EndSoon(),
+        prune_margin=math.inf,
+        **kwargs,
+    )
+    assert trace.beams_pruned == 0
+    assert EOS in expected.tolist()
+    assert output[0].tolist() == expected.tolist()
+
+
+def test_estimate_token_budget_grows_with_extent_and_template():
+    rng = np.random.default_rng(0)
+    small = rng.uniform(-0.1, 0.1, (4096, 3))
+    # one point in every cell of the grid
+    centers = (np.arange(16) + 0.5) / 8 - 1
+    large = np.stack(np.meshgrid(centers, centers, centers), axis=-1).reshape(-1, 3)
+    kwargs = dict(cls=None, min_new_tokens=0, max_new_tokens=100000)
+    # one occupied cell per 1/8 of the cube side
+    assert estimate_token_budget(small, **kwargs) == int(1.5 * 8)
+    assert estimate_token_budget(large, **kwargs) == int(1.5 * 16 ** 3)
+    assert estimate_token_budget(torch.from_numpy(large).float(), **kwargs) == estimate_token_budget(large, **kwargs)
+    # clamped to [min_new_tokens, max_new_tokens]
+    assert estimate_token_budget(small, cls=None, min_new_tokens=384, max_new_tokens=2048) == 384
+    assert estimate_token_budget(large, cls=None, min_new_tokens=384, max_new_tokens=2048) == 2048
+    # 7 tokens per template bone and one per part
+    order = SimpleNamespace(parts={'human': {'body': ['hips', 'spine', 'head'], 'hand': ['l', 'r']}})
+    with_template = estimate_token_budget(small, cls='human', order=order, min_new_tokens=0, max_new_tokens=100000)
+    assert with_template == int(1.5 * 8 + 7 * 5 + 2)
+    assert estimate_token_budget(small, cls='quadruped', order=order, min_new_tokens=0, max_new_tokens=100000) == int(1.5 * 8)
+
+class _NoEosUntil():
+    '''stands in for UniRigAR: generation reaches eos only with a budget of at least `needed`'''
+    def __init__(self, needed: int):
+        self.needed = needed
+        self.budgets = []
+        self.tokenizer = SimpleNamespace(bos=0, eos=EOS, pad=PAD, vocab_size=48, order=None)
+        embedding = torch.nn.Embedding(48, 8)
+        self.transformer = SimpleNamespace(dtype=torch.float32, get_input_embeddings=lambda: embedding)
+
+    def encode_mesh_cond(self, vertices, normals):
+        return torch.zeros(1, 4, 8)
+
+    def _run_generation(self, cond, processor, beam_controller=None, max_new_tokens=0, **kwargs):
+        self.budgets.append(max_new_tokens)
+        token = EOS if max_new_tokens >= self.needed else 5
+        return torch.tensor([[4, token]]), GenerationTrace(steps=2, max_new_tokens=max_new_tokens)
+
+@pytest.mark.parametrize("needed,budgets", [(90, [96]), (300, [96, 192, 384]), (5000, [96, 192, 384, 768, 1000])])
+def test_token_budget_doubles_until_eos(needed, budgets):
+    from src.model.unirig_ar import UniRigAR
+    model = _NoEosUntil(needed)
+    # 64 occupied cells, 1.5 tokens each
+    vertices = torch.from_numpy(np.stack(np.meshgrid(*[np.linspace(-0.2, 0.2, 4)] * 3), axis=-1).reshape(-1, 3)).float()
+    ids, trace = UniRigAR._generate_ids(
+        model, vertices=vertices, normals=vertices, max_new_tokens=1000,
+        token_budget={'min_new_tokens': 0, 'tokens_per_cell': 1.5},
+    )
+    assert model.budgets == budgets
+    assert trace.retries == len(budgets) - 1
+    assert trace.max_new_tokens == budgets[-1]
+    # the bos start token is put in front
+    assert ids[0].tolist()[:2] == [0, 4]
+
+def test_no_retry_without_token_budget():
+    from src.model.unirig_ar import UniRigAR
+    model = _NoEosUntil(5000)
+    _, trace = UniRigAR._generate_ids(model, vertices=torch.zeros(8, 3), normals=torch.zeros(8, 3), max_new_tokens=1000)
+    assert model.budgets == [1000]
+    assert trace.retries == 0
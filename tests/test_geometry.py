@@ -0,0 +1,63 @@
+import numpy as np
+import trimesh
+
+from src.data.geometry import face_normals, merge_vertices, vertex_normals
+
+def test_vertex_normals_match_trimesh():
+    mesh = trimesh.creation.capsule(height=1., radius=0.3)
+    vertices = np.asarray(mesh.vertices)
+    faces = np.asarray(mesh.faces)
+    np.testing.assert_allclose(face_normals(vertices, faces), mesh.face_normals, atol=1e-8)
+    np.testing.assert_allclose(vertex_normals(vertices, faces, weighting='angle'), mesh.vertex_normals, atol=1e-6)
+
+def test_area_weighting():
+    # a vertex shared by a large and a small face leans towards the large one
+    vertices = np.array([[0., 0., 0.], [4., 0., 0.], [0., 4., 0.], [0., 0., 1.], [0., -1., 0.]])
+    faces = np.array([[0, 1, 2], [0, 4, 3]])
+    n = vertex_normals(vertices, faces, weighting='area')
+    expected = 16 * np.array([0., 0., 1.]) + np.array([-1., 0., 0.])
+    np.testing.assert_allclose(n[0], expected / np.linalg.norm(expected), atol=1e-8)
+    np.testing.assert_allclose(np.linalg.norm(n, axis=1), 1., atol=1e-8)
+
+def test_degenerate_faces_get_zero_normals():
+    vertices = np.array([[0., 0., 0.], [1., 0., 0.], [2., 0., 0.], [5., 5., 5.]])
+    faces = np.array([[0, 1, 2]])
+    assert (face_normals(vertices, faces) == 0).all()
+    # vertices without faces too
+    assert (vertex_normals(vertices, faces)[3] == 0).all()
+
+def test_merge_vertices_welds_split_corners():
+    mesh = trimesh.creation.box()
+    # split every face corner into its own vertex
+    vertices = np.asarray(mesh.vertices)[np.asarray(mesh.faces).reshape(-1)]
+    faces = np.arange(vertices.shape[0]).reshape(-1, 3)
+    vertices = vertices + np.random.default_rng(0).uniform(-1e-10, 1e-10, vertices.shape)
+    merged, new_faces, inverse = merge_vertices(vertices, faces)
+    assert merged.shape == (8, 3)
+    np.testing.assert_array_equal(new_faces, inverse[faces])
+    # order of first occurrence
+    first = [int(np.where(inverse == i)[0][0]) for i in range(8)]
+    assert first == sorted(first)
+    np.testing.assert_allclose(merged[inverse], vertices, atol=1e-8)
+
+def test_merge_vertices_respects_digits():
+    vertices = np.array([[0., 0., 0.], [0.004, 0., 0.], [0.1, 0., 0.]])
+    faces = np.array([[0, 1, 2]])
+    assert merge_vertices(vertices, faces, digits=2)[0].shape[0] == 2
+    assert merge_vertices(vertices, faces, digits=4)[0].shape[0] == 3
+    empty = np.zeros((0, 3))
+    assert merge_vertices(empty, np.zeros((0, 3), dtype=np.int64))[2].shape == (0,)
+
+def test_merge_vertices_drops_unreferenced():
+    # 1 duplicates 0, 3 and 5 are not used by any face
+    vertices = np.array([[0., 0., 0.], [0., 0., 0.], [1., 0., 0.], [9., 9., 9.], [0., 1., 0.], [7., 7., 7.], [1., 1., 0.]])
+    faces = np.array([[1, 2, 4], [2, 6, 4]])
+    merged, new_faces, inverse = merge_vertices(vertices, faces)
+    np.testing.assert_array_equal(merged, vertices[[0, 2, 4, 6]])
+    np.testing.assert_array_equal(new_faces, [[0, 1, 2], [1, 3, 2]])
+    np.testing.assert_array_equal(inverse, [0, 0, 1, -1, 2, -1, 3])
+    # same triangles as before
+    np.testing.assert_array_equal(merged[new_faces], vertices[faces])
+    kept, kept_faces, kept_inverse = merge_vertices(vertices, faces, drop_unreferenced=False)
+    assert kept.shape[0] == 6 and (kept_inverse >= 0).all()
+    np.testing.assert_array_equal(kept[kept_faces], vertices[faces])
@@ -0,0 +1,206 @@
+import json
+import struct
+
+import numpy as np
+import trimesh
+from scipy.sparse import csr_matrix
+from scipy.spatial import cKDTree
+
+from src.data.extract_native import GLTF, load_gltf
+from src.data.gltf_writer import rig_gltf, write_glb
+from src.data.raw_data import RawData
+from src.data.skinning import prune_skin
+from step_modules.step5_blender_integration import Step5BlenderIntegration
+
+NAMES = ['hips', 'spine', 'head', 'leg.L', 'leg.R']
+PARENTS = [None, 0, 1, 0, 0]
+
+def _raw_data(sparse: bool=False) -> RawData:
+    mesh = trimesh.creation.icosphere(subdivisions=2)
+    vertices = np.asarray(mesh.vertices, dtype=np.float32)
+    faces = np.asarray(mesh.faces, dtype=np.int64)
+    joints = np.array([[0., 0., 0.], [0., 0., 0.4], [0., 0., 0.8], [0.2, 0., -0.1], [-0.2, 0., -0.1]], dtype=np.float32)
+    tails = joints + np.array([0., 0., 0.1], dtype=np.float32)
+    rng = np.random.default_rng(0)
+    skin = np.exp(-8 * np.linalg.norm(vertices[:, None] - joints[None], axis=2)) * rng.uniform(0.5, 1., (vertices.shape[0], 5))
+    skin = (skin / skin.sum(axis=1, keepdims=True)).astype(np.float32)
+    return RawData(
+        vertices=vertices,
+        vertex_normals=np.asarray(mesh.vertex_normals, dtype=np.float32),
+        faces=faces,
+        face_normals=np.asarray(mesh.face_normals, dtype=np.float32),
+        joints=joints,
+        tails=tails,
+        skin=csr_matrix(skin) if sparse else skin,
+        no_skin=None,
+        parents=PARENTS,
+        names=NAMES,
+        matrix_local=None,
+    )
+
+def _check_round_trip(raw_data: RawData, path: str):
+    vertices, faces, armature = load_gltf(path)
+    np.testing.assert_allclose(vertices, raw_data.vertices, atol=1e-6)
+    np.testing.assert_array_equal(faces, raw_data.faces)
+    assert armature['names'] == NAMES
+    assert armature['parents'] == PARENTS
+    np.testing.assert_allclose(armature['joints'], raw_data.joints, atol=1e-6)
+
+    # node hierarchy
+    reader = GLTF(path)
+    nodes = reader.gltf['nodes']
+    joint_nodes = reader.gltf['skins'][0]['joints']
+    parent_of = {c: i for i, node in enumerate(nodes) for c in node.get('children', [])}
+    for (k, j) in enumerate(joint_nodes):
+        assert nodes[j]['name'] == NAMES[k]
+        p = parent_of.get(j)
+        expected = PARENTS[k]
+        assert (p in joint_nodes and joint_nodes.index(p) == expected) or (expected is None and p not in joint_nodes)
+
+    # JOINTS_0 / WEIGHTS_0 are the top 4 weights of every vertex, renormalized
+    attributes = next(node for node in nodes if 'mesh' in node)
+    primitive = reader.gltf['meshes'][attributes['mesh']]['primitives'][0]['attributes']
+    skin_joints = reader.accessor(primitive['JOINTS_0'])
+    skin_weights = reader.accessor(primitive['WEIGHTS_0'])
+    indices, weights = prune_skin(raw_data.skin, k=4)
+    exported = np.zeros((vertices.shape[0], len(NAMES)))
+    expected = np.zeros_like(exported)
+    rows = np.arange(vertices.shape[0])[:, None]
+    np.add.at(exported, (rows, skin_joints), skin_weights)
+    np.add.at(expected, (rows, indices), weights)
+    np.testing.assert_allclose(exported, expected, atol=1e-6)
+    np.testing.assert_allclose(skin_weights.sum(axis=1), 1., atol=1e-6)
+
+def test_glb_round_trip(tmp_path):
+    for sparse in [False, True]:
+        raw_data = _raw_data(sparse=sparse)
+        path = str(tmp_path / f"model_{sparse}.glb")
+        raw_data.export_glb(path=path)
+        _check_round_trip(raw_data, path)
+
+def _textured_original(path: str, subdivisions: int=3) -> str:
+    # a denser mesh than the predicted one, with uvs and an embedded image
+    mesh = trimesh.creation.icosphere(subdivisions=subdivisions)
+    vertices = np.asarray(mesh.vertices, dtype=np.float32)
+    uv = np.stack([np.arctan2(vertices[:, 1], vertices[:, 0]) / (2 * np.pi) + 0.5, vertices[:, 2] * 0.5 + 0.5], axis=1)
+    texture = path.replace('.glb', '_albedo.png')
+    with open(texture, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n' + bytes(range(256)))
+    write_glb(
+        path=path,
+        vertices=vertices,
+        faces=np.asarray(mesh.faces),
+        vertex_normals=np.asarray(mesh.vertex_normals),
+        uv_coords=uv,
+        materials=[{'name': 'body', 'base_color': [1., 0.5, 0.5, 1.], 'texture': texture}],
+    )
+    return texture
+
+def _set_node(path: str, **node):
+    # patch the first node of a .glb written by write_glb
+    with open(path, 'rb') as f:
+        data = f.read()
+    length, _ = struct.unpack_from('<II', data, 12)
+    gltf = json.loads(data[20:20 + length])
+    gltf['nodes'][0].update(node)
+    content = json.dumps(gltf).encode('utf-8')
+    content += b' ' * ((-len(content)) % 4)
+    rest = data[20 + length:]
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<4sII', b'glTF', 2, 20 + len(content) + len(rest)))
+        f.write(struct.pack('<II', len(content), 0x4E4F534A))
+        f.write(content)
+        f.write(rest)
+
+def test_step5_writes_glb_without_blender(tmp_path):
+    raw_data = _raw_data()
+    npz = tmp_path / "bird_skinning.npz"
+    raw_data.save(str(npz))
+    original = tmp_path / "bird.glb"
+    write_glb(path=str(original), vertices=raw_data.vertices, faces=raw_data.faces, vertex_normals=raw_data.vertex_normals)
+    step5 = Step5BlenderIntegration(tmp_path / "step5")
+    # Blender would be needed for the merged FBX, which does not exist here
+    success, logs, files = step5.integrate_final_output("bird", original, tmp_path / "missing.fbx", skinning_npz=npz)
+    assert success, logs
+    assert files['final_output'].endswith("bird_final.glb")
+    _check_round_trip(raw_data, files['final_output'])
+
+def test_step5_keeps_uvs_and_images_of_the_original(tmp_path):
+    raw_data = _raw_data()
+    npz = tmp_path / "bird_skinning.npz"
+    raw_data.save(str(npz))
+    original = tmp_path / "bird.glb"
+    _textured_original(str(original))
+    step5 = Step5BlenderIntegration(tmp_path / "step5")
+    success, logs, files = step5.integrate_final_output("bird", original, tmp_path / "missing.fbx", skinning_npz=npz)
+    assert success, logs
+
+    before = GLTF(str(original))
+    after = GLTF(files['final_output'])
+    primitive_before = before.gltf['meshes'][0]['primitives'][0]
+    primitive_after = after.gltf['meshes'][0]['primitives'][0]
+    # the original (not the predicted, decimated) mesh with its uvs, material and image
+    for name in ['POSITION', 'NORMAL', 'TEXCOORD_0']:
+        np.testing.assert_array_equal(after.accessor(primitive_after['attributes'][name]), before.accessor(primitive_before['attributes'][name]))
+    np.testing.assert_array_equal(after.accessor(primitive_after['indices']), before.accessor(primitive_before['indices']))
+    assert after.gltf['materials'] == before.gltf['materials']
+    assert after.gltf['textures'] == before.gltf['textures']
+    def image(reader: GLTF, i: int) -> bytes:
+        view = reader.gltf['bufferViews'][reader.gltf['images'][i]['bufferView']]
+        return reader.buffers[view['buffer']][view.get('byteOffset', 0):view.get('byteOffset', 0) + view['byteLength']]
+    assert len(after.gltf['images']) == 1
+    assert image(after, 0) == image(before, 0)
+
+    # weights of the predicted mesh on its own vertices, which the denser sphere contains
+    vertices, _, armature = load_gltf(files['final_output'])
+    assert armature['names'] == NAMES
+    np.testing.assert_allclose(armature['joints'], raw_data.joints, atol=1e-6)
+    skin_joints = after.accessor(primitive_after['attributes']['JOINTS_0'])
+    skin_weights = after.accessor(primitive_after['attributes']['WEIGHTS_0'])
+    np.testing.assert_allclose(skin_weights.sum(axis=1), 1., atol=1e-6)
+    distance, nearest = cKDTree(vertices).query(raw_data.vertices)
+    assert distance.max() < 1e-5
+    exported = np.zeros((raw_data.N, len(NAMES)))
+    rows = np.arange(raw_data.N)[:, None]
+    np.add.at(exported, (rows, skin_joints[nearest]), skin_weights[nearest])
+    indices, weights = prune_skin(raw_data.skin, k=4)
+    expected = np.zeros_like(exported)
+    np.add.at(expected, (rows, indices), weights)
+    np.testing.assert_allclose(exported, expected, atol=1e-6)
+
+def test_rig_gltf_bakes_node_transforms(tmp_path):
+    raw_data = _raw_data()
+    original = str(tmp_path / "bird.glb")
+    _textured_original(original, subdivisions=2)
+    # the mesh sits 1 above the origin in glTF's frame, i.e. at z = 1 in Blender's
+    _set_node(original, translation=[0., 1., 0.])
+    moved = raw_data.vertices + np.array([0., 0., 1.], dtype=np.float32)
+    output = str(tmp_path / "rigged.glb")
+    rig_gltf(path=output, original=original, vertices=moved, skin=raw_data.skin, joints=raw_data.joints + np.array([0., 0., 1.]), parents=PARENTS, names=NAMES)
+    vertices, _, armature = load_gltf(output)
+    np.testing.assert_allclose(vertices, moved, atol=1e-6)
+    np.testing.assert_allclose(armature['joints'], raw_data.joints + np.array([0., 0., 1.]), atol=1e-6)
+    reader = GLTF(output)
+    attributes = reader.gltf['meshes'][0]['primitives'][0]['attributes']
+    skin_joints = reader.accessor(attributes['JOINTS_0'])
+    skin_weights = reader.accessor(attributes['WEIGHTS_0'])
+    indices, weights = prune_skin(raw_data.skin, k=4)
+    exported = np.zeros((raw_data.N, len(NAMES)))
+    expected = np.zeros_like(exported)
+    rows = np.arange(raw_data.N)[:, None]
+    np.add.at(exported, (rows, skin_joints), skin_weights)
+    np.add.at(expected, (rows, indices), weights)
+    np.testing.assert_allclose(exported, expected, atol=1e-6)
+
+def test_step5_falls_back_to_blender_for_rigged_originals(tmp_path):
+    raw_data = _raw_data()
+    npz = tmp_path / "bird_skinning.npz"
+    raw_data.save(str(npz))
+    original = tmp_path / "bird.glb"
+    raw_data.export_glb(path=str(original))
+    step5 = Step5BlenderIntegration(tmp_path / "step5")
+    success, logs, _ = step5.integrate_final_output("bird", original, tmp_path / "missing.fbx", skinning_npz=npz)
+    # the Blender path needs the merged FBX, which does not exist here
+    assert not success
+    assert "フォールバック" in logs
+    assert not (tmp_path / "step5" / "bird_final.glb").exists()
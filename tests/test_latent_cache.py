@@ -0,0 +1,53 @@
+import warnings
+
+import torch
+from torch import nn
+
+from src.model.latent_cache import LatentCache
+
+def _encoder():
+    torch.manual_seed(0)
+    return nn.Sequential(nn.Linear(3, 8), nn.ReLU(), nn.Linear(8, 4)).eval()
+
+def test_key_depends_on_autocast_and_quantization():
+    cache = LatentCache()
+    module = _encoder()
+    x = torch.randn(16, 3)
+    key = cache.key(module, x)
+    assert cache.key(module, x) == key
+    with torch.autocast(device_type='cpu', dtype=torch.bfloat16):
+        assert cache.key(module, x) != key
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        from torch.ao.quantization import quantize_dynamic
+        quantized = quantize_dynamic(_encoder(), {nn.Linear}, dtype=torch.qint8)
+    assert cache.key(quantized, x) != key
+
+def test_get_or_compute_reuses_memory_and_disk(tmp_path):
+    module = _encoder()
+    x = torch.randn(16, 3)
+    calls = []
+    def compute():
+        calls.append(1)
+        return module(x)
+    with torch.no_grad():
+        cache = LatentCache(cache_dir=str(tmp_path))
+        first = cache.get_or_compute(module, compute, x)
+        assert torch.equal(cache.get_or_compute(module, compute, x), first)
+        # a new process only finds the spilled file
+        assert torch.equal(LatentCache(cache_dir=str(tmp_path)).get_or_compute(module, compute, x), first)
+        with torch.autocast(device_type='cpu', dtype=torch.bfloat16):
+            cache.get_or_compute(module, compute, x)
+    assert len(calls) == 2
+
+def test_no_cache_with_gradients():
+    module = _encoder()
+    x = torch.randn(4, 3)
+    cache = LatentCache()
+    calls = []
+    def compute():
+        calls.append(1)
+        return module(x)
+    cache.get_or_compute(module, compute, x)
+    cache.get_or_compute(module, compute, x)
+    assert len(calls) == 2
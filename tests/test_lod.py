@@ -0,0 +1,118 @@
+import numpy as np
+import trimesh
+
+from src.data.lod import build_lod_pyramid, decimate, find_lod, level_raw_data, load_lod, pick_level, save_lod
+from src.data.raw_data import RawData
+
+def _sphere():
+    mesh = trimesh.creation.icosphere(subdivisions=4)
+    return np.asarray(mesh.vertices, dtype=np.float32), np.asarray(mesh.faces, dtype=np.int64)
+
+def test_pyramid_levels_and_mapping():
+    vertices, faces = _sphere()
+    levels = build_lod_pyramid(vertices, faces, face_counts=[500, 2000, 10000])
+    # 10000 is not below the 5120 faces of the base mesh and is skipped, finest level first
+    assert len(levels) == 2
+    assert levels[0].F <= 2000 and levels[1].F <= 500 and levels[0].F > levels[1].F
+    for level in levels:
+        assert level.mapping.shape == (vertices.shape[0],)
+        assert level.mapping.min() >= 0 and level.mapping.max() < level.N
+        assert level.faces.max() < level.N
+        # every base vertex collapsed into a nearby vertex of the level
+        distance = np.linalg.norm(vertices - level.vertices[level.mapping], axis=1)
+        assert distance.max() < 0.5
+        assert np.abs(np.linalg.norm(level.vertices, axis=1) - 1).max() < 0.05
+
+def test_lift_is_indexing_by_mapping():
+    vertices, faces = _sphere()
+    level = build_lod_pyramid(vertices, faces, face_counts=[1000])[0]
+    values = np.arange(level.N * 2, dtype=np.float32).reshape(level.N, 2)
+    lifted = level.lift(values)
+    assert lifted.shape == (vertices.shape[0], 2)
+    np.testing.assert_array_equal(lifted, values[level.mapping])
+    # lifting the level positions approximates the base mesh
+    assert np.abs(level.lift(level.vertices) - vertices).mean() < 0.1
+
+def test_save_load_and_pick(tmp_path):
+    vertices, faces = _sphere()
+    levels = build_lod_pyramid(vertices, faces, face_counts=[2000, 500])
+    save_lod(str(tmp_path / 'lod.npz'), levels)
+    loaded = load_lod(str(tmp_path / 'lod.npz'))
+    for a, b in zip(levels, loaded):
+        np.testing.assert_array_equal(a.vertices, b.vertices)
+        np.testing.assert_array_equal(a.faces, b.faces)
+        np.testing.assert_array_equal(a.mapping, b.mapping)
+    assert pick_level(loaded, max_faces=3000) is loaded[1]
+    assert pick_level(loaded, max_faces=100) is None
+    assert pick_level(loaded, min_vertices=loaded[1].N + 1) is loaded[0]
+
+def test_level_raw_data_restricts_skin():
+    vertices, faces = _sphere()
+    level = build_lod_pyramid(vertices, faces, face_counts=[1000])[0]
+    skin = np.zeros((vertices.shape[0], 2), dtype=np.float32)
+    skin[vertices[:, 2] > 0, 0] = 1.
+    skin[vertices[:, 2] <= 0, 1] = 1.
+    raw = RawData(
+        vertices=vertices, vertex_normals=None, faces=faces, face_normals=None,
+        joints=np.zeros((2, 3), dtype=np.float32), tails=None, skin=skin, no_skin=None,
+        parents=[None, 0], names=['a', 'b'], matrix_local=None,
+    )
+    res = level_raw_data(raw, level)
+    assert res.vertices.shape[0] == level.N and res.skin.shape == (level.N, 2)
+    np.testing.assert_allclose(np.linalg.norm(res.vertex_normals, axis=1), 1., atol=1e-4)
+    # every level vertex takes the weight of a base vertex that collapsed into it
+    for v in np.random.default_rng(0).choice(level.N, 50, replace=False):
+        members = np.where(level.mapping == v)[0]
+        assert any(np.array_equal(res.skin[v], skin[m]) for m in members)
+
+def test_mappings_compose_across_levels():
+    vertices, faces = _sphere()
+    fine, coarse = build_lod_pyramid(vertices, faces, face_counts=[2000, 500])
+    # base vertices that collapsed together in the finer level stay together in the coarser one
+    step = np.full(fine.N, -1, dtype=np.int64)
+    step[fine.mapping] = coarse.mapping
+    np.testing.assert_array_equal(step[fine.mapping], coarse.mapping)
+    # and the coarse level is the fine level decimated again
+    _, _, direct = decimate(fine.vertices, fine.faces, target_count=500)
+    np.testing.assert_array_equal(direct[fine.mapping], coarse.mapping)
+
+def test_find_lod(tmp_path):
+    assert find_lod(None) is None
+    assert find_lod(str(tmp_path / 'raw_data.npz')) is None
+    save_lod(str(tmp_path / 'lod.npz'), [])
+    assert find_lod(str(tmp_path / 'raw_data.npz')) == str(tmp_path / 'lod.npz')
+    assert find_lod(str(tmp_path)) == str(tmp_path / 'lod.npz')
+
+def test_step2_reuses_the_pyramid_step1_extracted(tmp_path, monkeypatch):
+    import logging
+    from pathlib import Path
+    from src.data.extract_native import save_raw_data
+    from step_modules import step2_skeleton
+    from step_modules.step1_extract import Step1Extract
+    vertices, faces = _sphere()
+    # the extractor writes raw_data.npz and lod.npz to <input parent>/<stem>/
+    extracted = tmp_path / 'input' / 'model' / 'raw_data.npz'
+    save_raw_data(
+        path=str(extracted), vertices=vertices, faces=faces, joints=None, tails=None, parents=None,
+        names=None, matrix_local=None, target_count=50000, lod_face_counts=[2000, 500],
+    )
+    step1 = Step1Extract(output_dir=tmp_path / 'work' / 'model' / '01_extracted_mesh')
+    step1._move_extracted(extracted, step1.output_dir / 'raw_data.npz')
+    assert (step1.output_dir / 'lod.npz').exists()
+    assert not extracted.parent.exists()
+
+    # without the UniRig base directory of __init__
+    step2 = step2_skeleton.Step2Skeleton.__new__(step2_skeleton.Step2Skeleton)
+    step2.step_output_dir = tmp_path / 'work' / 'model' / '02_skeleton'
+    step2.step_output_dir.mkdir()
+    step2.logger = logging.getLogger(__name__)
+    def extract(*args, **kwargs):
+        raise AssertionError("Step2 extracted the mesh again")
+    monkeypatch.setattr(step2_skeleton.subprocess, 'run', extract)
+    processing = tmp_path / 'processing'
+    processing.mkdir()
+    ok, logs = step2._execute_skeleton_specific_mesh_extraction(Path('model.glb'), processing, 'model')
+    assert ok, logs
+    raw_data = RawData.load(str(processing / 'raw_data.npz'))
+    assert 0 < raw_data.F <= 2000
+    assert (step2.step_output_dir / 'mesh_for_skeleton' / 'raw_data.npz').exists()
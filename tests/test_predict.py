@@ -0,0 +1,27 @@
+from torch import nn
+
+from src.inference.predict import Predictor
+
+class _Writer():
+    def __init__(self, repeat: int):
+        self.repeat = repeat
+        self._epoch = 0
+        self.calls = []
+
+class _Predictor(Predictor):
+    def predict_one(self, raw_data, path=None, cls=None):
+        self.writer.calls.append((self.writer._epoch, path))
+        return path
+
+def test_predict_honors_writer_repeat():
+    writer = _Writer(repeat=3)
+    predictor = _Predictor(system=nn.Identity(), writer=writer, transform_config=None, device='cpu')
+    items = iter([(None, 'a'), (None, 'b')])
+    res = predictor.predict(items)
+    assert res == ['a', 'b'] * 3
+    assert writer.calls == [(epoch, path) for epoch in range(3) for path in ['a', 'b']]
+
+def test_predict_without_writer_runs_once():
+    predictor = _Predictor(system=nn.Identity(), writer=None, transform_config=None, device='cpu')
+    predictor.predict_one = lambda raw_data, path=None, cls=None: path
+    assert predictor.predict([(None, 'a')]) == ['a']
@@ -0,0 +1,55 @@
+import pytest
+import torch
+from torch import nn
+
+pytest.importorskip("spconv")
+pytest.importorskip("torch_scatter")
+from src.model.pointcept.models.PTv3Object import padding_and_inverse
+from src.model.pointcept.models.utils.misc import offset2bincount
+
+def _reference(offset, K):
+    # per-cloud loop of the original Pointcept implementation
+    offset = torch.tensor(offset, dtype=torch.long)
+    bincount = offset2bincount(offset)
+    bincount_pad = torch.div(bincount + K - 1, K, rounding_mode="trunc") * K
+    mask_pad = bincount > K
+    bincount_pad = ~mask_pad * bincount + mask_pad * bincount_pad
+    _offset = nn.functional.pad(offset, (1, 0))
+    _offset_pad = nn.functional.pad(torch.cumsum(bincount_pad, dim=0), (1, 0))
+    pad = torch.arange(_offset_pad[-1])
+    unpad = torch.arange(_offset[-1])
+    cu_seqlens = []
+    for i in range(len(offset)):
+        unpad[_offset[i]:_offset[i + 1]] += _offset_pad[i] - _offset[i]
+        if bincount[i] != bincount_pad[i]:
+            pad[_offset_pad[i + 1] - K + (bincount[i] % K):_offset_pad[i + 1]] = \
+                pad[_offset_pad[i + 1] - 2 * K + (bincount[i] % K):_offset_pad[i + 1] - K]
+        pad[_offset_pad[i]:_offset_pad[i + 1]] -= _offset_pad[i] - _offset[i]
+        cu_seqlens.append(torch.arange(_offset_pad[i], _offset_pad[i + 1], step=K, dtype=torch.int32))
+    cu_seqlens = nn.functional.pad(torch.cat(cu_seqlens), (0, 1), value=_offset_pad[-1])
+    return pad, unpad, cu_seqlens
+
+@pytest.mark.parametrize("offset", [
+    (10,),
+    (48,),
+    (50,),
+    (7, 57, 64, 130),
+    (16, 32, 49),
+])
+def test_padding_matches_reference(offset):
+    K = 16
+    pad, unpad, cu_seqlens = padding_and_inverse(offset, K, torch.device('cpu'))
+    ref_pad, ref_unpad, ref_cu_seqlens = _reference(offset, K)
+    torch.testing.assert_close(pad, ref_pad)
+    torch.testing.assert_close(unpad, ref_unpad)
+    torch.testing.assert_close(cu_seqlens, ref_cu_seqlens)
+    # padding then unpadding is the identity
+    points = torch.arange(offset[-1])
+    torch.testing.assert_close(points[pad][unpad], points)
+
+def test_padding_is_cached_per_offset():
+    a = padding_and_inverse((20, 70), 16, torch.device('cpu'))
+    b = padding_and_inverse((20, 70), 16, torch.device('cpu'))
+    c = padding_and_inverse((20, 71), 16, torch.device('cpu'))
+    assert all(x is y for x, y in zip(a, b))
+    assert a[0] is not c[0]
@@ -0,0 +1,68 @@
+import torch
+from torch import nn
+
+from src.model.registry import build_model, convert_checkpoint, load_weights
+
+class _Tied(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.embed = nn.Embedding(16, 8)
+        self.body = nn.Sequential(nn.Linear(8, 8), nn.LayerNorm(8))
+        self.head = nn.Linear(8, 16, bias=False)
+        self.head.weight = self.embed.weight
+
+def _checkpoint(tmp_path):
+    torch.manual_seed(0)
+    model = _Tied()
+    path = str(tmp_path / 'model.ckpt')
+    torch.save({'state_dict': {f"model.{k}": v for k, v in model.state_dict().items()}, 'optimizer_states': []}, path)
+    return model, path
+
+def test_convert_and_load_keep_tied_weights(tmp_path):
+    model, path = _checkpoint(tmp_path)
+    converted = convert_checkpoint(path)
+    assert converted.endswith('model.safetensors')
+    for weights in [path, converted]:
+        state_dict = load_weights(weights)
+        assert state_dict.keys() == model.state_dict().keys()
+        for k, v in model.state_dict().items():
+            assert torch.equal(state_dict[k], v)
+
+def test_build_model_without_initialization(tmp_path):
+    model, path = _checkpoint(tmp_path)
+    built = build_model(_Tied, convert_checkpoint(path))
+    assert not any(p.is_meta for p in built.parameters())
+    x = torch.randint(0, 16, (4,))
+    with torch.no_grad():
+        assert torch.equal(built.head(built.body(built.embed(x))), model.head(model.body(model.embed(x))))
+
+def test_bench_builds_a_task_model(tmp_path):
+    import yaml
+    from box import Box
+    from src.model.parse import get_model
+    from src.model.registry import bench
+    from src.tokenizer.parse import get_tokenizer
+    from src.tokenizer.spec import TokenizerConfig
+    with open('configs/model/unirig_ar_350m_1024_81920_float32.yaml', 'r', encoding='utf-8') as f:
+        model_config = yaml.safe_load(f)
+    # a tiny model with the same structure, so that bench reads the config exactly like run.py
+    model_config['llm'].update(hidden_size=32, word_embed_proj_dim=32, ffn_dim=64, num_hidden_layers=1, num_attention_heads=2, _attn_implementation='eager')
+    model_config['mesh_encoder'].update(num_latents=16, embed_dim=8, width=32, heads=2, num_encoder_layers=1, flash=False)
+    model_config['latent_cache'] = None
+    with open(tmp_path / 'toy.yaml', 'w', encoding='utf-8') as f:
+        yaml.safe_dump(model_config, f)
+    with open('configs/tokenizer/tokenizer_parts_articulationxl_256.yaml', 'r', encoding='utf-8') as f:
+        tokenizer = get_tokenizer(config=TokenizerConfig.parse(config=Box(yaml.safe_load(f))))
+    model = get_model(tokenizer=tokenizer, **Box(model_config))
+    ckpt = str(tmp_path / 'model.ckpt')
+    torch.save({'state_dict': {f"model.{k}": v for k, v in model.state_dict().items()}}, ckpt)
+    task = {
+        'resume_from_checkpoint': ckpt,
+        # absolute paths are kept by os.path.join, so the toy config is read from tmp_path
+        'components': {'model': str(tmp_path / 'toy'), 'tokenizer': 'tokenizer_parts_articulationxl_256'},
+    }
+    with open(tmp_path / 'task.yaml', 'w', encoding='utf-8') as f:
+        yaml.safe_dump(task, f)
+    seconds = bench(str(tmp_path / 'task.yaml'), repeat=1)
+    assert 0 < seconds < float('inf')
+    assert (tmp_path / 'model.safetensors').exists()
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+import trimesh
+from scipy.sparse import issparse
+
+from src.system.skin import reskin as _reskin
+
+def reskin(**kwargs):
+    return _reskin(**kwargs).toarray()
+
+def _case(seed: int, parents):
+    mesh = trimesh.creation.icosphere(subdivisions=3)
+    vertices = np.asarray(mesh.vertices)
+    faces = np.asarray(mesh.faces)
+    rng = np.random.default_rng(seed)
+    joints = rng.uniform(-1, 1, (len(parents), 3))
+    samples = vertices[rng.choice(vertices.shape[0], 100, replace=False)]
+    skin = np.exp(-4 * np.linalg.norm(samples[:, None] - joints[None], axis=2))
+    skin /= skin.sum(axis=1, keepdims=True)
+    return dict(sampled_vertices=samples, vertices=vertices, parents=parents, faces=faces, sampled_skin=skin), rng
+
+# two root bones: no accumulated column is constant, so diffusion does not hinge on rounding
+FOREST = [None, 0, 1, None, 3, 4]
+TREE = [None, 0, 1, 1, 3, 0]
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("iter_steps", [1, 2, 3])
+def test_sparse_matches_explicit_without_ties(seed, iter_steps):
+    kwargs, _ = _case(seed, FOREST)
+    explicit = reskin(**kwargs, iter_steps=iter_steps, solver='explicit')
+    # eps=0: same update, only float rounding differs
+    np.testing.assert_allclose(reskin(**kwargs, iter_steps=iter_steps, solver='sparse', eps=0.), explicit, rtol=0, atol=1e-6)
+    # default eps=1e-6: near-tied edges do not diffuse, rows move by less than 1e-2
+    np.testing.assert_allclose(reskin(**kwargs, iter_steps=iter_steps, solver='sparse'), explicit, rtol=0, atol=1e-2)
+
+def test_sparse_ignores_rounding_noise_of_the_root():
+    kwargs, rng = _case(0, TREE)
+    noisy = dict(kwargs, sampled_skin=kwargs['sampled_skin'] * (1 + 1e-7 * rng.standard_normal(kwargs['sampled_skin'].shape)))
+    a = reskin(**kwargs, iter_steps=2, solver='sparse')
+    b = reskin(**noisy, iter_steps=2, solver='sparse')
+    np.testing.assert_allclose(a, b, rtol=0, atol=1e-5)
+
+@pytest.mark.parametrize("solver", ['explicit', 'sparse', 'implicit'])
+def test_rows_are_normalized(solver):
+    kwargs, _ = _case(0, TREE)
+    skin = reskin(**kwargs, iter_steps=2, solver=solver)
+    assert skin.shape == (kwargs['vertices'].shape[0], len(TREE))
+    assert (skin >= 0).all()
+    np.testing.assert_allclose(skin.sum(axis=1), 1., rtol=1e-5)
+
+def test_top_k_stays_sparse():
+    kwargs, _ = _case(0, TREE)
+    skin = _reskin(**kwargs, iter_steps=2, solver='sparse', top_k=2)
+    assert issparse(skin) and skin.shape == (kwargs['vertices'].shape[0], len(TREE))
+    assert (np.diff(skin.indptr) <= 2).all()
+    np.testing.assert_allclose(np.asarray(skin.sum(axis=1)).reshape(-1), 1., rtol=1e-5)
@@ -0,0 +1,43 @@
+import numpy as np
+import trimesh
+
+from src.data.skeleton_score import OccupancyGrid, rank_skeletons, score_skeleton
+
+def _points():
+    # upright box, x in [-0.3, 0.3], z in [-1, 1]
+    mesh = trimesh.creation.box(extents=[0.6, 0.4, 2.0])
+    points, _ = trimesh.sample.sample_surface(mesh, 4000, seed=0)
+    return points
+
+# spine with two mirrored arms, inside and symmetric
+GOOD = (np.array([[0., 0., -0.8], [0., 0., 0.], [0., 0., 0.8], [0.2, 0., 0.4], [-0.2, 0., 0.4]]), [None, 0, 1, 1, 1])
+# same spine with one arm only
+ONE_ARM = (np.array([[0., 0., -0.8], [0., 0., 0.], [0., 0., 0.8], [0.2, 0., 0.4]]), [None, 0, 1, 1])
+# same skeleton behind the box, still symmetric along x
+OUTSIDE = (GOOD[0] + np.array([0., 1.5, 0.]), GOOD[1])
+SINGLE = (np.zeros((1, 3)), [None])
+
+def test_rank_orders_by_total_score():
+    skeletons = [OUTSIDE, ONE_ARM, SINGLE, GOOD]
+    order, scores = rank_skeletons(skeletons=skeletons, points=_points())
+    assert order == [3, 1, 0, 2]
+    # scores stay in input order
+    totals = [s.total for s in scores]
+    assert totals[3] > totals[1] > totals[0] > totals[2] == 0.
+    assert scores[3].symmetry > scores[1].symmetry
+    assert scores[0].inside == 0.
+
+def test_ties_keep_generation_order():
+    order, _ = rank_skeletons(skeletons=[SINGLE, GOOD, SINGLE, GOOD], points=_points())
+    assert order == [1, 3, 0, 2]
+
+def test_weights_change_the_ranking():
+    occupancy = OccupancyGrid(points=_points())
+    # asymmetric but covering vs symmetric but short: only symmetry counts here
+    short = (np.array([[0., 0., -0.1], [0., 0., 0.1]]), [None, 0])
+    a = score_skeleton(*ONE_ARM, occupancy=occupancy, weights=(0., 1., 0.))
+    b = score_skeleton(*short, occupancy=occupancy, weights=(0., 1., 0.))
+    assert b.total > a.total
+    a = score_skeleton(*ONE_ARM, occupancy=occupancy, weights=(0., 0., 1.))
+    b = score_skeleton(*short, occupancy=occupancy, weights=(0., 0., 1.))
+    assert a.total > b.total
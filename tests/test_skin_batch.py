@@ -0,0 +1,136 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import torch
+import yaml
+from box import Box
+from scipy.sparse import issparse
+
+pytest.importorskip("torch_scatter")
+from src.data.raw_data import RawData
+from src.model.parse import get_model
+from src.model.parse_encoder import MAP_MESH_ENCODER
+from src.system.skin import SkinWriter
+
+class _PointwiseEncoder(MAP_MESH_ENCODER.ptv3obj):
+    '''stands in for PTv3, whose sparse convolutions need CUDA, and treats every point alone'''
+    def __init__(self, channels: int):
+        torch.nn.Module.__init__(self)
+        self.linear = torch.nn.Linear(9, channels)
+
+    def forward(self, data_dict, min_coord=None):
+        return SimpleNamespace(feat=self.linear(data_dict['feat']))
+
+def _model():
+    with open('configs/model/unirig_skin.yaml', 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    config.update(
+        num_train_vertex=64, chunk_memory_budget=None, num_heads=2, feat_dim=16, mlp_dim=8,
+        num_bone_attn=1, num_mesh_bone_attn=1, bone_embed_dim=16, latent_cache=None, attn_backend='sdpa',
+    )
+    config['mesh_encoder'].update(enc_depths=[1], enc_channels=[16], enc_num_head=[1], enc_patch_size=[16], enable_flash=False)
+    config['global_encoder'].update(num_latents=8, embed_dim=8, width=16, heads=2, num_encoder_layers=1, flash=False)
+    torch.manual_seed(0)
+    model = get_model(**Box(config)).eval()
+    model.mesh_encoder = _PointwiseEncoder(16)
+    return model
+
+def _item(seed: int, J: int, N: int=200):
+    g = torch.Generator().manual_seed(seed)
+    joints = torch.rand(J, 3, generator=g) * 2 - 1
+    return dict(
+        vertices=torch.rand(N, 3, generator=g) * 2 - 1,
+        normals=torch.nn.functional.normalize(torch.randn(N, 3, generator=g), dim=-1),
+        joints=joints,
+        tails=joints + 0.1,
+        parents=torch.tensor([-1] + list(range(J - 1))),
+        voxel_skin=torch.rand(N, J, generator=g),
+        num_bones=J,
+    )
+
+def _collate(items):
+    # pads bones to the largest item like the skin collate
+    J = max(item['num_bones'] for item in items)
+    N = items[0]['vertices'].shape[0]
+    def pad(x, value=0.):
+        return torch.nn.functional.pad(x, (0, 0) * (x.dim() - 1) + (0, J - x.shape[0]), value=value)
+    return dict(
+        vertices=torch.stack([item['vertices'] for item in items]),
+        normals=torch.stack([item['normals'] for item in items]),
+        joints=torch.stack([pad(item['joints']) for item in items]),
+        tails=torch.stack([pad(item['tails']) for item in items]),
+        parents=torch.stack([pad(item['parents'], -1) for item in items]),
+        voxel_skin=torch.stack([torch.nn.functional.pad(item['voxel_skin'], (0, J - item['num_bones'])) for item in items]),
+        num_bones=torch.tensor([item['num_bones'] for item in items]),
+        offset=[N * (i + 1) for i in range(len(items))],
+    )
+
+@pytest.mark.parametrize("fused_head", [False, True])
+def test_batched_skin_matches_single(fused_head):
+    model = _model()
+    model.fused_head = fused_head
+    items = [_item(0, J=7), _item(1, J=4), _item(2, J=5)]
+    with torch.no_grad():
+        batched = model.predict_step(_collate(items))
+        for item, skin in zip(items, batched):
+            single = model.predict_step(_collate([item]))[0]
+            assert skin.shape == single.shape == (200, item['num_bones'])
+            torch.testing.assert_close(skin, single, rtol=0, atol=1e-5)
+
+def _dense(skin):
+    return np.asarray(skin.todense()) if issparse(skin) else np.asarray(skin)
+
+def _writer_batch(assets, paths):
+    # collated like the skin dataset: every array padded to the largest asset
+    def stack(key, value=0):
+        n = max(a[key].shape[0] for a in assets)
+        return torch.stack([
+            torch.nn.functional.pad(torch.as_tensor(a[key]), (0, 0) * (a[key].ndim - 1) + (0, n - a[key].shape[0]), value=value)
+            for a in assets
+        ])
+    return {
+        'vertices': stack('sampled'),
+        'origin_vertices': stack('vertices'),
+        'origin_faces': stack('faces'),
+        'joints': stack('joints'),
+        'tails': stack('tails'),
+        'parents': stack('parents', value=-1),
+        'num_points': torch.tensor([a['vertices'].shape[0] for a in assets]),
+        'num_faces': torch.tensor([a['faces'].shape[0] for a in assets]),
+        'num_bones': torch.tensor([a['joints'].shape[0] for a in assets]),
+        'path': paths,
+    }
+
+def _asset(seed: int, N: int, F: int, J: int, S: int=64):
+    rng = np.random.default_rng(seed)
+    joints = rng.uniform(-1, 1, (J, 3)).astype(np.float32)
+    skin = rng.random((S, J)).astype(np.float32)
+    return {
+        'sampled': rng.uniform(-1, 1, (S, 3)).astype(np.float32),
+        'vertices': rng.uniform(-1, 1, (N, 3)).astype(np.float32),
+        'faces': rng.integers(0, N, (F, 3)),
+        'joints': joints,
+        'tails': joints + 0.1,
+        'parents': np.array([-1] + list(range(J - 1))),
+        'skin': torch.from_numpy(skin / skin.sum(axis=1, keepdims=True)),
+    }
+
+def test_writer_unpads_every_item(tmp_path):
+    assets = [_asset(0, N=50, F=30, J=6), _asset(1, N=40, F=20, J=3)]
+    paths = [str(tmp_path / 'a'), str(tmp_path / 'b')]
+    batched = SkinWriter(output_dir=str(tmp_path / 'batched'), save_name='predict_skin', export_fbx=False)
+    batched.write_on_batch_end(None, None, {'skin_pred': [a['skin'] for a in assets]}, None, _writer_batch(assets, paths), 0, 0)
+    for asset, path in zip(assets, paths):
+        name = path.rsplit('/', 1)[-1]
+        single = SkinWriter(output_dir=str(tmp_path / f"single_{name}"), save_name='predict_skin', export_fbx=False)
+        single.write_on_batch_end(None, None, {'skin_pred': [asset['skin']]}, None, _writer_batch([asset], [path]), 0, 0)
+        a = RawData.load(str(tmp_path / 'batched' / f"{name}_predict_skin.npz"))
+        b = RawData.load(str(tmp_path / f"single_{name}" / 'unknown_predict_skin.npz'))
+        assert a.vertices.shape == (asset['vertices'].shape[0], 3)
+        assert a.faces.shape == asset['faces'].shape
+        assert len(a.parents) == a.joints.shape[0] == asset['joints'].shape[0]
+        np.testing.assert_array_equal(a.vertices, asset['vertices'])
+        np.testing.assert_array_equal(a.faces, asset['faces'])
+        np.testing.assert_array_equal(_dense(a.skin), _dense(b.skin))
+        assert _dense(a.skin).shape == (asset['vertices'].shape[0], asset['joints'].shape[0])
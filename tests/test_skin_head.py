@@ -0,0 +1,96 @@
+import pytest
+import torch
+from torch import nn
+
+pytest.importorskip("torch_scatter")
+from src.model.unirig_skin import SkinweightPred, UniRigSkin
+
+def _head(feat_dim: int=32, num_heads: int=4, mlp_dim: int=16) -> UniRigSkin:
+    # only the modules of the skin head, without the mesh encoders
+    model = UniRigSkin.__new__(UniRigSkin)
+    nn.Module.__init__(model)
+    model.feat_dim = feat_dim
+    model.num_heads = num_heads
+    model.qmesh = nn.Linear(feat_dim, feat_dim * num_heads)
+    model.voxel_skin_embed = nn.Linear(1, num_heads)
+    model.voxel_skin_norm = nn.LayerNorm(num_heads)
+    model.attn_skin_norm = nn.LayerNorm(num_heads)
+    model.downscale = nn.Sequential(
+        nn.Linear(2 * num_heads, num_heads),
+        nn.LayerNorm(num_heads),
+        nn.GELU(),
+    )
+    model.skinweight_pred = SkinweightPred(num_heads, mlp_dim)
+    return model.eval()
+
+def _inputs(model: UniRigSkin, dtype: torch.dtype, B: int=2, N: int=37, J: int=9):
+    mesh_feat = torch.randn(B, N, model.feat_dim, dtype=dtype)
+    bone_feat = torch.randn(B, J, model.num_heads, model.feat_dim, dtype=dtype)
+    voxel_skin = torch.rand(B, N, J, dtype=dtype)
+    return dict(mesh_feat=mesh_feat, bone_feat=bone_feat, voxel_skin=voxel_skin, dtype=dtype)
+
+def _skin(model: UniRigSkin, attn_weight: torch.Tensor) -> torch.Tensor:
+    B, N, J, _ = attn_weight.shape
+    return torch.softmax(model.skinweight_pred(attn_weight).reshape(B, N, J).float(), dim=-1)
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_fused_head_matches_unfused(seed):
+    torch.manual_seed(seed)
+    model = _head()
+    inputs = _inputs(model, torch.float32)
+    with torch.no_grad():
+        a = model._attn_weight(**inputs)
+        b = model._fused_attn_weight(**inputs)
+        assert a.shape == b.shape == (2, 37, 9, model.num_heads)
+        torch.testing.assert_close(b, a, rtol=0, atol=1e-5)
+        torch.testing.assert_close(_skin(model, b), _skin(model, a), rtol=0, atol=1e-6)
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_fused_head_in_bfloat16(seed):
+    # the split Linear rounds differently from Linear on the concat, single activations can move by
+    # ~0.1 after LayerNorm, skin weights by a few 1e-3
+    torch.manual_seed(seed)
+    model = _head().to(torch.bfloat16)
+    inputs = _inputs(model, torch.bfloat16)
+    with torch.no_grad():
+        a = model._attn_weight(**inputs)
+        b = model._fused_attn_weight(**inputs)
+        assert (b.float() - a.float()).abs().mean() < 5e-3
+        torch.testing.assert_close(_skin(model, b), _skin(model, a), rtol=0, atol=1e-2)
+
+def _chunked(model: UniRigSkin, chunk_memory_budget) -> UniRigSkin:
+    model.num_train_vertex = 512
+    model.mlp_dim = 16
+    model.fused_head = False
+    model.chunk_memory_budget = chunk_memory_budget
+    return model
+
+def test_chunk_size_from_budget():
+    model = _chunked(_head(), chunk_memory_budget=None)
+    assert model._get_chunk_size(B=1, N=100000, J=9, dtype=torch.float32, device=torch.device('cpu')) == 512
+    model.chunk_memory_budget = 1
+    # per vertex: query projection, attention/voxel/downscale, MLP and concat activations in float32
+    per_vertex = 4 * (4 * 32 + 9 * (8 * 4 + 3 * 16) + 9 * 2 * 4)
+    assert model._get_chunk_size(B=1, N=100000, J=9, dtype=torch.float32, device=torch.device('cpu')) == (1 << 20) // per_vertex
+    assert model._get_chunk_size(B=2, N=100000, J=9, dtype=torch.float32, device=torch.device('cpu')) == (1 << 20) // (2 * per_vertex)
+    # never more than the mesh, never zero
+    assert model._get_chunk_size(B=1, N=10, J=9, dtype=torch.float32, device=torch.device('cpu')) == 10
+    model.chunk_memory_budget = 1e-6
+    assert model._get_chunk_size(B=1, N=100000, J=9, dtype=torch.float32, device=torch.device('cpu')) == 1
+
+def test_auto_chunk_size_without_sysconf(monkeypatch):
+    import os
+    from src.model import unirig_skin
+    model = _chunked(_head(), chunk_memory_budget='auto')
+    cpu = torch.device('cpu')
+    monkeypatch.setattr(unirig_skin, 'available_memory', lambda: 64 << 20)
+    assert 512 < model._get_chunk_size(B=1, N=100000, J=9, dtype=torch.float32, device=cpu) < 100000
+    monkeypatch.undo()
+    # sysconf names missing (macOS) or sysconf missing altogether (Windows) fall back to num_train_vertex
+    def missing(name):
+        raise ValueError(f"unrecognized configuration name: {name}")
+    monkeypatch.setattr(os, 'sysconf', missing)
+    assert unirig_skin.available_memory() is None
+    assert model._get_chunk_size(B=1, N=100000, J=9, dtype=torch.float32, device=cpu) == 512
+    monkeypatch.delattr(os, 'sysconf')
+    assert model._get_chunk_size(B=1, N=100000, J=9, dtype=torch.float32, device=cpu) == 512
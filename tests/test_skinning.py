@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+from scipy.sparse import csr_matrix
+from scipy.spatial.transform import Rotation
+
+from src.data.skinning import forward_kinematics, get_levels, identity_matrix_local, prune_skin, sparse_linear_blend_skinning
+from src.data.utils import linear_blend_skinning
+
+# 0 -> 1 -> 2, 0 -> 3 -> 4, 5 is a second root
+PARENTS = [None, 0, 1, 0, 3, None]
+
+def _pose(seed: int, J: int=len(PARENTS)):
+    rng = np.random.default_rng(seed)
+    matrix_local = np.tile(np.eye(4, dtype=np.float32), (J, 1, 1))
+    matrix_local[:, :3, :3] = Rotation.random(J, random_state=seed).as_matrix()
+    matrix_local[:, :3, 3] = rng.uniform(-1, 1, (J, 3))
+    matrix_basis = np.tile(np.eye(4, dtype=np.float32), (J, 1, 1))
+    matrix_basis[:, :3, :3] = Rotation.random(J, random_state=seed + 100).as_matrix()
+    matrix_basis[:, :3, 3] = rng.uniform(-0.1, 0.1, (J, 3))
+    return rng, matrix_local, matrix_basis
+
+def test_levels_group_joints_by_depth():
+    levels = get_levels(PARENTS)
+    assert [sorted(level.tolist()) for level in levels] == [[0, 5], [1, 3], [2, 4]]
+    with pytest.raises(AssertionError):
+        get_levels([1, None])
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_forward_kinematics_matches_recursion(seed):
+    _, matrix_local, matrix_basis = _pose(seed)
+    expected = np.zeros_like(matrix_local)
+    for i, p in enumerate(PARENTS):
+        if p is None:
+            expected[i] = matrix_local[i] @ matrix_basis[i]
+        else:
+            expected[i] = expected[p] @ np.linalg.inv(matrix_local[p]) @ matrix_local[i] @ matrix_basis[i]
+    np.testing.assert_allclose(forward_kinematics(matrix_local, matrix_basis, PARENTS), expected, atol=1e-5)
+
+def test_rest_pose_is_identity():
+    _, matrix_local, _ = _pose(0)
+    identity = np.tile(np.eye(4, dtype=np.float32), (len(PARENTS), 1, 1))
+    np.testing.assert_allclose(forward_kinematics(matrix_local, identity, PARENTS), matrix_local, atol=1e-5)
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_sparse_lbs_matches_dense(sparse):
+    rng, matrix_local, matrix_basis = _pose(0)
+    matrix = forward_kinematics(matrix_local, matrix_basis, PARENTS)
+    vertices = rng.uniform(-1, 1, (300, 3)).astype(np.float32)
+    skin = rng.uniform(0, 1, (300, len(PARENTS))).astype(np.float32)
+    # at most 2 bones per vertex, rows not normalized
+    skin[skin < np.sort(skin, axis=1)[:, -2:-1]] = 0.
+    expected = linear_blend_skinning(vertices, matrix_local, matrix, skin, pad=1, value=1.)
+    res = sparse_linear_blend_skinning(vertices, matrix_local, matrix, csr_matrix(skin) if sparse else skin, pad=1, value=1.)
+    np.testing.assert_allclose(res, expected, atol=1e-4)
+
+def test_lbs_rest_pose_keeps_vertices():
+    joints = np.random.default_rng(0).uniform(-1, 1, (3, 3)).astype(np.float32)
+    matrix_local = identity_matrix_local(joints)
+    vertices = np.random.default_rng(1).uniform(-1, 1, (50, 3)).astype(np.float32)
+    skin = np.full((50, 3), 1 / 3, dtype=np.float32)
+    res = sparse_linear_blend_skinning(vertices, matrix_local, matrix_local, skin, pad=1, value=1.)
+    np.testing.assert_allclose(res, vertices, atol=1e-5)
+
+def _dense(indices, weights, J):
+    res = np.zeros((indices.shape[0], J), dtype=np.float32)
+    np.add.at(res, (np.arange(indices.shape[0])[:, None], indices), weights)
+    return res
+
+def test_prune_keeps_top_k_normalized():
+    skin = np.array([[0.1, 0.5, 0.2, 0.2, 0., 0.], [0.3, 0., 0., 0., 0.6, 0.1]], dtype=np.float32)
+    indices, weights = prune_skin(skin, k=2, chunk_elements=6)
+    assert indices.shape == (2, 2)
+    # sorted by descending weight
+    assert indices[0, 0] == 1 and indices[1].tolist() == [4, 0]
+    np.testing.assert_allclose(weights.sum(axis=1), 1., atol=1e-6)
+    np.testing.assert_allclose(_dense(indices, weights, 6)[1], [1 / 3, 0, 0, 0, 2 / 3, 0], atol=1e-6)
+    # sparse input gives the same result
+    s_indices, s_weights = prune_skin(csr_matrix(skin), k=2)
+    np.testing.assert_allclose(_dense(s_indices, s_weights, 6), _dense(indices, weights, 6), atol=1e-6)
+
+def test_prune_threshold():
+    skin = np.array([[0.7, 0.295, 0.005], [0.004, 0.003, 0.002]], dtype=np.float32)
+    res = _dense(*prune_skin(skin, k=-1, threshold=0.01), 3)
+    np.testing.assert_allclose(res[0], [0.7 / 0.995, 0.295 / 0.995, 0.], atol=1e-6)
+    # no weight reaches the threshold: the row is kept and normalized
+    np.testing.assert_allclose(res[1], skin[1] / skin[1].sum(), atol=1e-6)
+
+def test_prune_folds_invalid_bones_into_ancestors():
+    skin = np.array([[0.1, 0.2, 0.3, 0.1, 0.2, 0.1]], dtype=np.float32)
+    valid = np.array([True, False, False, True, True, False])
+    res = _dense(*prune_skin(skin, k=-1, parents=PARENTS, valid=valid), 6)
+    # 1 and 2 go to 0, the second root has no valid ancestor and is dropped
+    np.testing.assert_allclose(res[0], np.array([0.6, 0, 0, 0.1, 0.2, 0]) / 0.9, atol=1e-6)
+
+def test_prune_fallback_for_empty_rows():
+    skin = np.zeros((2, 3), dtype=np.float32)
+    joints = np.array([[0., 0., 0.], [1., 0., 0.], [0., 1., 0.]])
+    vertices = np.array([[0.9, 0.1, 0.], [0.1, 0.8, 0.]])
+    res = _dense(*prune_skin(skin, k=2, vertices=vertices, joints=joints), 3)
+    np.testing.assert_allclose(res, [[0, 1, 0], [0, 0, 1]])
+    # without positions: the first valid bone
+    res = _dense(*prune_skin(skin, k=2, valid=np.array([False, True, True])), 3)
+    np.testing.assert_allclose(res, [[0, 1, 0], [0, 1, 0]])
+    # normalize=False leaves empty rows alone
+    _, weights = prune_skin(skin, k=2, normalize=False)
+    assert (weights == 0).all()
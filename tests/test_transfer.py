@@ -0,0 +1,51 @@
+import numpy as np
+from scipy.sparse import csr_matrix, issparse
+
+from src.data.raw_data import RawData
+from src.data.skinning import prune_skin
+from src.data.transfer import SkinTransfer, transfer_skin
+
+def _samples(seed: int=0, M: int=200, J: int=8):
+    rng = np.random.default_rng(seed)
+    vertices = rng.uniform(-1, 1, (M, 3)).astype(np.float32)
+    skin = rng.uniform(0, 1, (M, J)).astype(np.float32)
+    skin /= skin.sum(axis=1, keepdims=True)
+    return rng, vertices, skin
+
+def test_pruned_rows_sum_to_one():
+    rng, vertices, skin = _samples()
+    targets = rng.uniform(-1, 1, (1000, 3))
+    for k in [1, 4]:
+        res = transfer_skin(vertices, skin, targets, k=k, group_per_vertex=3, chunk_size=128)
+        assert issparse(res) and res.shape == (1000, 8)
+        assert (np.diff(res.indptr) <= 3).all()
+        np.testing.assert_allclose(np.asarray(res.sum(axis=1)).reshape(-1), 1., rtol=1e-5)
+
+def test_empty_rows_go_to_nearest_joint():
+    _, vertices, skin = _samples(J=4)
+    # samples near x = 1 carry no weight at all
+    skin[vertices[:, 0] > 0.5] = 0.
+    joints = np.array([[-1., 0., 0.], [1., 0., 0.], [0., 1., 0.], [0., -1., 0.]])
+    targets = np.array([[0.99, 0., 0.], [0.95, 0.05, 0.]])
+    res = SkinTransfer(vertices, skin, group_per_vertex=2, joints=joints).transfer(targets).toarray()
+    np.testing.assert_allclose(res, [[0., 1., 0., 0.], [0., 1., 0., 0.]])
+
+def test_prune_skin_accepts_sparse():
+    _, _, skin = _samples(J=12)
+    skin[skin < 0.05] = 0.
+    dense = prune_skin(skin, k=3, chunk_elements=64)
+    sparse = prune_skin(csr_matrix(skin), k=3, chunk_elements=64)
+    np.testing.assert_array_equal(dense[0], sparse[0])
+    np.testing.assert_allclose(dense[1], sparse[1])
+
+def test_sparse_skin_survives_npz(tmp_path):
+    _, vertices, skin = _samples(J=4)
+    raw = RawData(
+        vertices=vertices, vertex_normals=None, faces=None, face_normals=None,
+        joints=np.zeros((4, 3), dtype=np.float32), tails=None, skin=csr_matrix(skin), no_skin=None,
+        parents=[None, 0, 0, 0], names=['a', 'b', 'c', 'd'], matrix_local=None,
+    )
+    raw.save(str(tmp_path / 'predict_skin.npz'))
+    loaded = RawData.load(str(tmp_path / 'predict_skin.npz'))
+    assert issparse(loaded.skin)
+    np.testing.assert_allclose(loaded.skin.toarray(), skin)
@@ -101,8 +101,10 @@ class UnifiedPipelineOrchestrator:
             if not merged_file:
                 return False, logs + "Step4出力ファイル不明\n", {}
             
+            # .glb出力はStep3のスキンNPZからBlenderを使わずに書き出す
             success, step5_logs, step5_files = integrate_final_output_step5(
-                model_name, str(input_file), merged_file, str(step_dirs["step5"])
+                model_name, str(input_file), merged_file, str(step_dirs["step5"]),
+                skinning_npz_path=step3_files.get("skinning_npz") or None
             )
             logs += f"--- Step5 ---\n{step5_logs}\n"
             
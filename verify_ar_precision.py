@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+スケルトン生成（UniRigAR）の推論精度モード検証
+
+- float32 を基準に、bfloat16 (CPU autocast) / int8 (動的量子化) のジョイント位置を比較
+- 入力は固定シードの合成メッシュ（カプセル・人型・四足・箱）なので再現可能
+- 生成は決定的（do_sample=False）に行い、精度の差だけを比較する
+- 指標: ジョイント数の一致、ジョイント集合間の対称Chamfer距離（正規化座標 [-1, 1]）
+
+使い方:
+    python verify_ar_precision.py --modes bfloat16 int8 --tolerance 0.02
+"""
+
+import argparse
+import copy
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+import torch
+import trimesh
+import yaml
+from box import Box
+from scipy.spatial import cKDTree
+
+from src.inference.download import download
+from src.model.parse import get_model
+from src.model.registry import build_model
+from src.tokenizer.parse import get_tokenizer
+from src.tokenizer.spec import TokenizerConfig
+
+def load_yaml(path: str) -> Box:
+    with open(path, 'r', encoding='utf-8') as f:
+        return Box(yaml.safe_load(f))
+
+def synthetic_meshes() -> Dict[str, trimesh.Trimesh]:
+    def box(extents, center):
+        return trimesh.creation.box(extents=extents, transform=trimesh.transformations.translation_matrix(center))
+    humanoid = trimesh.util.concatenate([
+        box([0.5, 0.3, 0.7], [0, 0, 0.2]),      # torso
+        box([0.3, 0.3, 0.3], [0, 0, 0.75]),     # head
+        box([0.6, 0.12, 0.12], [0.55, 0, 0.45]), # arms
+        box([0.6, 0.12, 0.12], [-0.55, 0, 0.45]),
+        box([0.15, 0.15, 0.8], [0.15, 0, -0.55]), # legs
+        box([0.15, 0.15, 0.8], [-0.15, 0, -0.55]),
+    ])
+    quadruped = trimesh.util.concatenate([
+        box([0.4, 1.0, 0.35], [0, 0, 0.2]),     # body
+        box([0.25, 0.3, 0.25], [0, -0.6, 0.4]), # head
+        *[box([0.1, 0.1, 0.5], [x, y, -0.2]) for x in [-0.15, 0.15] for y in [-0.4, 0.4]],
+    ])
+    return {
+        'capsule': trimesh.creation.capsule(height=1.2, radius=0.25),
+        'humanoid': humanoid,
+        'quadruped': quadruped,
+        'box': trimesh.creation.box(extents=[0.6, 0.4, 1.2]),
+    }
+
+def sample(mesh: trimesh.Trimesh, num_points: int, seed: int) -> Dict[str, torch.Tensor]:
+    points, face_index = trimesh.sample.sample_surface(mesh, num_points, seed=seed)
+    normals = mesh.face_normals[face_index]
+    # 学習時と同じく [-1, 1] に正規化
+    center = (points.max(axis=0) + points.min(axis=0)) / 2
+    scale = (points.max(axis=0) - points.min(axis=0)).max() / 2
+    points = (points - center) / scale
+    return {
+        'vertices': torch.from_numpy(points.astype(np.float32)),
+        'normals': torch.from_numpy(normals.astype(np.float32)),
+    }
+
+def chamfer(a: np.ndarray, b: np.ndarray) -> float:
+    if a.shape[0] == 0 or b.shape[0] == 0:
+        return float('inf')
+    return float((cKDTree(b).query(a)[0].mean() + cKDTree(a).query(b)[0].mean()) / 2)
+
+def predict(model, data: Dict[str, torch.Tensor], generate_kwargs: Dict) -> np.ndarray:
+    batch = {
+        'vertices': data['vertices'].unsqueeze(0),
+        'normals': data['normals'].unsqueeze(0),
+        'path': ['synthetic'],
+        'cls': [None],
+        'generate_kwargs': generate_kwargs,
+    }
+    return np.asarray(model.predict_step(batch)[0].joints)
+
+def main() -> bool:
+    parser = argparse.ArgumentParser(description="UniRigAR 推論精度モードの精度検証")
+    parser.add_argument("--task", type=str, default="configs/task/quick_inference_skeleton_articulationxl_ar_256.yaml")
+    parser.add_argument("--modes", type=str, nargs='+', default=['bfloat16', 'int8'])
+    parser.add_argument("--num_points", type=int, default=65536)
+    parser.add_argument("--num_beams", type=int, default=1, help="決定的な生成のビーム数")
+    parser.add_argument("--max_new_tokens", type=int, default=2048)
+    parser.add_argument("--tolerance", type=float, default=0.02, help="許容する平均Chamfer距離")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    torch.manual_seed(args.seed)
+    task = load_yaml(args.task)
+    tokenizer = get_tokenizer(config=TokenizerConfig.parse(config=load_yaml(f"configs/tokenizer/{task.components.tokenizer}.yaml")))
+    model_config = load_yaml(f"configs/model/{task.components.model}.yaml")
+    system_config = load_yaml(f"configs/system/{task.components.system}.yaml")
+
+    generate_kwargs = dict(system_config.generate_kwargs)
+    generate_kwargs.update(do_sample=False, num_beams=args.num_beams, num_return_sequences=1, num_candidates=1, max_new_tokens=args.max_new_tokens)
+    for k in ['top_k', 'top_p', 'temperature']:
+        generate_kwargs.pop(k, None)
+
+    ckpt = download(task.resume_from_checkpoint)
+    start = time.time()
+    baseline = build_model(lambda: get_model(tokenizer=tokenizer, **model_config), ckpt).eval()
+    print(f"model loaded in {time.time() - start:.1f}s from {ckpt}")
+
+    # 精度モード間で潜在表現を共有しないよう、キャッシュ（ディスク退避を含む）は使わない
+    baseline.latent_cache = None
+    models = {'float32': baseline}
+    for mode in args.modes:
+        models[mode] = copy.deepcopy(baseline)
+        models[mode].inference_precision = mode
+
+    ok = True
+    results: Dict[str, List[float]] = {mode: [] for mode in args.modes}
+    for i, (name, mesh) in enumerate(synthetic_meshes().items()):
+        data = sample(mesh, num_points=args.num_points, seed=args.seed + i)
+        timings = {}
+        joints = {}
+        for mode, model in models.items():
+            start = time.time()
+            joints[mode] = predict(model, data, generate_kwargs)
+            timings[mode] = time.time() - start
+        for mode in args.modes:
+            d = chamfer(joints['float32'], joints[mode])
+            results[mode].append(d)
+            same = joints['float32'].shape[0] == joints[mode].shape[0]
+            print(
+                f"{name:10s} {mode:8s}: joints {joints[mode].shape[0]:3d} / {joints['float32'].shape[0]:3d} ({'same' if same else 'diff'}), "
+                f"chamfer {d:.4f}, time {timings[mode]:.1f}s (float32 {timings['float32']:.1f}s)"
+            )
+    for mode, ds in results.items():
+        mean = float(np.mean(ds))
+        passed = mean <= args.tolerance
+        ok &= passed
+        print(f"{'OK ' if passed else 'NG '} {mode}: mean chamfer {mean:.4f} (tolerance {args.tolerance})")
+    print("✅ precision OK" if ok else "❌ precision NG")
+    return ok
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+UniRigSkin SDPAバックエンドの数値一致検証
+
+- CrossAttention (SDPA) と flash_attn の MHA(cross_attn=True) を同じ重みで比較
+- varlen_qkvpacked_attention と flash_attn_varlen_qkvpacked_func を比較
+- flash_attn / CUDA が無い環境では、素朴なsoftmax実装を基準に比較する
+
+使い方:
+    python verify_sdpa_parity.py
+"""
+
+import sys
+import torch
+
+from src.model.attention import CrossAttention, MHA, flash_attn, varlen_qkvpacked_attention
+
+def reference_varlen(qkv: torch.Tensor, cu_seqlens: torch.Tensor, scale: float) -> torch.Tensor:
+    out = torch.empty_like(qkv[:, 0])
+    for s, e in zip(cu_seqlens[:-1].tolist(), cu_seqlens[1:].tolist()):
+        q, k, v = qkv[s:e].double().unbind(dim=1)  # (L, H, D)
+        attn = torch.einsum('qhd,khd->hqk', q, k) * scale
+        out[s:e] = torch.einsum('hqk,khd->qhd', attn.softmax(dim=-1), v).to(out.dtype)
+    return out
+
+def check(name: str, a: torch.Tensor, b: torch.Tensor, atol: float) -> bool:
+    diff = (a.float() - b.float()).abs().max().item()
+    ok = diff <= atol
+    print(f"{'OK ' if ok else 'NG '} {name}: max abs diff = {diff:.3e} (atol {atol:.0e})")
+    return ok
+
+def main() -> bool:
+    torch.manual_seed(0)
+    cuda = torch.cuda.is_available()
+    device = 'cuda' if cuda else 'cpu'
+    flash = flash_attn is not None and cuda
+    print(f"device: {device}, flash_attn: {'yes' if flash else 'no (comparing against reference)'}")
+    ok = True
+
+    # varlen: 等長パッチ（通常ケース）と、パッチより小さい点群を含む可変長
+    H, D, K = 4, 16, 32
+    for lengths in ([K, K, K, K], [K, K, 7, K, 19]):
+        cu_seqlens = torch.nn.functional.pad(torch.cumsum(torch.tensor(lengths), 0), (1, 0)).to(torch.int32)
+        qkv = torch.randn(sum(lengths), 3, H, D, device=device)
+        scale = D ** -0.5
+        out = varlen_qkvpacked_attention(qkv, cu_seqlens.to(device), max_seqlen=K, softmax_scale=scale)
+        if flash:
+            expected = flash_attn.flash_attn_varlen_qkvpacked_func(
+                qkv.half(), cu_seqlens.to(device), max_seqlen=K, softmax_scale=scale,
+            ).float()
+            atol = 5e-3
+        else:
+            expected = reference_varlen(qkv, cu_seqlens, scale)
+            atol = 1e-5
+        ok &= check(f"varlen lengths={lengths}", out, expected, atol)
+
+    # cross attention: state_dictの互換性と出力
+    embed_dim, num_heads = 64, 4
+    sdpa = CrossAttention(embed_dim=embed_dim, num_heads=num_heads).to(device)
+    x = torch.randn(2, 50, embed_dim, device=device)
+    x_kv = torch.randn(2, 70, embed_dim, device=device)
+    with torch.no_grad():
+        out = sdpa(x, x_kv=x_kv)
+        if MHA is not None:
+            mha = MHA(embed_dim=embed_dim, num_heads=num_heads, cross_attn=True).to(device)
+            mha.load_state_dict(sdpa.state_dict())
+            ok &= check("cross attention vs MHA", out, mha(x, x_kv=x_kv), 1e-4)
+        else:
+            q = sdpa.Wq(x).view(2, 50, num_heads, -1).double()
+            k, v = sdpa.Wkv(x_kv).view(2, 70, 2, num_heads, -1).double().unbind(dim=2)
+            attn = torch.einsum('bqhd,bkhd->bhqk', q, k) / (embed_dim // num_heads) ** 0.5
+            expected = sdpa.out_proj(torch.einsum('bhqk,bkhd->bqhd', attn.softmax(dim=-1), v).reshape(2, 50, embed_dim).float())
+            ok &= check("cross attention vs reference", out, expected, 1e-4)
+        if device == 'cpu':
+            with torch.autocast(device_type='cpu', dtype=torch.bfloat16):
+                out_bf16 = sdpa(x, x_kv=x_kv)
+            ok &= check("cross attention bf16 autocast", out_bf16, out, 5e-2)
+
+    print("✅ parity OK" if ok else "❌ parity NG")
+    return ok
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)